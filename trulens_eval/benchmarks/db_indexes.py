@@ -0,0 +1,232 @@
+"""
+Benchmark of the database queries along the feedbacks/records join paths,
+with and without the indexes added in schema revision 2.
+
+Run from the `trulens_eval` folder:
+
+```bash
+python -m benchmarks.db_indexes --sizes 1000 10000 100000 1000000
+```
+
+For each size a fresh SQLite database is filled with that many records (each
+with `--feedbacks-per-record` feedback results spread over `--apps` apps) and
+each query is timed, first with all indexes and then again after dropping
+them.
+"""
+
+import argparse
+from datetime import datetime
+import json
+from pathlib import Path
+import random
+from tempfile import TemporaryDirectory
+import timeit
+from typing import Callable, Dict, List
+
+from sqlalchemy import inspect
+from sqlalchemy import text
+
+from trulens_eval.database.sqlalchemy_db import SqlAlchemyDB
+from trulens_eval.schema import FeedbackResultStatus
+from trulens_eval.util import Class
+from trulens_eval.util import jsonify
+
+COST_JSON = json.dumps(
+    dict(n_requests=0, n_successful_requests=0, n_tokens=0, cost=0.0)
+)
+PERF_JSON = json.dumps(
+    dict(start_time="2023-09-01T00:00:00", end_time="2023-09-01T00:00:01")
+)
+
+
+def populate(db: SqlAlchemyDB, n_records: int, n_apps: int, n_feedbacks: int):
+    """
+    Insert `n_records` synthetic records with `n_feedbacks` feedback results
+    each, bypassing the ORM so that large sizes load quickly.
+    """
+
+    now = datetime.now().timestamp()
+
+    with db.engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO apps VALUES (:app_id, :app_json)"), [
+                dict(
+                    app_id=f"app_{a}",
+                    app_json=json.dumps(
+                        dict(
+                            app_id=f"app_{a}",
+                            tags="-",
+                            metadata={},
+                            app={},
+                            app_extra_json={},
+                            root_class=jsonify(Class.of_class(object))
+                        )
+                    )
+                ) for a in range(n_apps)
+            ]
+        )
+        conn.execute(
+            text(
+                "INSERT INTO feedback_defs VALUES (:feedback_definition_id, :feedback_json)"
+            ), [
+                dict(
+                    feedback_definition_id=f"fdef_{f}",
+                    feedback_json=json.dumps(dict(implementation=None))
+                ) for f in range(n_feedbacks)
+            ]
+        )
+
+        chunk = 10000
+        for start in range(0, n_records, chunk):
+            ids = range(start, min(start + chunk, n_records))
+            conn.execute(
+                text(
+                    "INSERT INTO records VALUES (:record_id, :app_id, :input, "
+                    ":output, :record_json, :tags, :ts, :cost_json, :perf_json)"
+                ), [
+                    dict(
+                        record_id=f"record_{i}",
+                        app_id=f"app_{i % n_apps}",
+                        input="\"in\"",
+                        output="\"out\"",
+                        record_json=json.dumps(dict(record_id=f"record_{i}")),
+                        tags="-",
+                        ts=now - n_records + i,
+                        cost_json=COST_JSON,
+                        perf_json=PERF_JSON
+                    ) for i in ids
+                ]
+            )
+            conn.execute(
+                text(
+                    "INSERT INTO feedbacks VALUES (:feedback_result_id, "
+                    ":record_id, :feedback_definition_id, :last_ts, :status, "
+                    ":error, :calls_json, :result, :name, :cost_json, "
+                    ":multi_result)"
+                ),
+                [
+                    dict(
+                        feedback_result_id=f"feedback_{i}_{f}",
+                        record_id=f"record_{i}",
+                        feedback_definition_id=f"fdef_{f}",
+                        last_ts=now - n_records + i,
+                        # Only the most recent results are still pending.
+                        status=(
+                            FeedbackResultStatus.NONE if i >= n_records - 10
+                            else FeedbackResultStatus.DONE
+                        ).value,
+                        error=None,
+                        calls_json=json.dumps(dict(calls=[])),
+                        result=random.random(),
+                        name=f"feedback_{f}",
+                        cost_json=COST_JSON,
+                        multi_result=None
+                    ) for i in ids for f in range(n_feedbacks)
+                ]
+            )
+
+
+def drop_indexes(db: SqlAlchemyDB) -> None:
+    inspector = inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table in ["feedbacks", "records"]:
+            for index in inspector.get_indexes(table):
+                conn.execute(text(f"DROP INDEX {index['name']}"))
+
+
+def queries(db: SqlAlchemyDB, n_records: int,
+            n_apps: int) -> Dict[str, Callable[[], None]]:
+    """
+    The queries to time, each exercising one of the indexed join paths.
+    """
+
+    def record_id():
+        return f"record_{random.randrange(n_records)}"
+
+    def app_records_in_window():
+        # Most recent page of records of one app, as the dashboard shows them.
+        with db.engine.connect() as conn:
+            conn.execute(
+                text(
+                    "SELECT record_id FROM records WHERE app_id = :app_id "
+                    "AND ts >= :since ORDER BY ts DESC LIMIT 100"
+                ),
+                dict(
+                    app_id=f"app_{random.randrange(n_apps)}",
+                    since=datetime.now().timestamp() - 3600
+                )
+            ).fetchall()
+
+    return {
+        "feedback by record_id":
+            lambda: db.get_feedback(record_id=record_id()),
+        "pending feedback by status":
+            lambda: db.get_feedback(status=FeedbackResultStatus.NONE),
+        "feedback by definition, stale":
+            lambda: db.get_feedback(
+                feedback_definition_id="fdef_0",
+                last_ts_before=datetime.
+                fromtimestamp(datetime.now().timestamp() - n_records + 10)
+            ),
+        "records of app in window":
+            app_records_in_window,
+    }
+
+
+def time_queries(db: SqlAlchemyDB, n_records: int, n_apps: int,
+                 repeat: int) -> Dict[str, float]:
+    """
+    Best-of-`repeat` latency in milliseconds of each query.
+    """
+
+    return {
+        name: 1000 * min(timeit.repeat(query, number=1, repeat=repeat))
+        for name, query in queries(db, n_records, n_apps).items()
+    }
+
+
+def main(sizes: List[int], n_apps: int, n_feedbacks: int, repeat: int):
+    print(
+        f"{'records':>10} {'query':<32} {'indexed ms':>12} {'no index ms':>12}"
+    )
+
+    for n_records in sizes:
+        with TemporaryDirectory() as tmp:
+            db = SqlAlchemyDB.from_db_url(
+                f"sqlite:///{Path(tmp).joinpath('bench.sqlite')}"
+            )
+            db.migrate_database()
+            populate(db, n_records, n_apps, n_feedbacks)
+
+            indexed = time_queries(db, n_records, n_apps, repeat)
+            drop_indexes(db)
+            unindexed = time_queries(db, n_records, n_apps, repeat)
+
+            for name in indexed:
+                print(
+                    f"{n_records:>10} {name:<32} {indexed[name]:>12.2f} {unindexed[name]:>12.2f}"
+                )
+
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000, 1000000],
+        help="Numbers of records to benchmark with."
+    )
+    parser.add_argument("--apps", type=int, default=10)
+    parser.add_argument("--feedbacks-per-record", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    main(
+        sizes=args.sizes,
+        n_apps=args.apps,
+        n_feedbacks=args.feedbacks_per_record,
+        repeat=args.repeat
+    )
@@ -0,0 +1,137 @@
+"""
+Benchmark of exporting records and feedback results with
+`database/export.py` against loading them with `get_records_and_feedback`.
+
+Run from the `trulens_eval` folder:
+
+```bash
+python -m benchmarks.export --sizes 1000 10000 50000
+```
+
+For each size a fresh SQLite database is filled with that many records (see
+`benchmarks/db_indexes.py`), each with a `record_json` of `--record-kb`
+kilobytes, and the time and peak python memory (as traced by `tracemalloc`)
+of `SqlAlchemyDB.get_records_and_feedback` and of
+`export_records_and_feedback` to Parquet files are reported, along with the
+time of an incremental export after adding 1% more records.
+"""
+
+import argparse
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import time
+import tracemalloc
+from typing import Callable, List, Tuple
+
+from benchmarks.db_indexes import populate
+from sqlalchemy import text
+
+from trulens_eval.database.export import export_records_and_feedback
+from trulens_eval.database.sqlalchemy_db import SqlAlchemyDB
+
+
+def measure(func: Callable[[], None]) -> Tuple[float, float]:
+    """
+    Time in seconds and peak traced memory in megabytes of `func`, measured
+    in separate runs as tracing slows it down.
+    """
+
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed, peak / 2**20
+
+
+def pad_records(db: SqlAlchemyDB, record_kb: int) -> None:
+    with db.engine.begin() as conn:
+        conn.execute(
+            text(
+                "UPDATE records SET record_json = json_object('record_id', "
+                "record_id, 'pad', hex(randomblob(:n)))"
+            ), dict(n=record_kb * 512)
+        )
+
+
+def main(sizes: List[int], n_apps: int, n_feedbacks: int, record_kb: int):
+    print(
+        f"{'records':>10} {'load s':>8} {'load MB':>8} {'export s':>9} "
+        f"{'export MB':>10} {'increment s':>12}"
+    )
+
+    for n_records in sizes:
+        with TemporaryDirectory() as tmp:
+            db = SqlAlchemyDB.from_db_url(
+                f"sqlite:///{Path(tmp).joinpath('bench.sqlite')}"
+            )
+            db.migrate_database()
+            populate(db, n_records, n_apps, n_feedbacks)
+            pad_records(db, record_kb)
+
+            load_s, load_mb = measure(lambda: db.get_records_and_feedback([]))
+
+            export_s, export_mb = measure(
+                lambda: export_records_and_feedback(
+                    db, Path(tmp) / "export", incremental=False
+                )
+            )
+
+            # Records newer than those exported so far.
+            extra = max(1, n_records // 100)
+            with db.engine.begin() as conn:
+                conn.execute(
+                    text(
+                        "INSERT INTO records SELECT 'new_' || record_id, "
+                        "app_id, input, output, record_json, tags, "
+                        "ts + :n, cost_json, perf_json FROM records "
+                        "ORDER BY ts DESC LIMIT :extra"
+                    ), dict(n=n_records, extra=extra)
+                )
+
+            start = time.perf_counter()
+            export_records_and_feedback(db, Path(tmp) / "export")
+            increment_s = time.perf_counter() - start
+
+            print(
+                f"{n_records:>10} {load_s:>8.2f} {load_mb:>8.1f} "
+                f"{export_s:>9.2f} {export_mb:>10.1f} {increment_s:>12.3f}"
+            )
+
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 50000],
+        help="Numbers of records in the database."
+    )
+    parser.add_argument("--apps", type=int, default=10, help="Number of apps.")
+    parser.add_argument(
+        "--feedbacks-per-record",
+        type=int,
+        default=3,
+        help="Number of feedback results of each record."
+    )
+    parser.add_argument(
+        "--record-kb",
+        type=int,
+        default=4,
+        help="Size of the record_json of each record."
+    )
+    args = parser.parse_args()
+
+    main(
+        sizes=args.sizes,
+        n_apps=args.apps,
+        n_feedbacks=args.feedbacks_per_record,
+        record_kb=args.record_kb
+    )
@@ -0,0 +1,133 @@
+"""
+Benchmark of the overhead of instrumented method calls in nested apps.
+
+Run from the `trulens_eval` folder:
+
+```bash
+python -m benchmarks.instrumented_calls --depths 10 25 50 100 --repeat 20
+```
+
+For each of `--depths`, a custom app is made of a chain of that many
+components, each of which calls the next one through an instrumented method.
+The chain is timed when called before instrumentation, after instrumentation
+but outside of a recording, within `TruCustomApp.with_record`, and within
+`with_record` of an app whose `SamplingPolicy` does not sample the call. The
+overhead per nested call is the difference to the plain call divided by the
+depth. The time of `with_record` as a whole, which includes constructing the
+record, is reported separately, as is that of unsampled `with_record` calls.
+"""
+
+import argparse
+import sys
+import time
+import timeit
+from typing import List, Optional
+
+from trulens_eval.app import SamplingPolicy
+from trulens_eval.tru_custom_app import instrument
+from trulens_eval.tru_custom_app import TruCustomApp
+
+
+class Component():
+
+    def __init__(self, child: Optional['Component']):
+        self.child = child
+
+    @instrument
+    def respond(self, query: str) -> str:
+        if self.child is None:
+            return query
+        else:
+            return self.child.respond(query)
+
+
+def chain(depth: int) -> Component:
+    component = None
+    for _ in range(depth):
+        component = Component(child=component)
+
+    return component
+
+
+def main(depths: List[int], repeat: int):
+    # Instrumented calls add a few python frames each.
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20 * max(depths)))
+
+    print(
+        f"{'depth':>6} {'plain us':>10} {'unrecorded us':>14} "
+        f"{'recorded us':>12} {'per call us':>12} {'with_record ms':>15} "
+        f"{'unsampled ms':>13}"
+    )
+
+    for depth in depths:
+        root = chain(depth)
+
+        # Component.respond is only wrapped once an app is made of it so
+        # only apps made earlier affect this.
+        plain = min(
+            timeit.repeat(lambda: root.respond("q"), number=1, repeat=repeat)
+        )
+
+        tru_app = TruCustomApp(root)
+
+        unrecorded = min(
+            timeit.repeat(lambda: root.respond("q"), number=1, repeat=repeat)
+        )
+
+        recorded = []
+
+        def timed_respond(query: str) -> str:
+            start = time.perf_counter()
+            ret = root.respond(query)
+            recorded.append(time.perf_counter() - start)
+            return ret
+
+        with_record = min(
+            timeit.repeat(
+                lambda: tru_app.with_record(timed_respond, "q"),
+                number=1,
+                repeat=repeat
+            )
+        )
+
+        per_call = (min(recorded) - plain) / depth
+
+        tru_app.sampling = SamplingPolicy(rate=0.0)
+        unsampled = min(
+            timeit.repeat(
+                lambda: tru_app.with_record(root.respond, "q"),
+                number=1,
+                repeat=repeat
+            )
+        )
+
+        print(
+            f"{depth:>6} {plain * 1e6:>10.1f} {unrecorded * 1e6:>14.1f} "
+            f"{min(recorded) * 1e6:>12.1f} {per_call * 1e6:>12.1f} "
+            f"{with_record * 1e3:>15.2f} {unsampled * 1e3:>13.2f}"
+        )
+
+        # Restore the original method for the next (uninstrumented) chain.
+        Component.respond = getattr(
+            Component.respond, tru_app.instrument.INSTRUMENT
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--depths",
+        type=int,
+        nargs="+",
+        default=[10, 25, 50, 100],
+        help="Numbers of nested components of the apps."
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=20,
+        help="Number of times to time each call, reporting the fastest."
+    )
+    args = parser.parse_args()
+
+    main(depths=args.depths, repeat=args.repeat)
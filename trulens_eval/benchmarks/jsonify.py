@@ -0,0 +1,160 @@
+"""
+Benchmark of `jsonify` serializing the example apps and their records.
+
+Run from the `trulens_eval` folder:
+
+```bash
+python -m benchmarks.jsonify --depths 1 8 32 --repeat 20
+```
+
+The apps are those of the langchain quickstart and the custom app example,
+with a fake LLM in place of OpenAI so no keys are needed, as well as a
+langchain app of nested sequential chains for each of `--depths` to show how
+serialization scales with deep object graphs. For each app, `App.dict` (as
+done by `App.post_init` and when storing the app) and `jsonify` of one of its
+records (as done by `App._post_record`) are timed.
+"""
+
+import argparse
+from pathlib import Path
+import sys
+import timeit
+from typing import Dict, List, Tuple
+
+from langchain.chains import LLMChain
+from langchain.chains import SequentialChain
+from langchain.llms.fake import FakeListLLM
+from langchain.prompts.chat import ChatPromptTemplate
+from langchain.prompts.chat import HumanMessagePromptTemplate
+from langchain.prompts.chat import PromptTemplate
+
+from trulens_eval.app import App
+from trulens_eval.schema import Record
+from trulens_eval.tru_chain import TruChain
+from trulens_eval.tru_custom_app import TruCustomApp
+from trulens_eval.util import jsonify
+
+EXAMPLES = Path(__file__).parent.parent / "examples"
+
+
+def llm_chain(input_key: str, output_key: str) -> LLMChain:
+    """
+    The chain of the langchain quickstart with a fake LLM.
+    """
+
+    full_prompt = HumanMessagePromptTemplate(
+        prompt=PromptTemplate(
+            template=
+            "Provide a helpful response with relevant background information for the following: {"
+            + input_key + "}",
+            input_variables=[input_key],
+        )
+    )
+
+    chat_prompt_template = ChatPromptTemplate.from_messages([full_prompt])
+
+    llm = FakeListLLM(responses=["Provided."] * 1000)
+
+    return LLMChain(llm=llm, prompt=chat_prompt_template, output_key=output_key)
+
+
+def sequential_chain(depth: int) -> SequentialChain:
+    """
+    Nested sequential chains, `depth` levels deep, each of which runs an
+    `LLMChain` before the next level.
+    """
+
+    chain = llm_chain(input_key=f"in{depth}", output_key=f"out{depth}")
+
+    for level in range(depth - 1, 0, -1):
+        chain = SequentialChain(
+            chains=[
+                llm_chain(input_key=f"in{level}", output_key=f"in{level + 1}"),
+                chain
+            ],
+            input_variables=[f"in{level}"],
+            output_variables=[f"out{depth}"]
+        )
+
+    return chain
+
+
+def custom_app() -> Tuple[TruCustomApp, Record]:
+    """
+    The app of the custom app example without its simulated latency, along
+    with one of its records.
+    """
+
+    sys.path.insert(0, str(EXAMPLES / "frameworks" / "custom"))
+
+    import custom_app
+    import custom_llm
+    import custom_retriever
+
+    custom_llm.sleep = lambda _: None
+    custom_retriever.sleep = lambda _: None
+
+    ca = custom_app.CustomApp()
+    tru_app = TruCustomApp(ca)
+
+    _, record = tru_app.with_record(
+        ca.respond_to_query, "What is the capital of Indonesia?"
+    )
+
+    return tru_app, record
+
+
+def apps(depths: List[int]) -> Dict[str, Tuple[App, Record]]:
+    """
+    Example apps along with one of their records.
+    """
+
+    ret = dict()
+
+    tru_app = TruChain(llm_chain(input_key="prompt", output_key="text"))
+    _, record = tru_app.call_with_record(dict(prompt="¿que hora es?"))
+    ret["langchain quickstart"] = (tru_app, record)
+
+    ret["custom app"] = custom_app()
+
+    for depth in depths:
+        tru_app = TruChain(sequential_chain(depth))
+        _, record = tru_app.call_with_record(dict(in1="¿que hora es?"))
+        ret[f"langchain sequential depth {depth}"] = (tru_app, record)
+
+    return ret
+
+
+def main(depths: List[int], repeat: int):
+    print(f"{'app':<32} {'app ms':>10} {'record ms':>10}")
+
+    for name, (tru_app, record) in apps(depths).items():
+        app_ms = 1000 * min(
+            timeit.repeat(tru_app.dict, number=1, repeat=repeat)
+        )
+        record_ms = 1000 * min(
+            timeit.repeat(lambda: jsonify(record), number=1, repeat=repeat)
+        )
+
+        print(f"{name:<32} {app_ms:>10.2f} {record_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--depths",
+        type=int,
+        nargs="+",
+        default=[1, 8, 32],
+        help="Nesting depths of the sequential chain apps."
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=20,
+        help="Number of times to serialize each app and record, reporting "
+        "the fastest."
+    )
+    args = parser.parse_args()
+
+    main(depths=args.depths, repeat=args.repeat)
@@ -0,0 +1,133 @@
+"""
+Benchmark of evaluating feedback selectors over the records of the example
+apps.
+
+Run from the `trulens_eval` folder:
+
+```bash
+python -m benchmarks.selectors --repeat 1000
+```
+
+Selectors typical of feedback functions, with and without slices, are
+evaluated over a record of the langchain quickstart and one of the custom app
+example (see `benchmarks/jsonify.py`). Each is timed as evaluated step by step
+(as `JSONPath.__call__` did before paths were compiled) and as compiled by
+`JSONPath.compile`. `Feedback.extract_selection` with all of the selectors of
+an app is timed as well.
+"""
+
+import argparse
+import timeit
+from typing import Any, Dict, Iterable, List, Tuple
+
+from benchmarks.jsonify import custom_app
+from benchmarks.jsonify import llm_chain
+
+from trulens_eval.feedback import Feedback
+from trulens_eval.schema import Record
+from trulens_eval.schema import Select
+from trulens_eval.tru_chain import TruChain
+from trulens_eval.util import JSONPath
+
+
+def interpreted(path: JSONPath, obj: Any) -> Iterable[Any]:
+    """
+    Elements of `obj` indexed by `path`, evaluated step by step.
+    """
+
+    if len(path.path) == 0:
+        yield obj
+        return
+
+    rest = JSONPath(path=path.path[1:])
+
+    for first_selection in path.path[0](obj):
+        yield from interpreted(rest, first_selection)
+
+
+def selectors() -> Dict[str, Tuple[Record, Dict[str, JSONPath]]]:
+    """
+    Records of the example apps along with selectors of some of their parts.
+    """
+
+    ret = dict()
+
+    tru_app = TruChain(llm_chain(input_key="prompt", output_key="text"))
+    _, record = tru_app.call_with_record(dict(prompt="¿que hora es?"))
+    ret["langchain quickstart"] = (
+        record,
+        dict(
+            input=Select.RecordInput,
+            output=Select.RecordOutput,
+            prompt=Select.Record.app._call.args.inputs.prompt,
+            inputs=Select.Record.app._call.args.inputs[["prompt"]],
+        )
+    )
+
+    _, record = custom_app()
+    ret["custom app"] = (
+        record,
+        dict(
+            input=Select.RecordInput,
+            output=Select.RecordOutput,
+            question=Select.Record.app.respond_to_query.args.input,
+            chunks=Select.Record.app.retriever.retrieve_chunks.rets[:],
+        )
+    )
+
+    return ret
+
+
+def main(repeat: int):
+    print(f"{'app':<24} {'selector':<12} {'step us':>10} {'compiled us':>12}")
+
+    for name, (record, paths) in selectors().items():
+        layout = record.layout_calls_as_app()
+
+        for key, path in paths.items():
+            within = JSONPath(path=path.path[1:])
+
+            # Both must select the same elements.
+            assert list(interpreted(within, layout)) == list(within(layout))
+
+            step_us = 1e6 * min(
+                timeit.repeat(
+                    lambda: list(interpreted(within, layout)),
+                    number=1,
+                    repeat=repeat
+                )
+            )
+            compiled_us = 1e6 * min(
+                timeit.repeat(
+                    lambda: list(within(layout)),
+                    number=1,
+                    repeat=repeat,
+                )
+            )
+
+            print(f"{name:<24} {key:<12} {step_us:>10.2f} {compiled_us:>12.2f}")
+
+        # Only the selectors of the feedback function are needed.
+        feedback = Feedback.construct(selectors=paths)
+        extract_us = 1e6 * min(
+            timeit.repeat(
+                lambda: list(feedback.extract_selection(None, record)),
+                number=1,
+                repeat=repeat
+            )
+        )
+        print(f"{name:<24} {'extract':<12} {'':>10} {extract_us:>12.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1000,
+        help="Number of times to evaluate each selector, reporting the "
+        "fastest."
+    )
+    args = parser.parse_args()
+
+    main(repeat=args.repeat)
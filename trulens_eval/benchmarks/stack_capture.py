@@ -0,0 +1,143 @@
+"""
+Benchmark of capturing the call stack at the bottom of nested calls.
+
+Run from the `trulens_eval` folder:
+
+```bash
+python -m benchmarks.stack_capture --depths 10 25 50 100 --repeat 200
+```
+
+For each of `--depths`, a function calls itself that many times and then
+captures the stack, once with `inspect.stack` (as `stack_with_tasks` did
+before walking frames) and once with `stack_with_tasks`. The same is done in
+nested coroutines creating a task, on an event loop with the task factory of
+`utils/python.py` that annotates tasks with the stack of their creator and on
+one whose task factory does so with `inspect.stack`. Savings per nested call
+are the differences of the times of the two divided by the depth.
+"""
+
+import argparse
+import asyncio
+import inspect
+import sys
+import timeit
+from typing import Callable, List
+
+from trulens_eval.utils.python import merge_stacks
+from trulens_eval.utils.python import STACK
+from trulens_eval.utils.python import stack_with_tasks
+from trulens_eval.utils.python import task_factory_with_stack
+
+
+def inspect_stack_with_tasks() -> List['frame']:
+    """
+    `stack_with_tasks` as it was with `inspect.stack`.
+    """
+
+    return [fi.frame for fi in inspect.stack()[1:]]
+
+
+def inspect_task_factory(loop, coro, *args, **kwargs) -> asyncio.Task:
+    """
+    `task_factory_with_stack` as it was with `inspect.stack`.
+    """
+
+    parent_task = asyncio.current_task(loop=loop)
+    task = asyncio.tasks.Task(coro=coro, loop=loop, *args, **kwargs)
+
+    stack = [fi.frame for fi in inspect.stack()[2:]]
+
+    if parent_task is not None:
+        stack = merge_stacks(stack, parent_task.get_stack()[::-1])
+
+    setattr(task, STACK, stack)
+
+    return task
+
+
+def nested(depth: int, capture: Callable[[], List['frame']]):
+    if depth == 0:
+        return capture()
+
+    return nested(depth - 1, capture)
+
+
+async def nested_async(depth: int):
+    if depth == 0:
+        return await asyncio.get_running_loop().create_task(asyncio.sleep(0))
+
+    return await nested_async(depth - 1)
+
+
+def time_async(loop: asyncio.AbstractEventLoop, depth: int, repeat: int):
+    return min(
+        timeit.repeat(
+            lambda: loop.run_until_complete(nested_async(depth)),
+            number=1,
+            repeat=repeat
+        )
+    )
+
+
+def main(depths: List[int], repeat: int):
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10 * max(depths)))
+
+    print(
+        f"{'depth':>6} {'inspect us':>11} {'frames us':>10} "
+        f"{'saved/call us':>14} {'task inspect us':>16} "
+        f"{'task frames us':>15} {'saved/call us':>14}"
+    )
+
+    loop = asyncio.new_event_loop()
+    loop.set_task_factory(task_factory_with_stack)
+    inspect_loop = asyncio.new_event_loop()
+    inspect_loop.set_task_factory(inspect_task_factory)
+
+    for depth in depths:
+        inspected = min(
+            timeit.repeat(
+                lambda: nested(depth, inspect_stack_with_tasks),
+                number=1,
+                repeat=repeat
+            )
+        )
+        walked = min(
+            timeit.repeat(
+                lambda: nested(depth, stack_with_tasks),
+                number=1,
+                repeat=repeat
+            )
+        )
+
+        task_inspected = time_async(inspect_loop, depth, repeat)
+        task_walked = time_async(loop, depth, repeat)
+
+        print(
+            f"{depth:>6} {inspected * 1e6:>11.1f} {walked * 1e6:>10.1f} "
+            f"{(inspected - walked) / depth * 1e6:>14.2f} "
+            f"{task_inspected * 1e6:>16.1f} {task_walked * 1e6:>15.1f} "
+            f"{(task_inspected - task_walked) / depth * 1e6:>14.2f}"
+        )
+
+    loop.close()
+    inspect_loop.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--depths",
+        type=int,
+        nargs="+",
+        default=[10, 25, 50, 100],
+        help="Numbers of nested calls before capturing the stack."
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=200,
+        help="Number of times to capture each stack, reporting the fastest."
+    )
+    args = parser.parse_args()
+
+    main(depths=args.depths, repeat=args.repeat)
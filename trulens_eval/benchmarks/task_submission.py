@@ -0,0 +1,89 @@
+"""
+Benchmark of the throughput of submitting tasks to thread pools.
+
+Run from the `trulens_eval` folder:
+
+```bash
+python -m benchmarks.task_submission --depths 10 50 --tasks 2000
+```
+
+For each of `--depths`, `--tasks` trivial tasks are submitted to `Executor`
+and to `ThreadPoolExecutor` (as used by `TP`) from within that many nested
+python frames, and the tasks per second are reported with and without
+`CAPTURE_THREAD_STACKS`. The latter is the legacy behaviour of capturing the
+submitter's stack, including source lines, on every submission.
+"""
+
+import argparse
+import time
+from typing import List
+
+from trulens_eval import util
+from trulens_eval.util import Executor
+from trulens_eval.util import ThreadPoolExecutor
+
+
+def nop():
+    pass
+
+
+def nested(depth: int, func, *args):
+    if depth == 0:
+        return func(*args)
+    else:
+        return nested(depth - 1, func, *args)
+
+
+def submit_all(submit, tasks: int) -> float:
+    """
+    Submit `tasks` tasks and wait for them, returning the tasks per second.
+    """
+
+    start = time.perf_counter()
+    futures = [submit(nop) for _ in range(tasks)]
+    for future in futures:
+        future.result()
+
+    return tasks / (time.perf_counter() - start)
+
+
+def main(depths: List[int], tasks: int):
+    executor = Executor(name="benchmark", max_queued=tasks)
+    pool = ThreadPoolExecutor(max_workers=8)
+
+    print(
+        f"{'depth':>6} {'pool':>20} {'tasks/s':>10} {'capturing tasks/s':>18}"
+    )
+
+    for depth in depths:
+        for name, submit in [("Executor", executor.submit),
+                             ("ThreadPoolExecutor", pool.submit)]:
+            rates = []
+            for capture in [False, True]:
+                util.CAPTURE_THREAD_STACKS = capture
+                rates.append(nested(depth, submit_all, submit, tasks))
+
+            print(f"{depth:>6} {name:>20} {rates[0]:>10.0f} {rates[1]:>18.0f}")
+
+    util.CAPTURE_THREAD_STACKS = False
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--depths",
+        type=int,
+        nargs="+",
+        default=[10, 50],
+        help="Numbers of python frames below the submitter."
+    )
+    parser.add_argument(
+        "--tasks",
+        type=int,
+        default=2000,
+        help="Number of tasks to submit for each measurement."
+    )
+    args = parser.parse_args()
+
+    main(depths=args.depths, tasks=args.tasks)
@@ -32,9 +32,13 @@ setup(
     ),
     python_requires='>=3.8',
     entry_points={
-        'console_scripts': [
-            'trulens-eval=trulens_eval.utils.command_line:main'
-        ],
+        'console_scripts':
+            [
+                'trulens-eval=trulens_eval.utils.command_line:main',
+                'trulens-eval-worker=trulens_eval.utils.command_line:worker',
+                'trulens-eval-export=trulens_eval.utils.command_line:export',
+                'trulens-eval-rollups=trulens_eval.utils.command_line:rollups'
+            ],
     },
     install_requires=[
         'cohere>=4.4.1',
@@ -64,6 +68,7 @@ setup(
         'numpy>=1.23.5',
         'sqlalchemy>=2.0.19',
         'alembic>=1.11.2',
+        'aiohttp>=3.8.0',  # async http requests in feedback endpoints
         # 'nest_asyncio>=1.5.6',  # NOTE(piotrm): disabling for now, need more investigation of compatibility issues
     ],
 )
@@ -1,11 +1,20 @@
+from collections import Counter
 from contextlib import contextmanager
+from datetime import datetime
+from datetime import timedelta
 import json
 from pathlib import Path
+import sqlite3
 from tempfile import TemporaryDirectory
-from typing import Literal, Union
+from threading import Event
+from threading import Thread
+import time
+from typing import ClassVar, Literal, Union
 from unittest import main
 from unittest import TestCase
 
+import pandas as pd
+import pyarrow as pa
 from sqlalchemy import Engine
 from sqlalchemy import text
 
@@ -16,15 +25,30 @@ from trulens_eval import Select
 from trulens_eval import Tru
 from trulens_eval import TruBasicApp
 from trulens_eval.database import orm
+from trulens_eval.database.export import export_records_and_feedback
+from trulens_eval.database.export import ExportFormat
 from trulens_eval.database.migrations import DbRevisions
 from trulens_eval.database.migrations import downgrade_db
 from trulens_eval.database.migrations import get_revision_history
 from trulens_eval.database.migrations import upgrade_db
 from trulens_eval.database.sqlalchemy_db import AppsExtractor
 from trulens_eval.database.sqlalchemy_db import SqlAlchemyDB
+from trulens_eval.database.utils import _copy_database
 from trulens_eval.database.utils import is_legacy_sqlite
+from trulens_eval.db import APP_SUMMARY_COLUMNS
 from trulens_eval.db import DB
 from trulens_eval.db import LocalSQLite
+from trulens_eval.feedback import FeedbackCache
+from trulens_eval.schema import Cost
+from trulens_eval.schema import FeedbackResult
+from trulens_eval.schema import FeedbackResultStatus
+from trulens_eval.schema import Perf
+from trulens_eval.schema import Record
+from trulens_eval.schema import RecordAppCall
+from trulens_eval.util import BLOB
+from trulens_eval.util import Executor
+from trulens_eval.util import TP
+from trulens_eval.utils.worker import EvaluatorWorker
 
 
 class TestDbV2Migration(TestCase):
@@ -53,6 +77,107 @@ class TestDbV2Migration(TestCase):
         with clean_db("mysql") as db:
             _test_db_consistency(db)
 
+    def test_bulk_insert_sqlite_file(self):
+        with clean_db("sqlite_file") as db:
+            db.migrate_database()
+            _test_bulk_insert(db)
+
+    def test_bulk_insert_legacy_sqlite(self):
+        with TemporaryDirectory() as tmp:
+            _test_bulk_insert(
+                LocalSQLite(filename=Path(tmp).joinpath("legacy.sqlite"))
+            )
+
+    def test_batched_writes_legacy_sqlite(self):
+        with TemporaryDirectory() as tmp:
+            _test_batched_writes(
+                LocalSQLite(filename=Path(tmp).joinpath("legacy.sqlite"))
+            )
+
+    def test_claim_pending_feedback_sqlite_file(self):
+        with clean_db("sqlite_file") as db:
+            db.migrate_database()
+            _test_claim_pending_feedback(db)
+
+    def test_claim_pending_feedback_legacy_sqlite(self):
+        with TemporaryDirectory() as tmp:
+            _test_claim_pending_feedback(
+                LocalSQLite(filename=Path(tmp).joinpath("legacy.sqlite"))
+            )
+
+    def test_evaluator_workers_sqlite_file(self):
+        with clean_db("sqlite_file") as db:
+            db.migrate_database()
+            _test_evaluator_workers(db)
+
+    def test_deferred_cache_sqlite_file(self):
+        with clean_db("sqlite_file") as db:
+            db.migrate_database()
+            _test_deferred_cache(db)
+
+    def test_get_records_and_feedback_sqlite_file(self):
+        with clean_db("sqlite_file") as db:
+            db.migrate_database()
+            _test_get_records_and_feedback(db)
+
+    def test_get_records_and_feedback_legacy_sqlite(self):
+        with TemporaryDirectory() as tmp:
+            _test_get_records_and_feedback(
+                LocalSQLite(filename=Path(tmp).joinpath("legacy.sqlite"))
+            )
+
+    def test_get_app_summaries_sqlite_file(self):
+        with clean_db("sqlite_file") as db:
+            db.migrate_database()
+            _test_get_app_summaries(db)
+            df, _ = db.get_app_summaries()
+
+            # Same summaries from the records as from the rollups.
+            db.rollups = False
+            pd.testing.assert_frame_equal(db.get_app_summaries()[0], df)
+
+            db.rebuild_rollups()
+            db.rollups = True
+            pd.testing.assert_frame_equal(db.get_app_summaries()[0], df)
+
+    def test_get_app_summaries_legacy_sqlite(self):
+        with TemporaryDirectory() as tmp:
+            _test_get_app_summaries(
+                LocalSQLite(filename=Path(tmp).joinpath("legacy.sqlite"))
+            )
+
+    def test_feedback_rollups_sqlite_file(self):
+        with clean_db("sqlite_file") as db:
+            db.migrate_database()
+            _test_feedback_rollups(db)
+
+    def test_record_calls_blobs_sqlite_file(self):
+        with clean_db("sqlite_file") as db:
+            db.migrate_database()
+            _test_record_calls_blobs(db)
+
+    def test_record_string_blobs_sqlite_file(self):
+        with clean_db("sqlite_file") as db:
+            db.migrate_database()
+            _test_record_string_blobs(db)
+
+    def test_latency_percentiles_sqlite_file(self):
+        with clean_db("sqlite_file") as db:
+            db.migrate_database()
+            _test_latency_percentiles(db)
+
+    def test_export_sqlite_file(self):
+        with clean_db("sqlite_file") as db:
+            db.migrate_database()
+            _test_export(db)
+
+    def test_copy_database_sqlite_file(self):
+        with clean_db("sqlite_file") as db, TemporaryDirectory() as tmp:
+            db.migrate_database()
+            _test_copy_database(
+                db, f"sqlite:///{Path(tmp).joinpath('copy.sqlite')}"
+            )
+
     def test_migrate_legacy_sqlite_file(self):
         with TemporaryDirectory() as tmp:
             file = Path(tmp).joinpath("legacy.sqlite")
@@ -90,6 +215,16 @@ class MockFeedback(Provider):
         return float(len(text))
 
 
+class CountingFeedback(Provider):
+
+    # Number of times each text was evaluated.
+    counts: ClassVar[Counter] = Counter()
+
+    def count(self, text: str) -> float:  # noqa
+        CountingFeedback.counts[text] += 1
+        return 1.0
+
+
 @contextmanager
 def clean_db(alias: str) -> SqlAlchemyDB:
     with TemporaryDirectory() as tmp:
@@ -172,6 +307,715 @@ def _test_db_consistency(db: SqlAlchemyDB):
                      ).one()  # feedback defs are preserved
 
 
+def _test_bulk_insert(db: DB, n: int = 100):
+    fb, app, rec = _populate_data(db)
+
+    recs = [
+        Record(**rec.dict(exclude={"record_id"}), record_id=f"bulk_{i}")
+        for i in range(n)
+    ] + [rec]  # existing records are updated
+    assert db.insert_records(recs) == [r.record_id for r in recs]
+
+    fbs = [
+        FeedbackResult(
+            record_id=r.record_id,
+            feedback_definition_id=fb.feedback_definition_id,
+            name=fb.name
+        ) for r in recs
+    ]
+    db.insert_feedbacks(fbs)
+    db.insert_feedbacks(
+        fr.update(status=FeedbackResultStatus.DONE, result=1.0) for fr in fbs
+    )
+
+    df_fb = db.get_feedback(feedback_definition_id=fb.feedback_definition_id)
+    assert len(df_fb) == n + 2  # one more from `_populate_data`
+    assert set(df_fb["status"]) == {FeedbackResultStatus.DONE}
+    df_recs, _ = db.get_records_and_feedback([app.app_id])
+    assert len(df_recs) == n + 1
+
+
+def _test_batched_writes(db: LocalSQLite):
+    fb, app, rec = _populate_data(db)
+
+    # A row that cannot be written is raised by the next flush only.
+    db._write_vals(table=db.TABLE_APPS, vals=("bad",))
+    db._write_vals(table=db.TABLE_APPS, vals=("good", app.json()))
+    try:
+        db.flush()
+        assert False, "Failed write was not raised."
+    except sqlite3.Error:
+        pass
+    db.flush()
+    assert db.get_app("good")["app_id"] == app.app_id
+
+    # Rows written together are committed or dropped together.
+    db._write_many_vals(
+        table=db.TABLE_APPS, rows=[("unit_good", app.json()), ("unit_bad",)]
+    )
+    try:
+        db.flush()
+        assert False, "Failed write was not raised."
+    except sqlite3.Error:
+        pass
+    with db._connection() as (conn, c):
+        c.execute(
+            f"SELECT COUNT(*) FROM {db.TABLE_APPS} WHERE app_id LIKE 'unit_%'"
+        )
+        assert c.fetchone()[0] == 0
+
+    # Writes submitted while or after closing are not lost.
+    threads = [
+        Thread(
+            target=db._write_vals,
+            kwargs=dict(table=db.TABLE_APPS, vals=(f"app_{i}", app.json()))
+        ) for i in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+    db.close()
+    for thread in threads:
+        thread.join()
+    db.flush()
+
+    for i in range(20):
+        assert db.get_app(f"app_{i}")["app_id"] == app.app_id
+
+
+def _test_claim_pending_feedback(db: DB):
+    fb, app, rec = _populate_data(db)
+    now = datetime.now()
+
+    db.insert_feedbacks(
+        [
+            FeedbackResult(
+                feedback_result_id=f"{status.value}_{age}",
+                record_id=rec.record_id,
+                feedback_definition_id=fb.feedback_definition_id,
+                name=fb.name,
+                status=status,
+                last_ts=now - timedelta(seconds=age)
+            ) for status in [
+                FeedbackResultStatus.NONE, FeedbackResultStatus.RUNNING,
+                FeedbackResultStatus.FAILED, FeedbackResultStatus.DONE
+            ] for age in [0, 60, 600]
+        ]
+    )
+
+    # One more done from `_populate_data`.
+    assert db.get_feedback_count_by_status() == {
+        FeedbackResultStatus.NONE: 3,
+        FeedbackResultStatus.RUNNING: 3,
+        FeedbackResultStatus.FAILED: 3,
+        FeedbackResultStatus.DONE: 4
+    }
+
+    first = db.claim_pending_feedback(
+        limit=2, lease_seconds=30, retry_failed_seconds=300
+    )
+    assert len(first) == 2
+    assert set(first["status"]) == {FeedbackResultStatus.RUNNING}
+    assert first["lease_token"].nunique() == 1
+
+    claimed = set(first["feedback_result_id"]).union(
+        db.claim_pending_feedback(
+            limit=10, lease_seconds=30, retry_failed_seconds=300
+        )["feedback_result_id"]
+    )
+    assert claimed == {
+        "none_0", "none_60", "none_600", "running_60", "running_600",
+        "failed_600"
+    }
+
+    # Everything pending is now leased.
+    assert len(db.claim_pending_feedback(limit=10, lease_seconds=30)) == 0
+
+    # Until the lease runs out.
+    taken = db.claim_pending_feedback(
+        limit=10, lease_seconds=-1, lease_token="taker"
+    )
+    assert len(taken) == 7
+    assert set(taken["lease_token"]) == {"taker"}
+
+    # Leases are only renewed and results only written by whoever holds the
+    # lease now.
+    feedback_result_id = first["feedback_result_id"].iloc[0]
+    assert db.heartbeat_feedback(
+        [feedback_result_id], first["lease_token"].iloc[0]
+    ) == 0
+    assert db.heartbeat_feedback(
+        list(taken["feedback_result_id"]), "taker"
+    ) == 7
+
+    done = FeedbackResult(
+        feedback_result_id=feedback_result_id,
+        record_id=rec.record_id,
+        feedback_definition_id=fb.feedback_definition_id,
+        name=fb.name,
+        status=FeedbackResultStatus.DONE,
+        result=1.0
+    )
+    assert db.insert_feedback(
+        done, lease_token=first["lease_token"].iloc[0]
+    ) is None
+    assert db.get_feedback(feedback_result_id=feedback_result_id
+                          )["status"].iloc[0] == FeedbackResultStatus.RUNNING
+
+    assert db.insert_feedback(
+        done.copy(update=dict(status=FeedbackResultStatus.RUNNING)),
+        lease_token="taker"
+    ) == feedback_result_id
+    assert db.insert_feedback(done, lease_token="taker") == feedback_result_id
+    assert db.get_feedback(feedback_result_id=feedback_result_id
+                          )["status"].iloc[0] == FeedbackResultStatus.DONE
+
+    # Bulk updates of leased results keep their lease.
+    others = list(set(taken["feedback_result_id"]) - {feedback_result_id})
+    db.insert_feedbacks(
+        done.copy(
+            update=dict(
+                feedback_result_id=other, status=FeedbackResultStatus.RUNNING
+            )
+        ) for other in others
+    )
+    assert db.heartbeat_feedback(others, "taker") == len(others)
+
+
+def _test_evaluator_workers(db: DB, n: int = 20):
+    tru = Tru()
+    tru.db = db
+    fb = Feedback(
+        imp=CountingFeedback().count,
+        feedback_definition_id="count",
+        selectors={"text": Select.RecordOutput},
+    )
+    app = TruBasicApp(
+        text_to_text=lambda x: x,
+        app_id="test_workers",
+        db=db,
+        feedbacks=[fb],
+        feedback_mode=FeedbackMode.DEFERRED,
+    )
+    for i in range(n):
+        app.call_with_record(f"input {i}")
+    TP().finish()  # deferred feedback placeholders are added in threads
+
+    completed = Executor().metrics()["completed"]
+
+    stop = Event()
+    workers = [
+        EvaluatorWorker(
+            tru=tru,
+            stop_event=stop,
+            worker_id=f"worker_{i}",
+            concurrency=4,
+            poll_seconds=0.1
+        ) for i in range(3)
+    ]
+    threads = [Thread(target=worker.run) for worker in workers]
+    for thread in threads:
+        thread.start()
+
+    def done() -> int:
+        return len(
+            db.get_feedback(
+                feedback_definition_id=fb.feedback_definition_id,
+                status=FeedbackResultStatus.DONE
+            )
+        )
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline and done() < n:
+        time.sleep(0.1)
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    # Every result is evaluated exactly once.
+    assert CountingFeedback.counts == Counter(
+        {f"input {i}": 1 for i in range(n)}
+    )
+
+    # The evaluations ran in the shared executor.
+    assert Executor().metrics()["completed"] - completed >= n
+
+
+def _test_deferred_cache(db: DB):
+    tru = Tru()
+    tru.db = db
+    fb = Feedback(
+        imp=CountingFeedback().count,
+        feedback_definition_id="count_cached",
+        selectors={"text": Select.RecordOutput},
+    )
+    app = TruBasicApp(
+        text_to_text=lambda x: "cached output",
+        app_id="test_deferred_cache",
+        db=db,
+        feedbacks=[fb],
+        feedback_mode=FeedbackMode.DEFERRED,
+    )
+    for i in range(2):
+        app.call_with_record(f"input {i}")
+    TP().finish()  # deferred feedback placeholders are added in threads
+
+    with TemporaryDirectory() as tmp:
+        tru.feedback_cache = FeedbackCache(
+            filename=Path(tmp).joinpath("cache.sqlite")
+        )
+        try:
+            # One at a time so the second finds the result of the first.
+            for _ in range(2):
+                assert Feedback.evaluate_deferred(tru, limit=1) == 1
+                Executor().finish(timeout=60)
+        finally:
+            tru.feedback_cache = None
+
+    # Deferred evaluation used the cache given to Tru.
+    assert CountingFeedback.counts.pop("cached output") == 1
+    results = db.get_feedback(feedback_definition_id=fb.feedback_definition_id)
+    assert sorted(
+        Cost(**json.loads(cost_json)).n_cache_hits
+        for cost_json in results["cost_json"]
+    ) == [0, 1]
+
+
+def _test_get_records_and_feedback(db: DB, n: int = 10):
+    fb, app, rec = _populate_data(db)
+    start = datetime.now() + timedelta(days=1)
+
+    recs = [
+        Record(
+            **rec.dict(exclude={"record_id", "ts", "tags"}),
+            record_id=f"page_{i}",
+            ts=start + timedelta(seconds=i),
+            tags="even, all" if i % 2 == 0 else "odd,all"
+        ) for i in range(n)
+    ]
+    db.insert_records(recs)
+    db.insert_feedbacks(
+        FeedbackResult(
+            record_id=r.record_id,
+            feedback_definition_id=fb.feedback_definition_id,
+            name=fb.name,
+            result=float(i),
+            status=FeedbackResultStatus.DONE
+        ) for i, r in enumerate(recs)
+    )
+
+    def record_ids(**kwargs):
+        df, _ = db.get_records_and_feedback([app.app_id], **kwargs)
+        return list(df["record_id"])
+
+    # Pages of the most recent records first.
+    assert record_ids(limit=3) == ["page_9", "page_8", "page_7"]
+    assert record_ids(limit=3, offset=3) == ["page_6", "page_5", "page_4"]
+    assert len(record_ids(limit=100, offset=3)) == n + 1 - 3
+
+    assert set(
+        record_ids(
+            start_time=start + timedelta(seconds=2),
+            end_time=start + timedelta(seconds=5)
+        )
+    ) == {"page_2", "page_3", "page_4"}
+    assert set(record_ids(tags=["odd"])
+              ) == {f"page_{i}" for i in range(1, n, 2)}
+    assert set(record_ids(tags=["even", "odd"])
+              ) == {f"page_{i}" for i in range(n)}
+    assert set(record_ids(record_ids=["page_0", rec.record_id])
+              ) == {"page_0", rec.record_id}
+
+    df, feedback_cols = db.get_records_and_feedback(
+        [app.app_id],
+        record_ids=["page_4"],
+        columns=["input", "latency"],
+        feedback_calls=False
+    )
+    assert list(feedback_cols) == [fb.name]
+    assert list(df.columns) == ["record_id", "input", "latency", fb.name]
+    assert df[fb.name][0] == 4.0
+
+    df, _ = db.get_records_and_feedback([app.app_id], record_ids=["page_4"])
+    assert fb.name + "_calls" in df.columns
+    assert df["record_json"][0] == recs[4].json()
+
+
+def _test_get_app_summaries(db: DB, n: int = 10):
+    fb, app, rec = _populate_data(db)
+    start = datetime.now()
+
+    recs = [rec] + [
+        Record(
+            **rec.dict(exclude={"record_id", "perf", "cost"}),
+            record_id=f"summary_{i}",
+            perf=Perf(
+                start_time=start, end_time=start + timedelta(seconds=i + 0.5)
+            ),
+            cost=Cost(n_tokens=i, cost=0.25 * i)
+        ) for i in range(n)
+    ]
+    db.insert_records(recs)
+    db.insert_records(recs[1:3])  # updates are not counted twice
+    db.insert_feedbacks(
+        FeedbackResult(
+            record_id=r.record_id,
+            feedback_definition_id=fb.feedback_definition_id,
+            name="summary",
+            result=float(i),
+            status=FeedbackResultStatus.DONE
+        ) for i, r in enumerate(recs[1:])
+    )
+
+    df, feedback_cols = db.get_app_summaries([app.app_id])
+    assert list(feedback_cols) == sorted([fb.name, "summary"])
+    assert list(df.columns) == APP_SUMMARY_COLUMNS + list(feedback_cols)
+    assert len(df) == 1
+
+    summary = df.iloc[0]
+    assert summary["app_id"] == app.app_id
+    assert json.loads(summary["app_json"]) == json.loads(app.json())
+    assert summary["records"] == n + 1
+    latencies = [r.perf.latency.total_seconds() for r in recs]
+    assert abs(summary["latency"] - sum(latencies) / len(latencies)) < 1e-3
+    assert summary["total_tokens"] == sum(r.cost.n_tokens for r in recs)
+    assert abs(summary["total_cost"] - sum(r.cost.cost for r in recs)) < 1e-9
+    assert summary["summary"] == sum(range(n)) / n
+
+    df, feedback_cols = db.get_app_summaries(["other"])
+    assert len(df) == 0
+    assert len(feedback_cols) == 0
+
+
+def _test_feedback_rollups(db: SqlAlchemyDB, n: int = 10):
+    fb, app, rec = _populate_data(db)
+    bucket = datetime.fromtimestamp(
+        orm.FeedbackRollup.bucket_of(datetime.now().timestamp())
+    ) + timedelta(days=1)
+    bucket_length = timedelta(seconds=orm.FeedbackRollup.BUCKET_SECONDS)
+
+    # Half the records in one bucket, half in the next.
+    recs = [
+        Record(
+            **rec.dict(exclude={"record_id", "ts"}),
+            record_id=f"rollup_{i}",
+            ts=bucket + (i % 2) * bucket_length
+        ) for i in range(n)
+    ]
+    db.insert_records(recs)
+
+    def results(status, result=lambda i: None):
+        return [
+            FeedbackResult(
+                feedback_result_id=f"rollup_{i}",
+                record_id=r.record_id,
+                feedback_definition_id=fb.feedback_definition_id,
+                name="rollup",
+                result=result(i),
+                status=status
+            ) for i, r in enumerate(recs)
+        ]
+
+    # Pending results are not rolled up, done ones are.
+    db.insert_feedbacks(results(FeedbackResultStatus.NONE))
+    for result in results(FeedbackResultStatus.DONE, float):
+        db.insert_feedback(result)
+
+    # Updated results replace the previous ones.
+    db.insert_feedback(
+        results(FeedbackResultStatus.DONE, lambda i: 100.0 + i)[0]
+    )
+
+    df = db.get_feedback_rollups([app.app_id], names=["rollup"])
+    assert list(df["bucket"]) == [bucket, bucket + bucket_length]
+    assert list(df["count"]) == [n // 2, n // 2]
+    assert list(df["min"]) == [2.0, 1.0]
+    assert list(df["max"]) == [100.0, float(n - 1)]
+    odd = [float(i) for i in range(1, n, 2)]
+    assert abs(df["mean"][1] - sum(odd) / len(odd)) < 1e-9
+    assert abs(df["std"][1] - pd.Series(odd).std(ddof=0)) < 1e-9
+
+    # Buckets from the one of start_time.
+    df_later = db.get_feedback_rollups(
+        [app.app_id], start_time=bucket + bucket_length * 1.5
+    )
+    assert list(df_later["bucket"]) == [bucket + bucket_length]
+
+    # Rebuilt rollups are the same as the maintained ones.
+    df_all = db.get_feedback_rollups()
+    db.rebuild_rollups()
+    pd.testing.assert_frame_equal(db.get_feedback_rollups(), df_all)
+
+    # Leaderboard means come from the rollups.
+    df_summaries, _ = db.get_app_summaries([app.app_id])
+    results = [100.0] + [float(i) for i in range(1, n)]
+    assert df_summaries["rollup"][0] == sum(results) / len(results)
+
+
+def _test_record_calls_blobs(db: SqlAlchemyDB, n: int = 5):
+    fb, app, rec = _populate_data(db)
+    assert len(rec.calls) > 0
+
+    # Records with the same calls share their blob.
+    recs = [
+        Record(**rec.dict(exclude={"record_id"}), record_id=f"blob_{i}")
+        for i in range(n)
+    ]
+    db.insert_records(recs)
+
+    with db.engine.begin() as conn:
+        stored = conn.execute(
+            text(
+                "SELECT record_json, calls_blob_id FROM records "
+                "WHERE record_id = :record_id"
+            ), dict(record_id=recs[0].record_id)
+        ).one()
+        n_blobs = conn.execute(text("SELECT COUNT(*) FROM blobs")).scalar()
+    assert "calls" not in json.loads(stored.record_json)
+    assert n_blobs == 1
+
+    # Calls are put back when records are loaded.
+    df, _ = db.get_records_and_feedback([app.app_id], record_ids=["blob_0"])
+    assert df["record_json"][0] == recs[0].json()
+    df_fb = db.get_feedback(record_id=rec.record_id)
+    assert df_fb["record_json"][0] == json.loads(rec.json())
+
+    # Calls are moved back into records and out again by migrations.
+    downgrade_db(db.engine, revision="4")
+    with db.engine.begin() as conn:
+        record_json = conn.execute(
+            text("SELECT record_json FROM records WHERE record_id = 'blob_0'")
+        ).scalar()
+    assert record_json == recs[0].json()
+
+    upgrade_db(db.engine, revision="head")
+    df, _ = db.get_records_and_feedback([app.app_id], record_ids=["blob_0"])
+    assert df["record_json"][0] == recs[0].json()
+
+
+def _test_record_string_blobs(db: SqlAlchemyDB, n: int = 5):
+    fb, app, rec = _populate_data(db)
+    document = "document " * 200  # over `blob_threshold`
+
+    inputs = [document] * n + [f"short {i}" for i in range(n)]
+    recs = [app.call_with_record(i)[1] for i in inputs]
+
+    with db.engine.begin() as conn:
+        n_blobs = conn.execute(text("SELECT COUNT(*) FROM blobs")).scalar()
+    # One blob of calls for each record (calls include timings so are not
+    # shared) and a single one for the document.
+    assert n_blobs == 1 + 2 * n + 1
+
+    # Strings are put back when records are loaded.
+    df, _ = db.get_records_and_feedback(
+        [app.app_id], record_ids=[recs[0].record_id]
+    )
+    assert df["record_json"][0] == recs[0].json()
+
+    # Or once selected by feedback functions.
+    db.insert_feedback(
+        FeedbackResult(
+            record_id=recs[0].record_id,
+            feedback_definition_id=fb.feedback_definition_id,
+            name=fb.name
+        )
+    )
+    df_fb = db.get_feedback(record_id=recs[0].record_id)
+    record = Record(**df_fb["record_json"][0])
+    assert BLOB in json.dumps(record.calls[0].rets)
+
+    selector = getattr(Select.Record.app, "<lambda>").rets
+    select_doc = Feedback(imp=fb.imp, selectors={"text": selector})
+    record.with_blob_loader(db.get_blobs)
+    selection = list(select_doc.extract_selection(app, record))
+    assert selection == [dict(text=document)]
+
+
+def _test_latency_percentiles(db: SqlAlchemyDB, n: int = 10):
+    fb, app, rec = _populate_data(db)
+    call = rec.calls[0]
+    path = call.top().path
+    now = datetime.now()
+
+    def record(i: int, start: datetime) -> Record:
+        # The call of record i takes i + 1 seconds, of which it waited i/10 in
+        # the queue and spent i/2 in calls it made.
+        perf = Perf(
+            start_time=start,
+            end_time=start + timedelta(seconds=i + 1),
+            queued_time=start - timedelta(seconds=i / 10),
+            child_time=timedelta(seconds=i / 2)
+        )
+        return Record(
+            **rec.dict(exclude={"record_id", "perf", "calls"}),
+            record_id=f"span_{i}",
+            perf=perf,
+            calls=[RecordAppCall(**call.dict(exclude={"perf"}), perf=perf)]
+        )
+
+    # The first two records are too old for the window.
+    old = now - timedelta(hours=2)
+    db.insert_records(
+        record(i, old if i < 2 else now - timedelta(seconds=i + 1))
+        for i in range(n)
+    )
+    db.insert_records([record(0, old)])  # replacing spans of a record
+
+    with db.engine.begin() as conn:
+        n_spans = conn.execute(
+            text("SELECT COUNT(*) FROM spans WHERE record_id LIKE 'span_%'")
+        ).scalar()
+    assert n_spans == n
+
+    # Spans include the call of the record of `_populate_data`, which is
+    # quicker than all others.
+    for component_path in [path, str(path), Select.for_record(path)]:
+        percentiles = db.get_latency_percentiles(
+            app.app_id, component_path=component_path
+        )
+        assert percentiles == {50: 5.0, 90: 9.0, 95: 10.0, 99: 10.0}
+
+    percentiles = db.get_latency_percentiles(
+        app.app_id,
+        component_path=path,
+        window=timedelta(hours=1),
+        percentiles=[50, 100]
+    )
+    assert percentiles == {50: 6.0, 100: 10.0}
+
+    for metric, expected in [("queue_wait", 0.4), ("self_time", 3.0),
+                             ("child_time", 2.0)]:
+        percentiles = db.get_latency_percentiles(
+            app.app_id, component_path=path, percentiles=[50], metric=metric
+        )
+        assert abs(percentiles[50] - expected) < 1e-6, (metric, percentiles)
+
+    # Records of the app, including the one of `_populate_data`.
+    percentiles = db.get_latency_percentiles(app.app_id, percentiles=[100])
+    assert percentiles == {100: 10.0}
+
+    # No calls were streamed.
+    percentiles = db.get_latency_percentiles(
+        app.app_id, component_path=path, metric="time_to_first_token"
+    )
+    assert percentiles == {50: None, 90: None, 95: None, 99: None}
+
+    # Records are not queued.
+    try:
+        db.get_latency_percentiles(app.app_id, metric="queue_wait")
+    except ValueError:
+        pass
+    else:
+        assert False, "Expected ValueError."
+
+
+def _test_export(db: SqlAlchemyDB, n: int = 25):
+    fb, app, rec = _populate_data(db)
+    now = datetime.now()
+
+    def add(start: int, end: int):
+        recs = [
+            Record(
+                **rec.dict(exclude={"record_id", "ts"}),
+                record_id=f"export_{i}",
+                ts=now + timedelta(seconds=i)
+            ) for i in range(start, end)
+        ]
+        db.insert_records(recs)
+        db.insert_feedbacks(
+            FeedbackResult(
+                record_id=r.record_id,
+                feedback_definition_id=fb.feedback_definition_id,
+                name=fb.name,
+                last_ts=r.ts,
+                result=float(i),
+                status=FeedbackResultStatus.DONE
+            ) for i, r in enumerate(recs)
+        )
+
+    add(0, n)
+
+    with TemporaryDirectory() as tmp:
+        watermark = export_records_and_feedback(db, tmp, chunk_size=10)
+        assert watermark.parts == 1
+        assert watermark.records[1] == f"export_{n - 1}"
+
+        records = pd.read_parquet(Path(tmp) / "records-00001.parquet")
+        feedbacks = pd.read_parquet(Path(tmp) / "feedbacks-00001.parquet")
+        assert len(records) == n + 1  # one more from `_populate_data`
+        assert len(feedbacks) == n + 1
+        assert set(records["app_id"]) == {app.app_id}
+        assert records["latency"].notna().all()
+        assert set(feedbacks["name"]) == {fb.name}
+
+        # Nothing new, nothing written.
+        assert export_records_and_feedback(db, tmp).parts == 1
+
+        # Only new rows are exported.
+        add(n, n + 5)
+        watermark = export_records_and_feedback(
+            db, tmp, format=ExportFormat.ARROW
+        )
+        assert watermark.parts == 2
+        with pa.ipc.open_file(Path(tmp) / "records-00002.arrow") as reader:
+            exported = reader.read_all()["record_id"].to_pylist()
+        assert set(exported) == {f"export_{i}" for i in range(n, n + 5)}
+
+        # Rows written late, behind the watermark, or replaced since they were
+        # exported are picked up within the overlap window, others are not
+        # exported again.
+        late = Record(
+            **rec.dict(exclude={"record_id", "ts"}),
+            record_id="export_late",
+            ts=now
+        )
+        db.insert_record(late)
+        db.insert_record(
+            Record(
+                **rec.dict(exclude={"record_id", "ts", "main_output"}),
+                record_id=f"export_{n}",
+                ts=now + timedelta(seconds=n),
+                main_output="replaced"
+            )
+        )
+        watermark = export_records_and_feedback(db, tmp)
+        assert watermark.parts == 3
+        records = pd.read_parquet(Path(tmp) / "records-00003.parquet")
+        assert set(records["record_id"]) == {"export_late", f"export_{n}"}
+        assert '"replaced"' in set(records["output"])
+        assert not (Path(tmp) / "feedbacks-00003.parquet").exists()
+
+        assert export_records_and_feedback(db, tmp).parts == 3
+
+        # Exports of other apps do not mix with this one.
+        try:
+            export_records_and_feedback(db, tmp, app_ids=["other"])
+            assert False, "Continued an export of other apps."
+        except ValueError:
+            pass
+
+
+def _test_copy_database(db: SqlAlchemyDB, tgt_url: str):
+    _populate_data(db)
+
+    tgt = SqlAlchemyDB.from_db_url(tgt_url)
+    tgt.migrate_database()
+
+    _copy_database(db.engine.url.render_as_string(hide_password=False), tgt_url)
+
+    for model in [orm.AppDefinition, orm.FeedbackDefinition, orm.Blob,
+                  orm.Record, orm.Span, orm.FeedbackResult, orm.AppRollup,
+                  orm.FeedbackRollup]:
+        with db.Session.begin() as src_session, \
+                tgt.Session.begin() as tgt_session:
+            name = model.__tablename__
+            count = src_session.query(model).count()
+            assert tgt_session.query(model).count() == count, name
+
+            # Every table holds something to copy.
+            assert count > 0 or model is orm.Blob, name
+
+
 def _populate_data(db: DB):
     tru = Tru()
     tru.db = db  # because of the singleton behavior, db must be changed manually
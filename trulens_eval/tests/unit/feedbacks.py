@@ -25,6 +25,24 @@ class CustomProvider(Provider):
     def method(self, t1: str) -> float:
         return 0.4 + self.attr
 
+    async def amethod(self, t1: str) -> float:
+        # Async variant of `method`, picked up by `Feedback.arun`.
+        return 0.4 + self.attr
+
+
+class CountingProvider(Provider):
+    # Counts calls to check whether results were reused.
+
+    calls: int = 0
+
+    def method(self, t1: str) -> float:
+        self.calls += 1
+        return 0.5
+
+    def method_with_meta(self, t1: str) -> float:
+        self.calls += 1
+        return 0.5, dict(length=len(t1))
+
 
 class CustomClassNoArgs():
     # This one is ok as it has no init arguments so we can deserialize it just
@@ -0,0 +1,185 @@
+"""
+Tests for the bounded task executor.
+"""
+
+from contextvars import ContextVar
+from queue import Full
+from threading import Event
+from threading import Lock
+import time
+from unittest import main
+from unittest import TestCase
+
+from trulens_eval import Tru
+from trulens_eval import util
+from trulens_eval.util import Executor
+from trulens_eval.util import get_first_local_in_call_stack
+from trulens_eval.util import TaskPriority
+
+VAR = ContextVar("test_executor", default="default")
+
+
+class TestExecutor(TestCase):
+
+    def test_priorities(self):
+        ex = Executor(name="test_priorities", max_workers=1)
+
+        started = Event()
+        release = Event()
+        order = []
+
+        def block():
+            started.set()
+            release.wait()
+
+        # Occupy the only thread so the rest queue up.
+        ex.submit(block)
+        started.wait()
+
+        for priority in [TaskPriority.FEEDBACK, TaskPriority.DEFAULT,
+                         TaskPriority.RECORD]:
+            ex.submit_task(order.append, args=(priority,), priority=priority)
+
+        release.set()
+        self.assertEqual(ex.finish(timeout=10), 0)
+
+        self.assertEqual(
+            order,
+            [TaskPriority.RECORD, TaskPriority.DEFAULT, TaskPriority.FEEDBACK]
+        )
+
+    def test_burst(self):
+        ex = Executor(name="test_burst", max_workers=16)
+
+        # Leave one idle thread behind.
+        ex.submit(lambda: None).result()
+        time.sleep(0.1)
+
+        start = time.perf_counter()
+        futures = [ex.submit(time.sleep, 0.5) for _ in range(8)]
+        for future in futures:
+            future.result()
+
+        self.assertLess(time.perf_counter() - start, 2.0)
+        self.assertGreaterEqual(ex.metrics()["threads"], 8)
+
+    def test_backpressure(self):
+        ex = Executor(name="test_backpressure", max_workers=1, max_queued=2)
+
+        release = Event()
+
+        ex.submit(release.wait)  # running
+        time.sleep(0.1)
+        ex.submit(lambda: None)  # queued
+        ex.submit(lambda: None)  # queued
+
+        with self.assertRaises(Full):
+            ex.submit_task(lambda: None, timeout=0.1)
+
+        release.set()
+        self.assertEqual(ex.finish(timeout=10), 0)
+
+    def test_key_limit(self):
+        ex = Executor(name="test_key_limit", max_workers=8)
+        ex.set_limit("endpoint", 2)
+
+        lock = Lock()
+        running = [0]
+        peak = [0]
+
+        def call():
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+
+        for _ in range(10):
+            ex.submit_task(call, key="endpoint")
+
+        self.assertEqual(ex.finish(timeout=10), 0)
+        self.assertEqual(peak[0], 2)
+        self.assertEqual(ex.metrics()["completed"], 10)
+
+    def test_tru_limits(self):
+        # Limits set on Tru apply to the shared executor.
+        tru = Tru()
+
+        tru.set_executor_limit("test_tru_limits", 3)
+        self.assertEqual(Executor()._limits["test_tru_limits"], 3)
+        self.assertEqual(tru.executor_limits, {"test_tru_limits": 3})
+
+        tru.set_executor_limit("test_tru_limits", None)
+        self.assertNotIn("test_tru_limits", Executor()._limits)
+        self.assertEqual(tru.executor_limits, {})
+
+    def test_nested_wait(self):
+        # A task waiting on tasks it submitted must not deadlock even when it
+        # occupies the only thread.
+        ex = Executor(name="test_nested_wait", max_workers=1)
+
+        def outer():
+            inner = [ex.submit(lambda i=i: i * 2) for i in range(3)]
+            return sum(f.result() for f in inner)
+
+        self.assertEqual(ex.submit(outer).result(timeout=10), 6)
+
+    def test_metrics(self):
+        ex = Executor(name="test_metrics", max_workers=2)
+
+        def fail():
+            raise ValueError("expected")
+
+        ok = ex.submit(lambda: 1)
+        bad = ex.submit(fail)
+
+        self.assertEqual(ok.get(timeout=10), 1)
+        self.assertIsInstance(bad.exception(timeout=10), ValueError)
+        ex.finish(timeout=10)
+
+        metrics = ex.metrics()
+        self.assertEqual(metrics["completed"], 1)
+        self.assertEqual(metrics["failed"], 1)
+        self.assertEqual(metrics["queued"] + metrics["running"], 0)
+
+    def test_context(self):
+        # Tasks run in the context they were submitted in.
+        ex = Executor(name="test_context")
+
+        token = VAR.set("submitter")
+        try:
+            future = ex.submit(VAR.get)
+        finally:
+            VAR.reset(token)
+
+        self.assertEqual(future.result(timeout=10), "submitter")
+        self.assertEqual(ex.submit(VAR.get).result(timeout=10), "default")
+
+    def test_capture_stacks(self):
+        ex = Executor(name="test_capture_stacks")
+
+        def found_self():
+            return get_first_local_in_call_stack(
+                key="marker", func=lambda f: f is found_self_code
+            )
+
+        def submitter():
+            marker = "found"
+            return ex.submit(found_self).result(timeout=10)
+
+        found_self_code = submitter.__code__
+
+        # Only tasks submitted while capturing stacks can see the stack of
+        # their submitter.
+        self.assertIsNone(submitter())
+
+        util.CAPTURE_THREAD_STACKS = True
+        try:
+            self.assertEqual(submitter(), "found")
+        finally:
+            util.CAPTURE_THREAD_STACKS = False
+
+
+if __name__ == '__main__':
+    main()
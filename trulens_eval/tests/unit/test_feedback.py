@@ -2,10 +2,16 @@
 Tests for Feedback class. 
 """
 
+import asyncio
+from pathlib import Path
+import pickle
+from tempfile import TemporaryDirectory
+import time
 from unittest import main
 from unittest import TestCase
 
 # Get the "globally importable" feedback implementations.
+from tests.unit.feedbacks import CountingProvider
 from tests.unit.feedbacks import custom_feedback_function
 from tests.unit.feedbacks import CustomClassNoArgs
 from tests.unit.feedbacks import CustomClassWithArgs
@@ -13,6 +19,10 @@ from tests.unit.feedbacks import CustomProvider
 from tests.unit.feedbacks import make_nonglobal_feedbacks
 
 from trulens_eval import Feedback
+from trulens_eval import Tru
+from trulens_eval.feedback import FeedbackCache
+from trulens_eval.feedback.provider.endpoint.base import Endpoint
+from trulens_eval.feedback.provider.endpoint.base import EndpointCallback
 from trulens_eval.schema import FeedbackMode
 from trulens_eval.tru_basic_app import TruBasicApp
 from trulens_eval.keys import check_keys
@@ -148,5 +158,248 @@ class TestFeedbackConstructors(TestCase):
                     )
 
 
+class TestFeedbackAsync(TestCase):
+
+    def setUp(self):
+        check_keys(
+            "OPENAI_API_KEY", "HUGGINGFACE_API_KEY", "PINECONE_API_KEY",
+            "PINECONE_ENV"
+        )
+
+        self.app = TruBasicApp(text_to_text=lambda t: f"returning {t}")
+        _, self.record = self.app.call_with_record(input="hello")
+
+    def test_async_imp(self):
+        provider = CustomProvider(attr=0.37)
+
+        # Provider methods with an "a"-prefixed coroutine variant use it.
+        f = Feedback(provider.method).on_default()
+        self.assertEqual(f._async_imp(), provider.amethod)
+
+        # Others are run in the event loop's executor.
+        f = Feedback(CustomClassNoArgs().method).on_default()
+        self.assertIsNone(f._async_imp())
+
+    def test_arun(self):
+        for imp, target in [
+            (custom_feedback_function, 0.1),
+            (CustomProvider(attr=0.37).method, 0.4 + 0.37),
+            (CustomClassNoArgs().method, 0.7),
+        ]:
+
+            with self.subTest(imp=imp, taget=target):
+                f = Feedback(imp).on_default()
+
+                res = asyncio.run(f.arun(record=self.record, app=self.app))
+
+                self.assertEqual(res.result, target)
+                self.assertEqual(
+                    res,
+                    f.run(record=self.record, app=self.app).copy(
+                        update=dict(
+                            feedback_result_id=res.feedback_result_id,
+                            last_ts=res.last_ts
+                        )
+                    )
+                )
+
+    def test_arun_feedback_functions(self):
+        feedbacks = [
+            Feedback(custom_feedback_function).on_default(),
+            Feedback(CustomProvider(attr=0.37).method).on_default()
+        ]
+
+        results = asyncio.run(
+            Tru().arun_feedback_functions(
+                record=self.record, feedback_functions=feedbacks, app=self.app
+            )
+        )
+
+        self.assertEqual([res.result for res in results], [0.1, 0.4 + 0.37])
+
+
+class LocalEndpoint(Endpoint):
+    """
+    Endpoint posting to a local server in tests.
+    """
+
+    def __new__(cls, *args, **kwargs):
+        return super(Endpoint, cls).__new__(cls, name="test_sessions")
+
+    def __init__(self, *args, **kwargs):
+        kwargs['name'] = "test_sessions"
+        kwargs['callback_class'] = EndpointCallback
+
+        super().__init__(*args, **kwargs)
+
+
+class TestEndpointSessions(TestCase):
+
+    def setUp(self):
+        self.endpoint = LocalEndpoint()
+
+    async def _apost(self, n: int):
+        """
+        Post `n` times to a local server with `apost`, returning the responses
+        and the sessions used.
+        """
+
+        from aiohttp import web
+
+        async def handle(request):
+            return web.json_response([{"label": "LABEL_2", "score": 0.9}])
+
+        server = web.Application()
+        server.router.add_post("/", handle)
+        runner = web.AppRunner(server)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        try:
+            responses = [
+                await self.endpoint.apost(
+                    url=f"http://127.0.0.1:{port}/", payload={}
+                ) for _ in range(n)
+            ]
+            return responses, list(self.endpoint._sessions.values())
+
+        finally:
+            await runner.cleanup()
+
+    def test_reuse(self):
+
+        async def run():
+            responses, sessions = await self._apost(3)
+            await self.endpoint.aclose()
+            return responses, sessions
+
+        responses, sessions = asyncio.run(run())
+
+        self.assertEqual(responses, [{"label": "LABEL_2", "score": 0.9}] * 3)
+        self.assertEqual(len(sessions), 1)
+        self.assertTrue(sessions[0].closed)
+        self.assertEqual(len(self.endpoint._sessions), 0)
+
+    def test_close_sessions(self):
+        # Sessions of loops that are gone are closed at exit.
+        _, sessions = asyncio.run(self._apost(1))
+        self.assertFalse(sessions[0].closed)
+
+        self.endpoint.close_sessions()
+
+        self.assertTrue(sessions[0].closed)
+        self.assertEqual(len(self.endpoint._sessions), 0)
+
+
+class TestFeedbackCache(TestCase):
+
+    def setUp(self):
+        check_keys(
+            "OPENAI_API_KEY", "HUGGINGFACE_API_KEY", "PINECONE_API_KEY",
+            "PINECONE_ENV"
+        )
+
+        self.app = TruBasicApp(text_to_text=lambda t: f"returning {t}")
+        _, self.record = self.app.call_with_record(input="hello")
+
+        self.tmp = TemporaryDirectory()
+        self.filename = Path(self.tmp.name).joinpath("cache.sqlite")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_hits(self):
+        cache = FeedbackCache(filename=self.filename)
+        provider = CountingProvider()
+
+        for imp in [provider.method, provider.method_with_meta]:
+            with self.subTest(imp=imp):
+                provider.calls = 0
+
+                f = Feedback(imp, cache=cache).on_default()
+
+                res1 = f.run(record=self.record, app=self.app)
+                res2 = f.run(record=self.record, app=self.app)
+
+                self.assertEqual(provider.calls, 1)
+                self.assertEqual(res1.result, res2.result)
+                self.assertEqual(res1.cost.n_cache_hits, 0)
+                self.assertEqual(res2.cost.n_cache_hits, 1)
+                self.assertNotIn("cache_hit", res1.calls[0].meta)
+                self.assertEqual(
+                    res2.calls[0].meta,
+                    dict(res1.calls[0].meta, cache_hit=True)
+                )
+
+                # Also shared with the async path.
+                res3 = asyncio.run(f.arun(record=self.record, app=self.app))
+                self.assertEqual(provider.calls, 1)
+                self.assertEqual(res3.cost.n_cache_hits, 1)
+
+    def test_key(self):
+        cache = FeedbackCache(filename=self.filename)
+        provider = CountingProvider()
+
+        f = Feedback(provider.method, cache=cache).on_default()
+        f.run(record=self.record, app=self.app)
+
+        # Different arguments are not hits.
+        _, record = self.app.call_with_record(input="bye")
+        f.run(record=record, app=self.app)
+        self.assertEqual(provider.calls, 2)
+
+        # Neither are different implementations.
+        f = Feedback(provider.method_with_meta, cache=cache).on_default()
+        f.run(record=self.record, app=self.app)
+        self.assertEqual(provider.calls, 3)
+
+        # Feedback functions without a cache do not use it.
+        f = Feedback(provider.method).on_default()
+        f.run(record=self.record, app=self.app)
+        self.assertEqual(provider.calls, 4)
+
+        # Provider objects with the same settings share results.
+        other = CountingProvider()
+        f = Feedback(other.method, cache=cache).on_default()
+        f.run(record=self.record, app=self.app)
+        self.assertEqual(other.calls, 0)
+
+    def test_pickle(self):
+        # Caches can be passed to worker processes.
+        cache = FeedbackCache(filename=self.filename, ttl_seconds=60)
+        cache.put("key", 0.5)
+
+        copy = pickle.loads(pickle.dumps(cache))
+        self.assertEqual(copy.ttl_seconds, 60)
+        self.assertEqual(copy.get("key"), 0.5)
+
+    def test_ttl(self):
+        cache = FeedbackCache(filename=self.filename, ttl_seconds=0.1)
+
+        cache.put("key", 0.5)
+        self.assertEqual(cache.get("key"), 0.5)
+
+        time.sleep(0.2)
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(len(cache), 0)
+
+    def test_lru(self):
+        cache = FeedbackCache(filename=self.filename, max_entries=10)
+
+        cache.put("recent", 0.5)
+        for i in range(98):
+            cache.put(f"key_{i}", 0.5)
+            # Keep this one in use.
+            cache.get("recent")
+        cache.put("last", 0.5)
+
+        self.assertEqual(len(cache), 10)
+        self.assertEqual(cache.get("recent"), 0.5)
+        self.assertEqual(cache.get("last"), 0.5)
+        self.assertIsNone(cache.get("key_0"))
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,81 @@
+"""
+Tests for JSONPath selection.
+"""
+
+from unittest import main
+from unittest import TestCase
+
+from munch import Munch as Bunch
+
+from trulens_eval.schema import Select
+from trulens_eval.util import GetAttribute
+from trulens_eval.util import GetItem
+from trulens_eval.util import JSONPath
+
+
+class TestJSONPath(TestCase):
+
+    def setUp(self):
+        self.obj = Bunch(
+            a=[dict(b=1, c="x"),
+               dict(b=2, c="y"),
+               dict(b=3, c="z")],
+            d=dict(e=dict(f="g")),
+        )
+
+    def test_select(self):
+        for path, expected in [
+            (JSONPath(), [self.obj]),
+            (JSONPath().d.e.f, ["g"]),
+            (JSONPath().a[1].c, ["y"]),
+            (JSONPath().a[-1]["b"], [3]),
+            (JSONPath().a[:].b, [1, 2, 3]),
+            (JSONPath().a[::2].c, ["x", "z"]),
+            (JSONPath().a[[0, 2]].b, [1, 3]),
+            (JSONPath().a[0][["b", "c"]], [1, "x"]),
+            (JSONPath(path=(GetItem(item="d"),)).e.f, ["g"]),
+            (JSONPath(path=(GetAttribute(attribute="d"),)).e.f, ["g"]),
+        ]:
+            with self.subTest(path=str(path)):
+                self.assertEqual(list(path(self.obj)), expected)
+
+    def test_select_errors(self):
+        with self.assertRaises(KeyError):
+            list(JSONPath().d.missing(self.obj))
+
+        with self.assertRaises(IndexError):
+            list(JSONPath().a[5](self.obj))
+
+        with self.assertRaises(ValueError):
+            list(JSONPath().d[0](self.obj))
+
+        with self.assertRaises(ValueError):
+            list(JSONPath().d[:](self.obj))
+
+    def test_select_lazy(self):
+        # Elements are selected as they are iterated over, so the ones before
+        # an element that cannot be selected are still produced.
+        selected = JSONPath().a[:].b(dict(a=[dict(b=1), None]))
+
+        self.assertEqual(next(selected), 1)
+        with self.assertRaises(ValueError):
+            next(selected)
+
+    def test_compile_cached(self):
+        # Equal paths share their compiled function even if constructed apart
+        # or deserialized.
+        path = Select.Record.app.retriever[:].rets
+        same = JSONPath(**path.dict())
+
+        self.assertIs(path.compile(), same.compile())
+        self.assertIsNot(path.compile(), Select.Record.app.retriever.compile())
+
+        # Steps of different types do not share compiled functions.
+        self.assertIsNot(
+            JSONPath(path=(GetItem(item="d"),)).compile(),
+            JSONPath().d.compile()
+        )
+
+
+if __name__ == '__main__':
+    main()
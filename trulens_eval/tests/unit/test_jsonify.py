@@ -0,0 +1,89 @@
+"""
+Tests for jsonify.
+"""
+
+from unittest import main
+from unittest import TestCase
+
+from trulens_eval.instruments import Instrument
+from trulens_eval.util import CIRCLE
+from trulens_eval.util import CLASS_INFO
+from trulens_eval.util import ERROR
+from trulens_eval.util import jsonify
+
+
+class Component():
+
+    def __init__(self, name):
+        self._name = name
+        self.children = []
+        self.parent = None
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def broken(self):
+        raise ValueError("not available")
+
+
+class TestJsonify(TestCase):
+
+    def setUp(self):
+        self.instrument = Instrument(include_classes=[Component])
+
+    def test_circular(self):
+        root = Component("root")
+        child = Component("child")
+        root.children.append(child)
+        child.parent = root
+
+        j = jsonify(root, instrument=self.instrument)
+
+        self.assertEqual(j['name'], "root")
+        self.assertNotIn('_name', j)
+        self.assertIn(ERROR, j['broken'])
+        self.assertEqual(j['children'][0]['name'], "child")
+        self.assertEqual(j['children'][0]['parent'], {CIRCLE: id(root)})
+
+        j = jsonify(root, instrument=self.instrument, skip_specials=True)
+        self.assertIsNone(j['children'][0]['parent'])
+
+    def test_shared(self):
+        # Objects found more than once but not within themselves are not
+        # circular.
+        shared = Component("shared")
+        root = Component("root")
+        root.children = [shared, shared, [shared]]
+
+        j = jsonify(root, instrument=self.instrument)
+
+        for child in j['children'][0:2] + [j['children'][2][0]]:
+            self.assertEqual(child['name'], "shared")
+
+    def test_class_info(self):
+        j1 = jsonify(Component("one"), instrument=self.instrument)
+        j2 = jsonify(Component("two"), instrument=self.instrument)
+
+        self.assertEqual(j1[CLASS_INFO]['name'], "Component")
+        self.assertEqual(j1[CLASS_INFO], j2[CLASS_INFO])
+
+        # Class info of different objects can be changed independently.
+        j1[CLASS_INFO]['bases'].clear()
+        self.assertGreater(len(j2[CLASS_INFO]['bases']), 0)
+
+    def test_instance_attributes(self):
+        # Attributes set on one instance do not show up in others.
+        c1 = Component("one")
+        c1.extra = "extra"
+        c2 = Component("two")
+
+        self.assertEqual(
+            jsonify(c1, instrument=self.instrument)['extra'], "extra"
+        )
+        self.assertNotIn('extra', jsonify(c2, instrument=self.instrument))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""
+Tests for in-process metrics and their exposition.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import gc
+from threading import Thread
+from unittest import main
+from unittest import TestCase
+from urllib.request import urlopen
+
+from trulens_eval.tru_custom_app import instrument
+from trulens_eval.tru_custom_app import TruCustomApp
+from trulens_eval.utils import metrics
+from trulens_eval.utils.rate_limit import RateLimiter
+
+
+class App():
+
+    @instrument
+    def respond(self, query: str) -> str:
+        return query.upper()
+
+
+def sample(metric: metrics.Metric, name: str, **labels) -> float:
+    """
+    Value of the sample `name` of `metric` with the given labels, 0 if none.
+    """
+
+    for sample_name, sample_labels, value in metric.samples():
+        if sample_name == name and sample_labels == labels:
+            return value
+
+    return 0.0
+
+
+class TestMetrics(TestCase):
+
+    def setUp(self):
+        self.registry = metrics.Registry()
+
+    def tearDown(self):
+        metrics.disable()
+
+    def test_exposition(self):
+        counter = metrics.Counter(
+            "requests_total", "Requests.", ["path"], registry=self.registry
+        )
+        histogram = metrics.Histogram(
+            "latency_seconds",
+            "Latency.",
+            buckets=[0.1, 1.0],
+            registry=self.registry
+        )
+        metrics.Gauge(
+            "depth",
+            "Depth.",
+            lambda: [(("a\"b",), 2)], ["queue"],
+            registry=self.registry
+        )
+
+        counter.labels("/x").inc()
+        counter.labels("/x").inc(2)
+        for value in [0.05, 0.1, 0.5, 5.0]:
+            histogram.observe(value)
+
+        self.assertEqual(
+            self.registry.exposition(), "\n".join(
+                [
+                    "# HELP requests_total Requests.",
+                    "# TYPE requests_total counter",
+                    'requests_total{path="/x"} 3.0',
+                    "# HELP latency_seconds Latency.",
+                    "# TYPE latency_seconds histogram",
+                    'latency_seconds_bucket{le="0.1"} 2.0',
+                    'latency_seconds_bucket{le="1.0"} 3.0',
+                    'latency_seconds_bucket{le="+Inf"} 4.0',
+                    "latency_seconds_sum 5.65",
+                    "latency_seconds_count 4.0",
+                    "# HELP depth Depth.",
+                    "# TYPE depth gauge",
+                    'depth{queue="a\\"b"} 2.0',
+                ]
+            ) + "\n"
+        )
+
+    def test_threads(self):
+        counter = metrics.Counter("n", "N.", registry=self.registry)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            for _ in range(100):
+                pool.submit(lambda: [counter.inc() for _ in range(100)])
+
+        self.assertEqual(sample(counter, "n"), 10000)
+
+    def test_finished_threads(self):
+        counter = metrics.Counter("m", "M.", registry=self.registry)
+        histogram = metrics.Histogram(
+            "h", "H.", buckets=[1.0], registry=self.registry
+        )
+
+        def update():
+            counter.inc()
+            histogram.observe(0.5)
+
+        for _ in range(10):
+            thread = Thread(target=update)
+            thread.start()
+            thread.join()
+
+        gc.collect()
+
+        # Cells of finished threads are folded into the totals.
+        self.assertEqual(len(counter._child(()).cells), 0)
+        self.assertEqual(len(histogram._child(()).cells), 0)
+        self.assertEqual(sample(counter, "m"), 10)
+        self.assertEqual(sample(histogram, "h_count"), 10)
+        self.assertEqual(sample(histogram, "h_sum"), 5.0)
+
+    def test_disabled(self):
+        app = App()
+        tru_app = TruCustomApp(app)
+
+        records = sample(
+            metrics.RECORDS,
+            "trulens_records_total",
+            app_id=tru_app.app_id,
+            status="ok"
+        )
+        waits = sample(
+            metrics.RATE_LIMIT_WAIT,
+            "trulens_rate_limit_wait_seconds_count",
+            limiter="test_metrics_disabled"
+        )
+
+        tru_app.with_record(app.respond, "hello")
+        RateLimiter(name="test_metrics_disabled", rpm=60).acquire()
+
+        self.assertEqual(
+            sample(
+                metrics.RECORDS,
+                "trulens_records_total",
+                app_id=tru_app.app_id,
+                status="ok"
+            ), records
+        )
+        self.assertEqual(
+            sample(
+                metrics.RATE_LIMIT_WAIT,
+                "trulens_rate_limit_wait_seconds_count",
+                limiter="test_metrics_disabled"
+            ), waits
+        )
+
+    def test_enabled(self):
+        metrics.enable()
+
+        app = App()
+        tru_app = TruCustomApp(app)
+
+        records = sample(
+            metrics.RECORDS,
+            "trulens_records_total",
+            app_id=tru_app.app_id,
+            status="ok"
+        )
+        calls = sample(
+            metrics.CALL_LATENCY,
+            "trulens_call_latency_seconds_count",
+            method="App.respond"
+        )
+
+        tru_app.with_record(app.respond, "hello")
+        tru_app.with_record(app.respond, "hello")
+        RateLimiter(name="test_metrics_enabled", rpm=60).acquire()
+
+        self.assertEqual(
+            sample(
+                metrics.RECORDS,
+                "trulens_records_total",
+                app_id=tru_app.app_id,
+                status="ok"
+            ), records + 2
+        )
+        self.assertEqual(
+            sample(
+                metrics.CALL_LATENCY,
+                "trulens_call_latency_seconds_count",
+                method="App.respond"
+            ), calls + 2
+        )
+        self.assertEqual(
+            sample(
+                metrics.RATE_LIMIT_WAIT,
+                "trulens_rate_limit_wait_seconds_count",
+                limiter="test_metrics_enabled"
+            ), 1
+        )
+
+    def test_server(self):
+        counter = metrics.Counter("served", "Served.", registry=self.registry)
+        counter.inc()
+
+        server = metrics.start_metrics_server(port=0, registry=self.registry)
+        try:
+            self.assertTrue(metrics.ENABLED)
+
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            with urlopen(url) as response:
+                self.assertEqual(
+                    response.headers["Content-Type"], metrics.CONTENT_TYPE
+                )
+                self.assertIn("served 1.0", response.read().decode())
+
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Tests for exporting records as OpenTelemetry spans.
+"""
+
+from importlib.util import find_spec
+from unittest import main
+from unittest import skipIf
+from unittest import TestCase
+
+from trulens_eval.schema import FeedbackMode
+from trulens_eval.tru_custom_app import instrument
+from trulens_eval.tru_custom_app import TruCustomApp
+from trulens_eval.utils.otel import SpanSink
+
+if find_spec("opentelemetry") is not None:
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+    from opentelemetry.trace import StatusCode
+
+
+class Leaf():
+
+    @instrument
+    def respond(self, query: str) -> str:
+        return query.upper()
+
+
+class Root():
+
+    def __init__(self):
+        self.leaf = Leaf()
+
+    @instrument
+    def respond(self, query: str) -> str:
+        return self.leaf.respond(query) + self.leaf.respond(query * 600)
+
+    @instrument
+    def fail(self, query: str) -> str:
+        raise ValueError(query)
+
+
+@skipIf(find_spec("opentelemetry") is None, "opentelemetry-sdk not installed")
+class TestSpanSink(TestCase):
+
+    def setUp(self):
+        self.exporter = InMemorySpanExporter()
+        self.sink = SpanSink(exporter=self.exporter, max_attribute_length=100)
+
+        self.app = Root()
+        self.tru_app = TruCustomApp(
+            self.app,
+            app_id="test_otel",
+            feedback_mode=FeedbackMode.NONE,
+            span_sink=self.sink
+        )
+
+    def tearDown(self):
+        self.sink.shutdown()
+
+    def spans(self):
+        self.assertTrue(self.sink.force_flush())
+        return {span.name: span for span in self.exporter.get_finished_spans()}
+
+    def test_spans(self):
+        _, record = self.tru_app.with_record(self.app.respond, "hello")
+
+        spans = self.spans()
+        self.assertEqual(
+            set(spans.keys()), {
+                "test_otel", "*.__record__.app.respond",
+                "*.__record__.app.leaf.respond"
+            }
+        )
+        # Both calls of the leaf have the same name.
+        self.assertEqual(len(self.exporter.get_finished_spans()), 4)
+
+        root = spans["test_otel"]
+        call = spans["*.__record__.app.respond"]
+        leaves = [
+            span for span in self.exporter.get_finished_spans()
+            if span.name == "*.__record__.app.leaf.respond"
+        ]
+
+        self.assertIsNone(root.parent)
+        self.assertEqual(root.attributes["trulens.record_id"], record.record_id)
+        self.assertEqual(root.attributes["trulens.cost.n_requests"], 0)
+        self.assertEqual(call.parent.span_id, root.context.span_id)
+        for leaf in leaves:
+            self.assertEqual(leaf.parent.span_id, call.context.span_id)
+            self.assertEqual(leaf.context.trace_id, root.context.trace_id)
+            self.assertLessEqual(call.start_time, leaf.start_time)
+            self.assertLessEqual(leaf.end_time, call.end_time)
+
+        # Arguments and returns are truncated.
+        self.assertEqual(leaves[0].attributes["trulens.rets"], "HELLO")
+        self.assertEqual(len(leaves[1].attributes["trulens.args"]), 103)
+
+    def test_error(self):
+        with self.assertRaises(ValueError):
+            self.tru_app.with_record(self.app.fail, "hello")
+
+        spans = self.spans()
+        for name in ["test_otel", "*.__record__.app.fail"]:
+            self.assertEqual(spans[name].status.status_code, StatusCode.ERROR)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Tests for python utilities.
+"""
+
+import asyncio
+import inspect
+from unittest import main
+from unittest import TestCase
+
+from trulens_eval.utils.python import caller_frame
+from trulens_eval.utils.python import stack_frames
+from trulens_eval.utils.python import stack_with_tasks
+from trulens_eval.utils.python import task_factory_with_stack
+
+
+class TestStackFrames(TestCase):
+
+    def test_stack_frames(self):
+        expected = [fi.frame for fi in inspect.stack()]
+
+        self.assertEqual(stack_frames(), expected)
+        self.assertEqual(stack_frames(offset=2), expected[2:])
+        self.assertEqual(stack_frames(offset=len(expected) + 1), [])
+
+        self.assertIs(caller_frame(), expected[0])
+
+        def callee():
+            return caller_frame(offset=1)
+
+        self.assertIs(callee(), expected[0])
+
+    def test_stack_with_tasks(self):
+        found = []
+
+        async def child():
+            found.extend(stack_with_tasks())
+
+        async def parent():
+            await asyncio.get_running_loop().create_task(child())
+
+        loop = asyncio.new_event_loop()
+        loop.set_task_factory(task_factory_with_stack)
+        try:
+            loop.run_until_complete(parent())
+        finally:
+            loop.close()
+
+        codes = [f.f_code for f in found]
+        self.assertIn(child.__code__, codes)
+        self.assertIn(parent.__code__, codes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""
+Tests for the token-bucket rate limiter.
+"""
+
+import asyncio
+import inspect
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import threading
+from typing import Any
+from unittest import main
+from unittest import TestCase
+
+from trulens_eval.feedback.provider.endpoint.base import Endpoint
+from trulens_eval.feedback.provider.endpoint.base import EndpointCallback
+from trulens_eval.utils.rate_limit import RateLimiter
+
+
+class TestRateLimiter(TestCase):
+
+    def test_burst(self):
+        # 600 rpm with a 1 second burst: 10 requests right away, then one
+        # every 0.1 seconds.
+        limiter = RateLimiter(name="test_burst", rpm=600, burst_seconds=1.0)
+
+        waits = [limiter.reserve() for _ in range(12)]
+
+        self.assertEqual(waits[:10], [0.0] * 10)
+        self.assertAlmostEqual(waits[10], 0.1, delta=0.01)
+        self.assertAlmostEqual(waits[11], 0.2, delta=0.01)
+
+    def test_unlimited(self):
+        limiter = RateLimiter(name="test_unlimited")
+
+        self.assertEqual(limiter.reserve(requests=1000, tokens=10**6), 0.0)
+
+    def test_tokens(self):
+        limiter = RateLimiter(
+            name="test_tokens", rpm=6000, tpm=60000, burst_seconds=1.0
+        )
+
+        self.assertEqual(limiter.reserve(tokens=500), 0.0)
+
+        # Tokens only known after the response put the budget in debt.
+        limiter.consume(tokens=1500)
+        self.assertAlmostEqual(limiter.reserve(tokens=0), 1.0, delta=0.01)
+
+        # Giving back unused tokens shortens the wait of the next request.
+        limiter.consume(tokens=-500)
+        self.assertAlmostEqual(limiter.reserve(tokens=0), 0.5, delta=0.01)
+
+    def test_shared_by_name(self):
+        limiter1 = RateLimiter(name="test_shared", rpm=60, burst_seconds=1.0)
+        limiter2 = RateLimiter(name="test_shared", rpm=60, burst_seconds=1.0)
+
+        self.assertEqual(limiter1.reserve(), 0.0)
+        self.assertGreater(limiter2.reserve(), 0.0)
+
+    def test_shared_file(self):
+        # Limiters of different processes share budgets through the file;
+        # separate instances stand in for them here.
+        with TemporaryDirectory() as tmp:
+            path = str(Path(tmp).joinpath("limits.sqlite"))
+
+            limiters = [
+                RateLimiter(
+                    name="test_file", rpm=120, burst_seconds=1.0, path=path
+                ) for _ in range(2)
+            ]
+
+            self.assertEqual(limiters[0].reserve(), 0.0)
+            self.assertEqual(limiters[1].reserve(), 0.0)
+            self.assertAlmostEqual(limiters[0].reserve(), 0.5, delta=0.05)
+            self.assertAlmostEqual(limiters[1].reserve(), 1.0, delta=0.05)
+
+    def test_aacquire(self):
+        limiter = RateLimiter(name="test_aacquire", rpm=600, burst_seconds=1.0)
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+
+            await asyncio.gather(*(limiter.aacquire() for _ in range(13)))
+
+            return loop.time() - start
+
+        # 10 in the burst, 3 more at 0.1 seconds each.
+        elapsed = asyncio.run(run())
+        self.assertGreaterEqual(elapsed, 0.29)
+        self.assertLess(elapsed, 2.0)
+
+    def test_aacquire_cancelled(self):
+        limiter = RateLimiter(
+            name="test_aacquire_cancelled", rpm=60, burst_seconds=1.0
+        )
+
+        async def run():
+            await limiter.aacquire()
+
+            waiting = asyncio.ensure_future(limiter.aacquire())
+            await asyncio.sleep(0.01)
+            waiting.cancel()
+
+            with self.assertRaises(asyncio.CancelledError):
+                await waiting
+
+        asyncio.run(run())
+
+        # The cancelled request gave back its budget.
+        self.assertLess(limiter.reserve(), 1.0)
+
+    def test_aacquire_nonblocking(self):
+        limiter = RateLimiter(name="test_aacquire_nonblocking", rpm=60)
+        lock = RateLimiter._memory_store.lock
+
+        async def run():
+            ticks = 0
+
+            async def tick():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            ticker = asyncio.ensure_future(tick())
+
+            # Another thread holds the store while this loop asks for budget.
+            lock.acquire()
+            threading.Timer(0.2, lock.release).start()
+            await limiter.aacquire()
+
+            ticker.cancel()
+            return ticks
+
+        # The loop kept running while the reservation waited on the lock.
+        self.assertGreater(asyncio.run(run()), 5)
+
+
+class TokenEndpoint(Endpoint):
+    """
+    Endpoint whose calls are expected to use their `max_tokens` and report
+    their usage like openai does.
+    """
+
+    def __new__(cls, *args, **kwargs):
+        return super(Endpoint, cls).__new__(cls, name="test_endpoint_tokens")
+
+    def __init__(self, *args, **kwargs):
+        kwargs['name'] = "test_endpoint_tokens"
+        kwargs['callback_class'] = EndpointCallback
+
+        super().__init__(*args, **kwargs)
+
+    def estimate_tokens(self, bindings: inspect.BoundArguments) -> int:
+        return bindings.arguments['max_tokens']
+
+    def handle_usage(self, response: Any, reserved: int = 0) -> None:
+        self.pace.consume(tokens=response['usage'] - reserved)
+
+
+class TestEndpointTokens(TestCase):
+
+    def test_reserve_and_settle(self):
+        endpoint = TokenEndpoint(tpm=600, burst_seconds=100.0)
+
+        def level():
+            return RateLimiter._memory_store.states[
+                "test_endpoint_tokens/tokens"][0]
+
+        def create(max_tokens: int):
+            # Budget for the expected usage is taken before the call.
+            reserved.append(start - level())
+            return dict(usage=250)
+
+        # Fill the bucket (1000 tokens).
+        endpoint.pace.reserve(requests=0, tokens=0)
+        start = level()
+        reserved = []
+
+        endpoint.wrap_function(create)(max_tokens=100)
+
+        self.assertAlmostEqual(reserved[0], 100, delta=5)
+        # The difference to the actual usage is charged afterwards.
+        self.assertAlmostEqual(start - level(), 250, delta=5)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+"""
+Tests for recording calls of TruCustomApp across threads and asyncio tasks.
+"""
+
+import asyncio
+from datetime import timedelta
+from unittest import main
+from unittest import TestCase
+from unittest.mock import patch
+
+from trulens_eval.app import SamplingPolicy
+from trulens_eval.tru_custom_app import instrument
+from trulens_eval.tru_custom_app import TruCustomApp
+from trulens_eval.util import Executor
+from trulens_eval.util import TP
+
+
+class Leaf():
+
+    @instrument
+    def respond(self, query: str) -> str:
+        return query.upper()
+
+    @instrument
+    async def arespond(self, query: str) -> str:
+        await asyncio.sleep(0.01)
+        return query.upper()
+
+
+class Root():
+
+    def __init__(self):
+        self.leaf1 = Leaf()
+        self.leaf2 = Leaf()
+
+    @property
+    def leaves(self):
+        return [self.leaf1, self.leaf2]
+
+    @instrument
+    def respond(self, query: str) -> str:
+        return " ".join(leaf.respond(query) for leaf in self.leaves)
+
+    @instrument
+    def respond_threaded(self, query: str) -> str:
+        promises = [TP().promise(leaf.respond, query) for leaf in self.leaves]
+        return " ".join(promise.result() for promise in promises)
+
+    @instrument
+    def fail(self, query: str) -> str:
+        raise ValueError(query)
+
+    @instrument
+    async def arespond(self, query: str) -> str:
+        responses = await asyncio.gather(
+            *(leaf.arespond(query) for leaf in self.leaves)
+        )
+        return " ".join(responses)
+
+    @instrument
+    def stream(self, query: str):
+        for leaf in self.leaves:
+            yield leaf.respond(query) + " "
+
+    @instrument
+    def stream_fail(self, query: str):
+        yield query
+        raise ValueError(query)
+
+    @instrument
+    async def astream(self, query: str):
+        for leaf in self.leaves:
+            yield await leaf.arespond(query) + " "
+
+
+class TestTruCustomApp(TestCase):
+
+    def setUp(self):
+        self.app = Root()
+        self.tru_app = TruCustomApp(self.app)
+
+    def assertCallStacks(self, record, root_method: str, leaf_method: str):
+        calls = record.calls
+
+        self.assertEqual(len(calls), 3)
+
+        # Leaf calls finish first.
+        for call in calls[0:2]:
+            self.assertEqual(len(call.stack), 2)
+            self.assertEqual(call.stack[0].method.name, root_method)
+            self.assertEqual(call.stack[1].method.name, leaf_method)
+
+        self.assertEqual(len(calls[2].stack), 1)
+        self.assertEqual(calls[2].stack[0].method.name, root_method)
+
+        self.assertNotEqual(calls[0].stack[1].path, calls[1].stack[1].path)
+
+    def test_nested(self):
+        ret, record = self.tru_app.with_record(self.app.respond, "hello")
+
+        self.assertEqual(ret, "HELLO HELLO")
+        self.assertCallStacks(record, "respond", "respond")
+
+    def test_threads(self):
+        ret, record = self.tru_app.with_record(
+            self.app.respond_threaded, "hello"
+        )
+
+        self.assertEqual(ret, "HELLO HELLO")
+        self.assertCallStacks(record, "respond_threaded", "respond")
+
+    def test_async(self):
+        ret, record = asyncio.run(
+            self.tru_app.awith_record(self.app.arespond, "hello")
+        )
+
+        self.assertEqual(ret, "HELLO HELLO")
+        self.assertCallStacks(record, "arespond", "arespond")
+
+    def test_span_timing(self):
+        _, record = self.tru_app.with_record(self.app.respond, "hello")
+        leaves, root = record.calls[0:2], record.calls[2]
+
+        self.assertEqual(
+            root.perf.child_time,
+            sum((call.perf.latency for call in leaves), timedelta())
+        )
+        self.assertEqual(
+            root.perf.self_time, root.perf.latency - root.perf.child_time
+        )
+        self.assertIsNone(root.perf.queue_wait)
+
+        for call in leaves:
+            self.assertEqual(call.perf.child_time, timedelta())
+            self.assertEqual(call.perf.self_time, call.perf.latency)
+
+        # Calls first in their executor tasks waited in the queue.
+        _, record = self.tru_app.with_record(self.app.respond_threaded, "hello")
+        leaves, root = record.calls[0:2], record.calls[2]
+
+        self.assertIsNone(root.perf.queue_wait)
+        for call in leaves:
+            self.assertGreaterEqual(call.perf.queue_wait, timedelta())
+
+    def test_not_recording(self):
+        # Instrumented methods called outside of a root method are not
+        # recorded.
+        _, record = self.tru_app.with_record(self.app.respond, "hello")
+
+        self.app.respond("hello")
+
+        self.assertEqual(len(record.calls), 3)
+
+
+class TestStreaming(TestCase):
+
+    def setUp(self):
+        self.app = Root()
+        self.tru_app = TruCustomApp(self.app)
+
+    def assertStreamed(self, record, root_method: str, leaf_method: str):
+        self.assertEqual(record.main_output, "HELLO HELLO ")
+        self.assertEqual(record.perf.n_chunks, 2)
+        self.assertGreaterEqual(
+            record.perf.first_chunk_time, record.perf.start_time
+        )
+        self.assertGreaterEqual(
+            record.perf.end_time, record.perf.last_chunk_time
+        )
+        self.assertIsNotNone(record.perf.time_to_first_token)
+        self.assertIsNotNone(record.perf.inter_token_latency)
+
+        # Calls made while streaming are part of the record.
+        self.assertEqual(
+            [call.method().name for call in record.calls],
+            [root_method, leaf_method, leaf_method]
+        )
+
+    def test_stream(self):
+        ret, record = self.tru_app.with_record(self.app.stream, "hello")
+
+        # Not finished until the stream is exhausted.
+        self.assertIsNone(record.main_output)
+        self.assertIsNone(record.perf.n_chunks)
+        self.assertEqual(self.tru_app.counters.calls, 0)
+
+        self.assertEqual(list(ret), ["HELLO ", "HELLO "])
+
+        self.assertStreamed(record, "stream", "respond")
+        self.assertEqual(self.tru_app.counters.calls, 1)
+
+    def test_astream(self):
+
+        async def consume():
+            ret, record = await self.tru_app.awith_record(
+                self.app.astream, "hello"
+            )
+            return [chunk async for chunk in ret], record
+
+        chunks, record = asyncio.run(consume())
+
+        self.assertEqual(chunks, ["HELLO ", "HELLO "])
+        self.assertStreamed(record, "astream", "arespond")
+
+    def test_stream_closed(self):
+        ret, record = self.tru_app.with_record(self.app.stream, "hello")
+
+        self.assertEqual(next(ret), "HELLO ")
+        ret.close()
+
+        self.assertEqual(record.main_output, "HELLO ")
+        self.assertEqual(record.perf.n_chunks, 1)
+        self.assertIsNone(record.perf.inter_token_latency)
+
+    def test_stream_error(self):
+        ret, record = self.tru_app.with_record(self.app.stream_fail, "hello")
+
+        with self.assertRaises(ValueError):
+            list(ret)
+
+        self.assertEqual(record.main_output, "hello")
+        self.assertEqual(record.main_error, "hello")
+        self.assertEqual(self.tru_app.counters.errors, 1)
+
+
+class TestSampling(TestCase):
+
+    def setUp(self):
+        self.app = Root()
+        self.tru_app = TruCustomApp(self.app)
+
+    def test_unsampled(self):
+        self.tru_app.sampling = SamplingPolicy(rate=0.0)
+
+        ret, record = self.tru_app.with_record(self.app.respond, "hello")
+        self.assertEqual(ret, "HELLO HELLO")
+        self.assertIsNone(record)
+
+        ret, record = asyncio.run(
+            self.tru_app.awith_record(self.app.arespond, "hello")
+        )
+        self.assertEqual(ret, "HELLO HELLO")
+        self.assertIsNone(record)
+
+        counters = self.tru_app.counters
+        self.assertEqual(counters.calls, 2)
+        self.assertEqual(counters.sampled, 0)
+        self.assertEqual(counters.errors, 0)
+        self.assertIsNotNone(counters.mean_latency)
+
+    def test_sampled(self):
+        self.tru_app.sampling = SamplingPolicy(rate=1.0)
+
+        _, record = self.tru_app.with_record(self.app.respond, "hello")
+
+        self.assertEqual(len(record.calls), 3)
+        self.assertEqual(self.tru_app.counters.calls, 1)
+        self.assertEqual(self.tru_app.counters.sampled, 1)
+
+    def test_tag_rates(self):
+        policy = SamplingPolicy(rate=0.0, tag_rates=dict(canary=1.0))
+
+        self.assertEqual(policy.rate_for("prod"), 0.0)
+        self.assertEqual(policy.rate_for("prod, canary"), 1.0)
+
+        self.tru_app.sampling = policy
+        self.tru_app.tags = "canary"
+
+        _, record = self.tru_app.with_record(self.app.respond, "hello")
+        self.assertIsNotNone(record)
+
+    def test_errors(self):
+        handled = []
+
+        def handle_error(app, record, error):
+            handled.append(record)
+
+        with patch.object(TruCustomApp, "_handle_error", handle_error):
+            for always_on_error in [True, False]:
+                self.tru_app.sampling = SamplingPolicy(
+                    rate=0.0, always_on_error=always_on_error
+                )
+
+                with self.assertRaises(ValueError):
+                    self.tru_app.with_record(self.app.fail, "hello")
+
+            Executor().finish()
+
+        # Only the first error produced a record, without calls.
+        self.assertEqual(len(handled), 1)
+        self.assertEqual(handled[0].main_input, "hello")
+        self.assertEqual(len(handled[0].calls), 0)
+
+        self.assertEqual(self.tru_app.counters.errors, 2)
+        self.assertEqual(self.tru_app.counters.sampled, 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -13,7 +13,6 @@ import numpy as np
 import streamlit as st
 from streamlit_extras.switch_page_button import switch_page
 
-from trulens_eval.db_migration import MIGRATION_UNKNOWN_STR
 from trulens_eval.ux.styles import CATEGORY
 
 st.runtime.legacy_caching.clear_cache()
@@ -49,39 +48,28 @@ def streamlit_app():
     st.write(
         'Average feedback values displayed in the range from 0 (worst) to 1 (best).'
     )
-    df, feedback_col_names = lms.get_records_and_feedback([])
+    df, feedback_col_names = lms.get_app_summaries()
 
     if df.empty:
         st.write("No records yet...")
         return
 
-    df = df.sort_values(by="app_id")
-
-    if df.empty:
-        st.write("No records yet...")
-
-    apps = list(df.app_id.unique())
     st.markdown("""---""")
 
-    for app in apps:
-        app_df = df.loc[df.app_id == app]
-        if app_df.empty:
-            continue
-        app_str = app_df['app_json'].iloc[0]
-        app_json = json.loads(app_str)
+    for _, summary in df.iterrows():
+        app = summary['app_id']
+        app_json = json.loads(summary['app_json'])
         metadata = app_json.get('metadata')
         #st.text('Metadata' + str(metadata))
         st.header(app, help=draw_metadata(metadata))
         col1, col2, col3, col4, *feedback_cols, col99 = st.columns(
             5 + len(feedback_col_names)
         )
-        latency_mean = app_df['latency'].apply(
-            lambda td: td if td != MIGRATION_UNKNOWN_STR else None
-        ).mean()
-
-        #app_df_feedback = df.loc[df.app_id == app]
+        latency_mean = summary['latency']
+        if latency_mean is None:
+            latency_mean = math.nan
 
-        col1.metric("Records", len(app_df))
+        col1.metric("Records", int(summary['records']))
         col2.metric(
             "Average Latency (Seconds)",
             f"{millify(round(latency_mean, 5), precision=2)}"
@@ -89,20 +77,13 @@ def streamlit_app():
         )
         col3.metric(
             "Total Cost (USD)",
-            f"${millify(round(sum(cost for cost in app_df.total_cost if cost is not None), 5), precision = 2)}"
+            f"${millify(round(summary['total_cost'], 5), precision=2)}"
         )
         col4.metric(
-            "Total Tokens",
-            millify(
-                sum(
-                    tokens for tokens in app_df.total_tokens
-                    if tokens is not None
-                ),
-                precision=2
-            )
+            "Total Tokens", millify(summary['total_tokens'], precision=2)
         )
         for i, col_name in enumerate(feedback_col_names):
-            mean = app_df[col_name].mean()
+            mean = summary[col_name]
 
             st.write(
                 styles.stmetricdelta_hidearrow,
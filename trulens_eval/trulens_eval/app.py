@@ -4,15 +4,24 @@ Generalized root type for various libraries like llama_index and langchain .
 
 from abc import ABC
 from abc import abstractmethod
+from contextlib import contextmanager
+import contextvars
 from datetime import datetime
+from datetime import timedelta
 from inspect import BoundArguments
+from inspect import isasyncgen
+from inspect import isawaitable
+from inspect import isgenerator
 from inspect import Signature
 from inspect import signature
 import logging
 from pprint import PrettyPrinter
+import random
+import threading
 import traceback
 from typing import (
-    Any, Callable, Dict, Iterable, Optional, Sequence, Set, Tuple, Type
+    Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional,
+    Sequence, Set, Tuple, Type, TypeVar
 )
 
 import pydantic
@@ -20,9 +29,11 @@ from pydantic import Field
 
 from trulens_eval.db import DB
 from trulens_eval.feedback import Feedback
+from trulens_eval.feedback.provider.endpoint import Endpoint
+from trulens_eval.feedback.provider.endpoint.base import EndpointCallback
 from trulens_eval.instruments import Instrument
+from trulens_eval.instruments import recording
 from trulens_eval.instruments import WithInstrumentCallbacks
-from trulens_eval.feedback.provider.endpoint import Endpoint
 from trulens_eval.schema import AppDefinition
 from trulens_eval.schema import Cost
 from trulens_eval.schema import FeedbackMode
@@ -33,8 +44,10 @@ from trulens_eval.schema import RecordAppCall
 from trulens_eval.schema import Select
 from trulens_eval.tru import Tru
 from trulens_eval.util import all_objects
+from trulens_eval.util import callable_name
 from trulens_eval.util import Class
 from trulens_eval.util import CLASS_INFO
+from trulens_eval.util import Executor
 from trulens_eval.util import GetItemOrAttribute
 from trulens_eval.util import JSON
 from trulens_eval.util import JSON_BASES
@@ -42,13 +55,18 @@ from trulens_eval.util import JSON_BASES_T
 from trulens_eval.util import json_str_of_obj
 from trulens_eval.util import jsonify
 from trulens_eval.util import JSONPath
+from trulens_eval.util import safe_signature
 from trulens_eval.util import SerialModel
-from trulens_eval.util import TP, safe_signature, callable_name
+from trulens_eval.util import TaskPriority
+from trulens_eval.utils import metrics
+from trulens_eval.utils.otel import SpanSink
 
 logger = logging.getLogger(__name__)
 
 pp = PrettyPrinter()
 
+T = TypeVar("T")
+
 # App component.
 COMPONENT = Any
 
@@ -273,6 +291,241 @@ def instrumented_component_views(
             yield q, ComponentView.of_json(json=o)
 
 
+class SamplingPolicy(SerialModel):
+    """
+    Which calls of an app's root methods (like `App.with_record`) produce
+    records. Calls that are not sampled run the wrapped app without any
+    instrumented method bookkeeping and only add to the app's `CallCounters`.
+    """
+
+    # Fraction of calls to sample.
+    rate: float = 1.0
+
+    # Fractions of calls to sample of apps with the given tags (see
+    # `AppDefinition.tags`, comma-separated), in place of `rate`. If more than
+    # one of the app's tags is given a rate, the highest applies.
+    tag_rates: Dict[str, float] = Field(default_factory=dict)
+
+    # Whether calls that were not sampled still produce a record if they raise
+    # an error. Such records have no calls as those were not tracked.
+    always_on_error: bool = True
+
+    def rate_for(self, tags: Optional[str]) -> float:
+        """
+        The fraction of calls to sample of an app with the given `tags`.
+        """
+
+        rates = [
+            self.tag_rates[tag.strip()]
+            for tag in (tags or "").split(",")
+            if tag.strip() in self.tag_rates
+        ]
+
+        if len(rates) > 0:
+            return max(rates)
+
+        return self.rate
+
+    def sample(self, tags: Optional[str] = None) -> bool:
+        """
+        Decide whether to sample a call of an app with the given `tags`.
+        """
+
+        rate = self.rate_for(tags)
+
+        return rate >= 1.0 or random.random() < rate
+
+
+class CallCounters():
+    """
+    Aggregates over all calls of an app's root methods, sampled or not.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+        self.calls: int = 0
+        self.sampled: int = 0
+        self.errors: int = 0
+        self.latency: timedelta = timedelta()
+        self.cost: Cost = Cost()
+
+    def add(
+        self, sampled: bool, error: Optional[BaseException], perf: Perf,
+        cost: Cost
+    ) -> None:
+        """
+        Count a call with the given outcome.
+        """
+
+        with self._lock:
+            self.calls += 1
+            self.sampled += int(sampled)
+            self.errors += int(error is not None)
+            self.latency += perf.latency
+            self.cost = self.cost + cost
+
+    @property
+    def mean_latency(self) -> Optional[timedelta]:
+        if self.calls == 0:
+            return None
+
+        return self.latency / self.calls
+
+    def __repr__(self):
+        return (
+            f"CallCounters(calls={self.calls}, sampled={self.sampled}, "
+            f"errors={self.errors}, latency={self.latency}, cost={self.cost})"
+        )
+
+
+class StreamedRecord():
+    """
+    Record of a call to an app whose output is streamed, finished once the
+    stream is exhausted (or closed) rather than when the call returns. Chunks
+    flow to the caller as they are produced while their timing (see `Perf`)
+    and content are kept for the record. The record's main output is the
+    concatenation of the chunks if they are strings or the list of chunks
+    otherwise.
+    """
+
+    def __init__(
+        self, app: 'App', record: Record, calls: List[RecordAppCall],
+        callbacks: Sequence[EndpointCallback], context: contextvars.Context
+    ):
+        self.app = app
+        self.record = record
+
+        # Calls made while streaming are added to these.
+        self.calls = calls
+
+        # Tally the costs of the call, including those of the stream.
+        self.callbacks = callbacks
+
+        # Context (see `contextvars`) of the call which produced the stream,
+        # in which chunks are produced so that their costs and instrumented
+        # calls are tracked.
+        self.context = context
+
+        self.chunks: List[Any] = []
+        self.first_chunk_time: Optional[datetime] = None
+        self.last_chunk_time: Optional[datetime] = None
+
+        self.finished = False
+
+    def wrap(self, chunks: Iterator[T]) -> Iterator[T]:
+        """
+        Produce the given chunks, finishing the record once they run out.
+        """
+
+        if self.finished:
+            yield from chunks
+            return
+
+        try:
+            while True:
+                try:
+                    chunk = self.context.run(next, chunks)
+                except StopIteration:
+                    break
+                except Exception as e:
+                    self.finish(error=e)
+                    raise e
+
+                self.add_chunk(chunk)
+                yield chunk
+
+        finally:
+            self.finish()
+
+    async def awrap(self, chunks: AsyncIterator[T]) -> AsyncIterator[T]:
+        """
+        Async version of `wrap`.
+        """
+
+        if self.finished:
+            async for chunk in chunks:
+                yield chunk
+            return
+
+        try:
+            while True:
+                try:
+                    with self._in_context():
+                        chunk = await chunks.__anext__()
+                except StopAsyncIteration:
+                    break
+                except Exception as e:
+                    self.finish(error=e)
+                    raise e
+
+                self.add_chunk(chunk)
+                yield chunk
+
+        finally:
+            self.finish()
+
+    @contextmanager
+    def _in_context(self) -> Iterator[None]:
+        """
+        Set the variables of the call's context in the current one, as async
+        chunks are produced in the task consuming them.
+        """
+
+        tokens = [(var, var.set(value)) for var, value in self.context.items()]
+
+        try:
+            yield
+
+        finally:
+            for var, token in reversed(tokens):
+                var.reset(token)
+
+    def add_chunk(self, chunk: Any) -> None:
+        now = datetime.now()
+
+        if self.first_chunk_time is None:
+            self.first_chunk_time = now
+        self.last_chunk_time = now
+
+        self.chunks.append(chunk)
+
+    def output(self) -> Any:
+        if all(isinstance(chunk, str) for chunk in self.chunks):
+            return "".join(self.chunks)
+
+        return self.chunks
+
+    def finish(self, error: Optional[Exception] = None) -> None:
+        """
+        Complete the record with the stream and hand it over to the app. Raises
+        `error` if given.
+        """
+
+        if self.finished:
+            return
+
+        self.finished = True
+
+        record = self.record
+
+        record.perf = Perf(
+            start_time=record.perf.start_time,
+            end_time=datetime.now(),
+            first_chunk_time=self.first_chunk_time,
+            last_chunk_time=self.last_chunk_time,
+            n_chunks=len(self.chunks)
+        )
+        record.cost = sum((cb.cost for cb in self.callbacks), Cost())
+        record.calls = list(self.calls)
+        record.main_output = jsonify(self.output())
+
+        if error is not None:
+            record.main_error = str(error)
+
+        self.app._finish_record(record, error)
+
+
 class App(AppDefinition, SerialModel, WithInstrumentCallbacks):
     """
     Generalization of a wrapped model.
@@ -304,6 +557,18 @@ class App(AppDefinition, SerialModel, WithInstrumentCallbacks):
         exclude=True, default_factory=dict
     )
 
+    # Which calls of root methods produce records. All calls are recorded if
+    # None. Root methods return None in place of the record of calls not
+    # sampled.
+    sampling: Optional[SamplingPolicy] = Field(exclude=True, default=None)
+
+    # Aggregates over all calls of root methods including those not sampled.
+    counters: CallCounters = Field(exclude=True, default_factory=CallCounters)
+
+    # Where to also emit the spans of records, e.g. for an OTLP collector. See
+    # `utils/otel.py`.
+    span_sink: Optional[SpanSink] = Field(exclude=True, default=None)
+
     def __init__(
         self,
         tru: Optional[Tru] = None,
@@ -402,6 +667,11 @@ class App(AppDefinition, SerialModel, WithInstrumentCallbacks):
         if isinstance(ret, str):
             return ret
 
+        if isgenerator(ret) or isasyncgen(ret):
+            # Main output is that of the stream once exhausted. See
+            # `StreamedRecord`.
+            return None
+
         logger.warning(
             f"Unsure what the main output string is for the call to {callable_name(func)}."
         )
@@ -564,18 +834,21 @@ class App(AppDefinition, SerialModel, WithInstrumentCallbacks):
         records += [ret_record]
     """
 
-    async def awith_record(self, func, *args, **kwargs) -> Tuple[Any, Record]:
+    async def awith_record(self, func, *args,
+                           **kwargs) -> Tuple[Any, Optional[Record]]:
         """
         Call the given instrumented async function `func` with the given `args`,
-        `kwargs`, producing its results as well as a record.
+        `kwargs`, producing its results as well as a record. The record is
+        None if the call is not sampled (see `sampling`).
         """
 
-        # Wrapped calls will look this up by traversing the call stack. This
-        # should work with threads. We also store self there are multiple apps
-        # may have instrumented the same methods.
-        record = []
-        # DO NOT REMOVE
-        record_and_app: Tuple[Sequence[RecordAppCall], App] = (record, self)
+        if self.sampling is not None and not self.sampling.sample(self.tags):
+            return await self._acall_unsampled(func, *args, **kwargs)
+
+        # Instrumented methods called within the `recording` context below add
+        # their calls to this list. This works across `TP` threads and
+        # asyncio tasks. Several apps may have instrumented the same methods.
+        record: List[RecordAppCall] = []
 
         ret = None
         error = None
@@ -596,9 +869,21 @@ class App(AppDefinition, SerialModel, WithInstrumentCallbacks):
 
             main_in = self.main_input(func, sig, bindings)
 
-            ret, cost = await Endpoint.atrack_all_costs_tally(
-                lambda: func(*bindings.args, **bindings.kwargs)
-            )
+            async def call():
+                ret = func(*bindings.args, **bindings.kwargs)
+                # Async generator functions produce their streams without
+                # being awaited.
+                if isawaitable(ret):
+                    ret = await ret
+
+                return ret, contextvars.copy_context()
+
+            with recording(record=record, app=self):
+                ret_context, callbacks = await Endpoint.atrack_all_costs(call)
+
+            ret, context = ret_context
+
+            cost = sum((cb.cost for cb in callbacks), Cost())
 
             main_out = self.main_output(func, sig, bindings, ret)
 
@@ -630,23 +915,42 @@ class App(AppDefinition, SerialModel, WithInstrumentCallbacks):
 
         perf = Perf(start_time=start_time, end_time=end_time)
         ret_record = self._post_record(
-            ret_record_args, error, cost, perf, record
+            ret_record_args, error, cost, perf, record, finished=False
         )
 
+        if error is None:
+            stream = self._wrap_stream(
+                ret,
+                StreamedRecord(
+                    app=self,
+                    record=ret_record,
+                    calls=record,
+                    callbacks=callbacks,
+                    context=context
+                )
+            )
+            if stream is not None:
+                return stream, ret_record
+
+        self._finish_record(ret_record, error)
+
         return ret, ret_record
 
-    def with_record(self, func, *args, **kwargs) -> Tuple[Any, Record]:
+    def with_record(self, func, *args,
+                    **kwargs) -> Tuple[Any, Optional[Record]]:
         """
         Call the given instrumented function `func` with the given `args`,
-        `kwargs`, producing its results as well as a record.
+        `kwargs`, producing its results as well as a record. The record is
+        None if the call is not sampled (see `sampling`).
         """
 
-        # Wrapped calls will look this up by traversing the call stack. This
-        # should work with threads. We also store self there are multiple apps
-        # may have instrumented the same methods.
-        record = []
-        # DO NOT REMOVE
-        record_and_app: Tuple[Sequence[RecordAppCall], App] = (record, self)
+        if self.sampling is not None and not self.sampling.sample(self.tags):
+            return self._call_unsampled(func, *args, **kwargs)
+
+        # Instrumented methods called within the `recording` context below add
+        # their calls to this list. This works across `TP` threads and
+        # asyncio tasks. Several apps may have instrumented the same methods.
+        record: List[RecordAppCall] = []
 
         ret = None
         error = None
@@ -668,9 +972,15 @@ class App(AppDefinition, SerialModel, WithInstrumentCallbacks):
 
             main_in = self.main_input(func, sig, bindings)
 
-            ret, cost = Endpoint.track_all_costs_tally(
-                lambda: func(*bindings.args, **bindings.kwargs)
-            )
+            with recording(record=record, app=self):
+                (ret, context), callbacks = Endpoint.track_all_costs(
+                    lambda: (
+                        func(*bindings.args, **bindings.kwargs),
+                        contextvars.copy_context()
+                    )
+                )
+
+            cost = sum((cb.cost for cb in callbacks), Cost())
 
             main_out = self.main_output(func, sig, bindings, ret)
 
@@ -701,11 +1011,105 @@ class App(AppDefinition, SerialModel, WithInstrumentCallbacks):
 
         perf = Perf(start_time=start_time, end_time=end_time)
         ret_record = self._post_record(
-            ret_record_args, error, cost, perf, record
+            ret_record_args, error, cost, perf, record, finished=False
         )
 
+        if error is None:
+            stream = self._wrap_stream(
+                ret,
+                StreamedRecord(
+                    app=self,
+                    record=ret_record,
+                    calls=record,
+                    callbacks=callbacks,
+                    context=context
+                )
+            )
+            if stream is not None:
+                return stream, ret_record
+
+        self._finish_record(ret_record, error)
+
         return ret, ret_record
 
+    async def _acall_unsampled(self, func, *args, **kwargs) -> Tuple[Any, None]:
+        """
+        Call the given async function `func` without recording the
+        instrumented methods it calls, only counting it in `counters`.
+        """
+
+        start_time = datetime.now()
+
+        try:
+            ret, cost = await Endpoint.atrack_all_costs_tally(
+                lambda: func(*args, **kwargs)
+            )
+
+        except BaseException as e:
+            self._handle_unsampled_error(func, args, kwargs, e, start_time)
+
+        perf = Perf(start_time=start_time, end_time=datetime.now())
+        self.counters.add(sampled=False, error=None, perf=perf, cost=cost)
+
+        return ret, None
+
+    def _call_unsampled(self, func, *args, **kwargs) -> Tuple[Any, None]:
+        """
+        Call the given function `func` without recording the instrumented
+        methods it calls, only counting it in `counters`.
+        """
+
+        start_time = datetime.now()
+
+        try:
+            ret, cost = Endpoint.track_all_costs_tally(
+                lambda: func(*args, **kwargs)
+            )
+
+        except BaseException as e:
+            self._handle_unsampled_error(func, args, kwargs, e, start_time)
+
+        perf = Perf(start_time=start_time, end_time=datetime.now())
+        self.counters.add(sampled=False, error=None, perf=perf, cost=cost)
+
+        return ret, None
+
+    def _handle_unsampled_error(
+        self, func, args, kwargs, error: BaseException, start_time: datetime
+    ):
+        """
+        Count a call that was not sampled and raised `error`, post its record
+        if the sampling policy asks for it, and re-raise the error.
+        """
+
+        perf = Perf(start_time=start_time, end_time=datetime.now())
+
+        logger.error(f"App raised an exception: {error}")
+        logger.error(traceback.format_exc())
+
+        if not self.sampling.always_on_error:
+            self.counters.add(
+                sampled=False, error=error, perf=perf, cost=Cost()
+            )
+            raise error
+
+        main_in = None
+        try:
+            sig = safe_signature(func)
+            bindings = sig.bind(*args, **kwargs)
+            main_in = self.main_input(func, sig, bindings)
+        except Exception:
+            pass
+
+        ret_record_args = dict(
+            main_input=jsonify(main_in), main_error=jsonify(error)
+        )
+
+        # Raises error.
+        self._post_record(
+            ret_record_args, error, Cost(), perf, [], sampled=False
+        )
+
     def json(self, *args, **kwargs):
         # Need custom jsonification here because it is likely the model
         # structure contains loops.
@@ -716,9 +1120,36 @@ class App(AppDefinition, SerialModel, WithInstrumentCallbacks):
         # Same problem as in json.
         return jsonify(self, instrument=self.instrument)
 
-    def _post_record(self, ret_record_args, error, cost, perf, record):
+    def _wrap_stream(self, ret: Any, stream: StreamedRecord) -> Optional[Any]:
         """
-        Final steps of record construction common among model types.
+        If `ret`, the output of a recorded call, is streamed, produce it with
+        its stream wrapped by `stream` so that the record of the call is
+        finished once the stream is exhausted. Returns None if `ret` is not
+        streamed.
+        """
+
+        if isgenerator(ret):
+            return stream.wrap(ret)
+
+        if isasyncgen(ret):
+            return stream.awrap(ret)
+
+        return None
+
+    def _post_record(
+        self,
+        ret_record_args,
+        error,
+        cost,
+        perf,
+        record,
+        sampled=True,
+        finished=True
+    ):
+        """
+        Final steps of record construction common among model types. If not
+        `finished`, the record is to be finished with `_finish_record` later
+        on.
         """
 
         ret_record_args['main_error'] = str(error)
@@ -730,26 +1161,59 @@ class App(AppDefinition, SerialModel, WithInstrumentCallbacks):
 
         ret_record = Record(**ret_record_args)
 
+        if finished:
+            self._finish_record(ret_record, error, sampled=sampled)
+
+        return ret_record
+
+    def _finish_record(
+        self, record: Record, error: Optional[Exception], sampled=True
+    ):
+        """
+        Count the given complete record and write it out along with its
+        feedback results according to `feedback_mode`. Raises `error` if
+        given.
+        """
+
+        self.counters.add(
+            sampled=sampled, error=error, perf=record.perf, cost=record.cost
+        )
+
+        if metrics.ENABLED:
+            metrics.RECORDS.labels(
+                self.app_id, "ok" if error is None else "error"
+            ).inc()
+
+        if self.span_sink is not None:
+            try:
+                self.span_sink.export_record(record)
+            except Exception as e:
+                logger.warning(f"Could not emit spans of record: {e}")
+
         if error is not None:
             if self.feedback_mode == FeedbackMode.WITH_APP:
-                self._handle_error(record=ret_record, error=error)
+                self._handle_error(record=record, error=error)
 
             elif self.feedback_mode in [FeedbackMode.DEFERRED,
                                         FeedbackMode.WITH_APP_THREAD]:
-                TP().runlater(
-                    self._handle_error, record=ret_record, error=error
+                Executor().submit_task(
+                    self._handle_error,
+                    kwargs=dict(record=record, error=error),
+                    priority=TaskPriority.RECORD
                 )
 
             raise error
 
         if self.feedback_mode == FeedbackMode.WITH_APP:
-            self._handle_record(record=ret_record)
+            self._handle_record(record=record)
 
         elif self.feedback_mode in [FeedbackMode.DEFERRED,
                                     FeedbackMode.WITH_APP_THREAD]:
-            TP().runlater(self._handle_record, record=ret_record)
-
-        return ret_record
+            Executor().submit_task(
+                self._handle_record,
+                kwargs=dict(record=record),
+                priority=TaskPriority.RECORD
+            )
 
     def _handle_record(self, record: Record):
         """
@@ -766,14 +1230,13 @@ class App(AppDefinition, SerialModel, WithInstrumentCallbacks):
 
         # Add empty (to run) feedback to db.
         if self.feedback_mode == FeedbackMode.DEFERRED:
-            for f in self.feedbacks:
-                self.db.insert_feedback(
-                    FeedbackResult(
-                        name=f.name,
-                        record_id=record_id,
-                        feedback_definition_id=f.feedback_definition_id
-                    )
-                )
+            self.tru.add_feedbacks(
+                FeedbackResult(
+                    name=f.name,
+                    record_id=record_id,
+                    feedback_definition_id=f.feedback_definition_id
+                ) for f in self.feedbacks
+            )
 
         elif self.feedback_mode in [FeedbackMode.WITH_APP,
                                     FeedbackMode.WITH_APP_THREAD]:
@@ -782,8 +1245,7 @@ class App(AppDefinition, SerialModel, WithInstrumentCallbacks):
                 record=record, feedback_functions=self.feedbacks, app=self
             )
 
-            for result in results:
-                self.tru.add_feedback(result)
+            self.tru.add_feedbacks(results)
 
     def _handle_error(self, record: Record, error: Exception):
         if self.db is None:
@@ -0,0 +1,136 @@
+"""
+Compressed, content addressed values stored in the `blobs` table, such as the
+calls of records. Each blob is identified by the hash of its content so that
+identical values are only stored once.
+
+Strings in records longer than a threshold, like documents retrieved by RAG
+apps which recur across many records, are also stored as blobs. They are
+replaced in records by references, `{BLOB: <blob id>}`, which are put back
+(`rehydrate`) when the strings are needed.
+"""
+
+from enum import Enum
+import hashlib
+from typing import Any, Dict, Mapping, Set, Tuple
+import zlib
+
+from trulens_eval.util import BLOB
+from trulens_eval.util import OptionalImports
+from trulens_eval.util import REQUIREMENT_ZSTD
+
+with OptionalImports(message=REQUIREMENT_ZSTD):
+    import zstandard
+
+
+class BlobEncoding(str, Enum):
+    ZLIB = "zlib"
+
+    # Faster to compress and decompress than zlib at similar ratios, requires
+    # the zstandard package.
+    ZSTD = "zstd"
+
+
+def blob_id_of(content: str) -> str:
+    """
+    Identifier of a blob with the given content.
+    """
+
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def compress(content: str, encoding: BlobEncoding) -> bytes:
+    data = content.encode()
+
+    if encoding == BlobEncoding.ZLIB:
+        return zlib.compress(data)
+    elif encoding == BlobEncoding.ZSTD:
+        return zstandard.ZstdCompressor().compress(data)
+    else:
+        raise ValueError(f"Unknown blob encoding {encoding}.")
+
+
+def decompress(data: bytes, encoding: BlobEncoding) -> str:
+    if encoding == BlobEncoding.ZLIB:
+        data = zlib.decompress(data)
+    elif encoding == BlobEncoding.ZSTD:
+        data = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        raise ValueError(f"Unknown blob encoding {encoding}.")
+
+    return data.decode()
+
+
+def is_blob_ref(obj: Any) -> bool:
+    return isinstance(obj, dict) and len(obj) == 1 and BLOB in obj
+
+
+def externalize(obj: Any, threshold: int) -> Tuple[Any, Dict[str, str]]:
+    """
+    Replace the strings in `obj` longer than `threshold` characters by
+    references to blobs. Produces the new object and the content of each
+    referred blob.
+    """
+
+    contents = dict()
+
+    def _externalize(o):
+        if isinstance(o, str):
+            if len(o) <= threshold:
+                return o
+
+            blob_id = blob_id_of(o)
+            contents[blob_id] = o
+            return {BLOB: blob_id}
+
+        elif isinstance(o, dict):
+            return {k: _externalize(v) for k, v in o.items()}
+
+        elif isinstance(o, (list, tuple)):
+            return [_externalize(v) for v in o]
+
+        else:
+            return o
+
+    return _externalize(obj), contents
+
+
+def blob_refs(obj: Any) -> Set[str]:
+    """
+    Ids of the blobs referred to in `obj`.
+    """
+
+    refs = set()
+
+    def _collect(o):
+        if is_blob_ref(o):
+            refs.add(o[BLOB])
+
+        elif isinstance(o, dict):
+            for v in o.values():
+                _collect(v)
+
+        elif isinstance(o, (list, tuple)):
+            for v in o:
+                _collect(v)
+
+    _collect(obj)
+
+    return refs
+
+
+def rehydrate(obj: Any, contents: Mapping[str, str]) -> Any:
+    """
+    Replace the references to blobs in `obj` by their `contents`.
+    """
+
+    if is_blob_ref(obj):
+        return contents[obj[BLOB]]
+
+    elif isinstance(obj, dict):
+        return {k: rehydrate(v, contents) for k, v in obj.items()}
+
+    elif isinstance(obj, list):
+        return [rehydrate(v, contents) for v in obj]
+
+    else:
+        return obj
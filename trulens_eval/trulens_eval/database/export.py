@@ -0,0 +1,535 @@
+"""
+Streaming export of records and feedback results to Arrow or Parquet files.
+
+Records and feedback results are read a page at a time, ordered by their
+timestamps (`ts` of records, `last_ts` of feedback results), and written out
+as flat tables with one column per `Cost` field along with latency and
+feedback result columns. The large `record_json` and `calls_json` columns are
+never read so memory use is bounded by the page size regardless of the size
+of the database.
+
+`export_records_and_feedback` writes to a directory, keeping a watermark of
+the last exported rows there, so that repeated exports only add files with
+rows that are new since the previous one. Rows are not necessarily committed
+in the order of their timestamps, so each export also looks again at the rows
+of the last `overlap_seconds` before the watermark and adds those that were
+written or replaced since they were last exported. The files of a directory
+can be read together:
+
+```python
+from pathlib import Path
+
+import pandas as pd
+
+records = pd.concat(
+    pd.read_parquet(path)
+    for path in sorted(Path("export").glob("records-*.parquet"))
+)
+```
+"""
+
+from datetime import datetime
+from enum import Enum
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import pydantic
+from sqlalchemy import and_
+from sqlalchemy import or_
+from sqlalchemy import select
+from sqlalchemy import true
+
+from trulens_eval import schema
+from trulens_eval.database import orm
+from trulens_eval.database.sqlalchemy_db import SqlAlchemyDB
+from trulens_eval.db_migration import MIGRATION_UNKNOWN_STR
+from trulens_eval.util import OptionalImports
+from trulens_eval.util import REQUIREMENT_PYARROW
+
+with OptionalImports(message=REQUIREMENT_PYARROW):
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+logger = logging.getLogger(__name__)
+
+# Name of the file in an export directory holding its `ExportWatermark`.
+WATERMARK_FILE = "watermark.json"
+
+# Position of a row in the order of export: its timestamp and id.
+Position = Tuple[float, str]
+
+# Rows exported recently, by id: their timestamp and a digest of their
+# exported values.
+Recent = Dict[str, Tuple[float, str]]
+
+
+class ExportFormat(str, Enum):
+    PARQUET = "parquet"
+
+    # Arrow IPC file format, also known as Feather v2.
+    ARROW = "arrow"
+
+
+class ExportWatermark(pydantic.BaseModel):
+    """
+    Position of the last records and feedback results exported to a
+    directory. Exports to the same directory continue after these.
+    """
+
+    # Apps the export is for. All apps if None.
+    app_ids: Optional[List[str]] = None
+
+    # Timestamp and id of the last exported record.
+    records: Optional[Position] = None
+
+    # Records exported within the overlap window before `records`.
+    recent_records: Recent = pydantic.Field(default_factory=dict)
+
+    # Last update timestamp and id of the last exported feedback result.
+    feedbacks: Optional[Position] = None
+
+    # Feedback results exported within the overlap window before `feedbacks`.
+    recent_feedbacks: Recent = pydantic.Field(default_factory=dict)
+
+    # Number of exports so far, used to name the files of the next one.
+    parts: int = 0
+
+    @staticmethod
+    def load(directory: Path) -> Optional['ExportWatermark']:
+        path = directory / WATERMARK_FILE
+
+        if not path.exists():
+            return None
+
+        return ExportWatermark.parse_file(path)
+
+    def save(self, directory: Path) -> None:
+        # Write then rename so an interrupted save does not lose the previous
+        # watermark.
+        path = directory / WATERMARK_FILE
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(self.json())
+        tmp.replace(path)
+
+
+def _cost_fields() -> List[Tuple[str, type]]:
+    return [
+        (name, field.outer_type_)
+        for name, field in schema.Cost.__fields__.items()
+    ]
+
+
+def _cost_schema() -> List['pa.Field']:
+    return [
+        pa.field(name,
+                 pa.float64() if typ is float else pa.int64())
+        for name, typ in _cost_fields()
+    ]
+
+
+def records_schema() -> 'pa.Schema':
+    """
+    Schema of exported records.
+    """
+
+    return pa.schema(
+        [
+            pa.field("record_id", pa.string()),
+            pa.field("app_id", pa.string()),
+            pa.field("ts", pa.timestamp("us")),
+            pa.field("tags", pa.string()),
+            pa.field("input", pa.string()),
+            pa.field("output", pa.string()),
+            pa.field("start_time", pa.timestamp("us")),
+            pa.field("end_time", pa.timestamp("us")),
+            pa.field("latency", pa.float64()),  # seconds
+        ] + _cost_schema()
+    )
+
+
+def feedbacks_schema() -> 'pa.Schema':
+    """
+    Schema of exported feedback results.
+    """
+
+    return pa.schema(
+        [
+            pa.field("feedback_result_id", pa.string()),
+            pa.field("record_id", pa.string()),
+            pa.field("app_id", pa.string()),
+            pa.field("feedback_definition_id", pa.string()),
+            pa.field("name", pa.string()),
+            pa.field("status", pa.string()),
+            pa.field("result", pa.float64()),
+            pa.field("error", pa.string()),
+            pa.field("last_ts", pa.timestamp("us")),
+        ] + _cost_schema()
+    )
+
+
+def _cost_columns(cost_json: Optional[str]) -> Dict[str, Any]:
+    try:
+        cost = json.loads(cost_json)
+    except (TypeError, ValueError):
+        cost = {}
+
+    return {name: cost.get(name) for name, _ in _cost_fields()}
+
+
+def _perf_columns(perf_json: Optional[str]) -> Dict[str, Any]:
+    if perf_json is None or perf_json == MIGRATION_UNKNOWN_STR:
+        return dict(start_time=None, end_time=None, latency=None)
+
+    perf = json.loads(perf_json)
+    start_time = datetime.fromisoformat(perf['start_time'])
+    end_time = datetime.fromisoformat(perf['end_time'])
+
+    return dict(
+        start_time=start_time,
+        end_time=end_time,
+        latency=(end_time - start_time).total_seconds()
+    )
+
+
+def _digest(values: Dict[str, Any]) -> str:
+    return hashlib.sha1(
+        json.dumps(values, default=str, sort_keys=True).encode()
+    ).hexdigest()[:16]
+
+
+def _after(ts_column, id_column, position: Optional[Position]):
+    """
+    Condition selecting rows that come after `position` in the order of
+    export.
+    """
+
+    if position is None:
+        return true()
+
+    ts, _id = position
+
+    return or_(ts_column > ts, and_(ts_column == ts, id_column > _id))
+
+
+def iter_records(
+    db: SqlAlchemyDB,
+    app_ids: Optional[Sequence[str]] = None,
+    after: Optional[Position] = None,
+    chunk_size: int = 1000,
+    exported: Optional[Recent] = None
+) -> Iterator[Tuple['pa.Table', Position, Recent]]:
+    """
+    Produce tables of at most `chunk_size` records of the given apps (all if
+    None) following `after`, in order of `ts`, each along with the position
+    of the last record read and the timestamps and digests of its records.
+    Records in `exported` are left out unless they changed since.
+    """
+
+    exported = exported or dict()
+
+    _rec = orm.Record
+    columns = [
+        _rec.record_id, _rec.app_id, _rec.ts, _rec.tags, _rec.input,
+        _rec.output, _rec.perf_json, _rec.cost_json
+    ]
+
+    schema_ = records_schema()
+
+    while True:
+        stmt = select(*columns).where(_after(_rec.ts, _rec.record_id, after))
+        if app_ids:
+            stmt = stmt.where(_rec.app_id.in_(app_ids))
+        stmt = stmt.order_by(_rec.ts, _rec.record_id).limit(chunk_size)
+
+        with db.Session.begin() as session:
+            rows = session.execute(stmt).all()
+
+        if len(rows) == 0:
+            return
+
+        values = [
+            dict(
+                record_id=row.record_id,
+                app_id=row.app_id,
+                ts=datetime.fromtimestamp(row.ts),
+                tags=row.tags,
+                input=row.input,
+                output=row.output,
+                **_perf_columns(row.perf_json),
+                **_cost_columns(row.cost_json)
+            ) for row in rows
+        ]
+        recent = {
+            row.record_id: (row.ts, _digest(vals))
+            for row, vals in zip(rows, values)
+        }
+        recent = {
+            _id: version
+            for _id, version in recent.items()
+            if exported.get(_id, (None, None))[1] != version[1]
+        }
+
+        table = pa.Table.from_pylist(
+            [vals for vals in values if vals["record_id"] in recent],
+            schema=schema_
+        )
+
+        after = (rows[-1].ts, rows[-1].record_id)
+
+        yield table, after, recent
+
+        if len(rows) < chunk_size:
+            return
+
+
+def iter_feedbacks(
+    db: SqlAlchemyDB,
+    app_ids: Optional[Sequence[str]] = None,
+    after: Optional[Position] = None,
+    chunk_size: int = 1000,
+    exported: Optional[Recent] = None
+) -> Iterator[Tuple['pa.Table', Position, Recent]]:
+    """
+    Produce tables of at most `chunk_size` feedback results of records of the
+    given apps (all if None) following `after`, in order of `last_ts`, each
+    along with the position of the last result read and the timestamps and
+    digests of its results. Results in `exported` are left out unless they
+    changed since.
+    """
+
+    exported = exported or dict()
+
+    _fr = orm.FeedbackResult
+    _rec = orm.Record
+    columns = [
+        _fr.feedback_result_id, _fr.record_id, _rec.app_id,
+        _fr.feedback_definition_id, _fr.name, _fr.status, _fr.result, _fr.error,
+        _fr.last_ts, _fr.cost_json
+    ]
+
+    schema_ = feedbacks_schema()
+
+    while True:
+        stmt = select(*columns
+                     ).join(_rec, _rec.record_id == _fr.record_id).where(
+                         _after(_fr.last_ts, _fr.feedback_result_id, after)
+                     )
+        if app_ids:
+            stmt = stmt.where(_rec.app_id.in_(app_ids))
+        stmt = stmt.order_by(_fr.last_ts,
+                             _fr.feedback_result_id).limit(chunk_size)
+
+        with db.Session.begin() as session:
+            rows = session.execute(stmt).all()
+
+        if len(rows) == 0:
+            return
+
+        values = [
+            dict(
+                feedback_result_id=row.feedback_result_id,
+                record_id=row.record_id,
+                app_id=row.app_id,
+                feedback_definition_id=row.feedback_definition_id,
+                name=row.name,
+                status=row.status,
+                result=row.result,
+                error=row.error,
+                last_ts=datetime.fromtimestamp(row.last_ts),
+                **_cost_columns(row.cost_json)
+            ) for row in rows
+        ]
+        recent = {
+            row.feedback_result_id: (row.last_ts, _digest(vals))
+            for row, vals in zip(rows, values)
+        }
+        recent = {
+            _id: version
+            for _id, version in recent.items()
+            if exported.get(_id, (None, None))[1] != version[1]
+        }
+
+        table = pa.Table.from_pylist(
+            [vals for vals in values if vals["feedback_result_id"] in recent],
+            schema=schema_
+        )
+
+        after = (rows[-1].last_ts, rows[-1].feedback_result_id)
+
+        yield table, after, recent
+
+        if len(rows) < chunk_size:
+            return
+
+
+class _Writer():
+    """
+    Writes tables to a file of the given format, creating it upon the first
+    table.
+    """
+
+    def __init__(self, path: Path, format: ExportFormat, schema: 'pa.Schema'):
+        self.path = path
+        self.format = format
+        self.schema = schema
+        self.writer = None
+        self.rows = 0
+
+    def write(self, table: 'pa.Table') -> None:
+        if self.writer is None:
+            if self.format == ExportFormat.PARQUET:
+                self.writer = pyarrow.parquet.ParquetWriter(
+                    self.path, self.schema
+                )
+            else:
+                self.writer = pyarrow.ipc.new_file(self.path, self.schema)
+
+        self.writer.write_table(table)
+        self.rows += table.num_rows
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+
+def _rewind(position: Optional[Position],
+            overlap_seconds: float) -> Optional[Position]:
+    """
+    Position `overlap_seconds` before `position`, ahead of any row with that
+    timestamp.
+    """
+
+    if position is None:
+        return None
+
+    return (position[0] - overlap_seconds, "")
+
+
+def _export(
+    tables: Iterator[Tuple['pa.Table', Position, Recent]], writer: _Writer,
+    position: Optional[Position], recent: Recent, overlap_seconds: float
+) -> Tuple[Optional[Position], Recent]:
+    recent = dict(recent)
+
+    try:
+        for table, after, exported in tables:
+            if table.num_rows > 0:
+                writer.write(table)
+            recent.update(exported)
+            position = max(position, after) if position is not None else after
+    finally:
+        writer.close()
+
+    if position is None:
+        return None, dict()
+
+    # Only rows within the overlap window are looked at again.
+    recent = {
+        _id: version
+        for _id, version in recent.items()
+        if version[0] >= position[0] - overlap_seconds
+    }
+
+    return position, recent
+
+
+def export_records_and_feedback(
+    db: SqlAlchemyDB,
+    directory: Union[str, Path],
+    app_ids: Optional[Sequence[str]] = None,
+    format: ExportFormat = ExportFormat.PARQUET,
+    chunk_size: int = 1000,
+    incremental: bool = True,
+    overlap_seconds: float = 300.0
+) -> ExportWatermark:
+    """
+    Export records and feedback results of the given apps (all if None) from
+    `db` to files in `directory`, `chunk_size` rows at a time.
+
+    If `incremental`, only rows that come after the watermark of a previous
+    export to `directory` are exported, along with rows of the last
+    `overlap_seconds` before it that were written late or replaced since the
+    previous export. Otherwise all rows are exported again. Feedback results
+    are exported again whenever they are updated (for example once evaluated)
+    so the latest version of each is the one with the highest `last_ts`, as
+    are records replaced within `overlap_seconds` of their `ts`; rows written
+    later than that after their timestamps are missed by incremental exports.
+
+    Each export adds a "records-<n>" and a "feedbacks-<n>" file, unless there
+    is nothing new to export, and returns the updated watermark.
+    """
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    format = ExportFormat(format)
+    app_ids = sorted(app_ids) if app_ids else None
+
+    watermark = ExportWatermark.load(directory)
+
+    if watermark is None:
+        watermark = ExportWatermark(app_ids=app_ids)
+
+    elif not incremental:
+        # Start over but keep numbering files after the existing ones.
+        watermark = ExportWatermark(app_ids=app_ids, parts=watermark.parts)
+
+    elif watermark.app_ids != app_ids:
+        raise ValueError(
+            f"{directory} holds an export of apps {watermark.app_ids}, "
+            f"cannot continue it with apps {app_ids}."
+        )
+
+    part = watermark.parts + 1
+
+    records_writer = _Writer(
+        directory / f"records-{part:05d}.{format.value}", format,
+        records_schema()
+    )
+    records, recent_records = _export(
+        iter_records(
+            db,
+            app_ids=app_ids,
+            after=_rewind(watermark.records, overlap_seconds),
+            chunk_size=chunk_size,
+            exported=watermark.recent_records
+        ), records_writer, watermark.records, watermark.recent_records,
+        overlap_seconds
+    )
+
+    feedbacks_writer = _Writer(
+        directory / f"feedbacks-{part:05d}.{format.value}", format,
+        feedbacks_schema()
+    )
+    feedbacks, recent_feedbacks = _export(
+        iter_feedbacks(
+            db,
+            app_ids=app_ids,
+            after=_rewind(watermark.feedbacks, overlap_seconds),
+            chunk_size=chunk_size,
+            exported=watermark.recent_feedbacks
+        ), feedbacks_writer, watermark.feedbacks, watermark.recent_feedbacks,
+        overlap_seconds
+    )
+
+    logger.info(
+        f"Exported {records_writer.rows} record(s) and "
+        f"{feedbacks_writer.rows} feedback result(s) to {directory}."
+    )
+
+    watermark = ExportWatermark(
+        app_ids=app_ids,
+        records=records,
+        recent_records=recent_records,
+        feedbacks=feedbacks,
+        recent_feedbacks=recent_feedbacks,
+        parts=part
+        if records_writer.rows + feedbacks_writer.rows > 0 else watermark.parts
+    )
+    watermark.save(directory)
+
+    return watermark
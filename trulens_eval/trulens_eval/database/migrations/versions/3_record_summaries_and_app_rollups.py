@@ -0,0 +1,122 @@
+"""record summaries and app rollups
+
+Revision ID: 3
+Revises: 2
+Create Date: 2023-09-21 16:45:03.118240
+
+"""
+from datetime import datetime
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '3'
+down_revision = '2'
+branch_labels = None
+depends_on = None
+
+# Number of records summarized at a time.
+BATCH_SIZE = 1000
+
+records = sa.table(
+    'records',
+    sa.column('record_id', sa.VARCHAR(length=256)),
+    sa.column('cost_json', sa.Text()),
+    sa.column('perf_json', sa.Text()),
+    sa.column('latency', sa.Float()),
+    sa.column('total_tokens', sa.Integer()),
+    sa.column('total_cost', sa.Float()),
+)
+
+
+def _summary(cost_json: str, perf_json: str) -> dict:
+    try:
+        cost = json.loads(cost_json) or {}
+    except ValueError:  # e.g. MIGRATION_UNKNOWN_STR of legacy databases
+        cost = {}
+
+    try:
+        perf = json.loads(perf_json) or {}
+        latency = (
+            datetime.fromisoformat(perf['end_time']) -
+            datetime.fromisoformat(perf['start_time'])
+        ).total_seconds()
+    except (ValueError, KeyError, TypeError):
+        latency = None
+
+    return dict(
+        latency=latency,
+        total_tokens=cost.get('n_tokens'),
+        total_cost=cost.get('cost')
+    )
+
+
+def _summarize_records() -> None:
+    conn = op.get_bind()
+
+    after = ""
+    while True:
+        rows = conn.execute(
+            sa.select(
+                records.c.record_id, records.c.cost_json, records.c.perf_json
+            ).where(records.c.record_id > after).order_by(records.c.record_id
+                                                         ).limit(BATCH_SIZE)
+        ).all()
+
+        if len(rows) == 0:
+            return
+
+        conn.execute(
+            records.update().where(
+                records.c.record_id == sa.bindparam('_record_id')
+            ), [
+                dict(
+                    _record_id=row.record_id,
+                    **_summary(row.cost_json, row.perf_json)
+                ) for row in rows
+            ]
+        )
+
+        after = rows[-1].record_id
+
+
+def upgrade() -> None:
+    op.add_column('records', sa.Column('latency', sa.Float(), nullable=True))
+    op.add_column(
+        'records', sa.Column('total_tokens', sa.Integer(), nullable=True)
+    )
+    op.add_column('records', sa.Column('total_cost', sa.Float(), nullable=True))
+    op.create_table(
+        'app_rollups',
+        sa.Column('app_id', sa.VARCHAR(length=256), nullable=False),
+        sa.Column('records', sa.Integer(), nullable=False),
+        sa.Column('latency_count', sa.Integer(), nullable=False),
+        sa.Column('latency_sum', sa.Float(), nullable=False),
+        sa.Column('total_tokens', sa.Integer(), nullable=False),
+        sa.Column('total_cost', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('app_id')
+    )
+
+    _summarize_records()
+
+    op.execute(
+        """
+        INSERT INTO app_rollups (app_id, records, latency_count, latency_sum,
+            total_tokens, total_cost)
+        SELECT a.app_id, COUNT(r.record_id), COUNT(r.latency),
+            COALESCE(SUM(r.latency), 0), COALESCE(SUM(r.total_tokens), 0),
+            COALESCE(SUM(r.total_cost), 0)
+        FROM apps a LEFT JOIN records r ON r.app_id = a.app_id
+        GROUP BY a.app_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('app_rollups')
+    with op.batch_alter_table('records') as batch_op:
+        batch_op.drop_column('total_cost')
+        batch_op.drop_column('total_tokens')
+        batch_op.drop_column('latency')
@@ -0,0 +1,90 @@
+"""feedback rollups
+
+Revision ID: 4
+Revises: 3
+Create Date: 2023-09-26 11:20:47.602315
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '4'
+down_revision = '3'
+branch_labels = None
+depends_on = None
+
+# Length of time buckets, as of `FeedbackRollup.BUCKET_SECONDS` at this
+# revision.
+BUCKET_SECONDS = 3600
+
+# Number of feedback results read at a time.
+BATCH_SIZE = 1000
+
+records = sa.table(
+    'records',
+    sa.column('record_id', sa.VARCHAR(length=256)),
+    sa.column('app_id', sa.VARCHAR(length=256)),
+    sa.column('ts', sa.Float()),
+)
+
+feedbacks = sa.table(
+    'feedbacks',
+    sa.column('record_id', sa.VARCHAR(length=256)),
+    sa.column('name', sa.Text()),
+    sa.column('result', sa.Float()),
+)
+
+
+def _roll_up_feedbacks(table: sa.Table) -> None:
+    conn = op.get_bind()
+
+    rollups = {}
+    rows = conn.execution_options(yield_per=BATCH_SIZE).execute(
+        sa.select(
+            records.c.app_id, feedbacks.c.name, records.c.ts, feedbacks.c.result
+        ).join(records, records.c.record_id == feedbacks.c.record_id).where(
+            feedbacks.c.result.is_not(None)
+        )
+    )
+    for app_id, name, ts, result in rows:
+        key = (app_id, name, ts // BUCKET_SECONDS * BUCKET_SECONDS)
+        if key not in rollups:
+            rollups[key] = dict(
+                count=0, sum=0.0, sum_squares=0.0, min=result, max=result
+            )
+        rollup = rollups[key]
+        rollup['count'] += 1
+        rollup['sum'] += result
+        rollup['sum_squares'] += result * result
+        rollup['min'] = min(rollup['min'], result)
+        rollup['max'] = max(rollup['max'], result)
+
+    if len(rollups) > 0:
+        op.bulk_insert(
+            table, [
+                dict(app_id=app_id, name=name, bucket=bucket, **rollup)
+                for (app_id, name, bucket), rollup in rollups.items()
+            ]
+        )
+
+
+def upgrade() -> None:
+    table = op.create_table(
+        'feedback_rollups',
+        sa.Column('app_id', sa.VARCHAR(length=256), nullable=False),
+        sa.Column('name', sa.VARCHAR(length=256), nullable=False),
+        sa.Column('bucket', sa.Float(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('sum', sa.Float(), nullable=False),
+        sa.Column('sum_squares', sa.Float(), nullable=False),
+        sa.Column('min', sa.Float(), nullable=True),
+        sa.Column('max', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('app_id', 'name', 'bucket')
+    )
+
+    _roll_up_feedbacks(table)
+
+
+def downgrade() -> None:
+    op.drop_table('feedback_rollups')
@@ -0,0 +1,175 @@
+"""record calls blobs
+
+Revision ID: 5
+Revises: 4
+Create Date: 2023-10-03 09:12:54.830117
+
+"""
+import hashlib
+import json
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision = '5'
+down_revision = '4'
+branch_labels = None
+depends_on = None
+
+# Number of records moved at a time.
+BATCH_SIZE = 200
+
+records = sa.table(
+    'records',
+    sa.column('record_id', sa.VARCHAR(length=256)),
+    sa.column('record_json', sa.Text()),
+    sa.column('calls_blob_id', sa.VARCHAR(length=64)),
+)
+
+blobs = sa.table(
+    'blobs',
+    sa.column('blob_id', sa.VARCHAR(length=64)),
+    sa.column('encoding', sa.VARCHAR(length=16)),
+    sa.column('data', sa.LargeBinary()),
+)
+
+
+def _split_calls(record_json: str):
+    """
+    Json of a record without its calls and json of its calls, or None if the
+    record has no calls to split out.
+    """
+
+    try:
+        record = json.loads(record_json)
+    except ValueError:
+        return None
+
+    if not isinstance(record, dict) or 'calls' not in record:
+        return None
+
+    calls = record.pop('calls')
+
+    return json.dumps(record), json.dumps(dict(calls=calls))
+
+
+def _move_calls_to_blobs() -> None:
+    conn = op.get_bind()
+
+    stored = set()
+    after = ""
+    while True:
+        rows = conn.execute(
+            sa.select(records.c.record_id, records.c.record_json).where(
+                records.c.record_id > after, records.c.calls_blob_id.is_(None)
+            ).order_by(records.c.record_id).limit(BATCH_SIZE)
+        ).all()
+
+        if len(rows) == 0:
+            return
+
+        updates = []
+        new_blobs = []
+        for row in rows:
+            split = _split_calls(row.record_json)
+            if split is None:
+                continue
+
+            record_json, calls_json = split
+            blob_id = hashlib.sha256(calls_json.encode()).hexdigest()
+            if blob_id not in stored:
+                stored.add(blob_id)
+                new_blobs.append(
+                    dict(
+                        blob_id=blob_id,
+                        encoding='zlib',
+                        data=zlib.compress(calls_json.encode())
+                    )
+                )
+            updates.append(
+                dict(
+                    _record_id=row.record_id,
+                    record_json=record_json,
+                    calls_blob_id=blob_id
+                )
+            )
+
+        if len(new_blobs) > 0:
+            conn.execute(blobs.insert(), new_blobs)
+        if len(updates) > 0:
+            conn.execute(
+                records.update().where(
+                    records.c.record_id == sa.bindparam('_record_id')
+                ), updates
+            )
+
+        after = rows[-1].record_id
+
+
+def _move_calls_to_records() -> None:
+    conn = op.get_bind()
+
+    after = ""
+    while True:
+        rows = conn.execute(
+            sa.select(
+                records.c.record_id, records.c.record_json, blobs.c.encoding,
+                blobs.c.data
+            ).join(blobs, blobs.c.blob_id == records.c.calls_blob_id).where(
+                records.c.record_id > after
+            ).order_by(records.c.record_id).limit(BATCH_SIZE)
+        ).all()
+
+        if len(rows) == 0:
+            return
+
+        updates = []
+        for row in rows:
+            if row.encoding != 'zlib':
+                raise RuntimeError(
+                    f"Cannot downgrade records with {row.encoding} blobs."
+                )
+            calls_json = zlib.decompress(row.data).decode()
+            updates.append(
+                dict(
+                    _record_id=row.record_id,
+                    record_json=row.record_json[:-1] + ", " + calls_json[1:]
+                )
+            )
+
+        conn.execute(
+            records.update().where(
+                records.c.record_id == sa.bindparam('_record_id')
+            ), updates
+        )
+
+        after = rows[-1].record_id
+
+
+def upgrade() -> None:
+    op.create_table(
+        'blobs', sa.Column('blob_id', sa.VARCHAR(length=64), nullable=False),
+        sa.Column('encoding', sa.VARCHAR(length=16), nullable=False),
+        sa.Column(
+            'data',
+            sa.LargeBinary().with_variant(mysql.LONGBLOB(), 'mysql'),
+            nullable=False
+        ), sa.PrimaryKeyConstraint('blob_id')
+    )
+    op.add_column(
+        'records',
+        sa.Column('calls_blob_id', sa.VARCHAR(length=64), nullable=True)
+    )
+
+    _move_calls_to_blobs()
+
+
+def downgrade() -> None:
+    _move_calls_to_records()
+
+    with op.batch_alter_table('records') as batch_op:
+        batch_op.drop_column('calls_blob_id')
+    op.drop_table('blobs')
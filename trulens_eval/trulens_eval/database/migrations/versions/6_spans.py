@@ -0,0 +1,47 @@
+"""spans
+
+Revision ID: 6
+Revises: 5
+Create Date: 2023-10-05 14:31:08.271904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '6'
+down_revision = '5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'records', sa.Column('time_to_first_token', sa.Float(), nullable=True)
+    )
+    op.create_table(
+        'spans', sa.Column('record_id', sa.VARCHAR(length=256), nullable=False),
+        sa.Column('call_index', sa.Integer(), nullable=False),
+        sa.Column('app_id', sa.VARCHAR(length=256), nullable=False),
+        sa.Column('path', sa.VARCHAR(length=256), nullable=False),
+        sa.Column('method', sa.VARCHAR(length=256), nullable=False),
+        sa.Column('ts', sa.Float(), nullable=False),
+        sa.Column('latency', sa.Float(), nullable=False),
+        sa.Column('queue_wait', sa.Float(), nullable=True),
+        sa.Column('self_time', sa.Float(), nullable=True),
+        sa.Column('child_time', sa.Float(), nullable=True),
+        sa.Column('time_to_first_token', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('record_id', 'call_index')
+    )
+    op.create_index(
+        'ix_spans_app_id_path_ts',
+        'spans', ['app_id', 'path', 'ts'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_spans_app_id_path_ts', table_name='spans')
+    op.drop_table('spans')
+    with op.batch_alter_table('records') as batch_op:
+        batch_op.drop_column('time_to_first_token')
@@ -0,0 +1,27 @@
+"""feedback lease tokens
+
+Revision ID: 7
+Revises: 6
+Create Date: 2023-10-09 11:12:40.518230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '7'
+down_revision = '6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'feedbacks',
+        sa.Column('lease_token', sa.VARCHAR(length=64), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('feedbacks') as batch_op:
+        batch_op.drop_column('lease_token')
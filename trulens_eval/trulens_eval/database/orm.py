@@ -1,23 +1,34 @@
+from datetime import timedelta
 from sqlite3 import Connection as SQLite3Connection
+from typing import List, Optional, Union
 
 from sqlalchemy import Column
 from sqlalchemy import Engine
 from sqlalchemy import event
 from sqlalchemy import Float
+from sqlalchemy import Index
+from sqlalchemy import Integer
+from sqlalchemy import LargeBinary
 from sqlalchemy import Text
 from sqlalchemy import VARCHAR
+from sqlalchemy.dialects import mysql
 from sqlalchemy.orm import backref
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import relationship
 
 from trulens_eval import schema
+from trulens_eval.database.blobs import BlobEncoding
+from trulens_eval.database.blobs import decompress
 from trulens_eval.util import json_str_of_obj
+from trulens_eval.util import JSONPath
 
 Base = declarative_base()
 
 TYPE_JSON = Text
 TYPE_TIMESTAMP = Float
 TYPE_ENUM = Text
+# BLOB of MySQL is limited to 64KB.
+TYPE_BLOB = LargeBinary().with_variant(mysql.LONGBLOB(), "mysql")
 
 
 class AppDefinition(Base):
@@ -47,8 +58,25 @@ class FeedbackDefinition(Base):
         )
 
 
+class Blob(Base):
+    """
+    Compressed value identified by the hash of its content (see
+    `database/blobs.py`).
+    """
+
+    __tablename__ = "blobs"
+
+    blob_id = Column(VARCHAR(64), nullable=False, primary_key=True)
+    encoding = Column(VARCHAR(16), nullable=False)
+    data = Column(TYPE_BLOB, nullable=False)
+
+    def content(self) -> str:
+        return decompress(self.data, BlobEncoding(self.encoding))
+
+
 class Record(Base):
     __tablename__ = "records"
+    __table_args__ = (Index("ix_records_app_id_ts", "app_id", "ts"),)
 
     record_id = Column(VARCHAR(256), nullable=False, primary_key=True)
     app_id = Column(VARCHAR(256), nullable=False)
@@ -60,6 +88,19 @@ class Record(Base):
     cost_json = Column(TYPE_JSON, nullable=False)
     perf_json = Column(TYPE_JSON, nullable=False)
 
+    # Columns holding durations, for `get_latency_percentiles`.
+    DURATIONS = ("latency", "time_to_first_token")
+
+    # Summaries of `perf_json` and `cost_json` for aggregation in queries.
+    latency = Column(Float)  # seconds
+    total_tokens = Column(Integer)
+    total_cost = Column(Float)
+    time_to_first_token = Column(Float)  # seconds, if streamed
+
+    # Blob of the calls of the record, which are then left out of
+    # `record_json`. Calls are in `record_json` if None.
+    calls_blob_id = Column(VARCHAR(64))
+
     app = relationship(
         'AppDefinition',
         backref=backref('records', cascade="all,delete"),
@@ -67,29 +108,204 @@ class Record(Base):
         foreign_keys=[app_id],
     )
 
+    calls_blob = relationship(
+        'Blob',
+        primaryjoin='Blob.blob_id == Record.calls_blob_id',
+        foreign_keys=[calls_blob_id],
+    )
+
+    @staticmethod
+    def calls_json(obj: schema.Record) -> str:
+        """
+        Json of the calls of a record, to be stored in a blob.
+        """
+
+        return json_str_of_obj(obj, include={"calls"})
+
+    @staticmethod
+    def with_calls(record_json: str, calls_json: Optional[str]) -> str:
+        """
+        Json of a record stored without its calls, with the json of its calls
+        put back as produced by `calls_json`.
+        """
+
+        if calls_json is None:
+            return record_json
+
+        # Calls are the last field of records so this is the same as the json
+        # of the whole record.
+        return record_json[:-1] + ", " + calls_json[1:]
+
+    def full_record_json(self) -> str:
+        """
+        Json of the record including its calls.
+        """
+
+        return self.with_calls(
+            self.record_json,
+            self.calls_blob.content() if self.calls_blob_id else None
+        )
+
     @classmethod
-    def parse(cls, obj: schema.Record) -> "Record":
+    def parse(
+        cls,
+        obj: schema.Record,
+        calls_blob_id: Optional[str] = None
+    ) -> "Record":
+        """
+        If `calls_blob_id` is given, the calls of the record are not included
+        in `record_json` but are expected to be stored in that blob.
+        """
+
         return cls(
             record_id=obj.record_id,
             app_id=obj.app_id,
             input=json_str_of_obj(obj.main_input),
             output=json_str_of_obj(obj.main_output),
-            record_json=json_str_of_obj(obj),
+            record_json=json_str_of_obj(obj, exclude={"calls"})
+            if calls_blob_id else json_str_of_obj(obj),
+            calls_blob_id=calls_blob_id,
             tags=obj.tags,
             ts=obj.ts.timestamp(),
             cost_json=json_str_of_obj(obj.cost),
             perf_json=json_str_of_obj(obj.perf),
+            latency=obj.perf.latency.total_seconds()
+            if obj.perf is not None else None,
+            total_tokens=obj.cost.n_tokens if obj.cost is not None else None,
+            total_cost=obj.cost.cost if obj.cost is not None else None,
+            time_to_first_token=_seconds(obj.perf.time_to_first_token)
+            if obj.perf is not None else None,
         )
 
 
+class Span(Base):
+    """
+    Timing of a call recorded in a record (see `schema.RecordAppCall`) for
+    aggregating the latencies of app components in queries. All durations are
+    in seconds.
+    """
+
+    __tablename__ = "spans"
+    __table_args__ = (Index("ix_spans_app_id_path_ts", "app_id", "path", "ts"),)
+
+    # Columns holding durations, for `get_latency_percentiles`.
+    DURATIONS = (
+        "latency", "queue_wait", "self_time", "child_time",
+        "time_to_first_token"
+    )
+
+    record_id = Column(VARCHAR(256), nullable=False, primary_key=True)
+    # Position of the call in the calls of its record.
+    call_index = Column(Integer, nullable=False, primary_key=True)
+    app_id = Column(VARCHAR(256), nullable=False)
+    # Path of the component making the call within its app (see
+    # `path_of`).
+    path = Column(VARCHAR(256), nullable=False)
+    method = Column(VARCHAR(256), nullable=False)
+    ts = Column(TYPE_TIMESTAMP, nullable=False)  # start of the call
+    latency = Column(Float, nullable=False)
+    queue_wait = Column(Float)
+    self_time = Column(Float)
+    child_time = Column(Float)
+    time_to_first_token = Column(Float)
+
+    record = relationship(
+        'Record',
+        backref=backref('spans', cascade="all,delete"),
+        primaryjoin='Record.record_id == Span.record_id',
+        foreign_keys=[record_id]
+    )
+
+    @staticmethod
+    def path_of(path: Union[str, JSONPath]) -> str:
+        """
+        Stored path of an app component given as a query for records or apps
+        (like `Select.RecordCalls.retriever` or `Select.App.app.retriever`),
+        relative to the app (like `JSONPath().app.retriever`) or as stored.
+        """
+
+        if isinstance(path, str):
+            return path
+
+        if len(path) > 0 and path.path[0] in (schema.Select.Record.path[0],
+                                              schema.Select.App.path[0]):
+            path = JSONPath(path=path.path[1:])
+
+        return str(path)
+
+    @classmethod
+    def parse_calls(cls, obj: schema.Record) -> List["Span"]:
+        return [
+            cls(
+                record_id=obj.record_id,
+                call_index=index,
+                app_id=obj.app_id,
+                path=cls.path_of(call.top().path),
+                method=call.method().name,
+                ts=call.perf.start_time.timestamp(),
+                latency=call.perf.latency.total_seconds(),
+                queue_wait=_seconds(call.perf.queue_wait),
+                self_time=call.perf.self_time.total_seconds()
+                if call.perf.child_time is not None else None,
+                child_time=_seconds(call.perf.child_time),
+                time_to_first_token=_seconds(call.perf.time_to_first_token)
+            )
+            for index, call in enumerate(obj.calls)
+            if call.perf is not None and len(call.stack) > 0
+        ]
+
+
+class AppRollup(Base):
+    """
+    Running totals of the records of an app, updated as records are inserted
+    so that app summaries do not need to scan records.
+    """
+
+    __tablename__ = "app_rollups"
+
+    app_id = Column(VARCHAR(256), nullable=False, primary_key=True)
+    records = Column(Integer, nullable=False, default=0)
+    latency_count = Column(Integer, nullable=False, default=0)
+    latency_sum = Column(Float, nullable=False, default=0.0)
+    total_tokens = Column(Integer, nullable=False, default=0)
+    total_cost = Column(Float, nullable=False, default=0.0)
+
+
+class FeedbackRollup(Base):
+    """
+    Running aggregates of the results of a feedback function on the records of
+    an app timestamped within a time bucket, updated as feedback results are
+    inserted.
+    """
+
+    __tablename__ = "feedback_rollups"
+
+    # Length of time buckets.
+    BUCKET_SECONDS = 3600
+
+    app_id = Column(VARCHAR(256), nullable=False, primary_key=True)
+    name = Column(VARCHAR(256), nullable=False, primary_key=True)
+    # Start of the bucket.
+    bucket = Column(TYPE_TIMESTAMP, nullable=False, primary_key=True)
+    count = Column(Integer, nullable=False)
+    sum = Column(Float, nullable=False)
+    sum_squares = Column(Float, nullable=False)
+    min = Column(Float)
+    max = Column(Float)
+
+    @classmethod
+    def bucket_of(cls, ts: float) -> float:
+        return float(ts // cls.BUCKET_SECONDS * cls.BUCKET_SECONDS)
+
+
 class FeedbackResult(Base):
     __tablename__ = "feedbacks"
 
     feedback_result_id = Column(VARCHAR(256), nullable=False, primary_key=True)
-    record_id = Column(VARCHAR(256), nullable=False)
-    feedback_definition_id = Column(VARCHAR(256), nullable=True)
-    last_ts = Column(TYPE_TIMESTAMP, nullable=False)
-    status = Column(TYPE_ENUM, nullable=False)
+    record_id = Column(VARCHAR(256), nullable=False, index=True)
+    feedback_definition_id = Column(VARCHAR(256), nullable=True, index=True)
+    last_ts = Column(TYPE_TIMESTAMP, nullable=False, index=True)
+    status = Column(TYPE_ENUM, nullable=False, index=True)
     error = Column(Text)
     calls_json = Column(TYPE_JSON, nullable=False)
     result = Column(Float)
@@ -97,6 +313,11 @@ class FeedbackResult(Base):
     cost_json = Column(TYPE_JSON, nullable=False)
     multi_result = Column(TYPE_JSON)
 
+    # Token of whoever last claimed the result with `claim_pending_feedback`.
+    # Writes of results made under a lease only go through while the lease is
+    # still theirs.
+    lease_token = Column(VARCHAR(64))
+
     record = relationship(
         'Record',
         backref=backref('feedback_results', cascade="all,delete"),
@@ -129,6 +350,10 @@ class FeedbackResult(Base):
         )
 
 
+def _seconds(duration: Optional[timedelta]) -> Optional[float]:
+    return duration.total_seconds() if duration is not None else None
+
+
 @event.listens_for(Engine, "connect")
 def _set_sqlite_pragma(dbapi_connection, _):
     if isinstance(dbapi_connection, SQLite3Connection):
@@ -1,20 +1,43 @@
 from collections import defaultdict
 from datetime import datetime
+from datetime import timedelta
+from itertools import groupby
 import json
 import logging
-from typing import Any, Iterable, List, Optional, Sequence, Tuple, Union
+import math
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import uuid
 import warnings
 
 import numpy as np
 import pandas as pd
 from pydantic import Field
+from sqlalchemy import and_
 from sqlalchemy import create_engine
+from sqlalchemy import delete
 from sqlalchemy import Engine
+from sqlalchemy import func
+from sqlalchemy import insert
+from sqlalchemy import inspect as sql_inspect
+from sqlalchemy import literal
+from sqlalchemy import or_
+from sqlalchemy import Row
 from sqlalchemy import select
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import Session
 from sqlalchemy.orm import sessionmaker
 
 from trulens_eval import schema
 from trulens_eval.database import orm
+from trulens_eval.database.blobs import blob_id_of
+from trulens_eval.database.blobs import blob_refs
+from trulens_eval.database.blobs import BlobEncoding
+from trulens_eval.database.blobs import compress
+from trulens_eval.database.blobs import decompress
+from trulens_eval.database.blobs import externalize
+from trulens_eval.database.blobs import rehydrate
 from trulens_eval.database.migrations import upgrade_db
 from trulens_eval.database.orm import AppDefinition
 from trulens_eval.database.orm import FeedbackDefinition
@@ -26,16 +49,26 @@ from trulens_eval.database.utils import is_legacy_sqlite
 from trulens_eval.database.utils import is_memory_sqlite
 from trulens_eval.database.utils import migrate_legacy_sqlite
 from trulens_eval.database.utils import run_before
+from trulens_eval.db import app_summaries_df
 from trulens_eval.db import DB
+from trulens_eval.db import records_columns
+from trulens_eval.db import stored_columns
 from trulens_eval.db_migration import MIGRATION_UNKNOWN_STR
 from trulens_eval.schema import FeedbackDefinitionID
 from trulens_eval.schema import FeedbackResultID
 from trulens_eval.schema import FeedbackResultStatus
 from trulens_eval.schema import RecordID
+from trulens_eval.util import BLOB
 from trulens_eval.util import JSON
+from trulens_eval.util import json_default
+from trulens_eval.util import JSONPath
+from trulens_eval.utils import metrics
 
 logger = logging.getLogger(__name__)
 
+# App id, feedback name and bucket of a feedback rollup.
+RollupKey = Tuple[str, str, float]
+
 
 @for_all_methods(
     run_before(lambda self, *args, **kwargs: check_db_revision(self.engine)),
@@ -44,6 +77,28 @@ logger = logging.getLogger(__name__)
 class SqlAlchemyDB(DB):
     engine_params: dict = Field(default_factory=dict)
     session_params: dict = Field(default_factory=dict)
+
+    # Whether to keep the `app_rollups` and `feedback_rollups` tables up to
+    # date as records and feedback results are inserted and summarize apps
+    # from them. Otherwise apps are summarized from their records. Rollups
+    # need to be rebuilt (see `rebuild_rollups`) after inserts with this
+    # disabled.
+    rollups: bool = True
+
+    # Whether to store the timing of each call of records in the `spans` table
+    # as records are inserted, for `get_latency_percentiles` of app
+    # components.
+    spans: bool = True
+
+    # Compression of the calls of records, which are stored apart from the
+    # rest of records (see `database/blobs.py`).
+    blob_encoding: BlobEncoding = BlobEncoding.ZLIB
+
+    # Strings in the calls of records longer than this many characters are
+    # stored as blobs of their own, once for all the records they are in. Not
+    # done if None.
+    blob_threshold: Optional[int] = 1024
+
     engine: Engine = None
     Session: sessionmaker = None
 
@@ -87,12 +142,386 @@ class SqlAlchemyDB(DB):
             deleted += session.query(FeedbackDefinition).delete()
             deleted += session.query(Record).delete()
             deleted += session.query(FeedbackResult).delete()
+            session.query(orm.AppRollup).delete()
+            session.query(orm.FeedbackRollup).delete()
+            session.query(orm.Span).delete()
 
         print(f"Deleted {deleted} rows.")
 
+    def rebuild_rollups(self, chunk_size: int = 1000) -> None:
+        """
+        Recompute the `app_rollups` table from the records and the
+        `feedback_rollups` table from the feedback results, read `chunk_size`
+        at a time.
+        """
+
+        _rec = orm.Record
+        _roll = orm.AppRollup
+
+        totals = select(
+            orm.AppDefinition.app_id,
+            func.count(_rec.record_id),
+            func.count(_rec.latency),
+            func.coalesce(func.sum(_rec.latency), 0.0),
+            func.coalesce(func.sum(_rec.total_tokens), 0),
+            func.coalesce(func.sum(_rec.total_cost), 0.0),
+        ).outerjoin(_rec, _rec.app_id == orm.AppDefinition.app_id).group_by(
+            orm.AppDefinition.app_id
+        )
+
+        with self.Session.begin() as session:
+            session.query(_roll).delete()
+            session.execute(
+                insert(_roll).from_select(
+                    [
+                        "app_id", "records", "latency_count", "latency_sum",
+                        "total_tokens", "total_cost"
+                    ], totals
+                )
+            )
+
+        _fr = orm.FeedbackResult
+        _froll = orm.FeedbackRollup
+
+        moments = defaultdict(_Moments)
+        with self.Session.begin() as session:
+            rows = session.execute(
+                select(_rec.app_id, _fr.name, _rec.ts,
+                       _fr.result).join(_rec,
+                                        _rec.record_id == _fr.record_id).where(
+                                            _fr.result.is_not(None)
+                                        ),
+                execution_options=dict(yield_per=chunk_size)
+            )
+            for app_id, name, ts, result in rows:
+                moments[(app_id, name, _froll.bucket_of(ts))].add(result)
+
+        with self.Session.begin() as session:
+            session.query(_froll).delete()
+            session.add_all(
+                _froll(app_id=app_id, name=name, bucket=bucket, **m.values())
+                for (app_id, name, bucket), m in moments.items()
+            )
+
+    def _update_rollups(
+        self, session: Session, _recs: Sequence[orm.Record]
+    ) -> None:
+        """
+        Add the records `_recs` about to be upserted to the rollups of their
+        apps, replacing the existing records with the same ids.
+        """
+
+        if not self.rollups:
+            return
+
+        _rec = orm.Record
+        _roll = orm.AppRollup
+
+        deltas = defaultdict(
+            lambda: dict(
+                records=0,
+                latency_count=0,
+                latency_sum=0.0,
+                total_tokens=0,
+                total_cost=0.0
+            )
+        )
+
+        def add(app_id, latency, total_tokens, total_cost, sign):
+            delta = deltas[app_id]
+            delta["records"] += sign
+            if latency is not None:
+                delta["latency_count"] += sign
+                delta["latency_sum"] += sign * latency
+            delta["total_tokens"] += sign * (total_tokens or 0)
+            delta["total_cost"] += sign * (total_cost or 0.0)
+
+        _recs = list({_r.record_id: _r for _r in _recs}.values())
+
+        for i in range(0, len(_recs), 500):
+            replaced = session.execute(
+                select(
+                    _rec.app_id, _rec.latency, _rec.total_tokens,
+                    _rec.total_cost
+                ).where(
+                    _rec.record_id.in_(
+                        [_r.record_id for _r in _recs[i:i + 500]]
+                    )
+                )
+            )
+            for row in replaced:
+                add(*row, sign=-1)
+
+        for _r in _recs:
+            add(_r.app_id, _r.latency, _r.total_tokens, _r.total_cost, sign=1)
+
+        for app_id, delta in deltas.items():
+            updated = session.execute(
+                update(_roll).where(_roll.app_id == app_id).values(
+                    **{
+                        column: getattr(_roll, column) + value
+                        for column, value in delta.items()
+                    }
+                ).execution_options(synchronize_session=False)
+            )
+            if updated.rowcount == 0:
+                session.add(_roll(app_id=app_id, **delta))
+
+    def _feedback_rollup_changes(
+        self, session: Session, _frs: Sequence[orm.FeedbackResult]
+    ) -> Tuple[Dict[RollupKey, '_Moments'], Dict[RollupKey, '_Moments']]:
+        """
+        Results added to and removed from feedback rollups by upserting the
+        feedback results `_frs`, to be applied with `_apply_feedback_rollups`
+        once they are upserted.
+        """
+
+        added = defaultdict(_Moments)
+        removed = defaultdict(_Moments)
+
+        if not self.rollups:
+            return added, removed
+
+        _rec = orm.Record
+        _fr = orm.FeedbackResult
+        bucket_of = orm.FeedbackRollup.bucket_of
+
+        _frs = list({_f.feedback_result_id: _f for _f in _frs}.values())
+        record_ids = list(set(_f.record_id for _f in _frs))
+        records = dict()
+
+        for i in range(0, len(_frs), 500):
+            replaced = session.execute(
+                select(_rec.app_id, _fr.name, _rec.ts,
+                       _fr.result).join(_rec,
+                                        _rec.record_id == _fr.record_id).where(
+                                            _fr.feedback_result_id.in_(
+                                                [
+                                                    _f.feedback_result_id
+                                                    for _f in _frs[i:i + 500]
+                                                ]
+                                            ), _fr.result.is_not(None)
+                                        )
+            )
+            for app_id, name, ts, result in replaced:
+                removed[(app_id, name, bucket_of(ts))].add(result)
+
+        for i in range(0, len(record_ids), 500):
+            for row in session.execute(select(_rec.record_id, _rec.app_id,
+                                              _rec.ts).where(_rec.record_id.in_(
+                                                  record_ids[i:i + 500]))):
+                records[row.record_id] = row
+
+        for _f in _frs:
+            # Results of records not inserted (yet) are left for
+            # `rebuild_rollups`.
+            if _f.result is not None and _f.record_id in records:
+                record = records[_f.record_id]
+                added[(record.app_id, _f.name, bucket_of(record.ts
+                                                        ))].add(_f.result)
+
+        return added, removed
+
+    def _apply_feedback_rollups(
+        self, session: Session, added: Dict[RollupKey, '_Moments'],
+        removed: Dict[RollupKey, '_Moments']
+    ) -> None:
+        _rec = orm.Record
+        _fr = orm.FeedbackResult
+        _froll = orm.FeedbackRollup
+
+        keys = sorted(set(added) | set(removed))
+        if len(keys) == 0:
+            return
+
+        session.flush()
+
+        for app_id, name, bucket in keys:
+            # Make sure the rollup exists, even if created concurrently, then
+            # lock it.
+            session.execute(
+                _insert_ignore(session, _froll).values(
+                    app_id=app_id,
+                    name=name,
+                    bucket=bucket,
+                    **_Moments().values()
+                )
+            )
+            rollup = session.get(
+                _froll, (app_id, name, bucket),
+                with_for_update=True,
+                populate_existing=True
+            )
+
+            values = rollup_values = _Moments.of(rollup)
+            if (app_id, name, bucket) in added:
+                values = values.merge(added[(app_id, name, bucket)])
+            if (app_id, name, bucket) in removed:
+                values = values.subtract(removed[(app_id, name, bucket)])
+
+                # Removed values may have been the min or max.
+                values.min, values.max = session.execute(
+                    select(func.min(_fr.result), func.max(
+                        _fr.result
+                    )).join(_rec, _rec.record_id == _fr.record_id).where(
+                        _rec.app_id == app_id, _fr.name == name,
+                        _rec.ts >= bucket,
+                        _rec.ts < bucket + _froll.BUCKET_SECONDS
+                    )
+                ).one()
+
+            if values.count <= 0:
+                session.delete(rollup)
+            elif values is not rollup_values:
+                for column, value in values.values().items():
+                    setattr(rollup, column, value)
+
+    def _replace_spans(
+        self, session: Session, records: Sequence[schema.Record]
+    ) -> None:
+        """
+        Store the spans of the calls of `records`, replacing those of existing
+        records with the same ids.
+        """
+
+        if not self.spans:
+            return
+
+        _span = orm.Span
+
+        record_ids = list(set(record.record_id for record in records))
+        for i in range(0, len(record_ids), 500):
+            session.execute(
+                delete(_span).where(
+                    _span.record_id.in_(record_ids[i:i + 500])
+                ).execution_options(synchronize_session=False)
+            )
+
+        records = {record.record_id: record for record in records}.values()
+        session.add_all(
+            flatten(_span.parse_calls(record) for record in records)
+        )
+
+    def _parse_records(
+        self, session: Session, records: Sequence[schema.Record]
+    ) -> List[orm.Record]:
+        """
+        Parse `records` for storage with their calls in blobs, adding the blobs
+        of calls not stored yet.
+        """
+
+        _blob = orm.Blob
+
+        new = dict()
+        blob_ids = []
+        for record in records:
+            calls_json, strings = self._calls_json(record)
+            blob_id = blob_id_of(calls_json)
+            new[blob_id] = calls_json
+            new.update(strings)
+            blob_ids.append(blob_id)
+
+        keys = list(new.keys())
+        for i in range(0, len(keys), 500):
+            for blob_id in session.scalars(select(_blob.blob_id).where(
+                    _blob.blob_id.in_(keys[i:i + 500]))):
+                del new[blob_id]
+
+        if len(new) > 0:
+            session.execute(
+                _insert_ignore(session, _blob), [
+                    dict(
+                        blob_id=blob_id,
+                        encoding=self.blob_encoding.value,
+                        data=compress(content, self.blob_encoding)
+                    ) for blob_id, content in new.items()
+                ]
+            )
+
+        return [
+            orm.Record.parse(record, calls_blob_id=blob_id)
+            for record, blob_id in zip(records, blob_ids)
+        ]
+
+    def _calls_json(self, record: schema.Record) -> Tuple[str, Dict[str, str]]:
+        """
+        Json of the calls of `record` with its large strings replaced by
+        references to blobs, along with the content of those blobs.
+        """
+
+        if self.blob_threshold is None:
+            return orm.Record.calls_json(record), dict()
+
+        calls, strings = externalize(
+            record.dict(include={"calls"}), self.blob_threshold
+        )
+
+        # Same as `orm.Record.calls_json` but for the replaced strings.
+        return json.dumps(calls, default=json_default), strings
+
+    def get_blobs(self, blob_ids: Iterable[str]) -> Dict[str, str]:
+        with self.Session.begin() as session:
+            return self._get_blobs(session, blob_ids)
+
+    def _get_blobs(self, session: Session,
+                   blob_ids: Iterable[str]) -> Dict[str, str]:
+        _blob = orm.Blob
+
+        blob_ids = list(blob_ids)
+        contents = dict()
+        for i in range(0, len(blob_ids), 500):
+            for blob_id, encoding, data in session.execute(select(
+                    _blob.blob_id, _blob.encoding,
+                    _blob.data).where(_blob.blob_id.in_(blob_ids[i:i + 500]))):
+                contents[blob_id] = decompress(data, BlobEncoding(encoding))
+
+        return contents
+
+    def _full_record_jsons(self, session: Session,
+                           df: pd.DataFrame) -> List[str]:
+        """
+        The `record_json` of the records of `df` with their calls.
+        """
+
+        _rec = orm.Record
+        _blob = orm.Blob
+
+        record_ids = list(df["record_id"])
+        calls = dict()
+        for i in range(0, len(record_ids), 500):
+            rows = session.execute(
+                select(_rec.record_id, _blob.encoding, _blob.data).join(
+                    _blob, _blob.blob_id == _rec.calls_blob_id
+                ).where(_rec.record_id.in_(record_ids[i:i + 500]))
+            )
+            for record_id, encoding, data in rows:
+                calls[record_id] = decompress(data, BlobEncoding(encoding))
+
+        # Put back the large strings of calls.
+        parsed = {
+            record_id: json.loads(calls_json)
+            for record_id, calls_json in calls.items()
+            if BLOB in calls_json
+        }
+        if len(parsed) > 0:
+            contents = self._get_blobs(
+                session,
+                set().union(*map(blob_refs, parsed.values()))
+            )
+            for record_id, obj in parsed.items():
+                calls[record_id] = json.dumps(rehydrate(obj, contents))
+
+        return [
+            orm.Record.with_calls(record_json, calls.get(record_id))
+            for record_id, record_json in zip(record_ids, df["record_json"])
+        ]
+
+    @metrics.timed(metrics.DB_WRITE_LATENCY, "insert_record")
     def insert_record(self, record: schema.Record) -> schema.RecordID:
-        _rec = orm.Record.parse(record)
         with self.Session.begin() as session:
+            _rec, = self._parse_records(session, [record])
+            self._update_rollups(session, [_rec])
+            self._replace_spans(session, [record])
             if session.query(orm.Record).filter_by(record_id=record.record_id
                                                   ).first():
                 session.merge(_rec)  # update existing
@@ -100,6 +529,18 @@ class SqlAlchemyDB(DB):
                 session.add(_rec)  # add new record
             return _rec.record_id
 
+    @metrics.timed(metrics.DB_WRITE_LATENCY, "insert_records")
+    def insert_records(
+        self, records: Iterable[schema.Record]
+    ) -> List[schema.RecordID]:
+        records = list(records)
+        with self.Session.begin() as session:
+            _recs = self._parse_records(session, records)
+            self._update_rollups(session, _recs)
+            self._replace_spans(session, records)
+            _bulk_upsert(session, orm.Record, "record_id", _recs)
+            return [_rec.record_id for _rec in _recs]
+
     def get_app(self, app_id: str) -> Optional[JSON]:
         with self.Session.begin() as session:
             if _app := session.query(orm.AppDefinition).filter_by(app_id=app_id
@@ -114,6 +555,18 @@ class SqlAlchemyDB(DB):
             else:
                 _app = orm.AppDefinition.parse(app)
                 session.add(_app)
+                if self.rollups and session.get(orm.AppRollup,
+                                                app.app_id) is None:
+                    session.add(
+                        orm.AppRollup(
+                            app_id=app.app_id,
+                            records=0,
+                            latency_count=0,
+                            latency_sum=0.0,
+                            total_tokens=0,
+                            total_cost=0.0
+                        )
+                    )
             return _app.app_id
 
     def insert_feedback_definition(
@@ -145,18 +598,59 @@ class SqlAlchemyDB(DB):
                 columns=["feedback_definition_id", "feedback_json"],
             )
 
+    @metrics.timed(metrics.DB_WRITE_LATENCY, "insert_feedback")
     def insert_feedback(
-        self, feedback_result: schema.FeedbackResult
-    ) -> schema.FeedbackResultID:
+        self,
+        feedback_result: schema.FeedbackResult,
+        lease_token: Optional[str] = None
+    ) -> Optional[schema.FeedbackResultID]:
         _feedback_result = orm.FeedbackResult.parse(feedback_result)
+        _fr = orm.FeedbackResult
         with self.Session.begin() as session:
+            if lease_token is not None:
+                # Lock the row while checking that the lease is still ours so
+                # it cannot be taken over before the result is written.
+                stmt = update(_fr).where(
+                    _fr.feedback_result_id ==
+                    feedback_result.feedback_result_id,
+                    _fr.lease_token == lease_token
+                ).values(lease_token=lease_token)
+                held = session.execute(
+                    stmt, execution_options=dict(synchronize_session=False)
+                ).rowcount == 1
+                if not held:
+                    logger.warning(
+                        f"Dropped feedback result {feedback_result.feedback_result_id} "
+                        "as its lease was taken over."
+                    )
+                    return None
+
+            changes = self._feedback_rollup_changes(session, [_feedback_result])
             if session.query(orm.FeedbackResult) \
                     .filter_by(feedback_result_id=feedback_result.feedback_result_id).first():
                 session.merge(_feedback_result)  # update existing
             else:
                 session.add(_feedback_result)  # insert new result
+            self._apply_feedback_rollups(session, *changes)
             return _feedback_result.feedback_result_id
 
+    @metrics.timed(metrics.DB_WRITE_LATENCY, "insert_feedbacks")
+    def insert_feedbacks(
+        self, feedback_results: Iterable[schema.FeedbackResult]
+    ) -> List[schema.FeedbackResultID]:
+        _feedback_results = [
+            orm.FeedbackResult.parse(feedback_result)
+            for feedback_result in feedback_results
+        ]
+        with self.Session.begin() as session:
+            changes = self._feedback_rollup_changes(session, _feedback_results)
+            _bulk_upsert(
+                session, orm.FeedbackResult, "feedback_result_id",
+                _feedback_results
+            )
+            self._apply_feedback_rollups(session, *changes)
+            return [_fr.feedback_result_id for _fr in _feedback_results]
+
     def get_feedback(
         self,
         record_id: Optional[RecordID] = None,
@@ -176,7 +670,7 @@ class SqlAlchemyDB(DB):
                 q = q.filter_by(feedback_definition_id=feedback_definition_id)
             if status:
                 if isinstance(status, FeedbackResultStatus):
-                    status = [status.value]
+                    status = [status]
                 q = q.filter(
                     orm.FeedbackResult.status.in_([s.value for s in status])
                 )
@@ -187,16 +681,459 @@ class SqlAlchemyDB(DB):
             results = (row[0] for row in session.execute(q))
             return _extract_feedback_results(results)
 
+    def claim_pending_feedback(
+        self,
+        limit: int = 100,
+        lease_seconds: float = schema.DEFAULT_LEASE_SECONDS,
+        retry_failed_seconds: float = 300.0,
+        worker_id: Optional[str] = None,
+        lease_token: Optional[str] = None
+    ) -> pd.DataFrame:
+        now = datetime.now().timestamp()
+        lease_token = lease_token or uuid.uuid4().hex
+        _fr = orm.FeedbackResult
+        claimable = or_(
+            _fr.status == FeedbackResultStatus.NONE.value,
+            and_(
+                _fr.status == FeedbackResultStatus.RUNNING.value,
+                _fr.last_ts < now - lease_seconds
+            ),
+            and_(
+                _fr.status == FeedbackResultStatus.FAILED.value,
+                _fr.last_ts < now - retry_failed_seconds
+            ),
+        )
+
+        with self.Session.begin() as session:
+            candidates = session.scalars(
+                select(_fr.feedback_result_id).where(claimable).order_by(
+                    _fr.last_ts
+                ).limit(limit).with_for_update(skip_locked=True)
+            ).all()
+
+            # Re-check each candidate while updating it so that a result
+            # claimed by someone else in the meantime is skipped.
+            claimed = []
+            for feedback_result_id in candidates:
+                updated = session.execute(
+                    update(_fr).where(
+                        _fr.feedback_result_id == feedback_result_id, claimable
+                    ).values(
+                        status=FeedbackResultStatus.RUNNING.value,
+                        last_ts=now,
+                        lease_token=lease_token
+                    ).execution_options(synchronize_session=False)
+                )
+                if updated.rowcount == 1:
+                    claimed.append(feedback_result_id)
+
+        logger.debug(
+            f"{worker_id or 'worker'} claimed {len(claimed)} feedback result(s)."
+        )
+
+        with self.Session.begin() as session:
+            results = session.scalars(
+                select(_fr).where(
+                    _fr.feedback_result_id.in_(claimed),
+                    _fr.lease_token == lease_token
+                )
+            )
+            df = _extract_feedback_results(results)
+
+        df["lease_token"] = lease_token
+
+        return df
+
+    def heartbeat_feedback(
+        self, feedback_result_ids: Sequence[FeedbackResultID], lease_token: str
+    ) -> int:
+        if len(feedback_result_ids) == 0:
+            return 0
+
+        _fr = orm.FeedbackResult
+        stmt = update(_fr).where(
+            _fr.feedback_result_id.in_(feedback_result_ids),
+            _fr.status == FeedbackResultStatus.RUNNING.value,
+            _fr.lease_token == lease_token
+        ).values(last_ts=datetime.now().timestamp())
+        with self.Session.begin() as session:
+            return session.execute(
+                stmt, execution_options=dict(synchronize_session=False)
+            ).rowcount
+
+    def get_apps(self) -> Iterable[JSON]:
+        with self.Session.begin() as session:
+            return [
+                json.loads(app_json) for app_json in
+                session.scalars(select(orm.AppDefinition.app_json))
+            ]
+
     def get_records_and_feedback(
         self,
-        app_ids: Optional[List[str]] = None
+        app_ids: Optional[List[str]] = None,
+        record_ids: Optional[List[RecordID]] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        tags: Optional[Sequence[str]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        columns: Optional[Sequence[str]] = None,
+        feedback_calls: bool = True
     ) -> Tuple[pd.DataFrame, Sequence[str]]:
+        _rec = orm.Record
+        _fr = orm.FeedbackResult
+
+        extractor = AppsExtractor(
+            columns=columns, feedback_calls=feedback_calls
+        )
+
+        # Records are selected in a subquery so that pages are made of records
+        # rather than of their feedback results.
+        page = select(_rec.record_id, _rec.ts)
+        if app_ids:
+            page = page.where(_rec.app_id.in_(app_ids))
+        if record_ids:
+            page = page.where(_rec.record_id.in_(record_ids))
+        if start_time is not None:
+            page = page.where(_rec.ts >= start_time.timestamp())
+        if end_time is not None:
+            page = page.where(_rec.ts < end_time.timestamp())
+        if tags:
+            record_tags = literal(",") + func.replace(_rec.tags, " ",
+                                                      "") + literal(",")
+            page = page.where(
+                or_(
+                    *(
+                        record_tags.contains(
+                            "," + tag.replace(" ", "") + ",", autoescape=True
+                        ) for tag in tags
+                    )
+                )
+            )
+        if limit is not None or offset > 0:
+            page = page.order_by(_rec.ts.desc(), _rec.record_id.desc()
+                                ).limit(limit).offset(offset)
+        page = page.subquery()
+
+        record_cols = [
+            orm.AppDefinition.app_json
+            if col == "app_json" else getattr(_rec, col)
+            for col in extractor.stored_cols
+        ]
+        feedback_cols = [_fr.name, _fr.result]
+        if feedback_calls:
+            feedback_cols.append(_fr.calls_json)
+
+        stmt = select(*record_cols, *feedback_cols).select_from(page)
+        stmt = stmt.join(_rec, _rec.record_id == page.c.record_id)
+        stmt = stmt.join(
+            orm.AppDefinition, orm.AppDefinition.app_id == _rec.app_id
+        )
+        stmt = stmt.outerjoin(_fr, _fr.record_id == _rec.record_id)
+        stmt = stmt.order_by(page.c.ts.desc(), page.c.record_id.desc())
+
         with self.Session.begin() as session:
-            stmt = select(orm.AppDefinition)
+            rows = session.execute(stmt)
+            df, feedback_cols = extractor.get_df_and_cols(rows)
+
+            # Calls are only loaded along with the rest of record_json.
+            if "record_json" in df.columns and len(df) > 0:
+                df["record_json"] = self._full_record_jsons(session, df)
+
+            return df, feedback_cols
+
+    def get_app_summaries(
+        self,
+        app_ids: Optional[List[str]] = None
+    ) -> Tuple[pd.DataFrame, Sequence[str]]:
+        _app = orm.AppDefinition
+        _rec = orm.Record
+        _fr = orm.FeedbackResult
+
+        if self.rollups:
+            _roll = orm.AppRollup
+            totals = select(
+                _roll.app_id,
+                _roll.records,
+                (_roll.latency_sum /
+                 func.nullif(_roll.latency_count, 0)).label("latency"),
+                _roll.total_cost,
+                _roll.total_tokens,
+            ).where(_roll.records > 0)
             if app_ids:
-                stmt = stmt.where(orm.AppDefinition.app_id.in_(app_ids))
-            apps = (row[0] for row in session.execute(stmt))
-            return AppsExtractor().get_df_and_cols(apps)
+                totals = totals.where(_roll.app_id.in_(app_ids))
+
+        else:
+            totals = select(
+                _rec.app_id,
+                func.count().label("records"),
+                func.avg(_rec.latency).label("latency"),
+                func.coalesce(func.sum(_rec.total_cost),
+                              0.0).label("total_cost"),
+                func.coalesce(func.sum(_rec.total_tokens),
+                              0).label("total_tokens"),
+            ).group_by(_rec.app_id)
+            if app_ids:
+                totals = totals.where(_rec.app_id.in_(app_ids))
+
+        totals = totals.subquery()
+        summaries = select(
+            _app.app_id, _app.app_json, totals.c.records, totals.c.latency,
+            totals.c.total_cost, totals.c.total_tokens
+        ).join(totals, totals.c.app_id == _app.app_id)
+
+        if self.rollups:
+            _froll = orm.FeedbackRollup
+            means = select(
+                _froll.app_id, _froll.name,
+                func.sum(_froll.sum) / func.sum(_froll.count)
+            ).group_by(_froll.app_id,
+                       _froll.name).having(func.sum(_froll.count) > 0)
+            if app_ids:
+                means = means.where(_froll.app_id.in_(app_ids))
+
+        else:
+            means = select(_rec.app_id, _fr.name, func.avg(_fr.result)).join(
+                _rec, _rec.record_id == _fr.record_id
+            ).group_by(_rec.app_id,
+                       _fr.name).having(func.count(_fr.result) > 0)
+            if app_ids:
+                means = means.where(_rec.app_id.in_(app_ids))
+
+        with self.Session.begin() as session:
+            return app_summaries_df(
+                session.execute(summaries).all(),
+                session.execute(means).all()
+            )
+
+    def get_feedback_rollups(
+        self,
+        app_ids: Optional[List[str]] = None,
+        names: Optional[List[str]] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> pd.DataFrame:
+        """
+        Get the aggregates of the results of each feedback function (or those
+        with the given `names`) on the records of the given apps (otherwise
+        all) per time bucket (see `FeedbackRollup`), for buckets from the one
+        of `start_time` up to `end_time`. Requires `rollups`.
+
+        Each row has the `app_id`, feedback `name`, start of the `bucket` and
+        the `count`, `mean`, standard deviation (`std`), `min` and `max` of
+        the results.
+        """
+
+        _froll = orm.FeedbackRollup
+
+        columns = [
+            "app_id", "name", "bucket", "count", "sum", "sum_squares", "min",
+            "max"
+        ]
+
+        stmt = select(*(getattr(_froll, column) for column in columns)
+                     ).where(_froll.count > 0)
+        if app_ids:
+            stmt = stmt.where(_froll.app_id.in_(app_ids))
+        if names:
+            stmt = stmt.where(_froll.name.in_(names))
+        if start_time is not None:
+            stmt = stmt.where(
+                _froll.bucket >= _froll.bucket_of(start_time.timestamp())
+            )
+        if end_time is not None:
+            stmt = stmt.where(_froll.bucket < end_time.timestamp())
+        stmt = stmt.order_by(_froll.app_id, _froll.name, _froll.bucket)
+
+        with self.Session.begin() as session:
+            df = pd.DataFrame(session.execute(stmt).all(), columns=columns)
+
+        df["bucket"] = df["bucket"].map(datetime.fromtimestamp)
+        df["mean"] = df["sum"] / df["count"]
+        df["std"] = np.sqrt(
+            (df["sum_squares"] / df["count"] - df["mean"]**2).clip(lower=0.0)
+        )
+
+        return df[[
+            "app_id", "name", "bucket", "count", "mean", "std", "min", "max"
+        ]]
+
+    def get_latency_percentiles(
+        self,
+        app_id: str,
+        component_path: Optional[Union[str, JSONPath]] = None,
+        window: Optional[timedelta] = None,
+        percentiles: Sequence[float] = (50, 90, 95, 99),
+        metric: str = "latency"
+    ) -> Dict[float, Optional[float]]:
+        # Nearest-rank percentiles, each looked up by its rank among the values
+        # of the spans (or records) selected by the `ix_spans_app_id_path_ts`
+        # (or `ix_records_app_id_ts`) index.
+
+        if component_path is None:
+            table = orm.Record
+            where = [table.app_id == app_id]
+        else:
+            table = orm.Span
+            where = [
+                table.app_id == app_id,
+                table.path == table.path_of(component_path)
+            ]
+
+        if metric not in table.DURATIONS:
+            raise ValueError(
+                f"Cannot get percentiles of {metric} of {table.__tablename__}."
+            )
+
+        value = getattr(table, metric)
+        where.append(value.is_not(None))
+        if window is not None:
+            where.append(table.ts >= (datetime.now() - window).timestamp())
+
+        ordered = select(value).where(*where).order_by(value)
+
+        ret = dict()
+        with self.Session.begin() as session:
+            count = session.scalar(select(func.count()).where(*where))
+
+            for percentile in percentiles:
+                if count == 0:
+                    ret[percentile] = None
+                    continue
+
+                offset = max(math.ceil(percentile / 100 * count), 1) - 1
+                ret[percentile] = session.scalar(
+                    ordered.offset(offset).limit(1)
+                )
+
+        return ret
+
+    def get_feedback_count_by_status(self) -> Dict[FeedbackResultStatus, int]:
+        with self.Session.begin() as session:
+            rows = session.execute(
+                select(orm.FeedbackResult.status,
+                       func.count()).group_by(orm.FeedbackResult.status)
+            )
+            return {
+                FeedbackResultStatus(status): count for status, count in rows
+            }
+
+
+class _Moments:
+    """
+    Count, sum, sum of squares, min and max of some feedback results.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.sum_squares = 0.0
+        self.min = None
+        self.max = None
+
+    @staticmethod
+    def of(rollup: orm.FeedbackRollup) -> '_Moments':
+        moments = _Moments()
+        for column, value in moments.values().items():
+            setattr(moments, column, getattr(rollup, column))
+        return moments
+
+    def values(self) -> Dict[str, Any]:
+        return dict(
+            count=self.count,
+            sum=self.sum,
+            sum_squares=self.sum_squares,
+            min=self.min,
+            max=self.max
+        )
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.sum_squares += value * value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: '_Moments') -> '_Moments':
+        merged = _Moments()
+        merged.count = self.count + other.count
+        merged.sum = self.sum + other.sum
+        merged.sum_squares = self.sum_squares + other.sum_squares
+        merged.min = min(
+            (v for v in [self.min, other.min] if v is not None), default=None
+        )
+        merged.max = max(
+            (v for v in [self.max, other.max] if v is not None), default=None
+        )
+        return merged
+
+    def subtract(self, other: '_Moments') -> '_Moments':
+        """
+        Remove the values of `other`, except from the min and max.
+        """
+
+        subtracted = _Moments()
+        subtracted.count = self.count - other.count
+        subtracted.sum = self.sum - other.sum
+        subtracted.sum_squares = self.sum_squares - other.sum_squares
+        subtracted.min = self.min
+        subtracted.max = self.max
+        return subtracted
+
+
+def _insert_ignore(session: Session, model: type):
+    """
+    Insert statement for `model` that does nothing for existing keys.
+    """
+
+    dialect = session.get_bind().dialect.name
+
+    if dialect == "sqlite":
+        return sqlite.insert(model).on_conflict_do_nothing()
+    elif dialect == "postgresql":
+        return postgresql.insert(model).on_conflict_do_nothing()
+    else:
+        return insert(model).prefix_with("IGNORE")
+
+
+def _bulk_upsert(
+    session: Session,
+    model: type,
+    key: str,
+    objs: Sequence[Any],
+    chunk_size: int = 500
+):
+    """
+    Add `objs` of the ORM `model` to `session`, updating the rows whose primary
+    `key` already exists in place. Existing rows are loaded `chunk_size` at a
+    time instead of once per object, and only get the columns set on the given
+    objects so that others, like lease tokens of feedback results, are kept.
+    """
+
+    column = getattr(model, key)
+    columns = [attr.key for attr in sql_inspect(model).column_attrs]
+
+    # Later objects with the same key win, as they would with repeated inserts.
+    objs = list({getattr(obj, key): obj for obj in objs}.values())
+
+    for i in range(0, len(objs), chunk_size):
+        chunk = objs[i:i + chunk_size]
+        keys = [getattr(obj, key) for obj in chunk]
+        existing = {
+            getattr(row, key): row
+            for row in session.scalars(select(model).where(column.in_(keys)))
+        }
+
+        for obj in chunk:
+            row = existing.get(getattr(obj, key))
+            if row is None:
+                session.add(obj)
+                continue
+
+            values = sql_inspect(obj).dict
+            for name in columns:
+                if name in values:
+                    setattr(row, name, values[name])
 
 
 def _extract_feedback_results(
@@ -220,7 +1157,7 @@ def _extract_feedback_results(
             json.loads(_result.record.perf_json),
             json.loads(_result.calls_json)["calls"],
             json.loads(_result.feedback_definition.feedback_json),
-            json.loads(_result.record.record_json),
+            json.loads(_result.record.full_record_json()),
             app_json,
             _type,
         )
@@ -284,6 +1221,12 @@ def _extract_tokens_and_cost(cost_json: pd.Series) -> pd.DataFrame:
 
 
 class AppsExtractor:
+    """
+    Produces the dataframe of `DB.get_records_and_feedback` from rows of
+    records, each with one of its feedback results (or None), ordered so that
+    the rows of each record are consecutive.
+    """
+
     app_cols = ["app_id", "app_json", "type"]
     rec_cols = [
         "record_id", "input", "output", "tags", "record_json", "cost_json",
@@ -292,62 +1235,88 @@ class AppsExtractor:
     extra_cols = ["latency", "total_tokens", "total_cost"]
     all_cols = app_cols + rec_cols + extra_cols
 
-    def __init__(self):
+    def __init__(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        feedback_calls: bool = True
+    ):
         self.feedback_columns = set()
+        self.feedback_calls = feedback_calls
+
+        self.cols = records_columns(columns)
+        if "record_id" not in self.cols:
+            self.cols = ["record_id"] + self.cols
+
+        # Columns to select from the database.
+        self.stored_cols = stored_columns(self.cols)
+
+        # App types by app_json.
+        self._types: Dict[str, str] = dict()
 
     def get_df_and_cols(
-        self, apps: Iterable[orm.AppDefinition]
+        self, rows: Iterable[Row]
     ) -> Tuple[pd.DataFrame, Sequence[str]]:
-        df = pd.concat(self.extract_apps(apps))
-        df["latency"] = _extract_latency(df["perf_json"])
+        df = pd.DataFrame(
+            [], columns=self.stored_cols
+        )  # prevent missing columns when there are no records
+        df = pd.concat([df, pd.DataFrame(data=self.extract_records(rows))])
         df.reset_index(
             drop=True, inplace=True
         )  # prevent index mismatch on the horizontal concat that follows
-        df = pd.concat([df, _extract_tokens_and_cost(df["cost_json"])], axis=1)
+
+        if "latency" in self.cols:
+            df["latency"] = _extract_latency(df["perf_json"])
+
+        if "total_tokens" in self.cols or "total_cost" in self.cols:
+            df = pd.concat(
+                [df, _extract_tokens_and_cost(df["cost_json"])], axis=1
+            )
+
+        feedback_cols = sorted(self.feedback_columns)
+        if self.feedback_calls:
+            feedback_cols += [name + "_calls" for name in feedback_cols]
+
+        df = df.reindex(columns=self.cols + feedback_cols)
+
         return df, list(self.feedback_columns)
 
-    def extract_apps(
-        self, apps: Iterable[orm.AppDefinition]
-    ) -> Iterable[pd.DataFrame]:
-        yield pd.DataFrame(
-            [], columns=self.app_cols + self.rec_cols
-        )  # prevent empty iterator
-        for _app in apps:
-            if _recs := _app.records:
-                df = pd.DataFrame(data=self.extract_records(_recs))
-
-                for col in self.app_cols:
-                    if col == "type":
-                        df[col] = str(
-                            schema.AppDefinition.parse_raw(_app.app_json
-                                                          ).root_class
-                        )
-                    else:
-                        df[col] = getattr(_app, col)
+    def _type(self, app_json: str) -> str:
+        if app_json not in self._types:
+            self._types[app_json] = str(
+                schema.AppDefinition.parse_raw(app_json).root_class
+            )
 
-                yield df
+        return self._types[app_json]
 
-    def extract_records(self,
-                        records: Iterable[orm.Record]) -> Iterable[pd.Series]:
-        for _rec in records:
+    def extract_records(self, rows: Iterable[Row]) -> Iterable[dict]:
+        for _, record_rows in groupby(rows, key=lambda row: row.record_id):
             calls = defaultdict(list)
             values = defaultdict(list)
 
-            for _res in _rec.feedback_results:
-                self.feedback_columns.add(_res.name)
-                calls[_res.name].append(json.loads(_res.calls_json)["calls"])
-                if _res.result is not None:  # avoid getting Nones into np.mean
-                    values[_res.name].append(_res.result)
+            for _row in record_rows:
+                if _row.name is None:  # record without feedback results
+                    continue
+
+                self.feedback_columns.add(_row.name)
+                if self.feedback_calls:
+                    calls[_row.name].append(
+                        json.loads(_row.calls_json)["calls"]
+                    )
+                if _row.result is not None:  # avoid getting Nones into np.mean
+                    values[_row.name].append(_row.result)
 
             row = {
                 **{k: np.mean(v) for k, v in values.items()},
                 **{k + "_calls": flatten(v) for k, v in calls.items()},
             }
 
-            for col in self.rec_cols:
+            for col in self.stored_cols:
                 row[col] = datetime.fromtimestamp(
-                    _rec.ts
-                ).isoformat() if col == "ts" else getattr(_rec, col)
+                    _row.ts
+                ).isoformat() if col == "ts" else getattr(_row, col)
+
+            if "type" in self.cols:
+                row["type"] = self._type(_row.app_json)
 
             yield row
 
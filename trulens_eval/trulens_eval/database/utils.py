@@ -163,7 +163,12 @@ def migrate_legacy_sqlite(engine: Engine):
     original_file = Path(engine.url.database)
     logger.info("Handling legacy SQLite file: %s", original_file)
     logger.debug("Applying legacy migration scripts")
-    LocalSQLite(filename=original_file).migrate_database()
+    legacy_db = LocalSQLite(filename=original_file)
+    legacy_db.migrate_database()
+
+    # Checkpoint the write-ahead log and release pooled connections so the
+    # file can be read and replaced below.
+    legacy_db.close()
 
     with TemporaryDirectory() as tmp:
 
@@ -188,12 +193,20 @@ def migrate_legacy_sqlite(engine: Engine):
             logger.debug("\n\n%s\n", df.head())
             df.to_sql(table, tgt_conn, index=False, if_exists="append")
 
+        src_conn.close()
+        tgt_conn.close()
+
         # 4. Migrate staging database to the latest Alembic revision
         logger.debug("Applying Alembic migration scripts")
         upgrade_db(stg_engine, revision="head")
 
         # 5. Replace original database file with the staging one
         logger.debug("Replacing database file at %s", original_file)
+        engine.dispose()
+        # A write-ahead log left next to the original file would otherwise be
+        # replayed on top of the replacement.
+        for suffix in ["-wal", "-shm"]:
+            Path(f"{original_file}{suffix}").unlink(missing_ok=True)
         shutil.copyfile(stg_file, original_file)
 
 
@@ -233,7 +246,8 @@ def _copy_database(src_url: str, tgt_url: str):
     tgt = SqlAlchemyDB.from_db_url(tgt_url)
     check_db_revision(tgt.engine)
 
-    for table in ["apps", "feedback_defs", "records", "feedbacks"]:
+    for table in ["apps", "feedback_defs", "blobs", "records", "spans",
+                  "feedbacks", "app_rollups", "feedback_rollups"]:
 
         with src.engine.begin() as src_conn:
             with tgt.engine.begin() as tgt_conn:
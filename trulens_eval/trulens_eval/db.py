@@ -1,11 +1,22 @@
 import abc
+import atexit
+from contextlib import contextmanager
 from datetime import datetime
+from datetime import timedelta
+import itertools
 import json
 import logging
 from pathlib import Path
 from pprint import PrettyPrinter
+from queue import Empty
+from queue import Queue
 import sqlite3
-from typing import List, Optional, Sequence, Tuple, Union
+import threading
+import time
+from typing import (
+    Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+)
+import uuid
 
 from merkle_json import MerkleJson
 import numpy as np
@@ -19,6 +30,7 @@ from trulens_eval.feedback import Feedback
 from trulens_eval.schema import AppDefinition
 from trulens_eval.schema import AppID
 from trulens_eval.schema import Cost
+from trulens_eval.schema import DEFAULT_LEASE_SECONDS
 from trulens_eval.schema import FeedbackDefinition
 from trulens_eval.schema import FeedbackDefinitionID
 from trulens_eval.schema import FeedbackResult
@@ -29,6 +41,7 @@ from trulens_eval.schema import Record
 from trulens_eval.schema import RecordID
 from trulens_eval.util import JSON
 from trulens_eval.util import json_str_of_obj
+from trulens_eval.util import JSONPath
 from trulens_eval.util import SerialModel
 from trulens_eval.utils.text import UNICODE_CHECK
 from trulens_eval.utils.text import UNICODE_CLOCK
@@ -42,6 +55,106 @@ logger = logging.getLogger(__name__)
 
 MULTI_CALL_NAME_DELIMITER = ":::"
 
+# Columns of the records dataframe of `DB.get_records_and_feedback` besides
+# feedback result columns.
+RECORDS_COLUMNS = [
+    "app_id", "app_json", "type", "record_id", "input", "output", "tags",
+    "record_json", "cost_json", "perf_json", "ts", "latency", "total_tokens",
+    "total_cost"
+]
+
+# Columns of records in the database each of the derived columns of
+# `RECORDS_COLUMNS` is computed from.
+DERIVED_COLUMNS = dict(
+    type="app_json",
+    latency="perf_json",
+    total_tokens="cost_json",
+    total_cost="cost_json"
+)
+
+# Columns of the summaries dataframe of `DB.get_app_summaries` besides mean
+# feedback result columns.
+APP_SUMMARY_COLUMNS = [
+    "app_id", "app_json", "records", "latency", "total_cost", "total_tokens"
+]
+
+
+def app_summaries_df(
+    summaries: Iterable[Sequence], means: Iterable[Sequence]
+) -> Tuple[pd.DataFrame, Sequence[str]]:
+    """
+    Produce the result of `DB.get_app_summaries` from rows of
+    `APP_SUMMARY_COLUMNS` and rows of (app_id, feedback name, mean result).
+    """
+
+    df = pd.DataFrame(list(summaries), columns=APP_SUMMARY_COLUMNS)
+    df_means = pd.DataFrame(list(means), columns=["app_id", "name", "result"])
+
+    feedback_cols = sorted(df_means.name.unique())
+
+    if len(feedback_cols) > 0:
+        df = df.merge(
+            df_means.pivot(index="app_id", columns="name", values="result"),
+            how="left",
+            left_on="app_id",
+            right_index=True
+        )
+
+    df = df.sort_values(by="app_id").reset_index(drop=True)
+
+    return df, feedback_cols
+
+
+def records_columns(columns: Optional[Sequence[str]]) -> List[str]:
+    """
+    The columns of `RECORDS_COLUMNS` requested by the `columns` argument of
+    `DB.get_records_and_feedback`.
+    """
+
+    if columns is None:
+        return list(RECORDS_COLUMNS)
+
+    unknown = set(columns) - set(RECORDS_COLUMNS)
+    if len(unknown) > 0:
+        raise ValueError(
+            f"Unknown record columns {sorted(unknown)}. "
+            f"Columns are: {RECORDS_COLUMNS}"
+        )
+
+    return [col for col in RECORDS_COLUMNS if col in columns]
+
+
+def stored_columns(columns: Sequence[str]) -> List[str]:
+    """
+    The columns stored in the database needed to produce the given
+    `RECORDS_COLUMNS`.
+    """
+
+    needed = set(DERIVED_COLUMNS.get(col, col) for col in columns)
+    needed.add("record_id")
+
+    return [
+        col for col in RECORDS_COLUMNS
+        if col in needed and col not in DERIVED_COLUMNS
+    ]
+
+
+def _tag_token(tag: str) -> str:
+    """
+    Pattern matching `tag` as one of the comma-separated tags of a record with
+    spaces removed.
+    """
+
+    return "," + tag.replace(" ", "") + ","
+
+
+def _like_escape(value: str) -> str:
+    """
+    Escape the wildcards of a LIKE pattern (with ESCAPE '\\').
+    """
+
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
 
 class DBMeta(pydantic.BaseModel):
     """
@@ -77,6 +190,17 @@ class DB(SerialModel, abc.ABC):
 
         raise NotImplementedError()
 
+    def insert_records(self, records: Iterable[Record]) -> List[RecordID]:
+        """
+        Insert multiple `records` into db. Return their record ids. Databases
+        that can write several rows at once should override this.
+
+        Args:
+        - records: Iterable[Record]
+        """
+
+        return [self.insert_record(record=record) for record in records]
+
     @abc.abstractmethod
     def insert_app(self, app: AppDefinition) -> AppID:
         """
@@ -107,17 +231,49 @@ class DB(SerialModel, abc.ABC):
     def insert_feedback(
         self,
         feedback_result: FeedbackResult,
-    ) -> FeedbackResultID:
+        lease_token: Optional[str] = None
+    ) -> Optional[FeedbackResultID]:
         """
         Insert a feedback record into the db.
 
         Args:
 
         - feedback_result: FeedbackResult
+
+        - lease_token: Optional[str] -- if given, the result is only written
+          if it is still leased with this token by `claim_pending_feedback`.
+          Returns None without writing anything otherwise.
         """
 
         raise NotImplementedError()
 
+    def insert_feedbacks(
+        self, feedback_results: Iterable[FeedbackResult]
+    ) -> List[FeedbackResultID]:
+        """
+        Insert or update multiple feedback records in the db. Databases that
+        can write several rows at once should override this.
+
+        Args:
+
+        - feedback_results: Iterable[FeedbackResult]
+        """
+
+        ids = []
+        for feedback_result in feedback_results:
+            self.insert_feedback(feedback_result=feedback_result)
+            ids.append(feedback_result.feedback_result_id)
+
+        return ids
+
+    def flush(self) -> None:
+        """
+        Block until all writes accepted so far are persisted. Databases that
+        write synchronously have nothing to do here.
+        """
+
+        pass
+
     @abc.abstractmethod
     def get_feedback(
         self,
@@ -130,20 +286,153 @@ class DB(SerialModel, abc.ABC):
     ) -> pd.DataFrame:
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    def claim_pending_feedback(
+        self,
+        limit: int = 100,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        retry_failed_seconds: float = 300.0,
+        worker_id: Optional[str] = None,
+        lease_token: Optional[str] = None
+    ) -> pd.DataFrame:
+        """
+        Atomically mark up to `limit` feedback results that need to be
+        evaluated as RUNNING and return them in the same format as
+        `get_feedback`, with an additional `lease_token` column. These are
+        results that were never started, RUNNING ones that made no progress in
+        the last `lease_seconds` and FAILED ones last attempted over
+        `retry_failed_seconds` ago. A result is handed to at most one caller
+        per lease, even across processes; writes of its outcome made with
+        `insert_feedback` and the lease token are dropped once someone else
+        took it over.
+
+        Args:
+
+        - limit: int -- maximum number of results to claim.
+
+        - lease_seconds: float -- how long a claimed result stays with its
+          claimer without its `last_ts` being updated.
+
+        - retry_failed_seconds: float -- how long to wait before retrying a
+          FAILED result.
+
+        - worker_id: Optional[str] -- identifies the claimer in logs.
+
+        - lease_token: Optional[str] -- identifies the claimer in the
+          database. A new one is made if not given.
+        """
+
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def heartbeat_feedback(
+        self, feedback_result_ids: Sequence[FeedbackResultID], lease_token: str
+    ) -> int:
+        """
+        Set `last_ts` of those of the given feedback results that are still
+        RUNNING under the lease `lease_token` of `claim_pending_feedback` to
+        now, extending that lease. Returns the number of results updated;
+        results missing from that count were finished or taken over by
+        someone else.
+        """
+
+        raise NotImplementedError()
+
+    def get_blobs(self, blob_ids: Iterable[str]) -> Dict[str, str]:
+        """
+        Get the content of the given blobs holding large strings of records
+        (see `database/blobs.py`). None are stored unless overridden.
+        """
+
+        return dict()
+
     @abc.abstractmethod
     def get_app(self, app_id: str) -> JSON:
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    def get_apps(self) -> Iterable[JSON]:
+        """
+        Get all apps.
+        """
+
+        raise NotImplementedError()
+
     @abc.abstractmethod
     def get_records_and_feedback(
         self,
-        app_ids: Optional[List[str]] = None
+        app_ids: Optional[List[str]] = None,
+        record_ids: Optional[List[RecordID]] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        tags: Optional[Sequence[str]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        columns: Optional[Sequence[str]] = None,
+        feedback_calls: bool = True
     ) -> Tuple[pd.DataFrame, Sequence[str]]:
         """
         Get the records logged for the given set of `app_ids` (otherwise all)
         alongside the names of the feedback function columns listed the
         dataframe.
+
+        Records can be narrowed down to the given `record_ids`, to those with
+        timestamps from `start_time` (inclusive) to `end_time` (exclusive) and
+        to those with any of the given `tags` (see `AppDefinition.tags`).
+        Pages of records are selected by `limit` and `offset`, most recent
+        first; records are in no particular order without a `limit`.
+
+        Only the given record `columns` (see `RECORDS_COLUMNS`) are included
+        along with feedback result columns, if given. The calls of feedback
+        functions (`<name>_calls` columns) are included if `feedback_calls`.
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def get_app_summaries(
+        self,
+        app_ids: Optional[List[str]] = None
+    ) -> Tuple[pd.DataFrame, Sequence[str]]:
+        """
+        Get a summary of the records of each of the given `app_ids` (otherwise
+        all) that has records, alongside the names of the feedback function
+        columns of the dataframe.
+
+        Each row has the columns of `APP_SUMMARY_COLUMNS`: the number of
+        records, their mean latency in seconds and their total cost and
+        tokens. Each feedback function column holds the mean of its results
+        for the records of the app. Aggregates are computed by the database
+        rather than by loading the records.
+        """
+        raise NotImplementedError()
+
+    def get_latency_percentiles(
+        self,
+        app_id: str,
+        component_path: Optional[Union[str, JSONPath]] = None,
+        window: Optional[timedelta] = None,
+        percentiles: Sequence[float] = (50, 90, 95, 99),
+        metric: str = "latency"
+    ) -> Dict[float, Optional[float]]:
+        """
+        Get the given `percentiles` of a duration `metric`, in seconds, of the
+        calls made by the component of app `app_id` at `component_path` (like
+        `Select.RecordCalls.retriever`) or of the records of the app if None.
+        Only calls (or records) from the last `window` of time are included if
+        given. Percentiles are None if there is nothing to include.
+
+        Metrics of calls are their `latency`, `queue_wait`, `self_time`,
+        `child_time` and `time_to_first_token` (see `Perf`). Those of records
+        are their `latency` and `time_to_first_token`.
+        """
+
+        raise NotImplementedError()
+
+    def get_feedback_count_by_status(self) -> Dict[FeedbackResultStatus, int]:
+        """
+        Get the number of feedback results in each status.
         """
+
         raise NotImplementedError()
 
 
@@ -168,7 +457,8 @@ def for_all_methods(decorator):
     def decorate(cls):
         for attr in cls.__dict__:
             if not str(attr).startswith("_") and str(attr) not in [
-                    "get_meta", "reset_database", "migrate_database"
+                    "get_meta", "reset_database", "migrate_database", "flush",
+                    "close"
             ] and callable(getattr(cls, attr)):
                 logger.debug(f"{attr}")
                 setattr(cls, attr, decorator(getattr(cls, attr)))
@@ -177,22 +467,326 @@ def for_all_methods(decorator):
     return decorate
 
 
+class SQLiteConnectionPool:
+    """
+    Persistent connections to a single SQLite file in WAL mode, shared by all
+    `LocalSQLite` instances pointing at that file.
+
+    Connections are handed out by `checkout` and returned by `checkin`; up to
+    `pool_size` idle connections are kept open for reuse and more are created
+    on demand so nested or concurrent users never block on the pool itself.
+
+    Inserts submitted with `submit` are written by a single writer thread which
+    group-commits everything that arrives within `flush_interval` seconds (up
+    to `max_batch_size` rows) in one transaction. Rows submitted together are
+    always committed together. Readers call `flush` first so they always see
+    their own writes. Rows that cannot be written are raised by the next
+    `flush`.
+    """
+
+    # One pool per resolved database file.
+    _pools: Dict[str, 'SQLiteConnectionPool'] = dict()
+    _pools_lock = threading.Lock()
+
+    # Queue marker stopping the writer thread. Flushes enqueue a
+    # `threading.Event` of their own instead.
+    _STOP = object()
+
+    def __init__(
+        self,
+        filename: Path,
+        pool_size: int = 4,
+        flush_interval: float = 0.1,
+        max_batch_size: int = 1000,
+        timeout: float = 30.0
+    ):
+        self.filename = filename
+        self.pool_size = pool_size
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self.timeout = timeout
+
+        self._idle: List[sqlite3.Connection] = []
+        self._idle_lock = threading.Lock()
+
+        self._writes: Queue = Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+
+        # Errors of rows the writer thread failed to write, raised by the next
+        # `flush`.
+        self._errors: List[sqlite3.Error] = []
+        self._errors_lock = threading.Lock()
+
+    @staticmethod
+    def of_filename(filename: Path, **kwargs) -> 'SQLiteConnectionPool':
+        """
+        Get the pool for the given database file, creating it if needed.
+        Settings in `kwargs` only apply to a newly created pool.
+        """
+
+        key = str(Path(filename).resolve())
+
+        pool = SQLiteConnectionPool._pools.get(key)
+        if pool is not None:
+            return pool
+
+        with SQLiteConnectionPool._pools_lock:
+            if key not in SQLiteConnectionPool._pools:
+                pool = SQLiteConnectionPool(filename=filename, **kwargs)
+                SQLiteConnectionPool._pools[key] = pool
+                atexit.register(pool.close)
+
+            return SQLiteConnectionPool._pools[key]
+
+    def _new_connection(self) -> sqlite3.Connection:
+        # Connections move between threads via the pool but are only ever used
+        # by one thread at a time.
+        conn = sqlite3.connect(
+            self.filename, timeout=self.timeout, check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def checkout(self) -> sqlite3.Connection:
+        with self._idle_lock:
+            if len(self._idle) > 0:
+                return self._idle.pop()
+
+        return self._new_connection()
+
+    def checkin(self, conn: sqlite3.Connection) -> None:
+        with self._idle_lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+
+        conn.close()
+
+    def submit(self, table: str, vals: Tuple) -> None:
+        """
+        Queue an `INSERT OR REPLACE` of `vals` into `table` for the writer
+        thread.
+        """
+
+        self.submit_many(table=table, rows=[vals])
+
+    def submit_many(self, table: str, rows: Sequence[Tuple]) -> None:
+        """
+        Queue an `INSERT OR REPLACE` of each of `rows` into `table` for the
+        writer thread, to be committed in the same transaction.
+        """
+
+        if len(rows) == 0:
+            return
+
+        # Under the lock so that nothing is queued behind a `close` stopping
+        # the writer.
+        with self._writer_lock:
+            self._ensure_writer()
+            self._writes.put((table, list(rows)))
+
+    def flush(self, raise_errors: bool = True) -> None:
+        """
+        Block until every insert submitted so far has been committed. Inserts
+        submitted meanwhile by others are not waited for. If `raise_errors`,
+        raises a `sqlite3.Error` if any rows failed to be written since the
+        previous flush.
+        """
+
+        if self._writes.unfinished_tasks > 0:
+            flushed = threading.Event()
+
+            with self._writer_lock:
+                if self._writer is not None:
+                    self._writes.put(flushed)
+                else:
+                    flushed.set()
+
+            flushed.wait()
+
+        if raise_errors:
+            self._raise_errors()
+
+    def _raise_errors(self) -> None:
+        with self._errors_lock:
+            errors = self._errors
+            self._errors = []
+
+        if len(errors) > 0:
+            raise sqlite3.DatabaseError(
+                f"{len(errors)} row(s) could not be written to {self.filename}, "
+                f"first because of: {errors[0]}"
+            ) from errors[0]
+
+    def close(self) -> None:
+        """
+        Flush pending writes, stop the writer thread, checkpoint the WAL back
+        into the database file and close idle connections. The pool can still
+        be used afterwards; connections and the writer are recreated lazily.
+        """
+
+        with self._writer_lock:
+            writer = self._writer
+            if writer is not None:
+                self._writes.put(SQLiteConnectionPool._STOP)
+                writer.join()
+                self._writer = None
+
+        with self._idle_lock:
+            idle = self._idle
+            self._idle = []
+
+        for i, conn in enumerate(idle):
+            try:
+                if i == 0:
+                    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                conn.close()
+            except sqlite3.Error as e:
+                logger.warning(
+                    f"Could not close connection to {self.filename}: {e}"
+                )
+
+    def _ensure_writer(self) -> None:
+        # Called with `_writer_lock` held.
+        if self._writer is None:
+            self._writer = threading.Thread(
+                target=self._writer_loop,
+                name=f"SQLiteWriter({self.filename})",
+                daemon=True
+            )
+            self._writer.start()
+
+    def _writer_loop(self) -> None:
+        stop = False
+
+        while not stop:
+            # Units of rows submitted together, as (table, rows).
+            batch = []
+            size = 0
+            flushed = None
+            markers = 0
+
+            item = self._writes.get()
+            deadline = time.monotonic() + self.flush_interval
+
+            # Gather whatever else arrives before the deadline into the same
+            # transaction unless somebody is waiting on a flush.
+            while True:
+                if item is SQLiteConnectionPool._STOP:
+                    markers += 1
+                    stop = True
+                    break
+                elif isinstance(item, threading.Event):
+                    markers += 1
+                    flushed = item
+                    break
+
+                batch.append(item)
+                size += len(item[1])
+
+                remaining = deadline - time.monotonic()
+                if size >= self.max_batch_size or remaining <= 0:
+                    break
+
+                try:
+                    item = self._writes.get(timeout=remaining)
+                except Empty:
+                    break
+
+            if len(batch) > 0:
+                self._write_batch(batch)
+
+            if flushed is not None:
+                flushed.set()
+
+            for _ in range(len(batch) + markers):
+                self._writes.task_done()
+
+    @staticmethod
+    def _insert_units(
+        conn: sqlite3.Connection, units: Sequence[Tuple[str, List[Tuple]]]
+    ) -> None:
+        # Consecutive rows for the same table are sent together while keeping
+        # the overall order so later updates of the same row win.
+        rows = ((table, vals) for table, unit in units for vals in unit)
+        groups = itertools.groupby(rows, key=lambda tv: (tv[0], len(tv[1])))
+        for (table, width), group in groups:
+            conn.executemany(
+                f"""INSERT OR REPLACE INTO {table}
+                    VALUES ({','.join('?' * width)})""",
+                [vals for _, vals in group]
+            )
+
+    def _write_batch(self, batch: Sequence[Tuple[str, List[Tuple]]]) -> None:
+        conn = self.checkout()
+
+        try:
+            with conn:
+                SQLiteConnectionPool._insert_units(conn, batch)
+
+        except sqlite3.Error as e:
+            logger.error(
+                f"Batched write of {len(batch)} submission(s) to {self.filename} failed: {e}. "
+                "Retrying submissions individually."
+            )
+
+            for table, rows in batch:
+                try:
+                    with conn:
+                        SQLiteConnectionPool._insert_units(
+                            conn, [(table, rows)]
+                        )
+                except sqlite3.Error as e:
+                    logger.error(
+                        f"Dropping write to {table} of {len(rows)} row(s) "
+                        f"starting with {rows[0][0]}: {e}"
+                    )
+                    with self._errors_lock:
+                        self._errors.append(e)
+
+        finally:
+            self.checkin(conn)
+
+
 @for_all_methods(versioning_decorator)
 class LocalSQLite(DB):
     filename: Path
+
+    # Queue inserts of records, feedback results and apps for the pool's writer
+    # thread instead of committing each one in its own transaction.
+    batch_writes: bool = True
+
+    # How long (seconds) the writer thread waits to gather more inserts into
+    # the same transaction.
+    flush_interval: float = 0.1
+
+    # Number of idle connections kept open.
+    pool_size: int = 4
     TABLE_META = "meta"
     TABLE_RECORDS = "records"
     TABLE_FEEDBACKS = "feedbacks"
     TABLE_FEEDBACK_DEFS = "feedback_defs"
     TABLE_APPS = "apps"
+    TABLE_FEEDBACK_LEASES = "feedback_leases"
 
     TYPE_TIMESTAMP = "FLOAT"
     TYPE_ENUM = "TEXT"
     TYPE_JSON = "TEXT"
 
-    TABLES = [TABLE_RECORDS, TABLE_FEEDBACKS, TABLE_FEEDBACK_DEFS, TABLE_APPS]
+    TABLES = [
+        TABLE_RECORDS, TABLE_FEEDBACKS, TABLE_FEEDBACK_DEFS, TABLE_APPS,
+        TABLE_FEEDBACK_LEASES
+    ]
 
-    def __init__(self, filename: Path):
+    def __init__(
+        self,
+        filename: Path,
+        batch_writes: bool = True,
+        flush_interval: float = 0.1,
+        pool_size: int = 4
+    ):
         """
         Database locally hosted using SQLite.
 
@@ -201,8 +795,24 @@ class LocalSQLite(DB):
         - filename: Optional[Path] -- location of sqlite database dump
           file. It will be created if it does not exist.
 
+        - batch_writes: bool -- if set, inserts of records, feedback results
+          and apps are group-committed by a background writer thread. Use
+          `flush` to wait for them.
+
+        - flush_interval: float -- seconds the writer thread waits to gather
+          more inserts into a single transaction.
+
+        - pool_size: int -- number of idle connections kept open.
+
+        Connection and writer settings are shared by all instances using the
+        same file; the first instance to open the file determines them.
         """
-        super().__init__(filename=filename)
+        super().__init__(
+            filename=filename,
+            batch_writes=batch_writes,
+            flush_interval=flush_interval,
+            pool_size=pool_size
+        )
 
         self._build_tables()
         db_migration._migration_checker(db=self, warn=True)
@@ -219,41 +829,34 @@ class LocalSQLite(DB):
         db_migration.migrate(db=self)
 
     def _clear_tables(self) -> None:
-        conn, c = self._connect()
-
-        for table in self.TABLES:
-            c.execute(f'''DELETE FROM {table}''')
-
-        self._close(conn)
+        with self._connection() as (conn, c):
+            for table in self.TABLES:
+                c.execute(f'''DELETE FROM {table}''')
 
     def _drop_tables(self) -> None:
-        conn, c = self._connect()
-
-        for table in self.TABLES:
-            c.execute(f'''DROP TABLE IF EXISTS {table}''')
-
-        self._close(conn)
+        with self._connection() as (conn, c):
+            for table in self.TABLES:
+                c.execute(f'''DROP TABLE IF EXISTS {table}''')
 
     def get_meta(self):
-        conn, c = self._connect()
-
-        try:
-            c.execute(f'''SELECT key, value FROM {self.TABLE_META}''')
-            rows = c.fetchall()
-            ret = {}
+        with self._connection() as (conn, c):
+            try:
+                c.execute(f'''SELECT key, value FROM {self.TABLE_META}''')
+                rows = c.fetchall()
+                ret = {}
 
-            for row in rows:
-                ret[row[0]] = row[1]
+                for row in rows:
+                    ret[row[0]] = row[1]
 
-            if 'trulens_version' in ret:
-                trulens_version = ret['trulens_version']
-            else:
-                trulens_version = None
+                if 'trulens_version' in ret:
+                    trulens_version = ret['trulens_version']
+                else:
+                    trulens_version = None
 
-            return DBMeta(trulens_version=trulens_version, attributes=ret)
+                return DBMeta(trulens_version=trulens_version, attributes=ret)
 
-        except Exception as e:
-            return DBMeta(trulens_version=None, attributes={})
+            except Exception as e:
+                return DBMeta(trulens_version=None, attributes={})
 
     def _create_db_meta_table(self, c):
         c.execute(
@@ -288,58 +891,131 @@ class LocalSQLite(DB):
             )
 
     def _build_tables(self):
-        conn, c = self._connect()
-        self._create_db_meta_table(c)
-        c.execute(
-            f'''CREATE TABLE IF NOT EXISTS {self.TABLE_RECORDS} (
-                record_id TEXT NOT NULL PRIMARY KEY,
-                app_id TEXT NOT NULL,
-                input TEXT,
-                output TEXT,
-                record_json {self.TYPE_JSON} NOT NULL,
-                tags TEXT NOT NULL,
-                ts {self.TYPE_TIMESTAMP} NOT NULL,
-                cost_json {self.TYPE_JSON} NOT NULL,
-                perf_json {self.TYPE_JSON} NOT NULL
-            )'''
-        )
-        c.execute(
-            f'''CREATE TABLE IF NOT EXISTS {self.TABLE_FEEDBACKS} (
-                feedback_result_id TEXT NOT NULL PRIMARY KEY,
-                record_id TEXT NOT NULL,
-                feedback_definition_id TEXT,
-                last_ts {self.TYPE_TIMESTAMP} NOT NULL,
-                status {self.TYPE_ENUM} NOT NULL,
-                error TEXT,
-                calls_json {self.TYPE_JSON} NOT NULL,
-                result FLOAT,
-                name TEXT NOT NULL,
-                cost_json {self.TYPE_JSON} NOT NULL,
-                multi_result {self.TYPE_JSON}
-            )'''
-        )
-        c.execute(
-            f'''CREATE TABLE IF NOT EXISTS {self.TABLE_FEEDBACK_DEFS} (
-                feedback_definition_id TEXT NOT NULL PRIMARY KEY,
-                feedback_json {self.TYPE_JSON} NOT NULL
-            )'''
-        )
-        c.execute(
-            f'''CREATE TABLE IF NOT EXISTS {self.TABLE_APPS} (
-                app_id TEXT NOT NULL PRIMARY KEY,
-                app_json {self.TYPE_JSON} NOT NULL
-            )'''
+        with self._connection() as (conn, c):
+            self._create_db_meta_table(c)
+            c.execute(
+                f'''CREATE TABLE IF NOT EXISTS {self.TABLE_RECORDS} (
+                    record_id TEXT NOT NULL PRIMARY KEY,
+                    app_id TEXT NOT NULL,
+                    input TEXT,
+                    output TEXT,
+                    record_json {self.TYPE_JSON} NOT NULL,
+                    tags TEXT NOT NULL,
+                    ts {self.TYPE_TIMESTAMP} NOT NULL,
+                    cost_json {self.TYPE_JSON} NOT NULL,
+                    perf_json {self.TYPE_JSON} NOT NULL
+                )'''
+            )
+            c.execute(
+                f'''CREATE TABLE IF NOT EXISTS {self.TABLE_FEEDBACKS} (
+                    feedback_result_id TEXT NOT NULL PRIMARY KEY,
+                    record_id TEXT NOT NULL,
+                    feedback_definition_id TEXT,
+                    last_ts {self.TYPE_TIMESTAMP} NOT NULL,
+                    status {self.TYPE_ENUM} NOT NULL,
+                    error TEXT,
+                    calls_json {self.TYPE_JSON} NOT NULL,
+                    result FLOAT,
+                    name TEXT NOT NULL,
+                    cost_json {self.TYPE_JSON} NOT NULL,
+                    multi_result {self.TYPE_JSON}
+                )'''
+            )
+            c.execute(
+                f'''CREATE TABLE IF NOT EXISTS {self.TABLE_FEEDBACK_DEFS} (
+                    feedback_definition_id TEXT NOT NULL PRIMARY KEY,
+                    feedback_json {self.TYPE_JSON} NOT NULL
+                )'''
+            )
+            c.execute(
+                f'''CREATE TABLE IF NOT EXISTS {self.TABLE_APPS} (
+                    app_id TEXT NOT NULL PRIMARY KEY,
+                    app_json {self.TYPE_JSON} NOT NULL
+                )'''
+            )
+            # Owners of feedback results claimed by `claim_pending_feedback`, kept
+            # apart from the feedbacks table whose layout older versions expect.
+            c.execute(
+                f'''CREATE TABLE IF NOT EXISTS {self.TABLE_FEEDBACK_LEASES} (
+                    feedback_result_id TEXT NOT NULL PRIMARY KEY,
+                    lease_token TEXT NOT NULL
+                )'''
+            )
+
+            # Columns used to join and filter feedbacks with records and apps.
+            for name, table, columns in [
+                ("ix_feedbacks_record_id", self.TABLE_FEEDBACKS, "record_id"),
+                ("ix_feedbacks_status", self.TABLE_FEEDBACKS, "status"),
+                ("ix_feedbacks_feedback_definition_id", self.TABLE_FEEDBACKS,
+                 "feedback_definition_id"),
+                ("ix_feedbacks_last_ts", self.TABLE_FEEDBACKS, "last_ts"),
+                ("ix_records_app_id_ts", self.TABLE_RECORDS, "app_id, ts"),
+            ]:
+                c.execute(
+                    f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"
+                )
+
+    @property
+    def _pool(self) -> SQLiteConnectionPool:
+        return SQLiteConnectionPool.of_filename(
+            self.filename,
+            pool_size=self.pool_size,
+            flush_interval=self.flush_interval
         )
-        self._close(conn)
 
     def _connect(self) -> Tuple[sqlite3.Connection, sqlite3.Cursor]:
-        conn = sqlite3.connect(self.filename)
+        pool = self._pool
+
+        # Make sure anything queued for the writer is visible to the caller.
+        # Failed writes are left to be raised by `flush`.
+        pool.flush(raise_errors=False)
+
+        conn = pool.checkout()
         c = conn.cursor()
         return conn, c
 
     def _close(self, conn: sqlite3.Connection) -> None:
         conn.commit()
-        conn.close()
+        self._pool.checkin(conn)
+
+    @contextmanager
+    def _connection(
+        self
+    ) -> Iterator[Tuple[sqlite3.Connection, sqlite3.Cursor]]:
+        """
+        A pooled connection and a cursor of it. The connection is committed,
+        or rolled back on errors, and returned to the pool when done.
+        """
+
+        conn, c = self._connect()
+
+        try:
+            yield conn, c
+            conn.commit()
+
+        except BaseException:
+            conn.rollback()
+            raise
+
+        finally:
+            self._pool.checkin(conn)
+
+    def flush(self) -> None:
+        """
+        Block until all queued inserts are committed. Raises a `sqlite3.Error`
+        if any of them could not be written.
+        """
+
+        self._pool.flush()
+
+    def close(self) -> None:
+        """
+        Flush queued inserts, checkpoint the write-ahead log and close pooled
+        connections to this database file. Connections are reopened if the
+        database is used again.
+        """
+
+        self._pool.close()
 
     # DB requirement
     def insert_record(
@@ -351,28 +1027,45 @@ class LocalSQLite(DB):
         # other columns. Might want to keep this so we can query on the columns
         # within sqlite.
 
-        vals = (
-            record.record_id, record.app_id, json_str_of_obj(record.main_input),
-            json_str_of_obj(record.main_output), json_str_of_obj(record),
-            record.tags, record.ts, json_str_of_obj(record.cost),
-            json_str_of_obj(record.perf)
+        self._write_vals(
+            table=self.TABLE_RECORDS, vals=self._record_vals(record)
         )
 
-        self._insert_or_replace_vals(table=self.TABLE_RECORDS, vals=vals)
-
         print(
             f"{UNICODE_CHECK} record {record.record_id} from {record.app_id} -> {self.filename}"
         )
 
         return record.record_id
 
+    # DB requirement
+    def insert_records(self, records: Iterable[Record]) -> List[RecordID]:
+        records = list(records)
+
+        self._write_many_vals(
+            table=self.TABLE_RECORDS,
+            rows=[self._record_vals(record) for record in records]
+        )
+
+        print(f"{UNICODE_CHECK} {len(records)} record(s) -> {self.filename}")
+
+        return [record.record_id for record in records]
+
+    @staticmethod
+    def _record_vals(record: Record) -> Tuple:
+        return (
+            record.record_id, record.app_id, json_str_of_obj(record.main_input),
+            json_str_of_obj(record.main_output), json_str_of_obj(record),
+            record.tags, record.ts, json_str_of_obj(record.cost),
+            json_str_of_obj(record.perf)
+        )
+
     # DB requirement
     def insert_app(self, app: AppDefinition) -> AppID:
         app_id = app.app_id
         app_str = app.json()
 
         vals = (app_id, app_str)
-        self._insert_or_replace_vals(table=self.TABLE_APPS, vals=vals)
+        self._write_vals(table=self.TABLE_APPS, vals=vals)
 
         print(f"{UNICODE_CHECK} app {app_id} -> {self.filename}")
 
@@ -414,10 +1107,9 @@ class LocalSQLite(DB):
             {clause}
         """
 
-        conn, c = self._connect()
-        c.execute(query, args)
-        rows = c.fetchall()
-        self._close(conn)
+        with self._connection() as (conn, c):
+            c.execute(query, args)
+            rows = c.fetchall()
 
         df = pd.DataFrame(
             rows, columns=[description[0] for description in c.description]
@@ -426,21 +1118,116 @@ class LocalSQLite(DB):
         return df
 
     def _insert_or_replace_vals(self, table, vals):
-        conn, c = self._connect()
-        c.execute(
-            f"""INSERT OR REPLACE INTO {table}
-                VALUES ({','.join('?' for _ in vals)})""", vals
-        )
-        self._close(conn)
+        with self._connection() as (conn, c):
+            c.execute(
+                f"""INSERT OR REPLACE INTO {table}
+                    VALUES ({','.join('?' for _ in vals)})""", vals
+            )
+
+    def _insert_or_replace_many_vals(self, table, rows):
+        if len(rows) == 0:
+            return
+
+        with self._connection() as (conn, c):
+            c.executemany(
+                f"""INSERT OR REPLACE INTO {table}
+                    VALUES ({','.join('?' for _ in rows[0])})""", rows
+            )
+
+    def _write_vals(self, table, vals):
+        """
+        Insert or replace `vals` in `table`, through the writer thread if
+        `batch_writes` is set.
+        """
+
+        if self.batch_writes:
+            self._pool.submit(table=table, vals=vals)
+        else:
+            self._insert_or_replace_vals(table=table, vals=vals)
+
+    def _write_many_vals(self, table, rows):
+        """
+        Insert or replace each of `rows` in `table` in a single transaction,
+        through the writer thread if `batch_writes` is set.
+        """
+
+        if self.batch_writes:
+            self._pool.submit_many(table=table, rows=rows)
+        else:
+            self._insert_or_replace_many_vals(table=table, rows=rows)
 
     def insert_feedback(
-        self, feedback_result: FeedbackResult
-    ) -> FeedbackResultID:
+        self,
+        feedback_result: FeedbackResult,
+        lease_token: Optional[str] = None
+    ) -> Optional[FeedbackResultID]:
         """
         Insert a record-feedback link to db or update an existing one.
         """
 
-        vals = (
+        if lease_token is None:
+            self._write_vals(
+                table=self.TABLE_FEEDBACKS,
+                vals=self._feedback_vals(feedback_result)
+            )
+
+        else:
+            # Written right away rather than through the writer thread so that
+            # the lease is checked in the same statement.
+            vals = self._feedback_vals(feedback_result)
+            with self._connection() as (conn, c):
+                c.execute(
+                    f"""INSERT OR REPLACE INTO {self.TABLE_FEEDBACKS}
+                        SELECT {','.join('?' for _ in vals)}
+                        WHERE EXISTS (
+                            SELECT 1 FROM {self.TABLE_FEEDBACK_LEASES}
+                            WHERE feedback_result_id=? AND lease_token=?
+                        )""",
+                    vals + (feedback_result.feedback_result_id, lease_token)
+                )
+                written = c.rowcount == 1
+
+            if not written:
+                logger.warning(
+                    f"Dropped feedback result {feedback_result.feedback_result_id} "
+                    "as its lease was taken over."
+                )
+                return None
+
+        if feedback_result.status == FeedbackResultStatus.DONE:
+            print(
+                f"{UNICODE_CHECK} feedback {feedback_result.feedback_result_id} on {feedback_result.record_id} -> {self.filename}"
+            )
+        else:
+            print(
+                f"{UNICODE_CLOCK} feedback {feedback_result.feedback_result_id} on {feedback_result.record_id} -> {self.filename}"
+            )
+
+        return feedback_result.feedback_result_id
+
+    def insert_feedbacks(
+        self, feedback_results: Iterable[FeedbackResult]
+    ) -> List[FeedbackResultID]:
+        """
+        Insert or update several record-feedback links in one transaction.
+        """
+
+        feedback_results = list(feedback_results)
+
+        self._write_many_vals(
+            table=self.TABLE_FEEDBACKS,
+            rows=[self._feedback_vals(fr) for fr in feedback_results]
+        )
+
+        print(
+            f"{UNICODE_CHECK} {len(feedback_results)} feedback(s) -> {self.filename}"
+        )
+
+        return [fr.feedback_result_id for fr in feedback_results]
+
+    @staticmethod
+    def _feedback_vals(feedback_result: FeedbackResult) -> Tuple:
+        return (
             feedback_result.feedback_result_id,
             feedback_result.record_id,
             feedback_result.feedback_definition_id,
@@ -455,17 +1242,6 @@ class LocalSQLite(DB):
             feedback_result.multi_result
         )
 
-        self._insert_or_replace_vals(table=self.TABLE_FEEDBACKS, vals=vals)
-
-        if feedback_result.status == FeedbackResultStatus.DONE:
-            print(
-                f"{UNICODE_CHECK} feedback {feedback_result.feedback_result_id} on {feedback_result.record_id} -> {self.filename}"
-            )
-        else:
-            print(
-                f"{UNICODE_CLOCK} feedback {feedback_result.feedback_result_id} on {feedback_result.record_id} -> {self.filename}"
-            )
-
     def get_feedback(
         self,
         record_id: Optional[RecordID] = None,
@@ -505,6 +1281,11 @@ class LocalSQLite(DB):
             clauses.append("f.last_ts<=?")
             vars.append(last_ts_before.timestamp())
 
+        return self._get_feedback_where(clauses, vars)
+
+    def _get_feedback_where(
+        self, clauses: List[str], vars: List[Any]
+    ) -> pd.DataFrame:
         where_clause = " AND ".join(clauses)
         if len(where_clause) > 0:
             where_clause = " AND " + where_clause
@@ -533,10 +1314,9 @@ class LocalSQLite(DB):
                 {where_clause}
         """
 
-        conn, c = self._connect()
-        c.execute(query, vars)
-        rows = c.fetchall()
-        self._close(conn)
+        with self._connection() as (conn, c):
+            c.execute(query, vars)
+            rows = c.fetchall()
 
         df = pd.DataFrame(
             rows, columns=[description[0] for description in c.description]
@@ -581,81 +1361,235 @@ class LocalSQLite(DB):
         df = df.apply(map_row, axis=1)
         return pd.DataFrame(df)
 
-    def get_app(self, app_id: str) -> JSON:
-        conn, c = self._connect()
-        c.execute(
-            f"SELECT app_json FROM {self.TABLE_APPS} WHERE app_id=?", (app_id,)
+    def claim_pending_feedback(
+        self,
+        limit: int = 100,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        retry_failed_seconds: float = 300.0,
+        worker_id: Optional[str] = None,
+        lease_token: Optional[str] = None
+    ) -> pd.DataFrame:
+        now = datetime.now().timestamp()
+        lease_token = lease_token or uuid.uuid4().hex
+
+        claimable = """(
+            status=?
+            OR (status=? AND last_ts<?)
+            OR (status=? AND last_ts<?)
+        )"""
+        claimable_vars = (
+            FeedbackResultStatus.NONE.value, FeedbackResultStatus.RUNNING.value,
+            now - lease_seconds, FeedbackResultStatus.FAILED.value,
+            now - retry_failed_seconds
         )
-        result = c.fetchone()[0]
-        conn.close()
+
+        with self._connection() as (conn, c):
+            c.execute(
+                f"""SELECT feedback_result_id FROM {self.TABLE_FEEDBACKS}
+                    WHERE {claimable}
+                    ORDER BY last_ts
+                    LIMIT ?""", claimable_vars + (limit,)
+            )
+            candidates = [row[0] for row in c.fetchall()]
+
+            # Re-check each candidate while updating it so that a result claimed
+            # by someone else in the meantime is skipped.
+            claimed = []
+            for feedback_result_id in candidates:
+                c.execute(
+                    f"""UPDATE {self.TABLE_FEEDBACKS}
+                        SET status=?, last_ts=?
+                        WHERE feedback_result_id=? AND {claimable}""", (
+                        FeedbackResultStatus.RUNNING.value, now,
+                        feedback_result_id
+                    ) + claimable_vars
+                )
+                if c.rowcount == 1:
+                    c.execute(
+                        f"""INSERT OR REPLACE INTO {self.TABLE_FEEDBACK_LEASES}
+                            VALUES (?, ?)""", (feedback_result_id, lease_token)
+                    )
+                    claimed.append(feedback_result_id)
+
+        logger.debug(
+            f"{worker_id or 'worker'} claimed {len(claimed)} feedback result(s)."
+        )
+
+        if len(claimed) == 0:
+            df = self._get_feedback_where(["0"], [])
+        else:
+            df = self._get_feedback_where(
+                [
+                    "f.feedback_result_id in (" + ",".join("?" * len(claimed)) +
+                    ")"
+                ], claimed
+            )
+
+        df["lease_token"] = lease_token
+
+        return df
+
+    def heartbeat_feedback(
+        self, feedback_result_ids: Sequence[FeedbackResultID], lease_token: str
+    ) -> int:
+        if len(feedback_result_ids) == 0:
+            return 0
+
+        with self._connection() as (conn, c):
+            c.execute(
+                f"""UPDATE {self.TABLE_FEEDBACKS}
+                    SET last_ts=?
+                    WHERE status=? AND feedback_result_id IN (
+                        SELECT feedback_result_id FROM {self.TABLE_FEEDBACK_LEASES}
+                        WHERE lease_token=? AND feedback_result_id IN ({",".join("?" * len(feedback_result_ids))})
+                    )""", (
+                    datetime.now().timestamp(),
+                    FeedbackResultStatus.RUNNING.value, lease_token
+                ) + tuple(feedback_result_ids)
+            )
+            updated = c.rowcount
+
+        return updated
+
+    def get_feedback_count_by_status(self) -> Dict[FeedbackResultStatus, int]:
+        with self._connection() as (conn, c):
+            c.execute(
+                f"""SELECT status, COUNT(*) FROM {self.TABLE_FEEDBACKS}
+                    GROUP BY status"""
+            )
+            counts = {
+                FeedbackResultStatus(status): count
+                for status, count in c.fetchall()
+            }
+
+        return counts
+
+    def get_app(self, app_id: str) -> JSON:
+        with self._connection() as (conn, c):
+            c.execute(
+                f"SELECT app_json FROM {self.TABLE_APPS} WHERE app_id=?",
+                (app_id,)
+            )
+            result = c.fetchone()[0]
 
         return json.loads(result)
 
+    def get_apps(self) -> Iterable[JSON]:
+        with self._connection() as (conn, c):
+            c.execute(f"SELECT app_json FROM {self.TABLE_APPS}")
+            rows = c.fetchall()
+
+        return [json.loads(row[0]) for row in rows]
+
     def get_records_and_feedback(
         self,
-        app_ids: Optional[List[str]] = None
+        app_ids: Optional[List[str]] = None,
+        record_ids: Optional[List[RecordID]] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        tags: Optional[Sequence[str]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        columns: Optional[Sequence[str]] = None,
+        feedback_calls: bool = True
     ) -> Tuple[pd.DataFrame, Sequence[str]]:
-        # This returns all apps if the list of app_ids is empty.
-        app_ids = app_ids or []
+        columns = records_columns(columns)
+        if "record_id" not in columns:
+            columns = ["record_id"] + columns
+        stored = stored_columns(columns)
 
-        conn, c = self._connect()
-        query = f"""
-            SELECT r.record_id, f.calls_json, f.result, f.name, f.multi_result
-            FROM {self.TABLE_RECORDS} r 
-            LEFT JOIN {self.TABLE_FEEDBACKS} f
-                ON r.record_id = f.record_id
-            """
-        if len(app_ids) > 0:
-            app_id_list = ', '.join('?' * len(app_ids))
-            query = query + f" WHERE r.app_id IN ({app_id_list})"
+        # Records are selected in a subquery so that pages are made of records
+        # rather than of their feedback results.
+        conditions = []
+        params = []
 
-        c.execute(query, app_ids)
-        rows = c.fetchall()
-        conn.close()
-        df_results = pd.DataFrame(
-            rows, columns=[description[0] for description in c.description]
-        )
-        if len(df_results) == 0:
-            return df_results, []
+        # This returns all apps if the list of app_ids is empty.
+        for column, values in [("app_id", app_ids), ("record_id", record_ids)]:
+            if values:
+                conditions.append(
+                    f"{column} IN ({', '.join('?' * len(values))})"
+                )
+                params += values
+
+        # Timestamps of records are stored as sqlite3 adapts datetimes, i.e. as
+        # ISO format strings.
+        if start_time is not None:
+            conditions.append("ts >= ?")
+            params.append(start_time)
+
+        if end_time is not None:
+            conditions.append("ts < ?")
+            params.append(end_time)
+
+        if tags:
+            conditions.append(
+                "(" + " OR ".join(
+                    "(',' || REPLACE(tags, ' ', '') || ',') LIKE ? ESCAPE '\\'"
+                    for _ in tags
+                ) + ")"
+            )
+            params += [f"%{_like_escape(_tag_token(tag))}%" for tag in tags]
+
+        page = f"SELECT record_id, ts FROM {self.TABLE_RECORDS}"
+        if len(conditions) > 0:
+            page += " WHERE " + " AND ".join(conditions)
+        if limit is not None or offset > 0:
+            page += " ORDER BY ts DESC, record_id DESC LIMIT ? OFFSET ?"
+            params += [limit if limit is not None else -1, offset]
+
+        record_cols = [
+            "c.app_json" if col == "app_json" else f"r.{col}" for col in stored
+        ]
+        feedback_cols = ["f.result", "f.name", "f.multi_result"]
+        if feedback_calls:
+            feedback_cols.append("f.calls_json")
 
-        conn, c = self._connect()
         query = f"""
-            SELECT DISTINCT r.*, c.app_json
-            FROM {self.TABLE_RECORDS} r 
+            SELECT {', '.join(record_cols + feedback_cols)}
+            FROM ({page}) p
+            JOIN {self.TABLE_RECORDS} r
+                ON r.record_id = p.record_id
             JOIN {self.TABLE_APPS} c
                 ON r.app_id = c.app_id
+            LEFT JOIN {self.TABLE_FEEDBACKS} f
+                ON r.record_id = f.record_id
+            ORDER BY p.ts DESC, p.record_id DESC
             """
-        if len(app_ids) > 0:
-            app_id_list = ', '.join('?' * len(app_ids))
-            query = query + f" WHERE r.app_id IN ({app_id_list})"
 
-        c.execute(query, app_ids)
-        rows = c.fetchall()
-        conn.close()
+        with self._connection() as (conn, c):
+            c.execute(query, params)
+            rows = c.fetchall()
 
-        df_records = pd.DataFrame(
+        df = pd.DataFrame(
             rows, columns=[description[0] for description in c.description]
         )
+        if len(df) == 0:
+            return pd.DataFrame([], columns=columns), []
 
-        apps = df_records['app_json'].apply(AppDefinition.parse_raw)
-        df_records['type'] = apps.apply(lambda row: str(row.root_class))
+        df_records = df[stored].drop_duplicates(subset="record_id")
+        df_results = df[["record_id"] + [col[2:] for col in feedback_cols]]
 
-        cost = df_records['cost_json'].map(Cost.parse_raw)
-        df_records['total_tokens'] = cost.map(lambda v: v.n_tokens)
-        df_records['total_cost'] = cost.map(lambda v: v.cost)
+        if "type" in columns:
+            apps = df_records['app_json'].apply(AppDefinition.parse_raw)
+            df_records['type'] = apps.apply(lambda row: str(row.root_class))
 
-        perf = df_records['perf_json'].apply(
-            lambda perf_json: Perf.parse_raw(perf_json)
-            if perf_json != MIGRATION_UNKNOWN_STR else MIGRATION_UNKNOWN_STR
-        )
+        if "total_tokens" in columns or "total_cost" in columns:
+            cost = df_records['cost_json'].map(Cost.parse_raw)
+            df_records['total_tokens'] = cost.map(lambda v: v.n_tokens)
+            df_records['total_cost'] = cost.map(lambda v: v.cost)
 
-        df_records['latency'] = perf.apply(
-            lambda p: p.latency.seconds
-            if p != MIGRATION_UNKNOWN_STR else MIGRATION_UNKNOWN_STR
-        )
+        if "latency" in columns:
+            perf = df_records['perf_json'].apply(
+                lambda perf_json: Perf.parse_raw(perf_json)
+                if perf_json != MIGRATION_UNKNOWN_STR else MIGRATION_UNKNOWN_STR
+            )
+
+            df_records['latency'] = perf.apply(
+                lambda p: p.latency.seconds
+                if p != MIGRATION_UNKNOWN_STR else MIGRATION_UNKNOWN_STR
+            )
 
-        if len(df_records) == 0:
-            return df_records, []
+        df_records = df_records[columns]
 
         result_cols = set()
 
@@ -672,15 +1606,14 @@ class LocalSQLite(DB):
                 else:
                     result_cols.add(row['name'])
                     row[row['name']] = row.result
-                row[row['name'] + "_calls"] = json.loads(row.calls_json
-                                                        )['calls']
+                if feedback_calls:
+                    row[row['name'] + "_calls"] = json.loads(row.calls_json
+                                                            )['calls']
 
             return pd.Series(row)
 
         df_results = df_results.apply(expand_results, axis=1)
-        df_results = df_results.drop(
-            columns=["name", "result", "multi_result", "calls_json"]
-        )
+        df_results = df_results.drop(columns=[col[2:] for col in feedback_cols])
 
         def nonempty(val):
             if isinstance(val, float):
@@ -704,6 +1637,60 @@ class LocalSQLite(DB):
 
         return combined_df, list(result_cols)
 
+    def get_app_summaries(
+        self,
+        app_ids: Optional[List[str]] = None
+    ) -> Tuple[pd.DataFrame, Sequence[str]]:
+        # This returns all apps if the list of app_ids is empty.
+        where = ""
+        params = []
+        if app_ids:
+            where = f"WHERE r.app_id IN ({', '.join('?' * len(app_ids))})"
+            params = list(app_ids)
+
+        # Latency and cost are only stored in json, not valid for records
+        # migrated from older versions (see MIGRATION_UNKNOWN_STR).
+        summaries_query = f"""
+            SELECT c.app_id, c.app_json, s.records, s.latency, s.total_cost,
+                s.total_tokens
+            FROM (
+                SELECT r.app_id, COUNT(*) AS records,
+                    AVG(CASE WHEN json_valid(r.perf_json) THEN (
+                        julianday(json_extract(r.perf_json, '$.end_time')) -
+                        julianday(json_extract(r.perf_json, '$.start_time'))
+                    ) * 86400 END) AS latency,
+                    TOTAL(CASE WHEN json_valid(r.cost_json)
+                        THEN json_extract(r.cost_json, '$.cost') END
+                    ) AS total_cost,
+                    SUM(CASE WHEN json_valid(r.cost_json)
+                        THEN json_extract(r.cost_json, '$.n_tokens') ELSE 0 END
+                    ) AS total_tokens
+                FROM {self.TABLE_RECORDS} r
+                {where}
+                GROUP BY r.app_id
+            ) s
+            JOIN {self.TABLE_APPS} c
+                ON s.app_id = c.app_id
+            """
+
+        means_query = f"""
+            SELECT r.app_id, f.name, AVG(f.result)
+            FROM {self.TABLE_FEEDBACKS} f
+            JOIN {self.TABLE_RECORDS} r
+                ON r.record_id = f.record_id
+            {where}
+            GROUP BY r.app_id, f.name
+            HAVING COUNT(f.result) > 0
+            """
+
+        with self._connection() as (conn, c):
+            c.execute(summaries_query, params)
+            summaries = c.fetchall()
+            c.execute(means_query, params)
+            means = c.fetchall()
+
+        return app_summaries_df(summaries, means)
+
 
 class TruDB(DB):
 
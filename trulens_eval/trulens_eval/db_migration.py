@@ -75,10 +75,11 @@ def _update_db_json_col(
 
 
 def migrate_0_3_0(db):
-    conn, c = db._connect()
-    c.execute(f"""ALTER TABLE feedbacks
-        ADD multi_result TEXT;""")
-    conn.commit()
+    with db._connection() as (conn, c):
+        c.execute(
+            f"""ALTER TABLE feedbacks
+            ADD multi_result TEXT;"""
+        )
 
 
 def migrate_0_2_0(db):
@@ -88,75 +89,76 @@ def migrate_0_2_0(db):
         db (DB): the db object
     """
 
-    conn, c = db._connect()
-    c.execute(
-        f"""SELECT * FROM records"""
-    )  # Use hardcode names as versions could go through name change
-    rows = c.fetchall()
-    json_db_col_idx = 7
-
-    def _replace_cost_none_vals(new_json):
-        if new_json['n_tokens'] is None:
-            new_json['n_tokens'] = 0
-
-        if new_json['cost'] is None:
-            new_json['cost'] = 0.0
-        return new_json
-
-    for old_entry in tqdm(rows, desc="Migrating Records DB 0.2.0 to 0.3.0"):
-        new_json = _replace_cost_none_vals(
-            json.loads(old_entry[json_db_col_idx])
-        )
-        _update_db_json_col(
-            db=db,
-            table=
-            "records",  # Use hardcode names as versions could go through name change
-            old_entry=old_entry,
-            json_db_col_idx=json_db_col_idx,
-            new_json=new_json
-        )
-
-    c.execute(f"""SELECT * FROM feedbacks""")
-    rows = c.fetchall()
-    json_db_col_idx = 9
-    for old_entry in tqdm(rows, desc="Migrating Feedbacks DB 0.2.0 to 0.3.0"):
-        new_json = _replace_cost_none_vals(
-            json.loads(old_entry[json_db_col_idx])
-        )
-        _update_db_json_col(
-            db=db,
-            table="feedbacks",
-            old_entry=old_entry,
-            json_db_col_idx=json_db_col_idx,
-            new_json=new_json
-        )
-
-    c.execute(f"""SELECT * FROM feedback_defs""")
-    rows = c.fetchall()
-    json_db_col_idx = 1
-    for old_entry in tqdm(rows,
-                          desc="Migrating FeedbackDefs DB 0.2.0 to 0.3.0"):
-        new_json = json.loads(old_entry[json_db_col_idx])
-        if 'implementation' in new_json:
-            new_json['implementation']['obj']['cls']['module'][
-                'module_name'] = new_json['implementation']['obj']['cls'][
-                    'module']['module_name'].replace(
-                        "tru_feedback", "feedback"
-                    )
-            if 'init_kwargs' in new_json['implementation']['obj']:
-                new_json['implementation']['obj']['init_bindings'] = {
-                    'args': (),
-                    'kwargs': new_json['implementation']['obj']['init_kwargs']
-                }
-                del new_json['implementation']['obj']['init_kwargs']
-        _update_db_json_col(
-            db=db,
-            table="feedback_defs",
-            old_entry=old_entry,
-            json_db_col_idx=json_db_col_idx,
-            new_json=new_json
-        )
-    conn.commit()
+    with db._connection() as (conn, c):
+        c.execute(
+            f"""SELECT * FROM records"""
+        )  # Use hardcode names as versions could go through name change
+        rows = c.fetchall()
+        json_db_col_idx = 7
+
+        def _replace_cost_none_vals(new_json):
+            if new_json['n_tokens'] is None:
+                new_json['n_tokens'] = 0
+
+            if new_json['cost'] is None:
+                new_json['cost'] = 0.0
+            return new_json
+
+        for old_entry in tqdm(rows, desc="Migrating Records DB 0.2.0 to 0.3.0"):
+            new_json = _replace_cost_none_vals(
+                json.loads(old_entry[json_db_col_idx])
+            )
+            _update_db_json_col(
+                db=db,
+                table=
+                "records",  # Use hardcode names as versions could go through name change
+                old_entry=old_entry,
+                json_db_col_idx=json_db_col_idx,
+                new_json=new_json
+            )
+
+        c.execute(f"""SELECT * FROM feedbacks""")
+        rows = c.fetchall()
+        json_db_col_idx = 9
+        for old_entry in tqdm(rows,
+                              desc="Migrating Feedbacks DB 0.2.0 to 0.3.0"):
+            new_json = _replace_cost_none_vals(
+                json.loads(old_entry[json_db_col_idx])
+            )
+            _update_db_json_col(
+                db=db,
+                table="feedbacks",
+                old_entry=old_entry,
+                json_db_col_idx=json_db_col_idx,
+                new_json=new_json
+            )
+
+        c.execute(f"""SELECT * FROM feedback_defs""")
+        rows = c.fetchall()
+        json_db_col_idx = 1
+        for old_entry in tqdm(rows,
+                              desc="Migrating FeedbackDefs DB 0.2.0 to 0.3.0"):
+            new_json = json.loads(old_entry[json_db_col_idx])
+            if 'implementation' in new_json:
+                new_json['implementation']['obj']['cls']['module'][
+                    'module_name'] = new_json['implementation']['obj']['cls'][
+                        'module']['module_name'].replace(
+                            "tru_feedback", "feedback"
+                        )
+                if 'init_kwargs' in new_json['implementation']['obj']:
+                    new_json['implementation']['obj']['init_bindings'] = {
+                        'args': (),
+                        'kwargs':
+                            new_json['implementation']['obj']['init_kwargs']
+                    }
+                    del new_json['implementation']['obj']['init_kwargs']
+            _update_db_json_col(
+                db=db,
+                table="feedback_defs",
+                old_entry=old_entry,
+                json_db_col_idx=json_db_col_idx,
+                new_json=new_json
+            )
 
 
 def migrate_0_1_2(db):
@@ -165,73 +167,72 @@ def migrate_0_1_2(db):
     Args:
         db (DB): the db object
     """
-    conn, c = db._connect()
-
-    c.execute(
-        f"""ALTER TABLE records
-        RENAME COLUMN chain_id TO app_id;
-        """
-    )
-    c.execute(
-        f"""ALTER TABLE records
-        ADD perf_json TEXT NOT NULL 
-        DEFAULT "{MIGRATION_UNKNOWN_STR}";"""
-    )
-
-    c.execute(f"""ALTER TABLE feedbacks
-        DROP COLUMN chain_id;""")
-
-    c.execute(
-        f"""SELECT * FROM records"""
-    )  # Use hardcode names as versions could go through name change
-    rows = c.fetchall()
-    json_db_col_idx = 4
-    for old_entry in tqdm(rows, desc="Migrating Records DB 0.1.2 to 0.2.0"):
-        new_json = json.loads(old_entry[json_db_col_idx])
-        new_json['app_id'] = new_json['chain_id']
-        del new_json['chain_id']
-        for calls_json in new_json['calls']:
-            calls_json['stack'] = calls_json['chain_stack']
-            del calls_json['chain_stack']
-
-        _update_db_json_col(
-            db=db,
-            table=
-            "records",  # Use hardcode names as versions could go through name change
-            old_entry=old_entry,
-            json_db_col_idx=json_db_col_idx,
-            new_json=new_json
+    with db._connection() as (conn, c):
+        c.execute(
+            f"""ALTER TABLE records
+            RENAME COLUMN chain_id TO app_id;
+            """
         )
-
-    c.execute(f"""SELECT * FROM chains""")
-    rows = c.fetchall()
-    json_db_col_idx = 1
-    for old_entry in tqdm(rows, desc="Migrating Apps DB 0.1.2 to 0.2.0"):
-        new_json = json.loads(old_entry[json_db_col_idx])
-        new_json['app_id'] = new_json['chain_id']
-        del new_json['chain_id']
-        new_json['root_class'] = {
-            'name': 'Unknown_class',
-            'module':
-                {
-                    'package_name': MIGRATION_UNKNOWN_STR,
-                    'module_name': MIGRATION_UNKNOWN_STR
-                },
-            'bases': None
-        }
-        new_json['feedback_mode'] = new_json['feedback_mode'].replace(
-            'chain', 'app'
+        c.execute(
+            f"""ALTER TABLE records
+            ADD perf_json TEXT NOT NULL 
+            DEFAULT "{MIGRATION_UNKNOWN_STR}";"""
         )
-        del new_json['db']
-        _update_db_json_col(
-            db=db,
-            table="apps",
-            old_entry=old_entry,
-            json_db_col_idx=json_db_col_idx,
-            new_json=new_json
+
+        c.execute(
+            f"""ALTER TABLE feedbacks
+            DROP COLUMN chain_id;"""
         )
 
-    conn.commit()
+        c.execute(
+            f"""SELECT * FROM records"""
+        )  # Use hardcode names as versions could go through name change
+        rows = c.fetchall()
+        json_db_col_idx = 4
+        for old_entry in tqdm(rows, desc="Migrating Records DB 0.1.2 to 0.2.0"):
+            new_json = json.loads(old_entry[json_db_col_idx])
+            new_json['app_id'] = new_json['chain_id']
+            del new_json['chain_id']
+            for calls_json in new_json['calls']:
+                calls_json['stack'] = calls_json['chain_stack']
+                del calls_json['chain_stack']
+
+            _update_db_json_col(
+                db=db,
+                table=
+                "records",  # Use hardcode names as versions could go through name change
+                old_entry=old_entry,
+                json_db_col_idx=json_db_col_idx,
+                new_json=new_json
+            )
+
+        c.execute(f"""SELECT * FROM chains""")
+        rows = c.fetchall()
+        json_db_col_idx = 1
+        for old_entry in tqdm(rows, desc="Migrating Apps DB 0.1.2 to 0.2.0"):
+            new_json = json.loads(old_entry[json_db_col_idx])
+            new_json['app_id'] = new_json['chain_id']
+            del new_json['chain_id']
+            new_json['root_class'] = {
+                'name': 'Unknown_class',
+                'module':
+                    {
+                        'package_name': MIGRATION_UNKNOWN_STR,
+                        'module_name': MIGRATION_UNKNOWN_STR
+                    },
+                'bases': None
+            }
+            new_json['feedback_mode'] = new_json['feedback_mode'].replace(
+                'chain', 'app'
+            )
+            del new_json['db']
+            _update_db_json_col(
+                db=db,
+                table="apps",
+                old_entry=old_entry,
+                json_db_col_idx=json_db_col_idx,
+                new_json=new_json
+            )
 
 
 upgrade_paths = {
@@ -296,15 +297,13 @@ def commit_migrated_version(db, version: str) -> None:
         db (DB): the db object
         version (str): The version string to set this DB to
     """
-    conn, c = db._connect()
-
-    c.execute(
-        f'''UPDATE {db.TABLE_META} 
-                SET value = '{version}' 
-                WHERE key='trulens_version'; 
-            '''
-    )
-    conn.commit()
+    with db._connection() as (conn, c):
+        c.execute(
+            f'''UPDATE {db.TABLE_META} 
+                    SET value = '{version}' 
+                    WHERE key='trulens_version'; 
+                '''
+        )
 
 
 def _upgrade_possible(compat_version: str) -> bool:
@@ -351,64 +350,64 @@ def _serialization_asserts(db) -> None:
         db (DB): the db object
     """
     global saved_db_locations
-    conn, c = db._connect()
-    SAVED_DB_FILE_LOC = saved_db_locations[db.filename]
-    validation_fail_advice = f"Please open a ticket on trulens github page including details on the old and new trulens versions. The migration completed so you can still proceed; but stability is not guaranteed. Your original DB file is saved here: {SAVED_DB_FILE_LOC} and can be used with the previous version, or you can `tru.reset_database()`"
-    for table in db.TABLES:
-        c.execute(f"""PRAGMA table_info({table});
-                """)
-        columns = c.fetchall()
-        for col_idx, col in tqdm(
-                enumerate(columns),
-                desc=f"Validating clean migration of table {table}"):
-            col_name_idx = 1
-            col_name = col[col_name_idx]
-            # This is naive for now...
-            if "json" in col_name:
-                c.execute(f"""SELECT * FROM {table}""")
-                rows = c.fetchall()
-                for row in rows:
-                    try:
-                        if row[col_idx] == MIGRATION_UNKNOWN_STR:
-                            continue
-
-                        test_json = json.loads(row[col_idx])
-                        # special implementation checks for serialized classes
-                        if 'implementation' in test_json:
-                            try:
-                                FunctionOrMethod.pick(
-                                    **(test_json['implementation'])
-                                ).load()
-                            except ImportError:
-                                # Import error is not a migration problem.
-                                # It signals that the function cannot be used for deferred evaluation.
-                                pass
-
-                        if col_name == "record_json":
-                            Record(**test_json)
-                        elif col_name == "cost_json":
-                            Cost(**test_json)
-                        elif col_name == "perf_json":
-                            Perf(**test_json)
-                        elif col_name == "calls_json":
-                            for record_app_call_json in test_json['calls']:
-                                FeedbackCall(**record_app_call_json)
-                        elif col_name == "feedback_json":
-                            FeedbackDefinition(**test_json)
-                        elif col_name == "app_json":
-                            AppDefinition(**test_json)
-                        else:
-                            # If this happens, trulens needs to add a migration
+    with db._connection() as (conn, c):
+        SAVED_DB_FILE_LOC = saved_db_locations[db.filename]
+        validation_fail_advice = f"Please open a ticket on trulens github page including details on the old and new trulens versions. The migration completed so you can still proceed; but stability is not guaranteed. Your original DB file is saved here: {SAVED_DB_FILE_LOC} and can be used with the previous version, or you can `tru.reset_database()`"
+        for table in db.TABLES:
+            c.execute(f"""PRAGMA table_info({table});
+                    """)
+            columns = c.fetchall()
+            for col_idx, col in tqdm(
+                    enumerate(columns),
+                    desc=f"Validating clean migration of table {table}"):
+                col_name_idx = 1
+                col_name = col[col_name_idx]
+                # This is naive for now...
+                if "json" in col_name:
+                    c.execute(f"""SELECT * FROM {table}""")
+                    rows = c.fetchall()
+                    for row in rows:
+                        try:
+                            if row[col_idx] == MIGRATION_UNKNOWN_STR:
+                                continue
+
+                            test_json = json.loads(row[col_idx])
+                            # special implementation checks for serialized classes
+                            if 'implementation' in test_json:
+                                try:
+                                    FunctionOrMethod.pick(
+                                        **(test_json['implementation'])
+                                    ).load()
+                                except ImportError:
+                                    # Import error is not a migration problem.
+                                    # It signals that the function cannot be used for deferred evaluation.
+                                    pass
+
+                            if col_name == "record_json":
+                                Record(**test_json)
+                            elif col_name == "cost_json":
+                                Cost(**test_json)
+                            elif col_name == "perf_json":
+                                Perf(**test_json)
+                            elif col_name == "calls_json":
+                                for record_app_call_json in test_json['calls']:
+                                    FeedbackCall(**record_app_call_json)
+                            elif col_name == "feedback_json":
+                                FeedbackDefinition(**test_json)
+                            elif col_name == "app_json":
+                                AppDefinition(**test_json)
+                            else:
+                                # If this happens, trulens needs to add a migration
+
+                                raise VersionException(
+                                    f"serialized column migration not implemented: {col_name}. {validation_fail_advice}"
+                                )
+                        except Exception as e:
+                            tb = traceback.format_exc()
 
                             raise VersionException(
-                                f"serialized column migration not implemented: {col_name}. {validation_fail_advice}"
+                                f"Migration failed on {table} {col_name} {row[col_idx]}.\n\n{tb}\n\n{validation_fail_advice}"
                             )
-                    except Exception as e:
-                        tb = traceback.format_exc()
-
-                        raise VersionException(
-                            f"Migration failed on {table} {col_name} {row[col_idx]}.\n\n{tb}\n\n{validation_fail_advice}"
-                        )
 
 
 def migrate(db) -> None:
@@ -428,6 +427,10 @@ def migrate(db) -> None:
     original_db_file = db.filename
     global saved_db_locations
 
+    # Make sure the copy below includes everything still in the write-ahead
+    # log or queued for writing.
+    db.close()
+
     saved_db_file = original_db_file.parent / f"{original_db_file.name}_saved_{uuid.uuid1()}"
     saved_db_locations[original_db_file] = saved_db_file
     shutil.copy(original_db_file, saved_db_file)
@@ -11,6 +11,7 @@ ImpCallable = Callable[..., Union[float, Tuple[float, Dict[str, Any]]]]
 AggCallable = Callable[[Iterable[float]], float]
 
 # Main class holding and running feedback functions:
+from trulens_eval.feedback.cache import FeedbackCache
 from trulens_eval.feedback.feedback import Feedback
 
 # Specific feedback functions:
@@ -24,6 +25,6 @@ from trulens_eval.feedback.provider.openai import AzureOpenAI
 from trulens_eval.feedback.provider.openai import OpenAI
 
 __all__ = [
-    'Feedback', 'Groundedness', 'GroundTruthAgreement', 'OpenAI', 'AzureOpenAI',
-    'Huggingface', 'Cohere'
+    'Feedback', 'FeedbackCache', 'Groundedness', 'GroundTruthAgreement',
+    'OpenAI', 'AzureOpenAI', 'Huggingface', 'Cohere'
 ]
@@ -0,0 +1,197 @@
+"""
+Persistent cache of feedback function results.
+
+Results are keyed by a hash of the serialized feedback implementation (minus
+anything that does not affect its output such as endpoint pacing settings)
+and the arguments it was called with. Entries are kept in a SQLite file and
+expire after `ttl_seconds`; when more than `max_entries` are stored, the least
+recently used ones are evicted.
+"""
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Union
+
+from trulens_eval.util import JSON
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_FILE = "feedback_cache.sqlite"
+
+# Evict entries beyond `max_entries` once every this many stores. The cache can
+# thus temporarily hold this many more entries than its limit.
+EVICT_EVERY = 100
+
+
+class FeedbackCache():
+    """
+    Cache of feedback function results stored in a SQLite file.
+
+    Args:
+
+    - filename: Union[str, Path] -- SQLite file to keep the cache in. Can be
+      shared by several processes.
+
+    - ttl_seconds: Optional[float] -- how long results are reused for. Never
+      expire if None.
+
+    - max_entries: Optional[int] -- number of results to keep, evicting least
+      recently used ones. Unbounded if None.
+    """
+
+    def __init__(
+        self,
+        filename: Union[str, Path] = DEFAULT_CACHE_FILE,
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = 100000
+    ):
+        self.filename = Path(filename)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        # One connection per thread.
+        self._local = threading.local()
+
+        # Number of results stored by this object, for spacing out evictions.
+        self._puts = 0
+
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS feedback_cache ("
+                "key TEXT NOT NULL PRIMARY KEY, "
+                "result_json TEXT NOT NULL, "
+                "created_ts REAL NOT NULL, "
+                "accessed_ts REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_feedback_cache_accessed_ts "
+                "ON feedback_cache (accessed_ts)"
+            )
+
+    def __repr__(self):
+        return f"FeedbackCache({self.filename})"
+
+    def __getstate__(self):
+        # Connections stay with the process that opened them, e.g. when passed
+        # to a worker process.
+        state = dict(self.__dict__)
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.filename, timeout=30.0)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def key(implementation: JSON, ins: Dict[str, Any]) -> str:
+        """
+        Cache key of calling the serialized `implementation` with arguments
+        `ins`.
+        """
+
+        return hashlib.sha256(
+            json.dumps(
+                dict(implementation=implementation, ins=ins),
+                sort_keys=True,
+                default=str
+            ).encode()
+        ).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Get the cached output of a feedback implementation, or None if there is
+        no live entry for `key`.
+        """
+
+        conn = self._connect()
+        now = time.time()
+
+        with conn:
+            row = conn.execute(
+                "SELECT result_json, created_ts FROM feedback_cache "
+                "WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            result_json, created_ts = row
+
+            if self.ttl_seconds is not None and \
+                    now - created_ts > self.ttl_seconds:
+                conn.execute("DELETE FROM feedback_cache WHERE key = ?", (key,))
+                return None
+
+            conn.execute(
+                "UPDATE feedback_cache SET accessed_ts = ? WHERE key = ?",
+                (now, key)
+            )
+
+        result = json.loads(result_json)
+        if result['meta'] is None:
+            return result['value']
+        else:
+            return (result['value'], result['meta'])
+
+    def put(self, key: str, output: Any) -> None:
+        """
+        Store the `output` of a feedback implementation. Outputs that cannot be
+        stored as JSON are not cached.
+        """
+
+        if isinstance(output, tuple):
+            value, meta = output
+        else:
+            value, meta = output, None
+
+        try:
+            result_json = json.dumps(dict(value=value, meta=meta))
+        except TypeError as e:
+            logger.debug(f"Not caching feedback output {output}: {e}")
+            return
+
+        conn = self._connect()
+        now = time.time()
+
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO feedback_cache VALUES (?, ?, ?, ?)",
+                (key, result_json, now, now)
+            )
+
+            self._puts += 1
+
+            if self.max_entries is not None and self._puts % EVICT_EVERY == 0:
+                # Evict least recently used entries beyond the limit.
+                conn.execute(
+                    "DELETE FROM feedback_cache WHERE key IN ("
+                    "SELECT key FROM feedback_cache "
+                    "ORDER BY accessed_ts DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+
+    def clear(self) -> None:
+        """
+        Remove all cached results.
+        """
+
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM feedback_cache")
+
+    def __len__(self) -> int:
+        conn = self._connect()
+        return conn.execute("SELECT COUNT(*) FROM feedback_cache").fetchone()[0]
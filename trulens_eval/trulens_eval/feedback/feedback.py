@@ -1,20 +1,27 @@
-from datetime import datetime
+import asyncio
+from concurrent.futures import Future
+import inspect
 from inspect import Signature
 from inspect import signature
 import itertools
 import json
 import logging
 import traceback
-from typing import Any, Callable, Dict, Iterable, Optional, Tuple, Union
+from typing import (
+    Any, Callable, Dict, Iterable, Optional, Sequence, Tuple, Union
+)
 
 import numpy as np
+import pandas as pd
 import pydantic
 
 from trulens_eval.feedback import AggCallable
 from trulens_eval.feedback import ImpCallable
+from trulens_eval.feedback.cache import FeedbackCache
 from trulens_eval.feedback.provider.endpoint.base import Endpoint
 from trulens_eval.schema import AppDefinition
 from trulens_eval.schema import Cost
+from trulens_eval.schema import DEFAULT_LEASE_SECONDS
 from trulens_eval.schema import FeedbackCall
 from trulens_eval.schema import FeedbackDefinition
 from trulens_eval.schema import FeedbackResult
@@ -22,12 +29,12 @@ from trulens_eval.schema import FeedbackResultID
 from trulens_eval.schema import FeedbackResultStatus
 from trulens_eval.schema import Record
 from trulens_eval.schema import Select
+from trulens_eval.util import Executor
 from trulens_eval.util import FunctionOrMethod
 from trulens_eval.util import JSON
 from trulens_eval.util import jsonify
-from trulens_eval.util import TP
+from trulens_eval.util import TaskPriority
 from trulens_eval.utils.text import UNICODE_CHECK
-from trulens_eval.utils.text import UNICODE_CLOCK
 from trulens_eval.utils.text import UNICODE_YIELD
 
 logger = logging.getLogger(__name__)
@@ -45,11 +52,16 @@ class Feedback(FeedbackDefinition):
     # An optional name. Only will affect display tables
     supplied_name: Optional[str] = None
 
+    # Optional cache of implementation results, not serialized. Deferred
+    # evaluation uses the cache given to `Tru` instead.
+    cache: Optional[FeedbackCache] = pydantic.Field(None, exclude=True)
+
     def __init__(
         self,
         imp: Optional[Callable] = None,
         agg: Optional[Callable] = None,
         name: Optional[str] = None,
+        cache: Optional[FeedbackCache] = None,
         **kwargs
     ):
         """
@@ -61,6 +73,11 @@ class Feedback(FeedbackDefinition):
 
         - agg: Optional[Callable] -- aggregation function for producing a single
           float for feedback implementations that are run more than once.
+
+        - cache: Optional[FeedbackCache] -- reuse results of the implementation
+          on the same arguments from this cache instead of calling it again.
+          The cache is not part of the stored definition, so deferred
+          evaluation uses `Tru(feedback_cache=...)` instead.
         """
 
         agg = agg or np.mean
@@ -115,6 +132,7 @@ class Feedback(FeedbackDefinition):
         self.imp = imp
         self.agg = agg
         self.supplied_name = name
+        self.cache = cache
 
         # Verify that `imp` expects the arguments specified in `selectors`:
         if self.imp is not None:
@@ -206,80 +224,90 @@ class Feedback(FeedbackDefinition):
         self.selectors = selectors
 
     @staticmethod
-    def evaluate_deferred(tru: 'Tru') -> int:
+    def evaluate_deferred(
+        tru: 'Tru',
+        limit: int = 100,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        retry_failed_seconds: float = 300.0,
+        worker_id: Optional[str] = None
+    ) -> int:
         """
         Evaluates feedback functions that were specified to be deferred. Returns
         an integer indicating how many evaluates were run.
+
+        At most `limit` feedback results are claimed from the database per
+        call: those not yet started, those RUNNING that made no progress in
+        `lease_seconds` and those that FAILED over `retry_failed_seconds` ago.
+        Leases taken here are not renewed, so results still waiting in the
+        executor after `lease_seconds` may be claimed again elsewhere; only
+        the first evaluation to finish under a current lease is written. Use
+        `trulens_eval.utils.worker.EvaluatorWorker` to keep leases alive.
         """
 
         db = tru.db
 
-        def prepare_feedback(row):
-            record_json = row.record_json
-            record = Record(**record_json)
-
-            app_json = row.app_json
-
-            feedback = Feedback(**row.feedback_json)
-            feedback.run_and_log(
-                record=record,
-                app=app_json,
-                tru=tru,
-                feedback_result_id=row.feedback_result_id
-            )
-
-        feedbacks = db.get_feedback()
-
-        started_count = 0
+        feedbacks = db.claim_pending_feedback(
+            limit=limit,
+            lease_seconds=lease_seconds,
+            retry_failed_seconds=retry_failed_seconds,
+            worker_id=worker_id
+        )
 
         for i, row in feedbacks.iterrows():
             feedback_ident = f"{row.fname} for app {row.app_json['app_id']}, record {row.record_id}"
 
-            if row.status == FeedbackResultStatus.NONE:
+            print(f"{UNICODE_YIELD} Feedback task starting: {feedback_ident}")
 
-                print(
-                    f"{UNICODE_YIELD} Feedback task starting: {feedback_ident}"
-                )
+            Feedback._submit_deferred_row(tru, row)
 
-                TP().runlater(prepare_feedback, row)
-                started_count += 1
+        return len(feedbacks)
 
-            elif row.status in [FeedbackResultStatus.RUNNING]:
-                now = datetime.now().timestamp()
-                if now - row.last_ts > 30:
-                    print(
-                        f"{UNICODE_YIELD} Feedback task last made progress over 30 seconds ago. "
-                        f"Retrying: {feedback_ident}"
-                    )
-                    TP().runlater(prepare_feedback, row)
-                    started_count += 1
+    @staticmethod
+    def _submit_deferred_row(tru: 'Tru', row: pd.Series) -> Future:
+        """
+        Evaluate the feedback described by a row returned by
+        `DB.claim_pending_feedback` in the shared `Executor`, limited per
+        endpoint like feedback evaluated on the app path.
+        """
 
-                else:
-                    print(
-                        f"{UNICODE_CLOCK} Feedback task last made progress less than 30 seconds ago. "
-                        f"Giving it more time: {feedback_ident}"
-                    )
+        try:
+            feedback = Feedback(**row.feedback_json)
+        except Exception as e:
+            future = Future()
+            future.set_exception(e)
+            return future
+
+        return Executor().submit_task(
+            Feedback._run_deferred_row,
+            args=(tru, row, feedback),
+            priority=TaskPriority.FEEDBACK,
+            key=feedback._endpoint_name()
+        )
 
-            elif row.status in [FeedbackResultStatus.FAILED]:
-                now = datetime.now().timestamp()
-                if now - row.last_ts > 60 * 5:
-                    print(
-                        f"{UNICODE_YIELD} Feedback task last made progress over 5 minutes ago. "
-                        f"Retrying: {feedback_ident}"
-                    )
-                    TP().runlater(prepare_feedback, row)
-                    started_count += 1
+    @staticmethod
+    def _run_deferred_row(
+        tru: 'Tru', row: pd.Series, feedback: 'Feedback'
+    ) -> None:
+        """
+        Run and log `feedback` for a row returned by
+        `DB.claim_pending_feedback`.
+        """
 
-                else:
-                    print(
-                        f"{UNICODE_CLOCK} Feedback task last made progress less than 5 minutes ago. "
-                        f"Not touching it for now: {feedback_ident}"
-                    )
+        record_json = row.record_json
+        record = Record(**record_json).with_blob_loader(tru.db.get_blobs)
 
-            elif row.status == FeedbackResultStatus.DONE:
-                pass
+        app_json = row.app_json
 
-        return started_count
+        if feedback.cache is None:
+            feedback.cache = tru.feedback_cache
+
+        feedback.run_and_log(
+            record=record,
+            app=app_json,
+            tru=tru,
+            feedback_result_id=row.feedback_result_id,
+            lease_token=row.lease_token
+        )
 
     def __call__(self, *args, **kwargs) -> Any:
         assert self.imp is not None, "Feedback definition needs an implementation to call."
@@ -297,7 +325,8 @@ class Feedback(FeedbackDefinition):
             imp=self.imp,
             selectors=self.selectors,
             agg=func,
-            name=self.supplied_name
+            name=self.supplied_name,
+            cache=self.cache
         )
 
     @staticmethod
@@ -347,7 +376,8 @@ class Feedback(FeedbackDefinition):
             imp=self.imp,
             selectors=new_selectors,
             agg=self.agg,
-            name=self.supplied_name
+            name=self.supplied_name,
+            cache=self.cache
         )
 
     on_input = on_prompt
@@ -370,7 +400,8 @@ class Feedback(FeedbackDefinition):
             imp=self.imp,
             selectors=new_selectors,
             agg=self.agg,
-            name=self.supplied_name
+            name=self.supplied_name,
+            cache=self.cache
         )
 
     on_output = on_response
@@ -395,7 +426,8 @@ class Feedback(FeedbackDefinition):
             imp=self.imp,
             selectors=new_selectors,
             agg=self.agg,
-            name=self.supplied_name
+            name=self.supplied_name,
+            cache=self.cache
         )
 
     def run(
@@ -414,10 +446,6 @@ class Feedback(FeedbackDefinition):
         else:
             app_json = app
 
-        result_vals = []
-
-        feedback_calls = []
-
         feedback_result = FeedbackResult(
             feedback_definition_id=self.feedback_definition_id,
             record_id=record.record_id,
@@ -428,93 +456,76 @@ class Feedback(FeedbackDefinition):
         try:
             # Total cost, will accumulate.
             cost = Cost()
-            multi_result = None
+            outputs = []
 
             for ins in self.extract_selection(app=app_json, record=record):
 
-                result_and_meta, part_cost = Endpoint.track_all_costs_tally(
-                    lambda: self.imp(**ins)
-                )
+                result_and_meta, part_cost = self._run_imp(ins)
                 cost += part_cost
+                outputs.append((ins, result_and_meta))
 
-                if isinstance(result_and_meta, Tuple):
-                    # If output is a tuple of two, we assume it is the float/multifloat and the metadata.
-                    assert len(result_and_meta) == 2, (
-                        f"Feedback functions must return either a single float, "
-                        f"a float-valued dict, or these in combination with a dictionary as a tuple."
-                    )
-                    result_val, meta = result_and_meta
-
-                    assert isinstance(
-                        meta, dict
-                    ), f"Feedback metadata output must be a dictionary but was {type(meta)}."
-                else:
-                    # Otherwise it is just the float. We create empty metadata dict.
-                    result_val = result_and_meta
-                    meta = dict()
-
-                if isinstance(result_val, dict):
-                    for val in result_val.values():
-                        assert isinstance(val, float), (
-                            f"Feedback function output with multivalue must be "
-                            f"a dict with float values but encountered {type(val)}."
-                        )
-                    feedback_call = FeedbackCall(
-                        args=ins,
-                        ret=np.mean(list(result_val.values())),
-                        meta=meta
-                    )
+            return self._finish_result(feedback_result, outputs, cost)
 
-                else:
-                    assert isinstance(
-                        result_val, float
-                    ), f"Feedback function output must be a float or dict but was {type(result_val)}."
-                    feedback_call = FeedbackCall(
-                        args=ins, ret=result_val, meta=meta
-                    )
+        except:
+            exc_tb = traceback.format_exc()
+            logger.warning(f"Feedback Function Exception Caught: {exc_tb}")
+            feedback_result.update(
+                error=exc_tb, status=FeedbackResultStatus.FAILED
+            )
+            return feedback_result
 
-                result_vals.append(result_val)
-                feedback_calls.append(feedback_call)
+    async def arun(
+        self, app: Union[AppDefinition, JSON], record: Record
+    ) -> FeedbackResult:
+        """
+        Async version of `run`. The implementation is evaluated on all of the
+        selected inputs concurrently. If it has an async variant (see
+        `_async_imp`), that is awaited on the running event loop; otherwise the
+        synchronous implementation is run in the loop's default executor.
+        """
 
-            if len(result_vals) == 0:
-                logger.warning(
-                    f"Feedback function {self.supplied_name if self.supplied_name is not None else self.name} with aggregation {self.agg} had no inputs."
-                )
-                result = np.nan
+        if isinstance(app, AppDefinition):
+            app_json = jsonify(app)
+        else:
+            app_json = app
 
-            else:
-                if isinstance(result_vals[0], float):
-                    result_vals = np.array(result_vals)
-                    result = self.agg(result_vals)
-                else:
-                    try:
-                        # Operates on list of dict; Can be a dict output
-                        # (maintain multi) or a float output (convert to single)
-                        result = self.agg(result_vals)
-                    except:
-                        # Alternatively, operate the agg per key
-                        result = {}
-                        for feedback_output in result_vals:
-                            for key in feedback_output:
-                                if key not in result:
-                                    result[key] = []
-                                result[key].append(feedback_output[key])
-                        for key in result:
-                            result[key] = self.agg(result[key])
-
-                    if isinstance(result, dict):
-                        multi_result = result
-                        result = np.nan
+        feedback_result = FeedbackResult(
+            feedback_definition_id=self.feedback_definition_id,
+            record_id=record.record_id,
+            name=self.supplied_name
+            if self.supplied_name is not None else self.name
+        )
 
-            feedback_result.update(
-                result=result,
-                status=FeedbackResultStatus.DONE,
-                cost=cost,
-                calls=feedback_calls,
-                multi_result=json.dumps(multi_result)
+        aimp = self._async_imp()
+        loop = asyncio.get_running_loop()
+
+        async def run_one(ins: Dict[str, Any]) -> Tuple[Any, Cost]:
+            if aimp is None:
+                return await loop.run_in_executor(None, self._run_imp, ins)
+
+            key, cached = self._cache_get(ins)
+            if cached is not None:
+                return cached
+
+            result_and_meta, part_cost = await Endpoint.atrack_all_costs_tally(
+                lambda: aimp(**ins)
             )
+            self._cache_put(key, result_and_meta)
 
-            return feedback_result
+            return result_and_meta, part_cost
+
+        try:
+            inss = list(self.extract_selection(app=app_json, record=record))
+
+            results = await asyncio.gather(*(run_one(ins) for ins in inss))
+
+            cost = sum((part_cost for _, part_cost in results), Cost())
+            outputs = [
+                (ins, result_and_meta)
+                for ins, (result_and_meta, _) in zip(inss, results)
+            ]
+
+            return self._finish_result(feedback_result, outputs, cost)
 
         except:
             exc_tb = traceback.format_exc()
@@ -524,13 +535,220 @@ class Feedback(FeedbackDefinition):
             )
             return feedback_result
 
+    def _run_imp(self, ins: Dict[str, Any]) -> Tuple[Any, Cost]:
+        """
+        Call the implementation on arguments `ins` unless its output is
+        cached, returning the output and the cost of producing it.
+        """
+
+        key, cached = self._cache_get(ins)
+        if cached is not None:
+            return cached
+
+        result_and_meta, part_cost = Endpoint.track_all_costs_tally(
+            lambda: self.imp(**ins)
+        )
+        self._cache_put(key, result_and_meta)
+
+        return result_and_meta, part_cost
+
+    def _cache_get(
+        self, ins: Dict[str, Any]
+    ) -> Tuple[Optional[str], Optional[Tuple[Any, Cost]]]:
+        """
+        Look up the output of the implementation on arguments `ins` in the
+        cache. Returns the cache key (None if not caching) and, on a hit, the
+        cached output and its cost.
+        """
+
+        key = self._cache_key(ins)
+        if key is None:
+            return None, None
+
+        cached = self.cache.get(key)
+        if cached is None:
+            return key, None
+
+        return key, (Feedback._cache_hit(cached), Cost(n_cache_hits=1))
+
+    def _cache_put(self, key: Optional[str], result_and_meta: Any) -> None:
+        """
+        Store the output of the implementation under a `key` from `_cache_get`.
+        """
+
+        if key is not None:
+            self.cache.put(key, result_and_meta)
+
+    def _cache_key(self, ins: Dict[str, Any]) -> Optional[str]:
+        """
+        Key of the output of the implementation on arguments `ins` in the
+        cache, or None if not caching.
+        """
+
+        if self.cache is None or self.implementation is None:
+            return None
+
+        implementation = jsonify(self.implementation)
+
+        obj = implementation.get("obj")
+        if obj is not None:
+            # Not part of what the implementation computes: the identity of
+            # the provider object and the settings of its api endpoint.
+            obj = dict(obj)
+            obj.pop("id", None)
+            if "init_bindings" in obj:
+                kwargs = dict(obj['init_bindings'].get('kwargs', {}))
+                kwargs.pop("endpoint", None)
+                obj['init_bindings'] = dict(obj['init_bindings'], kwargs=kwargs)
+            implementation = dict(implementation, obj=obj)
+
+        return FeedbackCache.key(implementation=implementation, ins=ins)
+
+    @staticmethod
+    def _cache_hit(result_and_meta: Any) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Mark a cached implementation output as such in its metadata.
+        """
+
+        if isinstance(result_and_meta, Tuple):
+            result_val, meta = result_and_meta
+        else:
+            result_val, meta = result_and_meta, dict()
+
+        return result_val, dict(meta, cache_hit=True)
+
+    def _async_imp(self) -> Optional[Callable]:
+        """
+        Get the coroutine function implementing this feedback function, if
+        any: either `imp` itself or, for provider methods like
+        `OpenAI.relevance`, the provider's method of the same name prefixed
+        with "a" like `OpenAI.arelevance`.
+        """
+
+        if inspect.iscoroutinefunction(self.imp):
+            return self.imp
+
+        obj = getattr(self.imp, "__self__", None)
+        name = getattr(self.imp, "__name__", None)
+
+        if obj is None or name is None:
+            return None
+
+        aimp = getattr(obj, "a" + name, None)
+
+        if aimp is not None and inspect.iscoroutinefunction(aimp):
+            return aimp
+
+        return None
+
+    def _finish_result(
+        self, feedback_result: FeedbackResult,
+        outputs: Sequence[Tuple[Dict[str, Any], Any]], cost: Cost
+    ) -> FeedbackResult:
+        """
+        Check and aggregate the `outputs` of the implementation on each of the
+        selected inputs into `feedback_result`.
+        """
+
+        result_vals = []
+
+        feedback_calls = []
+
+        multi_result = None
+
+        for ins, result_and_meta in outputs:
+            if isinstance(result_and_meta, Tuple):
+                # If output is a tuple of two, we assume it is the float/multifloat and the metadata.
+                assert len(result_and_meta) == 2, (
+                    f"Feedback functions must return either a single float, "
+                    f"a float-valued dict, or these in combination with a dictionary as a tuple."
+                )
+                result_val, meta = result_and_meta
+
+                assert isinstance(
+                    meta, dict
+                ), f"Feedback metadata output must be a dictionary but was {type(meta)}."
+            else:
+                # Otherwise it is just the float. We create empty metadata dict.
+                result_val = result_and_meta
+                meta = dict()
+
+            if isinstance(result_val, dict):
+                for val in result_val.values():
+                    assert isinstance(val, float), (
+                        f"Feedback function output with multivalue must be "
+                        f"a dict with float values but encountered {type(val)}."
+                    )
+                feedback_call = FeedbackCall(
+                    args=ins, ret=np.mean(list(result_val.values())), meta=meta
+                )
+
+            else:
+                assert isinstance(
+                    result_val, float
+                ), f"Feedback function output must be a float or dict but was {type(result_val)}."
+                feedback_call = FeedbackCall(
+                    args=ins, ret=result_val, meta=meta
+                )
+
+            result_vals.append(result_val)
+            feedback_calls.append(feedback_call)
+
+        if len(result_vals) == 0:
+            logger.warning(
+                f"Feedback function {self.supplied_name if self.supplied_name is not None else self.name} with aggregation {self.agg} had no inputs."
+            )
+            result = np.nan
+
+        else:
+            if isinstance(result_vals[0], float):
+                result_vals = np.array(result_vals)
+                result = self.agg(result_vals)
+            else:
+                try:
+                    # Operates on list of dict; Can be a dict output
+                    # (maintain multi) or a float output (convert to single)
+                    result = self.agg(result_vals)
+                except:
+                    # Alternatively, operate the agg per key
+                    result = {}
+                    for feedback_output in result_vals:
+                        for key in feedback_output:
+                            if key not in result:
+                                result[key] = []
+                            result[key].append(feedback_output[key])
+                    for key in result:
+                        result[key] = self.agg(result[key])
+
+                if isinstance(result, dict):
+                    multi_result = result
+                    result = np.nan
+
+        feedback_result.update(
+            result=result,
+            status=FeedbackResultStatus.DONE,
+            cost=cost,
+            calls=feedback_calls,
+            multi_result=json.dumps(multi_result)
+        )
+
+        return feedback_result
+
     def run_and_log(
         self,
         record: Record,
         tru: 'Tru',
         app: Union[AppDefinition, JSON] = None,
-        feedback_result_id: Optional[FeedbackResultID] = None
-    ) -> FeedbackResult:
+        feedback_result_id: Optional[FeedbackResultID] = None,
+        lease_token: Optional[str] = None
+    ) -> Optional[FeedbackResult]:
+        """
+        Run this feedback function on `record` and write its result to the
+        database of `tru`. With the `lease_token` of a claimed result, nothing
+        is run or written once the lease was taken over by someone else and
+        None is returned.
+        """
+
         record_id = record.record_id
         app_id = record.app_id
 
@@ -549,11 +767,12 @@ class Feedback(FeedbackDefinition):
             feedback_result_id = feedback_result.feedback_result_id
 
         try:
-            db.insert_feedback(
-                feedback_result.update(
-                    status=FeedbackResultStatus.RUNNING  # in progress
-                )
-            )
+            if db.insert_feedback(
+                    feedback_result.update(
+                        status=FeedbackResultStatus.RUNNING  # in progress
+                    ),
+                    lease_token=lease_token) is None:
+                return None
 
             feedback_result = self.run(
                 app=app, record=record
@@ -564,15 +783,31 @@ class Feedback(FeedbackDefinition):
             db.insert_feedback(
                 feedback_result.update(
                     error=exc_tb, status=FeedbackResultStatus.FAILED
-                )
+                ),
+                lease_token=lease_token
             )
             return
 
         # Otherwise update based on what Feedback.run produced (could be success or failure).
-        db.insert_feedback(feedback_result)
+        if db.insert_feedback(feedback_result, lease_token=lease_token) is None:
+            return None
 
         return feedback_result
 
+    def _endpoint_name(self) -> Optional[str]:
+        """
+        Name of the endpoint called by the implementation if it is a provider
+        method. Used to limit concurrent evaluations per endpoint.
+        """
+
+        endpoint = getattr(
+            getattr(self.imp, "__self__", None), "endpoint", None
+        )
+        if isinstance(endpoint, Endpoint):
+            return endpoint.name
+
+        return None
+
     @property
     def name(self):
         """
@@ -595,6 +830,7 @@ class Feedback(FeedbackDefinition):
         """
 
         arg_vals = {}
+        record_layout = None
 
         for k, v in self.selectors.items():
             if isinstance(v, Select.Query):
@@ -604,7 +840,9 @@ class Feedback(FeedbackDefinition):
                 raise RuntimeError(f"Unhandled selection type {type(v)}.")
 
             if q.path[0] == Select.Record.path[0]:
-                o = record.layout_calls_as_app()
+                if record_layout is None:
+                    record_layout = record.layout_calls_as_app()
+                o = record_layout
             elif q.path[0] == Select.App.path[0]:
                 o = app
             else:
@@ -615,6 +853,11 @@ class Feedback(FeedbackDefinition):
             q_within_o = Select.Query(path=q.path[1:])
             arg_vals[k] = list(q_within_o(o))
 
+            # Large strings of records loaded from a database may be left out
+            # until selected.
+            if o is not app:
+                arg_vals[k] = [record.rehydrate(v) for v in arg_vals[k]]
+
         keys = arg_vals.keys()
         vals = arg_vals.values()
 
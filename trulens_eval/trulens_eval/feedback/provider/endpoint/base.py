@@ -1,25 +1,31 @@
+import asyncio
+import atexit
+from contextvars import ContextVar
 import inspect
 import logging
+import os
 from pprint import PrettyPrinter
-from queue import Queue
-from threading import Thread
 from time import sleep
 from types import AsyncGeneratorType
+from types import GeneratorType
 from types import ModuleType
-from typing import (Any, Awaitable, Dict, Optional, Sequence,
+from typing import (Any, Awaitable, Callable, Dict, Optional, Sequence,
                     Tuple, Type, TypeVar)
+import weakref
 
 import pydantic
 import requests
 
 from trulens_eval.schema import Cost
 from trulens_eval.keys import ApiKeyError
-from trulens_eval.util import get_first_local_in_call_stack
 from trulens_eval.util import JSON
 from trulens_eval.util import SerialModel
 from trulens_eval.util import SingletonPerName
+from trulens_eval.utils import metrics
 
 from trulens_eval.utils.python import Thunk
+from trulens_eval.utils.rate_limit import DEFAULT_BURST_SECONDS
+from trulens_eval.utils.rate_limit import RateLimiter
 
 
 logger = logging.getLogger(__name__)
@@ -56,6 +62,19 @@ class EndpointCallback(SerialModel):
         self.handle(response)
 
 
+# Endpoints tracking costs, each with the callback tallying them, by type of
+# callback.
+EndpointsByCallback = Dict[Type[EndpointCallback],
+                           Sequence[Tuple['Endpoint', EndpointCallback]]]
+
+# Endpoints tracking costs in this context. Set by `Endpoint._track_costs` for
+# the duration of its thunk and looked up by wrapped API methods. Carries over
+# to tasks run by `TP`/`Executor` and to asyncio tasks.
+_ENDPOINTS: ContextVar[Optional[EndpointsByCallback]] = ContextVar(
+    "endpoints", default=None
+)
+
+
 class Endpoint(SerialModel, SingletonPerName):
 
     class Config:
@@ -67,6 +86,20 @@ class Endpoint(SerialModel, SingletonPerName):
     # Requests per minute.
     rpm: float = DEFAULT_RPM
 
+    # Tokens per minute, unlimited if None.
+    tpm: Optional[float] = None
+
+    # How many seconds worth of the above budgets can be used at once.
+    burst_seconds: float = DEFAULT_BURST_SECONDS
+
+    # SQLite file to share the above budgets across processes in. If not
+    # given, read from the TRULENS_RATE_LIMIT_PATH env. var. and if that is not
+    # set either, budgets are only shared within this process.
+    rate_limit_path: Optional[str] = pydantic.Field(
+        default_factory=lambda: os.environ.get("TRULENS_RATE_LIMIT_PATH"),
+        exclude=True
+    )
+
     # Retries (if performing requests using this class). TODO: wire this up to
     # the various endpoint systems' retries specification.
     retries: int = 3
@@ -76,10 +109,8 @@ class Endpoint(SerialModel, SingletonPerName):
         default_factory=dict, exclude=True
     )
 
-    # Queue that gets filled at rate rpm.
-    pace: Queue = pydantic.Field(
-        default_factory=lambda: Queue(maxsize=10), exclude=True
-    )
+    # Token buckets enforcing the above budgets.
+    pace: RateLimiter = pydantic.Field(exclude=True)
 
     # Track costs not run inside "track_cost" here. Also note that Endpoints are
     # singletons (one for each unique name argument) hence this global callback
@@ -95,8 +126,10 @@ class Endpoint(SerialModel, SingletonPerName):
     # Name of variable that stores the callback noted above.
     callback_name: str = pydantic.Field(exclude=True)
 
-    # Thread that fills the queue at the appropriate rate.
-    pace_thread: Thread = pydantic.Field(exclude=True)
+    # `aiohttp` sessions of `apost` by the event loop they were opened on.
+    _sessions: weakref.WeakKeyDictionary = pydantic.PrivateAttr(
+        default_factory=weakref.WeakKeyDictionary
+    )
 
     def __new__(cls, name: str, *args, **kwargs):
         return super(SingletonPerName, cls).__new__(
@@ -116,32 +149,60 @@ class Endpoint(SerialModel, SingletonPerName):
         kwargs['callback_class'] = callback_class
         kwargs['global_callback'] = callback_class()
         kwargs['callback_name'] = f"callback_{name}"
-        kwargs['pace_thread'] = Thread()  # temporary
+        kwargs['pace'] = RateLimiter(name=name)  # temporary
 
         super(SerialModel, self).__init__(*args, **kwargs)
 
-        def keep_pace():
-            while True:
-                sleep(60.0 / self.rpm)
-                self.pace.put(True)
-
-        self.pace_thread = Thread(target=keep_pace)
-        self.pace_thread.start()
+        self.pace = RateLimiter(
+            name=self.name,
+            rpm=self.rpm,
+            tpm=self.tpm,
+            burst_seconds=self.burst_seconds,
+            path=self.rate_limit_path
+        )
 
         logger.debug(f"*** Creating {self.name} endpoint ***")
 
+        atexit.register(self.close_sessions)
+
         # Extending class should call _instrument_module on the appropriate
         # modules and methods names.
 
-    def pace_me(self):
+    def pace_me(self, tokens: int = 0):
         """
-        Block until we can make a request to this endpoint.
+        Block until we can make a request to this endpoint that is expected to
+        use `tokens` tokens.
         """
 
-        self.pace.get()
+        self.pace.acquire(requests=1, tokens=tokens)
 
         return
 
+    async def apace_me(self, tokens: int = 0):
+        """
+        Wait until we can make a request to this endpoint without blocking the
+        event loop.
+        """
+
+        await self.pace.aacquire(requests=1, tokens=tokens)
+
+    def estimate_tokens(self, bindings: inspect.BoundArguments) -> int:
+        """
+        Tokens expected to be used by a call of an instrumented method with
+        the given `bindings`, reserved from the budgets of this endpoint before
+        the call is made. Endpoints with token budgets should implement this.
+        """
+        return 0
+
+    def handle_usage(self, response: Any, reserved: int = 0) -> None:
+        """
+        Charge the usage reported in the `response` of an instrumented method
+        to the budgets of this endpoint, less the `reserved` tokens already
+        taken before the call. Called on every response, whether or not costs
+        are being tracked. Endpoints with token budgets should implement this.
+        """
+        pass
+
     def post(
         self, url: str, payload: JSON, timeout: Optional[int] = None
     ) -> Any:
@@ -176,6 +237,113 @@ class Endpoint(SerialModel, SingletonPerName):
 
         return j[0]
 
+    async def apost(
+        self, url: str, payload: JSON, timeout: Optional[int] = None
+    ) -> Any:
+        """
+        Async version of `post`. Uses an `aiohttp` session instead of
+        `requests` so that waiting on the api does not occupy a thread.
+        """
+
+        import aiohttp
+
+        await self.apace_me()
+
+        request = self._session().post(
+            url,
+            json=payload,
+            headers=self.post_headers,
+            timeout=aiohttp.ClientTimeout(total=timeout)
+        )
+
+        async with request as resp:
+            ret = requests.Response()
+            ret.url = url
+            ret.status_code = resp.status
+            ret.headers.update(resp.headers)
+            ret.encoding = resp.get_encoding()
+            ret._content = await resp.read()
+
+        # Usage of `requests.post` is tracked by instrumenting it; the same
+        # callbacks are notified here with the equivalent response.
+        self._handle_response(
+            func=requests.post,
+            bindings=inspect.signature(requests.post).bind(
+                url, json=payload, timeout=timeout, headers=self.post_headers
+            ),
+            response=ret
+        )
+
+        j = ret.json()
+
+        # See `post` for these cases.
+        if "estimated_time" in j:
+            wait_time = j['estimated_time']
+            logger.error(f"Waiting for {j} ({wait_time}) second(s).")
+            await asyncio.sleep(wait_time + 2)
+            return await self.apost(url, payload)
+
+        if isinstance(j, Dict) and "error" in j:
+            error = j['error']
+            logger.error(f"API error: {j}.")
+            if error == "overloaded":
+                logger.error("Waiting for overloaded API before trying again.")
+                await asyncio.sleep(10.0)
+                return await self.apost(url, payload)
+            else:
+                raise RuntimeError(error)
+
+        assert isinstance(
+            j, Sequence
+        ) and len(j) > 0, f"Post did not return a sequence: {j}"
+
+        return j[0]
+
+    def _session(self) -> 'aiohttp.ClientSession':
+        """
+        The `aiohttp` session of this endpoint on the running event loop,
+        opened on first use so that connections are reused across requests.
+        """
+
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession()
+            self._sessions[loop] = session
+
+        return session
+
+    async def aclose(self) -> None:
+        """
+        Close the `aiohttp` session of this endpoint on the running event loop.
+        Another one is opened if `apost` is used again.
+        """
+
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+
+    def close_sessions(self) -> None:
+        """
+        Close the `aiohttp` sessions of this endpoint on all event loops that
+        are not running. Called at interpreter exit. Sessions of loops that
+        were already closed are discarded along with their connections.
+        """
+
+        for loop, session in list(self._sessions.items()):
+            if session.closed or loop.is_running():
+                continue
+
+            del self._sessions[loop]
+
+            if loop.is_closed():
+                session.detach()
+            else:
+                loop.run_until_complete(session.close())
+
     def run_me(self, thunk: Thunk[T]) -> T:
         """
         Run the given thunk, returning itse output, on pace with the api.
@@ -203,6 +371,33 @@ class Endpoint(SerialModel, SingletonPerName):
             f"API {self.name} request failed {self.retries+1} time(s)."
         )
 
+    async def arun_me(self, thunk: Thunk[Awaitable[T]]) -> T:
+        """
+        Async version of `run_me`: await the awaitable produced by the given
+        thunk on pace with the api, retrying as `run_me` does.
+        """
+
+        retries = self.retries + 1
+        retry_delay = 2.0
+
+        while retries > 0:
+            try:
+                await self.apace_me()
+                ret = await thunk()
+                return ret
+            except Exception as e:
+                retries -= 1
+                logger.error(
+                    f"{self.name} request failed {type(e)}={e}. Retries remaining={retries}."
+                )
+                if retries > 0:
+                    await asyncio.sleep(retry_delay)
+                    retry_delay *= 2
+
+        raise RuntimeError(
+            f"API {self.name} request failed {self.retries+1} time(s)."
+        )
+
     def _instrument_module(self, mod: ModuleType, method_name: str) -> None:
         if hasattr(mod, method_name):
             logger.debug(
@@ -328,7 +523,7 @@ class Endpoint(SerialModel, SingletonPerName):
         result, cbs = Endpoint.track_all_costs(
             thunk, with_openai=with_openai, with_hugs=with_hugs
         )
-        return result, sum(cb.cost for cb in cbs)
+        return result, sum((cb.cost for cb in cbs), Cost())
 
     @staticmethod
     async def atrack_all_costs_tally(
@@ -344,7 +539,7 @@ class Endpoint(SerialModel, SingletonPerName):
         result, cbs = await Endpoint.atrack_all_costs(
             thunk, with_openai=with_openai, with_hugs=with_hugs
         )
-        return result, sum(cb.cost for cb in cbs)
+        return result, sum((cb.cost for cb in cbs), Cost())
 
     @staticmethod
     def _track_costs(
@@ -359,12 +554,7 @@ class Endpoint(SerialModel, SingletonPerName):
         logger.debug("Starting to track costs.")
 
         # Check to see if this call is within another _track_costs call:
-        endpoints: Dict[Type[EndpointCallback], Sequence[Tuple[Endpoint, EndpointCallback]]] = \
-            get_first_local_in_call_stack(
-                key="endpoints",
-                func=Endpoint.__find_tracker,
-                offset=1
-            )
+        endpoints: Optional[EndpointsByCallback] = _ENDPOINTS.get()
 
         if endpoints is None:
             # If not, lets start a new collection of endpoints here along with
@@ -375,7 +565,7 @@ class Endpoint(SerialModel, SingletonPerName):
         else:
             # We copy the dict here so that the outer call to _track_costs will
             # have their own version unaffacted by our additions below. Once
-            # this frame returns, the outer frame will have its own endpoints
+            # this call returns, the outer call will have its own endpoints
             # again and any wrapped method will get that smaller set of
             # endpoints.
 
@@ -400,13 +590,17 @@ class Endpoint(SerialModel, SingletonPerName):
                 endpoints[callback_class] = []
 
             # And add them to the endpoints dict. This will be retrieved from
-            # locals of this frame later in the wrapped methods.
+            # the context later in the wrapped methods.
             endpoints[callback_class].append((endpoint, callback))
 
             callbacks.append(callback)
 
         # Call the thunk.
-        result: T = thunk()
+        token = _ENDPOINTS.set(endpoints)
+        try:
+            result: T = thunk()
+        finally:
+            _ENDPOINTS.reset(token)
 
         # Return result and only the callbacks created here. Outer thunks might
         # return others.
@@ -423,12 +617,7 @@ class Endpoint(SerialModel, SingletonPerName):
         """
 
         # Check to see if this call is within another _track_costs call:
-        endpoints: Dict[Type[EndpointCallback], Sequence[Tuple[Endpoint, EndpointCallback]]] = \
-            get_first_local_in_call_stack(
-                key="endpoints",
-                func=Endpoint.__find_tracker,
-                offset=1
-            )
+        endpoints: Optional[EndpointsByCallback] = _ENDPOINTS.get()
 
         if endpoints is None:
             # If not, lets start a new collection of endpoints here along with
@@ -439,7 +628,7 @@ class Endpoint(SerialModel, SingletonPerName):
         else:
             # We copy the dict here so that the outer call to _track_costs will
             # have their own version unaffacted by our additions below. Once
-            # this frame returns, the outer frame will have its own endpoints
+            # this call returns, the outer call will have its own endpoints
             # again and any wrapped method will get that smaller set of
             # endpoints.
 
@@ -464,13 +653,17 @@ class Endpoint(SerialModel, SingletonPerName):
                 endpoints[callback_class] = []
 
             # And add them to the endpoints dict. This will be retrieved from
-            # locals of this frame later in the wrapped methods.
+            # the context later in the wrapped methods.
             endpoints[callback_class].append((endpoint, callback))
 
             callbacks.append(callback)
 
         # Call the thunk.
-        result: T = await thunk()
+        token = _ENDPOINTS.set(endpoints)
+        try:
+            result: T = await thunk()
+        finally:
+            _ENDPOINTS.reset(token)
 
         # Return result and only the callbacks created here. Outer thunks might
         # return others.
@@ -487,13 +680,6 @@ class Endpoint(SerialModel, SingletonPerName):
 
         return result, callbacks[0]
 
-    @staticmethod
-    def __find_tracker(f):
-        return id(f) in [
-            id(m.__code__)
-            for m in [Endpoint._track_costs, Endpoint._atrack_costs]
-        ]
-
     def handle_wrapped_call(
         self, bindings: inspect.BoundArguments, response: Any,
         callback: Optional[EndpointCallback]
@@ -516,6 +702,44 @@ class Endpoint(SerialModel, SingletonPerName):
         """
         pass
 
+    def _handle_response(
+        self, func: Callable, bindings: inspect.BoundArguments, response: Any
+    ) -> None:
+        """
+        Notify the callbacks of this endpoint of a `response` to a call of
+        `func` that was made without going through an instrumented method, as
+        the wrapped methods produced by `wrap_function` would have.
+        """
+
+        endpoints: Optional[EndpointsByCallback] = _ENDPOINTS.get()
+
+        if endpoints is None or self.callback_class not in endpoints:
+            return
+
+        for endpoint, callback in endpoints[self.callback_class]:
+            endpoint.handle_wrapped_call(
+                func=func,
+                bindings=bindings,
+                response=response,
+                callback=callback
+            )
+
+    def _handle_untracked(
+        self, func: Callable, bindings: inspect.BoundArguments, response: Any
+    ) -> None:
+        """
+        Tally a `response` to a call of `func` made outside of `track_cost` in
+        the global callback only, for the endpoint metrics of
+        `utils/metrics.py`.
+        """
+
+        try:
+            self.handle_wrapped_call(
+                func=func, bindings=bindings, response=response, callback=None
+            )
+        except Exception as e:
+            logger.debug(f"Could not tally untracked call to {func}: {e}")
+
     def wrap_function(self, func):
         if hasattr(func, INSTRUMENT):
             # Store the types of callback classes that will handle calls to the
@@ -550,8 +774,12 @@ class Endpoint(SerialModel, SingletonPerName):
         # If INSTRUMENT is not set, create a wrapper method and return it.
 
         async def _agenwrapper_completion(
-            responses: AsyncGeneratorType, *args, **kwargs
+            responses: AsyncGeneratorType,
+            endpoints: Optional[EndpointsByCallback], *args, **kwargs
         ):
+            # `endpoints` are those expecting to be notified when the wrapped
+            # function was called, as the responses may be consumed elsewhere
+            # (see Endpoint._track_costs for definition).
 
             bindings = inspect.signature(func).bind(*args, **kwargs)
 
@@ -562,16 +790,6 @@ class Endpoint(SerialModel, SingletonPerName):
                 _agenwrapper_completion, INSTRUMENT
             )
 
-            # Look up the endpoints that are expecting to be notified and the
-            # callback tracking the tally. See Endpoint._track_costs for
-            # definition.
-            endpoints: Dict[Type[EndpointCallback], Sequence[Tuple[Endpoint, EndpointCallback]]] = \
-                get_first_local_in_call_stack(
-                    key="endpoints",
-                    func=self.__find_tracker,
-                    offset=0
-                )
-
             # If wrapped method was not called from within _track_costs, we will
             # get None here and do nothing but return wrapped function's
             # response.
@@ -584,6 +802,8 @@ class Endpoint(SerialModel, SingletonPerName):
                 yield response
 
                 if endpoints is None:
+                    if metrics.ENABLED:
+                        self._handle_untracked(func, bindings, response)
                     continue
 
                 for callback_class in registered_callback_classes:
@@ -612,7 +832,9 @@ class Endpoint(SerialModel, SingletonPerName):
             # Get the result of the wrapped function:
             responses: AsyncGeneratorType = await func(*args, **kwargs)
 
-            return _agenwrapper_completion(responses, *args, **kwargs)
+            return _agenwrapper_completion(
+                responses, _ENDPOINTS.get(), *args, **kwargs
+            )
 
         # TODO: async/sync code duplication
         async def awrapper(*args, **kwargs):
@@ -620,21 +842,31 @@ class Endpoint(SerialModel, SingletonPerName):
                 f"Calling async wrapped {func.__name__} for {self.name}."
             )
 
+            bindings = inspect.signature(func).bind(*args, **kwargs)
+
+            reserved = self.estimate_tokens(bindings)
+            if reserved > 0:
+                await self.pace.aacquire(requests=0, tokens=reserved)
+
             # Get the result of the wrapped function:
-            response_or_generator = await func(*args, **kwargs)
+            try:
+                response_or_generator = await func(*args, **kwargs)
+            except BaseException:
+                self.pace.aconsume(tokens=-reserved)
+                raise
 
             # Check that it is an async generator first. Sometimes we cannot
             # tell statically (via inspect) that a function will produce a
             # generator.
             if inspect.isasyncgen(response_or_generator):
                 return _agenwrapper_completion(
-                    response_or_generator, *args, **kwargs
+                    response_or_generator, _ENDPOINTS.get(), *args, **kwargs
                 )
 
             # Otherwise this is not an async generator.
             response = response_or_generator
 
-            bindings = inspect.signature(func).bind(*args, **kwargs)
+            self.handle_usage(response, reserved=reserved)
 
             # Get all of the callback classes suitable for handling this call.
             # Note that we stored this in the INSTRUMENT attribute of the
@@ -644,18 +876,15 @@ class Endpoint(SerialModel, SingletonPerName):
             # Look up the endpoints that are expecting to be notified and the
             # callback tracking the tally. See Endpoint._track_costs for
             # definition.
-            endpoints: Dict[Type[EndpointCallback], Sequence[Tuple[Endpoint, EndpointCallback]]] = \
-                get_first_local_in_call_stack(
-                    key="endpoints",
-                    func=self.__find_tracker,
-                    offset=0
-                )
+            endpoints: Optional[EndpointsByCallback] = _ENDPOINTS.get()
 
             # If wrapped method was not called from within _track_costs, we will
             # get None here and do nothing but return wrapped function's
             # response.
             if endpoints is None:
                 logger.debug("No endpoints found.")
+                if metrics.ENABLED:
+                    self._handle_untracked(func, bindings, response)
                 return response
 
             for callback_class in registered_callback_classes:
@@ -678,13 +907,64 @@ class Endpoint(SerialModel, SingletonPerName):
 
             return response
 
+        def _genwrapper_completion(
+            responses: GeneratorType, endpoints: Optional[EndpointsByCallback],
+            *args, **kwargs
+        ):
+            # Sync version of _agenwrapper_completion .
+
+            bindings = inspect.signature(func).bind(*args, **kwargs)
+
+            registered_callback_classes = getattr(wrapper, INSTRUMENT)
+
+            for response in responses:
+                yield response
+
+                if endpoints is None:
+                    if metrics.ENABLED:
+                        self._handle_untracked(func, bindings, response)
+                    continue
+
+                for callback_class in registered_callback_classes:
+                    if callback_class not in endpoints:
+                        logger.warning(
+                            f"Callback class {callback_class.__name__} is registered for handling {func.__name__}"
+                            " but there are no endpoints waiting to receive the result."
+                        )
+                        continue
+
+                    for endpoint, callback in endpoints[callback_class]:
+                        endpoint.handle_wrapped_call(
+                            func=func,
+                            bindings=bindings,
+                            response=response,
+                            callback=callback
+                        )
+
         def wrapper(*args, **kwargs):
             logger.debug(f"Calling wrapped {func.__name__} for {self.name}.")
 
+            bindings = inspect.signature(func).bind(*args, **kwargs)
+
+            reserved = self.estimate_tokens(bindings)
+            if reserved > 0:
+                self.pace.acquire(requests=0, tokens=reserved)
+
             # Get the result of the wrapped function:
-            response: Any = func(*args, **kwargs)
+            try:
+                response: Any = func(*args, **kwargs)
+            except BaseException:
+                self.pace.consume(tokens=-reserved)
+                raise
+
+            # Streamed responses (e.g. openai with stream=True) are handled
+            # chunk by chunk as they are consumed.
+            if inspect.isgenerator(response):
+                return _genwrapper_completion(
+                    response, _ENDPOINTS.get(), *args, **kwargs
+                )
 
-            bindings = inspect.signature(func).bind(*args, **kwargs)
+            self.handle_usage(response, reserved=reserved)
 
             # Get all of the callback classes suitable for handling this call.
             # Note that we stored this in the INSTRUMENT attribute of the
@@ -694,17 +974,14 @@ class Endpoint(SerialModel, SingletonPerName):
             # Look up the endpoints that are expecting to be notified and the
             # callback tracking the tally. See Endpoint._track_costs for
             # definition.
-            endpoints: Dict[Type[EndpointCallback], Sequence[Tuple[Endpoint, EndpointCallback]]] = \
-                get_first_local_in_call_stack(
-                    key="endpoints",
-                    func=self.__find_tracker,
-                    offset=0
-                )
+            endpoints: Optional[EndpointsByCallback] = _ENDPOINTS.get()
 
             # If wrapped method was not called from within _track_costs, we will
             # get None here and do nothing but return wrapped function's
             # response.
             if endpoints is None:
+                if metrics.ENABLED:
+                    self._handle_untracked(func, bindings, response)
                 return response
 
             for callback_class in registered_callback_classes:
@@ -1,4 +1,5 @@
 import inspect
+import json
 import logging
 from typing import Any, Callable, Dict, List, Optional
 
@@ -95,6 +96,26 @@ class OpenAIEndpoint(Endpoint, WithClassInfo):
     def __new__(cls, *args, **kwargs):
         return super(Endpoint, cls).__new__(cls, name="openai")
 
+    def estimate_tokens(self, bindings: inspect.BoundArguments) -> int:
+        # Roughly 4 characters per token of the prompt plus the most the
+        # completion may use if limited.
+        params = bindings.kwargs
+
+        prompt = params.get('prompt', params.get('input', ""))
+        if 'messages' in params:
+            prompt = [message.get('content') for message in params['messages']]
+
+        return len(json.dumps(prompt)) // 4 + (params.get('max_tokens') or 0)
+
+    def handle_usage(self, response: Any, reserved: int = 0) -> None:
+        # Streamed responses are generators and are only charged what was
+        # reserved for them.
+        if isinstance(response, dict) and 'usage' in response:
+            self.pace.consume(
+                requests=0,
+                tokens=response['usage'].get('total_tokens', 0) - reserved
+            )
+
     def handle_wrapped_call(
         self, func: Callable, bindings: inspect.BoundArguments, response: Any,
         callback: Optional[EndpointCallback]
@@ -1,12 +1,13 @@
+import asyncio
 import logging
-from multiprocessing.pool import AsyncResult
-from typing import Dict
+from typing import Dict, Optional, Tuple
 
 import numpy as np
 
 from trulens_eval.feedback.provider.base import Provider
 from trulens_eval.feedback.provider.endpoint import HuggingfaceEndpoint
 from trulens_eval.feedback.provider.endpoint.base import Endpoint
+from trulens_eval.util import TaskFuture
 from trulens_eval.util import TP
 
 logger = logging.getLogger(__name__)
@@ -20,6 +21,39 @@ HUGS_LANGUAGE_API_URL = "https://api-inference.huggingface.co/models/papluca/xlm
 HUGS_NLI_API_URL = "https://api-inference.huggingface.co/models/ynie/roberta-large-snli_mnli_fever_anli_R1_R2_R3-nli"
 HUGS_DOCNLI_API_URL = "https://api-inference.huggingface.co/models/MoritzLaurer/DeBERTa-v3-base-mnli-fever-docnli-ling-2c"
 
+# Longest prefix of texts sent to classification models.
+MAX_LENGTH = 500
+
+
+def _payload(text: str) -> Dict:
+    return {"inputs": text[:MAX_LENGTH]}
+
+
+def _label_score(hf_response, label: str) -> Optional[float]:
+    """
+    Score of `label` in a classification response, None if absent.
+    """
+
+    for item in hf_response:
+        if item['label'] == label:
+            return item['score']
+
+
+def _label_scores(hf_response) -> Dict[str, float]:
+    return {item['label']: item['score'] for item in hf_response}
+
+
+def _language_match(scores1: Dict[str, float],
+                    scores2: Dict[str, float]) -> Tuple[float, Dict]:
+    langs = list(scores1.keys())
+    prob1 = np.array([scores1[k] for k in langs])
+    prob2 = np.array([scores2[k] for k in langs])
+    diff = prob1 - prob2
+
+    l1 = 1.0 - (np.linalg.norm(diff, ord=1)) / 2.0
+
+    return l1, dict(text1_scores=scores1, text2_scores=scores2)
+
 
 class Huggingface(Provider):
 
@@ -65,31 +99,34 @@ class Huggingface(Provider):
         assert len(text1) > 0 and len(text2) > 0, "Inputs cannot be blank."
 
         def get_scores(text):
-            payload = {"inputs": text}
             hf_response = self.endpoint.post(
-                url=HUGS_LANGUAGE_API_URL, payload=payload, timeout=30
+                url=HUGS_LANGUAGE_API_URL, payload=_payload(text), timeout=30
             )
-            return {r['label']: r['score'] for r in hf_response}
+            return _label_scores(hf_response)
 
-        max_length = 500
-        scores1: AsyncResult[Dict] = TP().promise(
-            get_scores, text=text1[:max_length]
-        )
-        scores2: AsyncResult[Dict] = TP().promise(
-            get_scores, text=text2[:max_length]
-        )
+        scores1: TaskFuture = TP().promise(get_scores, text=text1)
+        scores2: TaskFuture = TP().promise(get_scores, text=text2)
+
+        return _language_match(scores1.get(), scores2.get())
+
+    async def alanguage_match(self, text1: str, text2: str) -> float:
+        """
+        Async version of `language_match`.
+        """
 
-        scores1: Dict = scores1.get()
-        scores2: Dict = scores2.get()
+        assert len(text1) > 0 and len(text2) > 0, "Inputs cannot be blank."
 
-        langs = list(scores1.keys())
-        prob1 = np.array([scores1[k] for k in langs])
-        prob2 = np.array([scores2[k] for k in langs])
-        diff = prob1 - prob2
+        async def get_scores(text):
+            hf_response = await self.endpoint.apost(
+                url=HUGS_LANGUAGE_API_URL, payload=_payload(text), timeout=30
+            )
+            return _label_scores(hf_response)
 
-        l1 = 1.0 - (np.linalg.norm(diff, ord=1)) / 2.0
+        scores1, scores2 = await asyncio.gather(
+            get_scores(text1), get_scores(text2)
+        )
 
-        return l1, dict(text1_scores=scores1, text2_scores=scores2)
+        return _language_match(scores1, scores2)
 
     def positive_sentiment(self, text: str) -> float:
         """
@@ -106,17 +143,24 @@ class Huggingface(Provider):
 
         assert len(text) > 0, "Input cannot be blank."
 
-        max_length = 500
-        truncated_text = text[:max_length]
-        payload = {"inputs": truncated_text}
-
         hf_response = self.endpoint.post(
-            url=HUGS_SENTIMENT_API_URL, payload=payload
+            url=HUGS_SENTIMENT_API_URL, payload=_payload(text)
         )
 
-        for label in hf_response:
-            if label['label'] == 'LABEL_2':
-                return label['score']
+        return _label_score(hf_response, 'LABEL_2')
+
+    async def apositive_sentiment(self, text: str) -> float:
+        """
+        Async version of `positive_sentiment`.
+        """
+
+        assert len(text) > 0, "Input cannot be blank."
+
+        hf_response = await self.endpoint.apost(
+            url=HUGS_SENTIMENT_API_URL, payload=_payload(text)
+        )
+
+        return _label_score(hf_response, 'LABEL_2')
 
     def not_toxic(self, text: str) -> float:
         """
@@ -133,16 +177,24 @@ class Huggingface(Provider):
 
         assert len(text) > 0, "Input cannot be blank."
 
-        max_length = 500
-        truncated_text = text[:max_length]
-        payload = {"inputs": truncated_text}
         hf_response = self.endpoint.post(
-            url=HUGS_TOXIC_API_URL, payload=payload
+            url=HUGS_TOXIC_API_URL, payload=_payload(text)
         )
 
-        for label in hf_response:
-            if label['label'] == 'toxic':
-                return label['score']
+        return _label_score(hf_response, 'toxic')
+
+    async def anot_toxic(self, text: str) -> float:
+        """
+        Async version of `not_toxic`.
+        """
+
+        assert len(text) > 0, "Input cannot be blank."
+
+        hf_response = await self.endpoint.apost(
+            url=HUGS_TOXIC_API_URL, payload=_payload(text)
+        )
+
+        return _label_score(hf_response, 'toxic')
 
     def _summarized_groundedness(self, premise: str, hypothesis: str) -> float:
         """ A groundedness measure best used for summarized premise against simple hypothesis.
@@ -1,4 +1,5 @@
 import logging
+from typing import Dict, List
 
 import openai
 
@@ -52,6 +53,25 @@ class OpenAI(Provider):
     def _create_chat_completion(self, *args, **kwargs):
         return openai.ChatCompletion.create(*args, **kwargs)
 
+    async def _acreate_chat_completion(self, *args, **kwargs):
+        return await openai.ChatCompletion.acreate(*args, **kwargs)
+
+    async def _arate(self, messages: List[Dict[str, str]]) -> float:
+        """
+        Complete the given chat `messages` asynchronously and parse the 1 to 10
+        rating in the completion, scaled to between 0 and 1.
+        """
+
+        completion = await self.endpoint.arun_me(
+            lambda: self._acreate_chat_completion(
+                model=self.model_engine, temperature=0.0, messages=messages
+            )
+        )
+
+        return re_1_10_rating(
+            completion["choices"][0]["message"]["content"]
+        ) / 10
+
     def _moderation(self, text: str):
         return self.endpoint.run_me(
             lambda: openai.Moderation.create(input=text)
@@ -311,6 +331,26 @@ class OpenAI(Provider):
             )
         ) / 10
 
+    async def aqs_relevance(self, question: str, statement: str) -> float:
+        """
+        Async version of `qs_relevance`.
+        """
+
+        return await self._arate(
+            messages=[
+                {
+                    "role":
+                        "system",
+                    "content":
+                        str.format(
+                            prompts.QS_RELEVANCE,
+                            question=question,
+                            statement=statement
+                        )
+                }
+            ]
+        )
+
     def relevance(self, prompt: str, response: str) -> float:
         """
         Uses OpenAI's Chat Completion Model. A function that completes a
@@ -345,6 +385,26 @@ class OpenAI(Provider):
             )
         ) / 10
 
+    async def arelevance(self, prompt: str, response: str) -> float:
+        """
+        Async version of `relevance`.
+        """
+
+        return await self._arate(
+            messages=[
+                {
+                    "role":
+                        "system",
+                    "content":
+                        str.format(
+                            prompts.PR_RELEVANCE,
+                            prompt=prompt,
+                            response=response
+                        )
+                }
+            ]
+        )
+
     def sentiment(self, text: str) -> float:
         """
         Uses OpenAI's Chat Completion Model. A function that completes a
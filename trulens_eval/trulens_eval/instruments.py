@@ -105,36 +105,25 @@ tools as App Data (see above).
 
 - Thread-safety -- it is tricky to use global data to keep track of instrumented
   method calls in presence of multiple threads. For this reason we do not use
-  global data and instead hide instrumenting data in the call stack frames of
-  the instrumentation methods. See `util.py:get_first_local_in_call_stack.py`.
+  global data and instead keep instrumenting data in context variables (see
+  `contextvars`) which are local to each thread and asyncio task. See
+  `recording` and `_CALL_STACKS` below.
 
 #### Threads
 
-Threads do not inherit call stacks from their creator. This is a problem due to
-our reliance on info stored on the stack. Therefore we have a limitation:
+Threads do not inherit the context of their creator. Therefore we have a
+limitation:
 
-- **Limitation**: Threads need to be started using the utility class TP in order
-  for instrumented methods called in a thread to be tracked. As we rely on call
-  stack for call instrumentation we need to preserve the stack before a thread
-  start which python does not do.  See `util.py:TP._thread_starter`.
+- **Limitation**: Threads need to be started using the utility class TP (or
+  `Executor`) in order for instrumented methods called in a thread to be
+  tracked. These run tasks in a copy of the context of their submitter. See
+  `util.py:Executor.submit_task`.
 
 #### Async
 
-Similar to threads, code run as part of a `asyncio.Task` does not inherit the
-stack of the creator. Our current solution instruments `asyncio.new_event_loop`
-to make sure all tasks that get created in `async` track the stack of their
-creator. This is done in `utils/python.py:_new_event_loop` . The function
-`stack_with_tasks` is then used to integrate this information with the normal
-caller stack when needed. This may cause incompatibility issues when other tools
-use their own event loops or interfere with this instrumentation in other ways.
-Note that some async functions that seem to not involve `Task` do use tasks,
-such as `gather`.
-
-- **Limitation**: `async.Tasks` must be created via our `task_factory` as per
-  `utils/python.py:task_factory_with_stack`. This includes tasks created by
-  function such as `gather`. This limitation is not expected to be a problem
-  given our instrumentation except if other tools are used that modify `async`
-  in some ways.
+Each `asyncio.Task` runs in a copy of the context it was created in, so
+instrumented methods called in tasks created within a recorded call, including
+those created by functions such as `gather`, are tracked.
 
 #### Limitations
 
@@ -210,49 +199,41 @@ Our tracking of calls uses instrumentated versions of methods to manage the
 recording of inputs/outputs. The instrumented methods must distinguish
 themselves from invocations of apps that are being tracked from those not being
 tracked, and of those that are tracked, where in the call stack a instrumented
-method invocation is. To achieve this, we rely on inspecting the python call
-stack for specific frames:
-
-- Root frame -- A tracked invocation of an app starts with one of the
-  main/"root" methods such as call or query. These are the bottom of the
-  relevant stack we use to manage the tracking of subsequent calls. Further
-  calls to instrumented methods check for the root method in the call stack and
-  retrieve the collection where data is to be recorded.
-  
-- Prior frame -- Each instrumented call also searches for the topmost
-  instrumented call (except itself) in the stack to check its immediate caller
-  (by immediate we mean only among instrumented methods) which forms the basis
-  of the stack information recorded alongside the inputs/outputs.
+method invocation is. To achieve this, we keep two context variables:
 
-#### Drawbacks
+- Records -- A tracked invocation of an app starts with one of the main/"root"
+  methods such as call or query. These run the app within the `recording`
+  context which makes the collection where data is to be recorded available to
+  subsequent calls to instrumented methods.
 
-- Python call stacks are implementation dependent and we do not expect to operate
-  on anything other than CPython.
+- Call stacks -- Each instrumented call sets the stack of instrumented calls
+  leading to it for the duration of the call. Calls it makes (directly or not)
+  extend this stack which forms the basis of the stack information recorded
+  alongside the inputs/outputs.
 
-- Python creates a fresh empty stack for each thread. Because of this, we need
-  special handling of each thread created to make sure it keeps a hold of the
-  stack prior to thread creation. Right now we do this in our threading utility
-  class TP but a more complete solution may be the instrumentation of
-  threading.Thread class.
+Looking these up takes constant time regardless of the depth of the python
+call stack.
 
-- We require a root method to be placed on the stack to indicate the start of
-  tracking. We therefore cannot implement something like a context-manager-based
-  setup of the tracking system as suggested in the "To discuss" above.
+#### Drawbacks
 
-  TODO: ROOTLESS
+- Python creates a fresh empty context for each thread. Because of this, we
+  need special handling of each thread created to make sure it runs in the
+  context prior to thread creation. Right now we do this in our threading
+  utility class TP but a more complete solution may be the instrumentation of
+  threading.Thread class.
 
-#### Alternatives
+- We require a root method to set up the `recording` context to indicate the
+  start of tracking.
 
-- `contextvars` -- langchain uses these to manage contexts such as those used for
-  instrumenting/tracking LLM usage. These can be used to manage call stack
-  information like we do. The drawback is that these are not threadsafe or at
-  least need instrumenting thread creation. We have to do a similar thing by
-  requiring threads created by our utility package which does stack management
-  instead of contextvar management.
+  TODO: ROOTLESS
 
 """
 
+from contextlib import contextmanager
+from contextvars import ContextVar
+from contextvars import Token
 from datetime import datetime
+from datetime import timedelta
 import inspect
 from inspect import BoundArguments
 from inspect import Signature
@@ -263,7 +244,8 @@ from pprint import PrettyPrinter
 import threading as th
 import traceback
 from typing import (
-    Any, Callable, Dict, Iterable, Optional, Sequence, Set, Tuple
+    Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set,
+    Tuple
 )
 
 from pydantic import BaseModel
@@ -276,11 +258,11 @@ from trulens_eval.schema import RecordAppCall
 from trulens_eval.schema import RecordAppCallMethod
 from trulens_eval.util import _safe_getattr
 from trulens_eval.util import dict_merge_with
-from trulens_eval.util import get_all_local_in_call_stack
-from trulens_eval.util import get_first_local_in_call_stack
 from trulens_eval.util import jsonify
 from trulens_eval.util import JSONPath
 from trulens_eval.util import Method
+from trulens_eval.util import take_queued_time
+from trulens_eval.utils import metrics
 
 logger = logging.getLogger(__name__)
 pp = PrettyPrinter()
@@ -351,6 +333,76 @@ class WithInstrumentCallbacks:
         raise NotImplementedError
 
 
+# Stack of instrumented method calls leading to (and including) a call.
+CallStack = Tuple[RecordAppCallMethod, ...]
+
+# Call stacks indexed by id of the record they belong to.
+CallStacks = Dict[int, CallStack]
+
+# A record of calls and the stack of a call within it.
+RecordAndStack = Tuple[List[RecordAppCall], CallStack]
+
+# A record being collected and the app collecting it.
+RecordAndApp = Tuple[List[RecordAppCall], WithInstrumentCallbacks]
+
+# Records being collected by the root methods (like `App.with_record`) running
+# in this context, innermost first.
+_RECORDS_AND_APPS: ContextVar[Tuple[RecordAndApp, ...]] = ContextVar(
+    "records_and_apps", default=()
+)
+
+# Stacks of the innermost instrumented method call running in this context.
+# Never modified, only replaced.
+_CALL_STACKS: ContextVar[CallStacks] = ContextVar("call_stacks", default={})
+
+# Latencies of the calls made by the innermost instrumented method call running
+# in this context, to which they add themselves as they finish. Summed into
+# `Perf.child_time` of that call.
+_CHILD_LATENCIES: ContextVar[Optional[List[timedelta]]] = ContextVar(
+    "child_latencies", default=None
+)
+
+
+@contextmanager
+def recording(record: List[RecordAppCall],
+              app: WithInstrumentCallbacks) -> Iterator[None]:
+    """
+    Within this context, instrumented methods known to `app` add their calls
+    to `record`. Root methods of apps (like `App.with_record`) run the app in
+    this context. It carries over to tasks run by `TP`/`Executor` and to
+    `asyncio` tasks created within it.
+    """
+
+    token = _RECORDS_AND_APPS.set(((record, app),) + _RECORDS_AND_APPS.get())
+
+    try:
+        yield
+
+    finally:
+        _RECORDS_AND_APPS.reset(token)
+
+
+class _RecordedCall():
+    """
+    An instrumented method call being recorded, from its start to its end.
+    """
+
+    def __init__(self, records_and_stacks: List[RecordAndStack]):
+        # Records the call is added to along with its stack in each.
+        self.records_and_stacks = records_and_stacks
+
+        self.bindings: Optional[BoundArguments] = None
+
+        self.queued_time: Optional[datetime] = None
+        self.start_time: Optional[datetime] = None
+
+        # Latencies of the instrumented calls made by this one.
+        self.child_latencies: List[timedelta] = []
+
+        # Tokens to reset the context variables set for the call with.
+        self.tokens: Optional[Tuple[Token, Token]] = None
+
+
 class Instrument(object):
     # TODO: might have to be made serializable soon.
 
@@ -467,97 +519,42 @@ class Instrument(object):
 
         sig = signature(func)
 
-        async def awrapper(*args, **kwargs):
-            # TODO: figure out how to have less repetition between the async and
-            # sync versions of this method.
+        # Identifies this method in the stacks of recorded calls. Created upon
+        # the first recorded call.
+        method: Optional[Method] = None
 
-            logger.debug(f"{query}: calling async instrumented method {func}")
+        # Latencies of the recorded calls of this method (see
+        # `utils/metrics.py`). Created upon the first recorded call with
+        # metrics enabled.
+        call_latency: Optional[metrics.Histogram.Child] = None
 
-            # If not within a root method, call the wrapped function without
-            # any recording.
-
-            def find_root_methods(f):
-                return id(f) in set(
-                    [id(rm.__code__) for rm in self.root_methods]
-                )  # or id(f) == id(wrapper.__code__) # TODO ROOTLESS
-
-            # Look up whether the root instrumented method was called earlier in
-            # the stack and "record_and_app" variable was defined there. Will
-            # use that for recording the wrapped call.
-            records_and_apps = list(
-                get_all_local_in_call_stack(
-                    key="record_and_app", func=find_root_methods, offset=1
-                )
-            )
+        def start_call(args) -> Tuple[List[RecordAndStack], CallStacks]:
             """
-            # TODO: ROOTLESS
-
-            is_root_call = False
-
-            if len(records_and_apps) == 0:
-                # If this is the first instrumented method in the stack, check
-                # that the app wants it recorded.
-                records_and_apps = self.on_new_record(func)
-
-                # If so, indicate that this is a root instrumented call.
-                is_root_call = True
+            Determine which records this call is to be added to, along with the
+            stack of instrumented calls leading to it for each. Also returns the
+            stacks (by id of record) for calls made by this one to extend.
             """
 
-            if records_and_apps is None or len(records_and_apps) == 0:
-                # Otherwise return result without instrumentation.
-
-                logger.debug(f"{query}: no record found, not recording.")
+            nonlocal method
+            if method is None:
+                method = Method.of_method(func, obj=obj, cls=cls)
 
-                return await func(*args, **kwargs)
-
-            # Otherwise keep track of inputs and outputs (or exception).
-
-            error = None
-            rets = None
-
-            def find_instrumented(f):
-                return id(f) in [id(awrapper.__code__)]
-
-            # If a wrapped method was called in this call stack, get the prior
-            # calls from this variable. Otherwise create a new chain stack. As
-            # another wrinke, the addresses of methods in the stack may vary
-            # from app to app that are watching this method. Hence we index the
-            # stacks by id of the call record list which is unique to each app.
-            pstacks = get_first_local_in_call_stack(
-                key="stacks", func=find_instrumented, offset=1
-            )
-            # Note: Empty dict is false-ish.
-            if pstacks is None:
-                pstacks = dict()
+            # Stacks of the instrumented call that made this one, if any.
+            pstacks = _CALL_STACKS.get()
 
-            # My own stacks to be looked up by further subcalls by the logic
-            # right above. We make a copy here since we need subcalls to access
-            # it but we don't want them to modify it.
+            # The addresses of methods in the stack may vary from app to app
+            # that are watching this method. Hence we index the stacks by id of
+            # the call record list which is unique to each app.
             stacks = dict()
+            records_and_stacks = []
 
-            start_time = None
-            end_time = None
-
-            bindings = None
-
-            # Prepare stacks with call information of this wrapped method so
-            # subsequent (inner) calls will see it. For every root_method in the
-            # call stack, we make a call record to add to the existing list
-            # found in the stack. Path stored in `query` of this method may
-            # differ between apps that use it so we have to create a seperate
-            # frame identifier for each, and therefore the stack. We also need
-            # to use a different stack for the same reason. We index the stack
-            # in `stacks` via id of the (unique) list `record`.
-
-            for record, app in records_and_apps:
-                # Get record and app that has instrumented this method.
-
+            for record, app in _RECORDS_AND_APPS.get():
                 rid = id(record)
 
                 # The path to this method according to the app.
                 path = app._get_method_path(
                     args[0], func
-                )  # hopefully args[0] is self
+                )  # args[0] is owner of wrapped method, hopefully
 
                 if path is None:
                     logger.warning(
@@ -565,285 +562,166 @@ class Instrument(object):
                     )
                     continue
 
-                if rid not in pstacks:
-                    # If we are the first instrumented method in the chain
-                    # stack, make a new stack tuple for subsequent deeper calls
-                    # (if any) to look up.
-                    stack = ()
-                else:
-                    stack = pstacks[rid]
-
-                frame_ident = RecordAppCallMethod(
-                    path=path, method=Method.of_method(func, obj=obj, cls=cls)
-                )
-
-                stack = stack + (frame_ident,)
-
-                stacks[rid] = stack  # for deeper calls to get
-
-                # Now we will call the wrapped method. We only do so once.
-
-                # Start of run once condition.
-                if start_time is None:
-                    start_time = datetime.now()
-
-                    try:
-                        # Using sig bind here so we can produce a list of key-value
-                        # pairs even if positional arguments were provided.
-                        bindings: BoundArguments = sig.bind(*args, **kwargs)
-                        """
-                        # TODO: ROOTLESS
-                        # If this is a root call (first instrumented method), also track
-                        # costs:
-                        cost: Cost = None
-                        if is_root_call:
-                            rets, cost = Endpoint.track_all_costs_tally(
-                                lambda: func(*bindings.args, **bindings.kwargs)
-                            )
-                        else:
-                        """
+                frame_ident = RecordAppCallMethod(path=path, method=method)
 
-                        rets = await func(*bindings.args, **bindings.kwargs)
+                stack = pstacks.get(rid, ()) + (frame_ident,)
 
-                        end_time = datetime.now()
+                stacks[rid] = stack
+                records_and_stacks.append((record, stack))
 
-                    except BaseException as e:
-                        end_time = datetime.now()
-                        error = e
-                        error_str = str(e)
+            return records_and_stacks, stacks
 
-                        logger.error(
-                            f"Error calling wrapped function {func.__name__}."
-                        )
-                        logger.error(traceback.format_exc())
-
-                    # Done running the wrapped function. Lets collect the results.
-                    # Create common information across all records.
-
-                    # Don't include self in the recorded arguments.
-                    nonself = {
-                        k: jsonify(v) for k, v in (
-                            bindings.arguments.items(
-                            ) if bindings is not None else {}
-                        ) if k != "self"
-                    }
-
-                    row_args = dict(
-                        args=nonself,
-                        perf=Perf(start_time=start_time, end_time=end_time),
-                        pid=os.getpid(),
-                        tid=th.get_native_id(),
-                        rets=rets,
-                        error=error_str if error is not None else None
+        def finish_call(
+            records_and_stacks: List[RecordAndStack],
+            bindings: Optional[BoundArguments], perf: Perf, rets: Any,
+            error: Optional[BaseException]
+        ) -> None:
+            """
+            Add the results of this call to each of the records it was made
+            for.
+            """
+
+            nonlocal call_latency
+
+            # Don't include self in the recorded arguments.
+            nonself = {
+                k: jsonify(v)
+                for k, v in
+                (bindings.arguments.items() if bindings is not None else {})
+                if k != "self"
+            }
+
+            row_args = dict(
+                args=nonself,
+                perf=perf,
+                pid=os.getpid(),
+                tid=th.get_native_id(),
+                rets=rets,
+                error=str(error) if error is not None else None
+            )
+
+            if metrics.ENABLED:
+                if call_latency is None:
+                    call_latency = metrics.CALL_LATENCY.labels(
+                        func.__qualname__
                     )
+                call_latency.observe(perf.latency.total_seconds())
 
-                # End of run once condition.
+            # Note that only the stack differs between each of the records.
+            for record, stack in records_and_stacks:
+                row = RecordAppCall(stack=(), **row_args)
 
-                # Note that only the stack differs between each of the records in this loop.
-                row_args['stack'] = stack
-                row = RecordAppCall(**row_args)
+                # Frames of the stack were validated when created. Validating
+                # (and copying) them again here would make each call cost as
+                # much as its depth.
+                row.stack = stack
 
                 record.append(row)
-                """
-                # TODO: ROOTLESS
-                if is_root_call:
-                    # If this is a root call, notify app to add the completed record
-                    # into its containers:
-                    self.on_add_record(record, func, sig, bindings, cost)
-                """
 
-            if error is not None:
-                raise error
-
-            return rets
+        def begin_call(args) -> Optional[_RecordedCall]:
+            """
+            Start recording a call with the given `args`, None if it is not to
+            be recorded.
+            """
 
-        def wrapper(*args, **kwargs):
-            # TODO: figure out how to have less repetition between the async and
-            # sync versions of this method.
+            # If not within a root method, call the wrapped function without
+            # any recording. This is checked before anything else as it is the
+            # path taken by calls apps do not sample (see `App.sampling`).
+            if len(_RECORDS_AND_APPS.get()) == 0:
+                return None
 
             logger.debug(f"{query}: calling instrumented method {func}")
 
-            # If not within a root method, call the wrapped function without
-            # any recording.
-
-            def find_root_methods(f):
-                return id(f) in set(
-                    [id(rm.__code__) for rm in self.root_methods]
-                )  # or id(f) == id(wrapper.__code__) # TODO ROOTLESS
-
-            # Look up whether the root instrumented method was called earlier in
-            # the stack and "record_and_app" variable was defined there. Will
-            # use that for recording the wrapped call.
-            records_and_apps = list(
-                get_all_local_in_call_stack(
-                    key="record_and_app", func=find_root_methods, offset=1
-                )
-            )
-            """
-            # TODO: ROOTLESS
+            records_and_stacks, stacks = start_call(args)
 
-            is_root_call = False
+            if len(records_and_stacks) == 0:
+                return None
 
-            if len(records_and_apps) == 0:
-                # If this is the first instrumented method in the stack, check
-                # that the app wants it recorded.
-                records_and_apps = self.on_new_record(func)
+            # Otherwise keep track of inputs and outputs (or exception).
 
-                # If so, indicate that this is a root instrumented call.
-                is_root_call = True
-            """
+            call = _RecordedCall(records_and_stacks)
+            call.queued_time = take_queued_time()
+            call.start_time = datetime.now()
 
-            if records_and_apps is None or len(records_and_apps) == 0:
-                # Otherwise return result without instrumentation.
+            # Make our stacks visible to the instrumented calls we make and
+            # have them add their latencies to ours.
+            call.tokens = (
+                _CALL_STACKS.set(stacks),
+                _CHILD_LATENCIES.set(call.child_latencies)
+            )
 
-                logger.debug(f"{query}: no record found, not recording.")
+            return call
 
-                return func(*args, **kwargs)
-
-            # Otherwise keep track of inputs and outputs (or exception).
+        def end_call(
+            call: _RecordedCall, rets: Any, error: Optional[BaseException]
+        ) -> None:
+            """
+            Finish recording `call` which returned `rets` or raised `error`.
+            """
 
-            error = None
-            rets = None
+            end_time = datetime.now()
 
-            def find_instrumented(f):
-                return id(f) in [id(wrapper.__code__)]
+            stacks_token, child_token = call.tokens
+            _CALL_STACKS.reset(stacks_token)
+            _CHILD_LATENCIES.reset(child_token)
 
-            # If a wrapped method was called in this call stack, get the prior
-            # calls from this variable. Otherwise create a new chain stack. As
-            # another wrinke, the addresses of methods in the stack may vary
-            # from app to app that are watching this method. Hence we index the
-            # stacks by id of the call record list which is unique to each app.
-            pstacks = get_first_local_in_call_stack(
-                key="stacks", func=find_instrumented, offset=1
+            if error is not None:
+                logger.error(f"Error calling wrapped function {func.__name__}.")
+                logger.error(traceback.format_exc())
+
+            parent_latencies = _CHILD_LATENCIES.get()
+            if parent_latencies is not None:
+                parent_latencies.append(end_time - call.start_time)
+
+            perf = Perf(
+                start_time=call.start_time,
+                end_time=end_time,
+                queued_time=call.queued_time,
+                child_time=sum(call.child_latencies, timedelta())
             )
-            # Note: Empty dict is false-ish.
-            if pstacks is None:
-                pstacks = dict()
-
-            # My own stacks to be looked up by further subcalls by the logic
-            # right above. We make a copy here since we need subcalls to access
-            # it but we don't want them to modify it.
-            stacks = dict()
-
-            start_time = None
-            end_time = None
 
-            bindings = None
-
-            # Prepare stacks with call information of this wrapped method so
-            # subsequent (inner) calls will see it. For every root_method in the
-            # call stack, we make a call record to add to the existing list
-            # found in the stack. Path stored in `query` of this method may
-            # differ between apps that use it so we have to create a seperate
-            # frame identifier for each, and therefore the stack. We also need
-            # to use a different stack for the same reason. We index the stack
-            # in `stacks` via id of the (unique) list `record`.
+            finish_call(
+                call.records_and_stacks, call.bindings, perf, rets, error
+            )
 
-            for record, app in records_and_apps:
-                # Get record and app that has instrumented this method.
+        async def awrapper(*args, **kwargs):
+            call = begin_call(args)
 
-                rid = id(record)
+            if call is None:
+                return await func(*args, **kwargs)
 
-                # The path to this method according to the app.
-                path = app._get_method_path(
-                    args[0], func
-                )  # args[0] is owner of wrapped method, hopefully
+            try:
+                # Using sig bind here so we can produce a list of key-value
+                # pairs even if positional arguments were provided.
+                call.bindings = sig.bind(*args, **kwargs)
 
-                if path is None:
-                    logger.warning(
-                        f"App of type {type(app)} no longer knows about Object 0x{id(args[0]):x} method {func}."
-                    )
-                    continue
+                rets = await func(*call.bindings.args, **call.bindings.kwargs)
 
-                if rid not in pstacks:
-                    # If we are the first instrumented method in the chain
-                    # stack, make a new stack tuple for subsequent deeper calls
-                    # (if any) to look up.
-                    stack = ()
-                else:
-                    stack = pstacks[rid]
-
-                frame_ident = RecordAppCallMethod(
-                    path=path, method=Method.of_method(func, obj=obj, cls=cls)
-                )
-
-                stack = stack + (frame_ident,)
-
-                stacks[rid] = stack  # for deeper calls to get
-
-                # Now we will call the wrapped method. We only do so once.
-
-                # Start of run once condition.
-                if start_time is None:
-                    start_time = datetime.now()
-
-                    try:
-                        # Using sig bind here so we can produce a list of key-value
-                        # pairs even if positional arguments were provided.
-                        bindings: BoundArguments = sig.bind(*args, **kwargs)
-                        """
-                        # TODO: ROOTLESS
-                        # If this is a root call (first instrumented method), also track
-                        # costs:
-                        cost: Cost = None
-                        if is_root_call:
-                            rets, cost = Endpoint.track_all_costs_tally(
-                                lambda: func(*bindings.args, **bindings.kwargs)
-                            )
-                        else:
-                        """
+            except BaseException as e:
+                end_call(call, None, e)
+                raise
 
-                        rets = func(*bindings.args, **bindings.kwargs)
+            end_call(call, rets, None)
 
-                        end_time = datetime.now()
+            return rets
 
-                    except BaseException as e:
-                        end_time = datetime.now()
-                        error = e
-                        error_str = str(e)
+        def wrapper(*args, **kwargs):
+            call = begin_call(args)
 
-                        logger.error(
-                            f"Error calling wrapped function {func.__name__}."
-                        )
-                        logger.error(traceback.format_exc())
-
-                    # Done running the wrapped function. Lets collect the results.
-                    # Create common information across all records.
-
-                    # Don't include self in the recorded arguments.
-                    nonself = {
-                        k: jsonify(v) for k, v in (
-                            bindings.arguments.items(
-                            ) if bindings is not None else {}
-                        ) if k != "self"
-                    }
-
-                    row_args = dict(
-                        args=nonself,
-                        perf=Perf(start_time=start_time, end_time=end_time),
-                        pid=os.getpid(),
-                        tid=th.get_native_id(),
-                        rets=rets,
-                        error=error_str if error is not None else None
-                    )
+            if call is None:
+                return func(*args, **kwargs)
 
-                # End of run once condition.
+            try:
+                # See `awrapper`.
+                call.bindings = sig.bind(*args, **kwargs)
 
-                # Note that only the stack differs between each of the records in this loop.
-                row_args['stack'] = stack
-                row = RecordAppCall(**row_args)
+                rets = func(*call.bindings.args, **call.bindings.kwargs)
 
-                record.append(row)
-                """
-                # TODO: ROOTLESS
-                if is_root_call:
-                    # If this is a root call, notify app to add the completed record
-                    # into its containers:
-                    self.on_add_record(record, func, sig, bindings, cost)
-                """
+            except BaseException as e:
+                end_call(call, None, e)
+                raise
 
-            if error is not None:
-                raise error
+            end_call(call, rets, None)
 
             return rets
 
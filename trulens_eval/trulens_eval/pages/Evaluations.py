@@ -47,7 +47,12 @@ add_logo()
 tru = Tru()
 lms = tru.db
 
-df_results, feedback_cols = lms.get_records_and_feedback([])
+# Columns of the records table. The json of the selected record, of its app
+# and of its feedback function calls are only loaded once it is selected.
+RECORD_COLUMNS = [
+    "app_id", "type", "record_id", "input", "output", "tags", "ts", "latency",
+    "total_tokens", "total_cost"
+]
 
 state = st.session_state
 
@@ -104,11 +109,12 @@ def render_component(query, component, header=True):
             st.json(jsonify_for_ui(component.json))
 
 
-if df_results.empty:
+apps = sorted(app['app_id'] for app in lms.get_apps())
+
+if len(apps) == 0:
     st.write("No records yet...")
 
 else:
-    apps = list(df_results.app_id.unique())
     if 'app' in st.session_state:
         app = st.session_state.app
     else:
@@ -116,20 +122,24 @@ else:
 
     options = st.multiselect('Filter Applications', apps, default=app)
 
+    limit = st.number_input(
+        'Most recent records to show', min_value=1, value=1000, step=100
+    )
+
+    # This returns all apps if the list of options is empty.
+    app_df, feedback_cols = lms.get_records_and_feedback(
+        options, limit=int(limit), columns=RECORD_COLUMNS, feedback_calls=False
+    )
+
     if (len(options) == 0):
         st.header("All Applications")
-        app_df = df_results
 
     elif (len(options) == 1):
         st.header(options[0])
 
-        app_df = df_results[df_results.app_id.isin(options)]
-
     else:
         st.header("Multiple Applications Selected")
 
-        app_df = df_results[df_results.app_id.isin(options)]
-
     tab1, tab2 = st.tabs(["Records", "Feedback Functions"])
 
     with tab1:
@@ -160,18 +170,8 @@ else:
         gb.configure_column('tags', header_name='Tags')
         gb.configure_column('ts', header_name='Time Stamp', sort="desc")
 
-        non_feedback_cols = [
-            'app_id', 'type', 'ts', 'total_tokens', 'total_cost', 'record_json',
-            'latency', 'record_id', 'app_id', 'cost_json', 'app_json', 'input',
-            'output', 'perf_json'
-        ]
-
-        for feedback_col in evaluations_df.columns.drop(non_feedback_cols):
-            gb.configure_column(
-                feedback_col,
-                cellStyle=cellstyle_jscode,
-                hide=feedback_col.endswith("_calls")
-            )
+        for feedback_col in evaluations_df.columns.drop(RECORD_COLUMNS):
+            gb.configure_column(feedback_col, cellStyle=cellstyle_jscode)
         gb.configure_pagination()
         gb.configure_side_bar()
         gb.configure_selection(selection_mode="single", use_checkbox=False)
@@ -194,6 +194,11 @@ else:
             st.header(f"Selected LLM Application: {selected_rows['app_id'][0]}")
             st.text(f"Selected Record ID: {selected_rows['record_id'][0]}")
 
+            # All columns of the selected record.
+            selected_rows, _ = lms.get_records_and_feedback(
+                [], record_ids=[selected_rows['record_id'][0]]
+            )
+
             prompt = selected_rows['input'][0]
             response = selected_rows['output'][0]
             details = selected_rows['app_json'][0]
@@ -221,10 +226,10 @@ else:
             st.header("Feedback")
             for fcol in feedback_cols:
                 feedback_name = fcol
-                feedback_result = row[fcol]
+                feedback_result = row.get(fcol)
                 if MULTI_CALL_NAME_DELIMITER in fcol:
                     fcol = fcol.split(MULTI_CALL_NAME_DELIMITER)[0]
-                feedback_calls = row[f"{fcol}_calls"]
+                feedback_calls = row.get(f"{fcol}_calls")
 
                 def display_feedback_call(call):
 
@@ -23,13 +23,18 @@ util.py:CLASS_INFO key.
 from abc import ABC
 from abc import abstractmethod
 from datetime import datetime
+from datetime import timedelta
 from enum import Enum
 import logging
-from typing import Any, ClassVar, Dict, Optional, Sequence, TypeVar, Union
+from typing import (
+    Any, Callable, ClassVar, Dict, Iterable, Optional, Sequence, TypeVar, Union
+)
 
 from munch import Munch as Bunch
 import pydantic
 
+from trulens_eval.database.blobs import blob_refs
+from trulens_eval.database.blobs import rehydrate
 from trulens_eval.util import Class
 from trulens_eval.util import Function
 from trulens_eval.util import FunctionOrMethod
@@ -91,6 +96,9 @@ class Cost(SerialModel):
     # Cost in USD.
     cost: float = 0.0
 
+    # Number of feedback results reused from a cache instead of requested.
+    n_cache_hits: int = 0
+
     def __add__(self, other: 'Cost') -> 'Cost':
         kwargs = {}
         for k in self.__fields__.keys():
@@ -110,10 +118,64 @@ class Perf(SerialModel):
     start_time: datetime
     end_time: datetime
 
+    # For calls whose output is streamed, when the first and last chunks
+    # (tokens for LLMs) of the stream were produced and how many there were.
+    # The call ends once the stream is exhausted.
+    first_chunk_time: Optional[datetime] = None
+    last_chunk_time: Optional[datetime] = None
+    n_chunks: Optional[int] = None
+
+    # When the call was submitted to run in a thread (see `Executor`), for the
+    # first instrumented call of a task. The call waited in the queue from then
+    # until `start_time`.
+    queued_time: Optional[datetime] = None
+
+    # Total time spent in the recorded calls made by this one. May exceed the
+    # latency of this call if they ran concurrently.
+    child_time: Optional[timedelta] = None
+
     @property
     def latency(self):
         return self.end_time - self.start_time
 
+    @property
+    def queue_wait(self) -> Optional[timedelta]:
+        if self.queued_time is None:
+            return None
+
+        return self.start_time - self.queued_time
+
+    @property
+    def self_time(self) -> timedelta:
+        """
+        Time spent in the call itself rather than in the recorded calls it
+        made.
+        """
+
+        if self.child_time is None:
+            return self.latency
+
+        return max(self.latency - self.child_time, timedelta())
+
+    @property
+    def time_to_first_token(self) -> Optional[timedelta]:
+        if self.first_chunk_time is None:
+            return None
+
+        return self.first_chunk_time - self.start_time
+
+    @property
+    def inter_token_latency(self) -> Optional[timedelta]:
+        """
+        Mean time between consecutive chunks of a streamed output.
+        """
+
+        if self.n_chunks is None or self.n_chunks < 2:
+            return None
+
+        return (self.last_chunk_time -
+                self.first_chunk_time) / (self.n_chunks - 1)
+
 
 class RecordAppCall(SerialModel):
     """
@@ -169,6 +231,12 @@ class Record(SerialModel):
     # via `layout_calls_as_app`.
     calls: Sequence[RecordAppCall] = []
 
+    # Loads the content of the blobs referred to in place of large strings of
+    # this record if loaded from a database that stores them apart (see
+    # `database/blobs.py`).
+    _blob_loader: Optional[Callable[[Iterable[str]], Dict[str, str]]] = \
+        pydantic.PrivateAttr(default=None)
+
     def __init__(self, record_id: Optional[RecordID] = None, **kwargs):
         super().__init__(record_id="temporary", **kwargs)
 
@@ -177,6 +245,30 @@ class Record(SerialModel):
 
         self.record_id = record_id
 
+    def with_blob_loader(
+        self, loader: Callable[[Iterable[str]], Dict[str, str]]
+    ) -> 'Record':
+        self._blob_loader = loader
+        return self
+
+    def rehydrate(self, obj: JSON) -> JSON:
+        """
+        Put the large strings of this record back in `obj`, a part of it, in
+        place of references to the blobs holding them.
+        """
+
+        refs = blob_refs(obj)
+        if len(refs) == 0:
+            return obj
+
+        if self._blob_loader is None:
+            raise RuntimeError(
+                f"Record {self.record_id} refers to blobs but was not loaded "
+                "from a database."
+            )
+
+        return rehydrate(obj, self._blob_loader(refs))
+
     def layout_calls_as_app(self) -> JSON:
         """
         Layout the calls in this record into the structure that follows that of
@@ -282,6 +374,11 @@ class FeedbackResultStatus(Enum):
     DONE = "done"
 
 
+# How long a feedback result claimed for evaluation stays with its claimer
+# without a heartbeat before it can be claimed again.
+DEFAULT_LEASE_SECONDS = 60.0
+
+
 class FeedbackCall(SerialModel):
     args: Dict[str, Optional[str]]
     ret: float
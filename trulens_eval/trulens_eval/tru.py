@@ -1,29 +1,34 @@
+import asyncio
+import atexit
 import logging
+import multiprocessing
 from multiprocessing import Process
+from multiprocessing.process import BaseProcess
 import os
 from pathlib import Path
 import subprocess
 import sys
 import threading
 from threading import Thread
-from time import sleep
-from typing import Iterable, List, Optional, Sequence, Union
+from typing import Dict, Iterable, List, Optional, Sequence, Union
 import warnings
 
 import pkg_resources
 
 from trulens_eval.database.sqlalchemy_db import SqlAlchemyDB
+from trulens_eval.database.utils import is_memory_sqlite
 from trulens_eval.db import JSON
 from trulens_eval.feedback import Feedback
+from trulens_eval.feedback import FeedbackCache
 from trulens_eval.schema import AppDefinition
 from trulens_eval.schema import FeedbackResult
 from trulens_eval.schema import Record
+from trulens_eval.schema import RecordID
+from trulens_eval.util import Executor
 from trulens_eval.util import SingletonPerName
-from trulens_eval.util import TP
+from trulens_eval.util import TaskPriority
 from trulens_eval.utils.notebook_utils import is_notebook
 from trulens_eval.utils.notebook_utils import setup_widget_stdout_stderr
-from trulens_eval.utils.text import UNICODE_CHECK
-from trulens_eval.utils.text import UNICODE_YIELD
 from trulens_eval.utils.text import UNICODE_SQUID
 
 
@@ -47,6 +52,10 @@ class Tru(SingletonPerName):
     """
     DEFAULT_DATABASE_FILE = "default.sqlite"
 
+    # How long to wait at interpreter exit for records and feedback results
+    # still being produced or written by background tasks.
+    SHUTDOWN_TIMEOUT_SECONDS = 30.0
+
     # Process or Thread of the deferred feedback function evaluator.
     evaluator_proc = None
 
@@ -74,7 +83,9 @@ class Tru(SingletonPerName):
     def __init__(
         self,
         database_url: Optional[str] = None,
-        database_file: Optional[str] = None
+        database_file: Optional[str] = None,
+        executor_limits: Optional[Dict[str, int]] = None,
+        feedback_cache: Optional[FeedbackCache] = None
     ):
         """
         TruLens instrumentation, logging, and feedback functions for apps.
@@ -82,11 +93,23 @@ class Tru(SingletonPerName):
         :param database_url: SQLAlchemy database URL. Defaults to a local
                              SQLite database file at 'default.sqlite'
         :param database_file: (Deprecated) Path to a local SQLite database file
+        :param executor_limits: Maximum number of feedback functions to
+                                evaluate at once per endpoint name, e.g.
+                                `{"openai": 4}`. See `set_executor_limit`.
+        :param feedback_cache: Cache of feedback function results used when
+                               evaluating deferred feedback functions that do
+                               not have their own cache.
         """
         if hasattr(self, "db"):
             if database_url is not None or database_file is not None:
                 logger.warning(f"Tru was already initialized. Cannot change database_url={database_url} or database_file={database_file} .")
 
+            for endpoint, limit in (executor_limits or {}).items():
+                self.set_executor_limit(endpoint, limit)
+
+            if feedback_cache is not None:
+                self.feedback_cache = feedback_cache
+
             # Already initialized by SingletonByName mechanism.
             return
 
@@ -107,6 +130,49 @@ class Tru(SingletonPerName):
 
         print(f"{UNICODE_SQUID} Tru initialized with db url {self.db.engine.url} .")
 
+        # Persist records and feedback results still being written in the
+        # background when the interpreter exits.
+        atexit.register(self._flush_on_shutdown)
+
+        # Caches of feedback functions are not stored with their definitions.
+        self.feedback_cache: Optional[FeedbackCache] = feedback_cache
+
+        self.executor_limits: Dict[str, int] = dict()
+        for endpoint, limit in (executor_limits or {}).items():
+            self.set_executor_limit(endpoint, limit)
+
+    def set_executor_limit(self, endpoint: str, limit: Optional[int]) -> None:
+        """
+        Evaluate at most `limit` feedback functions calling the endpoint named
+        `endpoint` (e.g. "openai" or "huggingface") at once, whether run on the
+        app path, by `Feedback.evaluate_deferred` or by evaluator workers. A
+        `limit` of None removes the limit. Worker processes started by
+        `start_evaluator(fork=True)` get the limits set at the time; those
+        started with `trulens-eval-worker` take them with `--limit`.
+        """
+
+        if limit is None:
+            self.executor_limits.pop(endpoint, None)
+        else:
+            self.executor_limits[endpoint] = limit
+
+        Executor().set_limit(endpoint, limit)
+
+    def _flush_on_shutdown(self):
+        # Records of apps not recording `WITH_APP` are written by executor
+        # tasks whose daemon threads would otherwise be dropped at exit.
+        unfinished = Executor().finish(timeout=self.SHUTDOWN_TIMEOUT_SECONDS)
+        if unfinished > 0:
+            logger.warning(
+                f"Exiting with {unfinished} background task(s) unfinished. "
+                "Records or feedback results they were producing are lost."
+            )
+
+        try:
+            self.db.flush()
+        except Exception as e:
+            logger.warning(f"Could not flush database on shutdown: {e}")
+
     def reset_database(self):
         """
         Reset the database. Clears all tables.
@@ -144,27 +210,23 @@ class Tru(SingletonPerName):
 
         return self.db.insert_record(record=record)
 
-    def run_feedback_functions(
-        self,
-        record: Record,
-        feedback_functions: Sequence[Feedback],
-        app: Optional[AppDefinition] = None,
-    ) -> Sequence[JSON]:
+    def add_records(self, records: Iterable[Record]) -> List[RecordID]:
         """
-        Run a collection of feedback functions and report their result.
+        Add multiple records to the database in one batch.
 
-        Parameters:
-
-            record (Record): The record on which to evaluate the feedback
-            functions.
-
-            app (App, optional): The app that produced the given record.
-            If not provided, it is looked up from the given database `db`.
+        Returns:
+            List[RecordID]: Unique record identifiers.
+        """
 
-            feedback_functions (Sequence[Feedback]): A collection of feedback
-            functions to evaluate.
+        return self.db.insert_records(records=records)
 
-        Returns nothing.
+    def _app_of_record(
+        self, record: Record, app: Optional[AppDefinition]
+    ) -> Union[AppDefinition, JSON]:
+        """
+        Get the app that produced `record` for evaluating feedback functions on
+        it, either the given `app`, which is added to the database if needed,
+        or looked up from the database.
         """
 
         app_id = record.app_id
@@ -186,17 +248,72 @@ class Tru(SingletonPerName):
                 )
                 self.add_app(app=app)
 
+        return app
+
+    def run_feedback_functions(
+        self,
+        record: Record,
+        feedback_functions: Sequence[Feedback],
+        app: Optional[AppDefinition] = None,
+    ) -> Sequence[JSON]:
+        """
+        Run a collection of feedback functions and report their result.
+
+        Parameters:
+
+            record (Record): The record on which to evaluate the feedback
+            functions.
+
+            app (App, optional): The app that produced the given record.
+            If not provided, it is looked up from the given database `db`.
+
+            feedback_functions (Sequence[Feedback]): A collection of feedback
+            functions to evaluate.
+
+        Returns nothing.
+        """
+
+        app = self._app_of_record(record=record, app=app)
+
         evals = []
 
         for func in feedback_functions:
             evals.append(
-                TP().promise(lambda f: f.run(app=app, record=record), func)
+                Executor().submit_task(
+                    lambda f: f.run(app=app, record=record),
+                    args=(func,),
+                    priority=TaskPriority.FEEDBACK,
+                    key=func._endpoint_name()
+                )
             )
 
-        evals = map(lambda p: p.get(), evals)
+        evals = map(lambda p: p.result(), evals)
 
         return list(evals)
 
+    async def arun_feedback_functions(
+        self,
+        record: Record,
+        feedback_functions: Sequence[Feedback],
+        app: Optional[AppDefinition] = None,
+    ) -> Sequence[FeedbackResult]:
+        """
+        Async version of `run_feedback_functions`. All of the feedback
+        functions are evaluated concurrently on the running event loop using
+        `Feedback.arun` instead of a thread each.
+        """
+
+        app = self._app_of_record(record=record, app=app)
+
+        return list(
+            await asyncio.gather(
+                *(
+                    func.arun(app=app, record=record)
+                    for func in feedback_functions
+                )
+            )
+        )
+
     def add_app(self, app: AppDefinition) -> None:
         """
         Add a app to the database.        
@@ -220,11 +337,10 @@ class Tru(SingletonPerName):
 
     def add_feedbacks(self, feedback_results: Iterable[FeedbackResult]) -> None:
         """
-        Add multiple feedback results to the database.
+        Add multiple feedback results to the database in one batch.
         """
 
-        for feedback_result in feedback_results:
-            self.add_feedback(feedback_result=feedback_result)
+        self.db.insert_feedbacks(feedback_results=feedback_results)
 
     def get_app(self, app_id: Optional[str] = None) -> JSON:
         """
@@ -234,29 +350,120 @@ class Tru(SingletonPerName):
         # TODO: unserialize
         return self.db.get_app(app_id)
 
-    def get_records_and_feedback(self, app_ids: List[str]):
+    def get_records_and_feedback(self, app_ids: List[str], **kwargs):
         """
         Get records, their feeback results, and feedback names from the
-        database. Pass an empty list of app_ids to return all.
+        database. Pass an empty list of app_ids to return all. See
+        `DB.get_records_and_feedback` for filtering, paginating and selecting
+        the columns of the records.
 
         ```python
         tru.get_records_and_feedback(app_ids=[])
+
+        # The 100 most recent records without their json.
+        tru.get_records_and_feedback(
+            app_ids=[], limit=100, columns=["input", "output", "latency"]
+        )
         ```
         """
 
-        df, feedback_columns = self.db.get_records_and_feedback(app_ids)
+        df, feedback_columns = self.db.get_records_and_feedback(
+            app_ids, **kwargs
+        )
 
         return df, feedback_columns
 
+    def get_app_summaries(self, app_ids: Optional[List[str]] = None):
+        """
+        Get the number of records, mean latency, total cost and tokens and
+        mean feedback results of each app, alongside the feedback names. These
+        are aggregated by the database without loading the records.
+        """
+
+        return self.db.get_app_summaries(app_ids)
+
+    def get_latency_percentiles(self, app_id: str, **kwargs):
+        """
+        Get percentiles of the latency (or other durations) of the calls of a
+        component of an app, or of its records. See
+        `DB.get_latency_percentiles` for the arguments.
+
+        ```python
+        # p50, p90, p95 and p99 of the retriever over the last hour.
+        tru.get_latency_percentiles(
+            app_id, component_path=Select.RecordCalls.retriever,
+            window=timedelta(hours=1)
+        )
+        ```
+        """
+
+        return self.db.get_latency_percentiles(app_id, **kwargs)
+
+    def start_metrics_server(
+        self,
+        port: int = 9464,
+        host: str = "127.0.0.1"
+    ) -> 'ThreadingHTTPServer':
+        """
+        Enable metrics and serve them in the Prometheus text format at
+        `http://host:port/metrics`, including the number of feedback results of
+        this database in each status (i.e. the depth of the deferred feedback
+        queue). See `utils/metrics.py` for the rest.
+
+        ```python
+        server = tru.start_metrics_server()
+        ...
+        server.shutdown()
+        ```
+        """
+
+        from trulens_eval.utils import metrics
+
+        def feedback_results():
+            counts = self.db.get_feedback_count_by_status()
+            return [((status.value,), n) for status, n in counts.items()]
+
+        metrics.Gauge(
+            "trulens_feedback_results", "Feedback results by status.",
+            feedback_results, ["status"]
+        )
+
+        return metrics.start_metrics_server(port=port, host=host)
+
+    def export_records_and_feedback(
+        self,
+        directory: Union[str, Path],
+        app_ids: Optional[List[str]] = None,
+        **kwargs
+    ) -> 'ExportWatermark':
+        """
+        Export records and feedback results to Parquet (or Arrow) files in
+        `directory` a page at a time, continuing after the previous export to
+        it if any. See `database/export.py` for the other arguments.
+
+        ```python
+        tru.export_records_and_feedback("export")
+        ```
+        """
+
+        from trulens_eval.database.export import export_records_and_feedback
+
+        return export_records_and_feedback(
+            self.db, directory, app_ids=app_ids, **kwargs
+        )
+
     def start_evaluator(self,
                         restart=False,
-                        fork=False) -> Union[Process, Thread]:
+                        fork=False,
+                        **worker_kwargs) -> Union[BaseProcess, Thread]:
         """
-        Start a deferred feedback function evaluation thread.
+        Start a deferred feedback function evaluation thread, or with `fork`, a
+        separate worker process that does not share the GIL with the app. More
+        workers can be started on this or other hosts with the
+        `trulens-eval-worker` command. Other `worker_kwargs` are passed on to
+        `trulens_eval.utils.worker.EvaluatorWorker`.
         """
 
-        assert not fork, "Fork mode not yet implemented."
-
         if self.evaluator_proc is not None:
             if restart:
                 self.stop_evaluator()
@@ -265,39 +472,47 @@ class Tru(SingletonPerName):
                     "Evaluator is already running in this process."
                 )
 
-        from trulens_eval.feedback import Feedback
+        if fork:
+            if is_memory_sqlite(self.db.engine):
+                raise ValueError(
+                    "An in-memory database cannot be shared with a worker process."
+                )
 
-        if not fork:
-            self.evaluator_stop = threading.Event()
+            from trulens_eval.utils.worker import run_worker
+
+            # Spawn rather than fork so the worker does not inherit this
+            # process's threads, singletons and database connections.
+            context = multiprocessing.get_context("spawn")
+
+            self.evaluator_stop = context.Event()
+
+            proc = context.Process(
+                target=run_worker,
+                kwargs=dict(
+                    database_url=self.db.engine.url.render_as_string(
+                        hide_password=False
+                    ),
+                    stop_event=self.evaluator_stop,
+                    executor_limits=dict(self.executor_limits),
+                    feedback_cache=self.feedback_cache,
+                    **worker_kwargs
+                ),
+                name="trulens-eval-worker"
+            )
 
-        def runloop():
-            while fork or not self.evaluator_stop.is_set():
-                #print(
-                #    "Looking for things to do. Stop me with `tru.stop_evaluator()`.",
-                #    end=''
-                #)
-                started_count = Feedback.evaluate_deferred(tru=self)
-
-                if started_count > 0:
-                    print(
-                        f"{UNICODE_YIELD}{UNICODE_YIELD}{UNICODE_YIELD} Started {started_count} deferred feedback functions."
-                    )
-                    TP().finish()
-                    print(
-                        f"{UNICODE_CHECK}{UNICODE_CHECK}{UNICODE_CHECK} Finished evaluating deferred feedback functions."
-                    )
+        else:
+            from trulens_eval.utils.worker import EvaluatorWorker
 
-                if fork:
-                    sleep(10)
-                else:
-                    self.evaluator_stop.wait(10)
+            self.evaluator_stop = threading.Event()
 
-            print("Evaluator stopped.")
+            # The worker renews the leases of what it claimed, only claims as
+            # much as it has room to evaluate and evaluates it in the shared
+            # Executor next to feedback run on the app path.
+            worker = EvaluatorWorker(
+                tru=self, stop_event=self.evaluator_stop, **worker_kwargs
+            )
 
-        if fork:
-            proc = Process(target=runloop)
-        else:
-            proc = Thread(target=runloop)
+            proc = Thread(target=worker.run, name="trulens-eval-evaluator")
 
         # Start a persistent thread or process that evaluates feedback functions.
 
@@ -306,16 +521,22 @@ class Tru(SingletonPerName):
 
         return proc
 
-    def stop_evaluator(self):
+    def stop_evaluator(self, timeout: Optional[float] = None):
         """
-        Stop the deferred feedback evaluation thread.
+        Stop the deferred feedback evaluation thread or process. A worker
+        process first finishes the feedback functions it already started; it
+        is terminated if that takes longer than `timeout` seconds.
         """
 
         if self.evaluator_proc is None:
             raise RuntimeError("Evaluator not running this process.")
 
-        if isinstance(self.evaluator_proc, Process):
-            self.evaluator_proc.terminate()
+        if isinstance(self.evaluator_proc, BaseProcess):
+            self.evaluator_stop.set()
+            self.evaluator_proc.join(timeout)
+            if self.evaluator_proc.is_alive():
+                self.evaluator_proc.terminate()
+            self.evaluator_stop = None
 
         elif isinstance(self.evaluator_proc, Thread):
             self.evaluator_stop.set()
@@ -6,7 +6,7 @@ from datetime import datetime
 from inspect import BoundArguments, Signature
 import logging
 from pprint import PrettyPrinter
-from typing import Callable, ClassVar, Sequence
+from typing import Callable, ClassVar, Optional, Sequence, Tuple
 
 from pydantic import Field
 
@@ -14,6 +14,7 @@ from trulens_eval.app import App
 from trulens_eval.instruments import Instrument
 from trulens_eval.feedback.provider.endpoint import Endpoint
 from trulens_eval.schema import Cost
+from trulens_eval.schema import Record
 from trulens_eval.schema import RecordAppCall
 from trulens_eval.util import Class
 from trulens_eval.util import FunctionOrMethod
@@ -94,11 +95,13 @@ class TruBasicApp(App):
         
         return super().main_input(func, sig, bindings)
 
-    def call_with_record(self, input: str, **kwargs):
+    def call_with_record(self, input: str,
+                         **kwargs) -> Tuple[str, Optional[Record]]:
         """ Run the callable and pass any kwargs.
 
         Returns:
-            dict: record metadata
+            Tuple[str, Optional[Record]]: output of the callable and its
+            record, None if the call is not sampled (see `App.sampling`).
         """
 
         return self.with_record(self.app._call, input, **kwargs)
@@ -6,7 +6,7 @@ from inspect import BoundArguments
 from inspect import Signature
 import logging
 from pprint import PrettyPrinter
-from typing import Any, Callable, ClassVar, Dict, List, Tuple, Union
+from typing import Any, Callable, ClassVar, Dict, List, Optional, Tuple, Union
 
 # import nest_asyncio # NOTE(piotrm): disabling for now, need more investigation
 from pydantic import Field
@@ -175,17 +175,20 @@ class TruChain(App):
 
     # NOTE: Input signature compatible with langchain.chains.base.Chain.acall
     # TODEP
-    async def acall_with_record(self, *args, **kwargs) -> Tuple[Any, Record]:
+    async def acall_with_record(self, *args,
+                                **kwargs) -> Tuple[Any, Optional[Record]]:
         """
-        Run the chain acall method and also return a record metadata object.
+        Run the chain acall method and also return a record metadata object,
+        None if the call is not sampled (see `App.sampling`).
         """
         return await self.awith_record(self.app.acall, *args, **kwargs)
 
     # NOTE: Input signature compatible with langchain.chains.base.Chain.__call__
     # TODEP
-    def call_with_record(self, *args, **kwargs) -> Tuple[Any, Record]:
+    def call_with_record(self, *args, **kwargs) -> Tuple[Any, Optional[Record]]:
         """
-        Run the chain call method and also return a record metadata object.
+        Run the chain call method and also return a record metadata object,
+        None if the call is not sampled (see `App.sampling`).
         """
         return self.with_record(self.app.__call__, *args, **kwargs)
 
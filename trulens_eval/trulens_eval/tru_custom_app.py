@@ -84,7 +84,8 @@ response, record = ta.with_record(
 
 The `with_record` use above returns both the response of the app normally
 produces as well as the record of the app as is the case with the higher-level
-wrappers. `TruCustomApp` constructor arguments are like in those higher-level
+wrappers. The record is None for calls not sampled by the app's `sampling`
+policy. `TruCustomApp` constructor arguments are like in those higher-level
 apps as well including the feedback functions, metadata, etc.
 
 ### Instrumenting 3rd party classes
@@ -3,15 +3,20 @@
 """
 
 
+import asyncio
+import contextvars
+import functools
 from inspect import BoundArguments
 from inspect import Signature
 import logging
 from pprint import PrettyPrinter
-from typing import Any, Callable, ClassVar, Tuple, Union
+from typing import Any, Callable, ClassVar, Iterator, Optional, Tuple, Union
 
 from pydantic import Field
 
 from trulens_eval.app import App
+from trulens_eval.app import StreamedRecord
+from trulens_eval.instruments import _RECORDS_AND_APPS
 from trulens_eval.instruments import Instrument
 from trulens_eval.schema import Record
 from trulens_eval.util import Class
@@ -117,7 +122,7 @@ class LlamaInstrument(Instrument):
                 "stream_chat":
                     lambda o:
                     isinstance(o, llama_index.chat_engine.types.BaseChatEngine),
-                "astream_achat":
+                "astream_chat":
                     lambda o:
                     isinstance(o, llama_index.chat_engine.types.BaseChatEngine),
                 "retrieve":
@@ -145,6 +150,96 @@ class LlamaInstrument(Instrument):
         )
 
 
+class RecordedStreamingAgentChatResponse():
+    """
+    Proxy of a streaming chat response returned by a recorded call whose
+    tokens are produced through the `StreamedRecord` of that call. Other
+    attributes are those of the response itself.
+    """
+
+    def __init__(
+        self, response: StreamingAgentChatResponse, stream: StreamedRecord
+    ):
+        self.__dict__['_tru_response'] = response
+        self.__dict__['_tru_stream'] = stream
+        self.__dict__['_tru_response_gen'] = None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._tru_response, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._tru_response, name, value)
+
+    def __str__(self) -> str:
+        return str(self._tru_response)
+
+    @property
+    def response_gen(self) -> Iterator[str]:
+        # The response makes a new generator over its token queue each time,
+        # the record is made from the first one.
+        if self._tru_response_gen is None:
+            self.__dict__['_tru_response_gen'] = self._tru_stream.wrap(
+                self._tru_response.response_gen
+            )
+
+        return self._tru_response_gen
+
+    def print_response_stream(self) -> None:
+        for token in self.response_gen:
+            print(token, end="")
+
+
+def _write_streams_in_creator_context() -> None:
+    """
+    Chat engines consume the LLM streams of their streaming responses in
+    threads of their own which do not get the context (see `contextvars`) in
+    which the responses are made. Make them do so, so that the costs of the
+    streams are tracked along with the call that made the response. Responses
+    made outside of recorded calls are left as they are.
+    """
+
+    cls = StreamingAgentChatResponse
+
+    if hasattr(cls, "_tru_context"):
+        return
+
+    # Default for responses made before this.
+    cls._tru_context = None
+
+    post_init = cls.__post_init__
+
+    @functools.wraps(post_init)
+    def __post_init__(self) -> None:
+        post_init(self)
+        if len(_RECORDS_AND_APPS.get()) > 0:
+            self._tru_context = contextvars.copy_context()
+
+    write = cls.write_response_to_history
+
+    @functools.wraps(write)
+    def write_response_to_history(self, *args, **kwargs) -> None:
+        if self._tru_context is None:
+            return write(self, *args, **kwargs)
+
+        return self._tru_context.run(write, self, *args, **kwargs)
+
+    awrite = cls.awrite_response_to_history
+
+    @functools.wraps(awrite)
+    async def awrite_response_to_history(self, *args, **kwargs) -> None:
+        if self._tru_context is None:
+            return await awrite(self, *args, **kwargs)
+
+        # Tasks run in a copy of the context they are created in.
+        return await self._tru_context.run(
+            asyncio.ensure_future, awrite(self, *args, **kwargs)
+        )
+
+    cls.__post_init__ = __post_init__
+    cls.write_response_to_history = write_response_to_history
+    cls.awrite_response_to_history = awrite_response_to_history
+
+
 class TruLlama(App):
     """
     Wrap a llama index engine for monitoring.
@@ -170,6 +265,8 @@ class TruLlama(App):
 
         super().update_forward_refs()
 
+        _write_streams_in_creator_context()
+
         # TruLlama specific:
         kwargs['app'] = app
         kwargs['root_class'] = Class.of_object(app)  # TODO: make class property
@@ -283,22 +380,35 @@ class TruLlama(App):
             return ret.response
 
         elif isinstance(ret, (StreamingResponse, StreamingAgentChatResponse)):
-            logger.warn(
-                "App produced a streaming response. "
-                "Tracking content of streams in llama_index is not yet supported. "
-                "App main_output will be None."
-            )
-
+            # Main output is that of the stream once exhausted. See
+            # `_wrap_stream`.
             return None
 
         else:
 
             return App.main_output(self, func, sig, bindings, ret)
 
+    def _wrap_stream(self, ret: Any, stream: StreamedRecord) -> Optional[Any]:
+        """
+        Streaming responses are recorded once their `response_gen` is
+        exhausted.
+        """
+
+        if isinstance(ret, StreamingResponse):
+            ret.response_gen = stream.wrap(ret.response_gen)
+            return ret
+
+        elif isinstance(ret, StreamingAgentChatResponse):
+            return RecordedStreamingAgentChatResponse(ret, stream)
+
+        else:
+
+            return App._wrap_stream(self, ret, stream)
+
     # Mirrors llama_index.indices.query.base.BaseQueryEngine.query .
     def query_with_record(
         self, str_or_query_bundle: QueryType
-    ) -> Tuple[RESPONSE_TYPE, Record]:
+    ) -> Tuple[RESPONSE_TYPE, Optional[Record]]:
         assert isinstance(
             self.app, llama_index.indices.query.base.BaseQueryEngine
         )
@@ -308,7 +418,7 @@ class TruLlama(App):
     # Mirrors llama_index.indices.query.base.BaseQueryEngine.aquery .
     async def aquery_with_record(
         self, str_or_query_bundle: QueryType
-    ) -> Tuple[RESPONSE_TYPE, Record]:
+    ) -> Tuple[RESPONSE_TYPE, Optional[Record]]:
         assert isinstance(
             self.app, llama_index.indices.query.base.BaseQueryEngine
         )
@@ -316,8 +426,9 @@ class TruLlama(App):
         return await self.awith_record(self.app.aquery, str_or_query_bundle)
 
     # Compatible with llama_index.chat_engine.types.BaseChatEngine.chat .
-    def chat_with_record(self, message: str,
-                         **kwargs) -> Tuple[AgentChatResponse, Record]:
+    def chat_with_record(
+        self, message: str, **kwargs
+    ) -> Tuple[AgentChatResponse, Optional[Record]]:
         assert isinstance(
             self.app, llama_index.chat_engine.types.BaseChatEngine
         )
@@ -325,8 +436,9 @@ class TruLlama(App):
         return self.with_record(self.app.chat, message, **kwargs)
 
     # Compatible with llama_index.chat_engine.types.BaseChatEngine.achat .
-    async def achat_with_record(self, message: str,
-                                **kwargs) -> Tuple[AgentChatResponse, Record]:
+    async def achat_with_record(
+        self, message: str, **kwargs
+    ) -> Tuple[AgentChatResponse, Optional[Record]]:
         assert isinstance(
             self.app, llama_index.chat_engine.types.BaseChatEngine
         )
@@ -334,9 +446,11 @@ class TruLlama(App):
         return await self.awith_record(self.app.achat, message, **kwargs)
 
     # Compatible with llama_index.chat_engine.types.BaseChatEngine.stream_chat .
+    # The record is finished once the `response_gen` of the response is
+    # exhausted.
     def stream_chat_with_record(
         self, message: str, **kwargs
-    ) -> Tuple[StreamingAgentChatResponse, Record]:
+    ) -> Tuple[StreamingAgentChatResponse, Optional[Record]]:
         assert isinstance(
             self.app, llama_index.chat_engine.types.BaseChatEngine
         )
@@ -344,9 +458,11 @@ class TruLlama(App):
         return self.with_record(self.app.stream_chat, message, **kwargs)
 
     # Compatible with llama_index.chat_engine.types.BaseChatEngine.astream_chat .
+    # The record is finished once the `response_gen` of the response is
+    # exhausted.
     async def astream_chat_with_record(
         self, message: str, **kwargs
-    ) -> Tuple[StreamingAgentChatResponse, Record]:
+    ) -> Tuple[StreamingAgentChatResponse, Optional[Record]]:
         assert isinstance(
             self.app, llama_index.chat_engine.types.BaseChatEngine
         )
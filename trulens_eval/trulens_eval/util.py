@@ -27,25 +27,35 @@ Method                      | (python method)
 from __future__ import annotations
 
 import builtins
+from collections import abc
+from collections import defaultdict
+from collections import deque
+from concurrent.futures import Future
 from concurrent.futures import ThreadPoolExecutor as fThreadPoolExecutor
+import contextvars
+import copy
+from datetime import datetime
 from enum import Enum
+import functools
+import heapq
 import importlib
 import inspect
-from inspect import stack, signature
+from inspect import signature
 import itertools
 import json
 import logging
-from multiprocessing.context import TimeoutError
-from multiprocessing.pool import AsyncResult
-from multiprocessing.pool import ThreadPool
+import os
 from pathlib import Path
 from pprint import PrettyPrinter
+from queue import Full
 from queue import Queue
+import threading
 from time import sleep
+from types import GetSetDescriptorType
 from types import ModuleType
 from typing import (
-    Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Set,
-    Tuple, TypeVar, Union
+    Any, Callable, ClassVar, Deque, Dict, Hashable, Iterable, List, Optional,
+    Sequence, Set, Tuple, TypeVar, Union
 )
 
 from merkle_json import MerkleJson
@@ -54,6 +64,7 @@ import pandas as pd
 import pydantic
 
 from trulens_eval.keys import redact_value
+from trulens_eval.utils.python import stack_frames
 from trulens_eval.utils.python import stack_with_tasks
 
 logger = logging.getLogger(__name__)
@@ -75,6 +86,21 @@ REQUIREMENT_LANGCHAIN = (
     f"Please install it before use: `pip install langchain>={langchain_version}`."
 )
 
+REQUIREMENT_PYARROW = (
+    "pyarrow is required for exporting records to Arrow or Parquet files. "
+    "Please install it before use: `pip install pyarrow`."
+)
+
+REQUIREMENT_ZSTD = (
+    "zstandard is required for storing records compressed with zstd. "
+    "Please install it before use: `pip install zstandard`."
+)
+
+REQUIREMENT_OTEL = (
+    "opentelemetry-sdk is required for exporting records as OpenTelemetry spans. "
+    "Please install it before use: `pip install opentelemetry-sdk`."
+)
+
 
 class Dummy(object):
     """
@@ -290,6 +316,11 @@ ERROR = "__tru_property_error"
 # Key of structure where class information is stored. See WithClassInfo mixin.
 CLASS_INFO = "__tru_class_info"
 
+# Key of structure standing for a large string stored apart from the record it
+# is in, with the id of the blob holding the string as value. See
+# `database/blobs.py`.
+BLOB = "__tru_blob"
+
 ALL_SPECIAL_KEYS = set([CIRCLE, ERROR, CLASS_INFO, NOSERIO])
 
 def callable_name(c: Callable):
@@ -320,6 +351,162 @@ def safe_signature(func_or_obj: Any):
             raise e
 
 
+class _ClassInfo():
+    """
+    Information about a class needed to jsonify its instances, computed once
+    per class. Lookups of class attributes done by `inspect.getattr_static`
+    (for each attribute of each serialized object) and the bases of the class
+    in its `CLASS_INFO` dominate the time to jsonify apps and records
+    otherwise.
+    """
+
+    # Cache of the above per class.
+    _cache: Dict[type, '_ClassInfo'] = dict()
+
+    def __init__(self, cls: type):
+        self.cls = cls
+
+        # Attributes of instances not counting those in their __dict__, in the
+        # order given by `dir`.
+        self.dir = dir(cls)
+        self.dir_set = frozenset(self.dir)
+
+        # Whether instance __dict__ can be read directly. Otherwise some class
+        # in the mro defines __dict__ and we leave lookups to `inspect`.
+        self.plain_dict = all(
+            _is_plain_dict_attr(base, base.__dict__.get("__dict__"))
+            for base in cls.__mro__
+        )
+
+        # Whether `dir` of instances is the default one.
+        self.plain_dir = cls.__dir__ is object.__dir__
+
+        # Class attribute (or _NOT_FOUND) along with whether it is a data
+        # descriptor, per attribute name.
+        self.attributes: Dict[str, Tuple[Any, bool]] = dict()
+
+        self._fields = None
+        self._class_info_json = None
+
+    @staticmethod
+    def of_class(cls: type) -> '_ClassInfo':
+        try:
+            info = _ClassInfo._cache.get(cls)
+        except TypeError:
+            # Unhashable class.
+            return _ClassInfo(cls)
+
+        if info is None:
+            info = _ClassInfo(cls)
+            _ClassInfo._cache[cls] = info
+
+        return info
+
+    def class_attribute(self, k: str) -> Tuple[Any, bool]:
+        if k not in self.attributes:
+            v = _NOT_FOUND
+            for base in self.cls.__mro__:
+                if k in base.__dict__:
+                    v = base.__dict__[k]
+                    break
+
+            is_data_descriptor = v is not _NOT_FOUND and _has_class_attribute(
+                type(v), "__get__"
+            ) and (
+                _has_class_attribute(type(v), "__set__") or
+                _has_class_attribute(type(v), "__delete__")
+            )
+
+            self.attributes[k] = (v, is_data_descriptor)
+
+        return self.attributes[k]
+
+    def getattr_static(self, obj: Any, k: str) -> Any:
+        """
+        Same as `inspect.getattr_static(obj, k)` for instances of this class.
+        """
+
+        if not self.plain_dict:
+            return inspect.getattr_static(obj, k)
+
+        v, is_data_descriptor = self.class_attribute(k)
+
+        if not is_data_descriptor:
+            try:
+                instance_dict = object.__getattribute__(obj, "__dict__")
+                if k in instance_dict:
+                    return instance_dict[k]
+            except AttributeError:
+                pass
+
+        if v is _NOT_FOUND:
+            # Let inspect raise the appropriate error.
+            return inspect.getattr_static(obj, k)
+
+        return v
+
+    def dir_of(self, obj: Any) -> List[str]:
+        """
+        Same as `dir(obj)` for instances of this class.
+        """
+
+        if not self.plain_dir or obj.__class__ is not self.cls:
+            return dir(obj)
+
+        try:
+            instance_dict = object.__getattribute__(obj, "__dict__")
+        except AttributeError:
+            return self.dir
+
+        if not isinstance(instance_dict, dict) or len(instance_dict) == 0:
+            return self.dir
+
+        return sorted(self.dir_set.union(instance_dict.keys()))
+
+    @property
+    def fields(self) -> List[str]:
+        """
+        Names of fields of a pydantic model class that are not excluded from
+        serialization.
+        """
+
+        if self._fields is None:
+            self._fields = [
+                k for k, v in self.cls.__fields__.items()
+                if not v.field_info.exclude
+            ]
+
+        return self._fields
+
+    def class_info_json(self) -> JSON:
+        """
+        A fresh copy of the json of `Class.of_class(cls, with_bases=True)`.
+        """
+
+        if self._class_info_json is None:
+            self._class_info_json = Class.of_class(
+                cls=self.cls, with_bases=True
+            ).dict()
+
+        return copy.deepcopy(self._class_info_json)
+
+
+# Marker for attributes not found by `_ClassInfo.class_attribute`.
+_NOT_FOUND = object()
+
+
+def _has_class_attribute(cls: type, k: str) -> bool:
+    return any(k in base.__dict__ for base in cls.__mro__)
+
+
+def _is_plain_dict_attr(cls: type, attr: Any) -> bool:
+    # The `__dict__` attribute python adds to classes whose instances have one.
+    return attr is None or (
+        isinstance(attr, GetSetDescriptorType) and
+        attr.__name__ == "__dict__" and attr.__objclass__ is cls
+    )
+
+
 def _safe_getattr(obj: Any, k: str) -> Any:
     """
     Try to get the attribute `k` of the given object. This may evaluate some
@@ -327,7 +514,10 @@ def _safe_getattr(obj: Any, k: str) -> Any:
     indicating so is returned.
     """
 
-    v = inspect.getattr_static(obj, k)
+    if isinstance(obj, type):
+        v = inspect.getattr_static(obj, k)
+    else:
+        v = _ClassInfo.of_class(type(obj)).getattr_static(obj, k)
 
     if isinstance(v, property):
         try:
@@ -350,7 +540,12 @@ def _clean_attributes(obj) -> Dict[str, Any]:
     serializing/displaying.
     """
 
-    keys = dir(obj)
+    if isinstance(obj, type):
+        keys = dir(obj)
+    else:
+        keys = _ClassInfo.of_class(type(obj)).dir_of(obj)
+
+    key_set = set(keys)
 
     ret = {}
 
@@ -360,7 +555,7 @@ def _clean_attributes(obj) -> Dict[str, Any]:
             # exposed beyond immediate definitions. Ignoring these.
             continue
 
-        if k.startswith("_") and k[1:] in keys:
+        if k.startswith("_") and k[1:] in key_set:
             # Objects often have properties named `name` with their values
             # coming from `_name`. Lets avoid including both the property and
             # the value.
@@ -387,8 +582,9 @@ def jsonify(
 
         - obj: Any -- the object to jsonify.
 
-        - dicted: Optional[Dict[int, JSON]] -- the mapping from addresses of
-          already jsonifed objects (via id) to their json.
+        - dicted: Optional[Dict[int, JSON]] -- addresses (via id) of objects
+          that are being jsonified and thus should not be recurred into if
+          found again within `obj`.
 
         - instrument: Optional[Instrument] -- instrumentation functions for
           checking whether to recur into components of `obj`.
@@ -408,134 +604,150 @@ def jsonify(
     from trulens_eval.instruments import Instrument
 
     instrument = instrument or Instrument()
-    dicted = dicted or dict()
+
+    # Addresses of the objects on the path from `obj` to the one being
+    # jsonified. Objects are added when entered and removed when done so a
+    # single set is shared by the whole traversal. Objects found more than
+    # once outside of this path are jsonified each time.
+    path = set(dicted or ())
 
     if skip_specials:
         recur_key = lambda k: k not in ALL_SPECIAL_KEYS
     else:
         recur_key = lambda k: True
 
-    if id(obj) in dicted:
-        if skip_specials:
-            return None
+    # How instances of each type found are jsonified along with whether they
+    # are to be instrumented.
+    kinds: Dict[type, Tuple[str, bool]] = dict()
+
+    def kind_of(obj: Any) -> Tuple[str, bool]:
+        cls = type(obj)
+
+        # Proxies and similar may pass isinstance checks their type would not
+        # so are never cached.
+        cacheable = obj.__class__ is cls
+
+        if cacheable and cls in kinds:
+            return kinds[cls]
+
+        to_instrument = instrument.to_instrument_object(obj)
+
+        if isinstance(obj, Path):
+            kind = "path"
+        elif cls in pydantic.json.ENCODERS_BY_TYPE:
+            kind = "encoded"
+        elif isinstance(obj, Enum):
+            kind = "enum"
+        elif isinstance(obj, dict):
+            kind = "dict"
+        elif isinstance(obj, (abc.Sequence, set)):
+            kind = "sequence"
+        elif isinstance(obj, pydantic.BaseModel):
+            kind = "model"
+        elif to_instrument:
+            kind = "component"
         else:
-            return {CIRCLE: id(obj)}
+            kind = "other"
 
-    if isinstance(obj, JSON_BASES):
-        if redact_keys and isinstance(obj, str):
-            return redact_value(obj)
-        else:
-            return obj
+        if cacheable:
+            kinds[cls] = (kind, to_instrument)
 
-    if isinstance(obj, Path):
-        return str(obj)
+        return kind, to_instrument
 
-    if type(obj) in pydantic.json.ENCODERS_BY_TYPE:
-        return obj
+    def recur(obj: Any) -> JSON:
+        if id(obj) in path:
+            if skip_specials:
+                return None
+            else:
+                return {CIRCLE: id(obj)}
 
-    # TODO: should we include duplicates? If so, dicted needs to be adjusted.
-    new_dicted = {k: v for k, v in dicted.items()}
+        if isinstance(obj, JSON_BASES):
+            if redact_keys and isinstance(obj, str):
+                return redact_value(obj)
+            else:
+                return obj
 
-    recur = lambda o: jsonify(
-        obj=o,
-        dicted=new_dicted,
-        instrument=instrument,
-        skip_specials=skip_specials,
-        redact_keys=redact_keys
-    )
+        kind, to_instrument = kind_of(obj)
 
-    content = None
+        if kind == "path":
+            return str(obj)
 
-    if isinstance(obj, Enum):
-        content = obj.name
+        if kind == "encoded":
+            return obj
 
-    elif isinstance(obj, Dict):
-        temp = {}
-        new_dicted[id(obj)] = temp
-        temp.update({k: recur(v) for k, v in obj.items() if recur_key(k)})
+        content = None
 
-        # Redact possible secrets based on key name and value.
-        if redact_keys:
-            for k, v in temp.items():
-                temp[k] = redact_value(v=v, k=k)
+        if kind == "enum":
+            content = obj.name
 
-        content = temp
+        elif kind == "other":
+            logger.debug(
+                f"Do not know how to jsonify an object '{str(obj)[0:32]}' of type '{type(obj)}'."
+            )
 
-    elif isinstance(obj, Sequence):
-        temp = []
-        new_dicted[id(obj)] = temp
-        for x in (recur(v) for v in obj):
-            temp.append(x)
+            content = noserio(obj)
 
-        content = temp
+        else:
+            path.add(id(obj))
+            try:
+                content = recur_container(obj, kind)
+            finally:
+                path.remove(id(obj))
 
-    elif isinstance(obj, Set):
-        temp = []
-        new_dicted[id(obj)] = temp
-        for x in (recur(v) for v in obj):
-            temp.append(x)
+        # Add class information for objects that are to be instrumented, known
+        # as "components".
+        if to_instrument:
+            content[CLASS_INFO] = _ClassInfo.of_class(obj.__class__
+                                                     ).class_info_json()
 
-        content = temp
+        if not isinstance(obj, JSONPath) and hasattr(obj, "jsonify_extra"):
+            # Problem with JSONPath and similar objects: they always say they have every attribute.
 
-    elif isinstance(obj, pydantic.BaseModel):
-        # Not even trying to use pydantic.dict here.
+            content = obj.jsonify_extra(content)
 
-        temp = {}
-        new_dicted[id(obj)] = temp
-        temp.update(
-            {
-                k: recur(_safe_getattr(obj, k))
-                for k, v in obj.__fields__.items()
-                if not v.field_info.exclude and recur_key(k)
-            }
-        )
+        return content
 
-        # Redact possible secrets based on key name and value.
-        if redact_keys:
-            for k, v in temp.items():
-                temp[k] = redact_value(v=v, k=k)
+    def recur_container(obj: Any, kind: str) -> JSON:
+        if kind == "dict":
+            temp = {k: recur(v) for k, v in obj.items() if recur_key(k)}
 
-        content = temp
+            # Redact possible secrets based on key name and value.
+            if redact_keys:
+                for k, v in temp.items():
+                    temp[k] = redact_value(v=v, k=k)
 
-    elif instrument.to_instrument_object(obj):
+            return temp
 
-        temp = {}
-        new_dicted[id(obj)] = temp
+        elif kind == "sequence":
+            return [recur(v) for v in obj]
 
-        kvs = _clean_attributes(obj)
+        elif kind == "model":
+            # Not even trying to use pydantic.dict here.
 
-        temp.update(
-            {
-                k: recur(v) for k, v in kvs.items() if recur_key(k) and (
-                    isinstance(v, JSON_BASES) or isinstance(v, Dict) or
-                    isinstance(v, Sequence) or
-                    instrument.to_instrument_object(v)
-                )
+            temp = {
+                k: recur(_safe_getattr(obj, k))
+                for k in _ClassInfo.of_class(type(obj)).fields
+                if recur_key(k)
             }
-        )
-
-        content = temp
 
-    else:
-        logger.debug(
-            f"Do not know how to jsonify an object '{str(obj)[0:32]}' of type '{type(obj)}'."
-        )
-
-        content = noserio(obj)
+            # Redact possible secrets based on key name and value.
+            if redact_keys:
+                for k, v in temp.items():
+                    temp[k] = redact_value(v=v, k=k)
 
-    # Add class information for objects that are to be instrumented, known as
-    # "components".
-    if instrument.to_instrument_object(obj):
-        content[CLASS_INFO] = Class.of_class(
-            cls=obj.__class__, with_bases=True
-        ).dict()
+            return temp
 
-    if not isinstance(obj, JSONPath) and hasattr(obj, "jsonify_extra"):
-        # Problem with JSONPath and similar objects: they always say they have every attribute.
+        else:
+            kvs = _clean_attributes(obj)
 
-        content = obj.jsonify_extra(content)
+            return {
+                k: recur(v) for k, v in kvs.items() if recur_key(k) and (
+                    isinstance(v, (JSON_BASES, dict,
+                                   abc.Sequence)) or kind_of(v)[1]
+                )
+            }
 
-    return content
+    return recur(obj)
 
 
 def leaf_queries(obj_json: JSON, query: JSONPath = None) -> Iterable[JSONPath]:
@@ -742,16 +954,44 @@ class Step(SerialModel):  #, abc.ABC):
         """
         raise NotImplementedError()
 
+    # Whether the step selects exactly one element, in which case it also
+    # implements `get_sole_item`.
+    sole: ClassVar[bool] = False
+
+    def get_sole_item(self, obj: Any) -> Any:
+        """
+        Get the sole element of `obj` indexed by `self` if `self.sole`.
+        """
+        raise NotImplementedError()
+
+    def _key(self) -> Tuple:
+        # Hashable identity of the step, cheaper to compare than the step.
+        return (type(self),) + tuple(
+            tuple(v) if isinstance(v, list) else v
+            for v in self.__dict__.values()
+        )
+
+    @staticmethod
+    def _of_key(key: Tuple) -> 'Step':
+        # Inverse of `_key`.
+        cls, *values = key
+        return cls(**dict(zip(cls.__fields__, values)))
+
 
 class GetAttribute(Step):
     attribute: str
 
+    sole = True
+
     def __hash__(self):
         return hash(self.attribute)
 
     def __call__(self, obj: Any) -> Iterable[Any]:
+        yield self.get_sole_item(obj)
+
+    def get_sole_item(self, obj: Any) -> Any:
         if hasattr(obj, self.attribute):
-            yield getattr(obj, self.attribute)
+            return getattr(obj, self.attribute)
         else:
             raise ValueError(
                 f"Object {obj} does not have attribute: {self.attribute}"
@@ -776,13 +1016,18 @@ class GetAttribute(Step):
 class GetIndex(Step):
     index: int
 
+    sole = True
+
     def __hash__(self):
         return hash(self.index)
 
     def __call__(self, obj: Sequence[T]) -> Iterable[T]:
-        if isinstance(obj, Sequence):
+        yield self.get_sole_item(obj)
+
+    def get_sole_item(self, obj: Sequence[T]) -> T:
+        if isinstance(obj, abc.Sequence):
             if len(obj) > self.index:
-                yield obj[self.index]
+                return obj[self.index]
             else:
                 raise IndexError(f"Index out of bounds: {self.index}")
         else:
@@ -808,13 +1053,18 @@ class GetIndex(Step):
 class GetItem(Step):
     item: str
 
+    sole = True
+
     def __hash__(self):
         return hash(self.item)
 
     def __call__(self, obj: Dict[str, T]) -> Iterable[T]:
-        if isinstance(obj, Dict):
+        yield self.get_sole_item(obj)
+
+    def get_sole_item(self, obj: Dict[str, T]) -> T:
+        if isinstance(obj, dict):
             if self.item in obj:
-                yield obj[self.item]
+                return obj[self.item]
             else:
                 raise KeyError(f"Key not in dictionary: {self.item}")
         else:
@@ -838,20 +1088,25 @@ class GetItemOrAttribute(Step):
 
     item_or_attribute: str  # distinct from "item" for deserialization
 
+    sole = True
+
     def __hash__(self):
         return hash(self.item_or_attribute)
 
     def __call__(self, obj: Dict[str, T]) -> Iterable[T]:
-        if isinstance(obj, Dict):
+        yield self.get_sole_item(obj)
+
+    def get_sole_item(self, obj: Dict[str, T]) -> T:
+        if isinstance(obj, dict):
             if self.item_or_attribute in obj:
-                yield obj[self.item_or_attribute]
+                return obj[self.item_or_attribute]
             else:
                 raise KeyError(
                     f"Key not in dictionary: {self.item_or_attribute}"
                 )
         else:
             if hasattr(obj, self.item_or_attribute):
-                yield getattr(obj, self.item_or_attribute)
+                return getattr(obj, self.item_or_attribute)
             else:
                 raise ValueError(
                     f"Object {obj} does not have item or attribute {self.item_or_attribute}."
@@ -1028,47 +1283,22 @@ class JSONPath(SerialModel):
         return True
 
     def set(self, obj: Any, val: Any) -> Any:
-        if len(self.path) == 0:
-            return val
-
-        first = self.path[0]
-        rest = JSONPath(path=self.path[1:])
-
-        try:
-            firsts = first(obj)
-            first_obj, firsts = iterable_peek(firsts)
-
-        except (ValueError, IndexError, KeyError, AttributeError):
-
-            # `first` points to an element that does not exist, use `set` to create a spot for it.
-            obj = first.set(obj, None)  # will create a spot for `first`
-            firsts = first(obj)
-
-        for first_obj in firsts:
-            obj = first.set(
-                obj,
-                rest.set(first_obj, val),
-            )
-
-        return obj
+        return _set_steps(self.path, obj, val)
 
     def get_sole_item(self, obj: Any) -> Any:
         return next(self.__call__(obj))
 
     def __call__(self, obj: Any) -> Iterable[Any]:
-        if len(self.path) == 0:
-            yield obj
-            return
+        yield from self.compile()(obj)
 
-        first = self.path[0]
-        if len(self.path) == 1:
-            rest = JSONPath(path=())
-        else:
-            rest = JSONPath(path=self.path[1:])
+    def compile(self) -> Callable[[Any], Iterable[Any]]:
+        """
+        Function selecting the elements of an object indexed by this path, as
+        `__call__` does but without building a path for each step. Compiled
+        functions of the most recently used paths are cached.
+        """
 
-        for first_selection in first.__call__(obj):
-            for rest_selection in rest.__call__(first_selection):
-                yield rest_selection
+        return _compile_key(tuple(step._key() for step in self.path))
 
     def _append(self, step: Step) -> JSONPath:
         return JSONPath(path=self.path + (step,))
@@ -1102,6 +1332,84 @@ class JSONPath(SerialModel):
         return self._append(GetItemOrAttribute(item_or_attribute=attr))
 
 
+def _set_steps(steps: Sequence[Step], obj: Any, val: Any) -> Any:
+    """
+    Set the value(s) of `obj` indexed by the given steps to `val`.
+    """
+
+    if len(steps) == 0:
+        return val
+
+    first = steps[0]
+    rest = steps[1:]
+
+    try:
+        firsts = first(obj)
+        first_obj, firsts = iterable_peek(firsts)
+
+    except (ValueError, IndexError, KeyError, AttributeError):
+
+        # `first` points to an element that does not exist, use `set` to create a spot for it.
+        obj = first.set(obj, None)  # will create a spot for `first`
+        firsts = first(obj)
+
+    for first_obj in firsts:
+        obj = first.set(
+            obj,
+            _set_steps(rest, first_obj, val),
+        )
+
+    return obj
+
+
+# Most functions compiled by `JSONPath.compile` kept at once.
+COMPILED_PATHS_CACHE_SIZE = 1024
+
+
+@functools.lru_cache(maxsize=COMPILED_PATHS_CACHE_SIZE)
+def _compile_key(key: Tuple[Tuple, ...]) -> Callable[[Any], Iterable[Any]]:
+    """
+    Function selecting the elements indexed by the steps with the given
+    `Step._key`s.
+    """
+
+    return _compile_steps([Step._of_key(step_key) for step_key in key])
+
+
+def _compile_steps(steps: Sequence[Step]) -> Callable[[Any], Iterable[Any]]:
+    """
+    Function selecting the elements of an object indexed by the given steps.
+    """
+
+    if all(step.sole for step in steps):
+        # Fast path: a single element, got step after step.
+        getters = tuple(step.get_sole_item for step in steps)
+
+        def select(obj: Any) -> Iterable[Any]:
+            for getter in getters:
+                obj = getter(obj)
+            return (obj,)
+
+    else:
+        # Lazy pipeline of the elements selected by each step from those
+        # selected by the previous one.
+        selectors = tuple(
+            (step.get_sole_item, True) if step.sole else (step.__call__, False)
+            for step in steps
+        )
+
+        def select(obj: Any) -> Iterable[Any]:
+            objs = iter((obj,))
+            for selector, sole in selectors:
+                if sole:
+                    objs = map(selector, objs)
+                else:
+                    objs = itertools.chain.from_iterable(map(selector, objs))
+            return objs
+
+    return select
+
+
 # Python utilities
 
 
@@ -1133,102 +1441,470 @@ class SingletonPerName():
 
 # Threading utilities
 
+# Whether tasks submitted to `Executor` (and `TP`) or `ThreadPoolExecutor` keep
+# the stack of their submitter for `get_all_local_in_call_stack` and similar
+# to walk across threads. Instrumentation finds what it needs via context
+# variables which tasks always get so this is off by default: capturing a stack
+# walks all of its frames. Enable with the TRULENS_CAPTURE_THREAD_STACKS env.
+# var. or by setting this to True.
+CAPTURE_THREAD_STACKS = os.environ.get("TRULENS_CAPTURE_THREAD_STACKS",
+                                       "").lower() in ["1", "true"]
+
+
+def _submission_stack() -> Sequence['frame']:
+    """
+    The stack to be kept by a task submitted from here, if any.
+    """
+
+    if CAPTURE_THREAD_STACKS:
+        # skip this method and the submitting one
+        return stack_frames(offset=2)
+    else:
+        return ()
+
+
+# When the task running in this context was submitted to be run in a thread,
+# until taken by the first instrumented call made by the task (see
+# `take_queued_time` and `Perf.queued_time`).
+_QUEUED_TIME: contextvars.ContextVar[Optional[datetime]] = \
+    contextvars.ContextVar("queued_time", default=None)
 
-def _future_target_wrapper(stack, func, *args, **kwargs):
+
+def take_queued_time() -> Optional[datetime]:
+    """
+    When the task running in this context was submitted to `Executor` (or
+    `ThreadPoolExecutor`) if nothing has taken it yet, otherwise None. Tasks
+    run in a copy of the context of their submitter so this does not affect
+    other tasks.
+    """
+
+    queued_time = _QUEUED_TIME.get()
+    if queued_time is not None:
+        _QUEUED_TIME.set(None)
+
+    return queued_time
+
+
+def _future_target_wrapper(stack, queued_time, func, *args, **kwargs):
     """
     Wrapper for a function that is started by threads. This is needed to
     record the call stack prior to thread creation as in python threads do
-    not inherit the stack. Our instrumentation, however, relies on walking
-    the stack and need to do this to the frames prior to thread starts.
+    not inherit the stack. Only used for walking the stack across threads if
+    `CAPTURE_THREAD_STACKS` is set. Also makes the time at which the task was
+    submitted available to `take_queued_time`.
     """
 
     # Keep this for looking up via get_first_local_in_call_stack .
     pre_start_stack = stack
 
+    _QUEUED_TIME.set(queued_time)
+
     return func(*args, **kwargs)
 
 
 class ThreadPoolExecutor(fThreadPoolExecutor):
+    """
+    A `concurrent.futures.ThreadPoolExecutor` whose tasks run in the context
+    (see `contextvars`) of their submitter.
+    """
 
     def submit(self, fn, /, *args, **kwargs):
-        present_stack = stack()
+        present_stack = _submission_stack()
+        context = contextvars.copy_context()
         return super().submit(
-            _future_target_wrapper, present_stack, fn, *args, **kwargs
+            context.run, _future_target_wrapper, present_stack, datetime.now(),
+            fn, *args, **kwargs
         )
 
 
-class TP(SingletonPerName):  # "thread processing"
+class TaskPriority(int, Enum):
+    """
+    Priorities of `Executor` tasks. Lower values run first.
+    """
 
-    # Store here stacks of calls to various thread starting methods so that we can retrieve
-    # the trace of calls that caused a thread to start.
-    # pre_run_stacks = dict()
+    # Writing out records produced on the app path.
+    RECORD = 0
 
-    def __init__(self):
-        if hasattr(self, "thread_pool"):
+    DEFAULT = 10
+
+    # Feedback function evaluation.
+    FEEDBACK = 20
+
+
+class _Task():
+    """
+    A unit of work queued in an `Executor`, ordered by priority and then by
+    submission order.
+    """
+
+    __slots__ = (
+        "priority", "seq", "func", "args", "kwargs", "key", "stack", "context",
+        "queued_time", "future", "claimed"
+    )
+
+    def __init__(self, priority, seq, func, args, kwargs, key, stack, context):
+        self.priority = priority
+        self.seq = seq
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.stack = stack
+        self.context = context
+        self.queued_time = datetime.now()
+        self.future: Optional[TaskFuture] = None
+
+        # Set once a thread has taken the task to run it.
+        self.claimed = False
+
+    def __lt__(self, other: _Task) -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class TaskFuture(Future):
+    """
+    Future of a task submitted to an `Executor`. If waited on from one of the
+    executor's own threads before the task has started, the waiting thread runs
+    the task itself instead of blocking a thread the task might need.
+
+    Also provides `get` so it can stand in for the `AsyncResult`s previously
+    returned by `TP.promise`.
+    """
+
+    def __init__(self, executor: Executor, task: _Task):
+        super().__init__()
+        self._executor = executor
+        self._task = task
+
+    def result(self, timeout: Optional[float] = None) -> Any:
+        self._executor._run_inline_if_waiting(self._task)
+        return super().result(timeout)
+
+    def exception(self, timeout: Optional[float] = None) -> Any:
+        self._executor._run_inline_if_waiting(self._task)
+        return super().exception(timeout)
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        return self.result(timeout)
+
+
+class Executor(SingletonPerName):
+    """
+    Bounded thread pool for background work such as writing records and
+    evaluating feedback functions.
+
+    - At most `max_workers` threads run tasks. Tasks run in order of
+      `TaskPriority` so that record writes go ahead of feedback evaluation.
+
+    - At most `max_queued` tasks wait to run. Submitting more blocks the
+      submitter until there is room (or raises `queue.Full` after `timeout`).
+      Tasks submitted from the executor's own threads run in the submitting
+      thread instead of blocking it.
+
+    - Tasks can be given a `key`, such as the name of the endpoint they call.
+      At most `set_limit(key, n)` tasks with the same key run at once.
+
+    - `metrics` reports how many tasks are queued, running, completed and
+      failed.
+
+    Like `TP`, tasks run in the context (see `contextvars`) of the thread that
+    submitted them so that instrumentation can find the records they
+    contribute to.
+
+    `Executor()` is shared; executors given a different `name` are separate.
+    Settings only apply when an executor is first created.
+    """
+
+    def __init__(
+        self,
+        name: Optional[str] = None,
+        max_workers: int = 64,
+        max_queued: int = 1024,
+        limits: Optional[Dict[str, int]] = None
+    ):
+        if hasattr(self, "max_workers"):
             # Already initialized as per SingletonPerName mechanism.
             return
 
-        # TODO(piotrm): if more tasks than `processes` get added, future ones
-        # will block and earlier ones may never start executing.
-        self.thread_pool = ThreadPool(processes=1024)
-        self.running = 0
-        self.promises = Queue(maxsize=1024)
+        self.max_workers = max_workers
+        self.max_queued = max_queued
 
-    def runrepeatedly(self, func: Callable, rpm: float = 6, *args, **kwargs):
+        self._cond = threading.Condition()
+        self._queue: List[_Task] = []  # heap
+        self._seq = itertools.count()
+        self._threads: List[threading.Thread] = []
+        self._idle = 0
+        self._local = threading.local()
 
-        def runner():
-            while True:
-                func(*args, **kwargs)
-                sleep(60 / rpm)
+        # Per-key concurrency limits, running counts and tasks waiting for
+        # their key to free up.
+        self._limits: Dict[str, int] = dict(limits or {})
+        self._running_by_key: Dict[str, int] = defaultdict(int)
+        self._parked: Dict[str, Deque[_Task]] = defaultdict(deque)
+
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+
+    def set_limit(self, key: str, limit: Optional[int]) -> None:
+        """
+        Run at most `limit` tasks with the given `key` at once. A `limit` of
+        None removes the limit.
+        """
+
+        with self._cond:
+            if limit is None:
+                self._limits.pop(key, None)
+            else:
+                self._limits[key] = limit
+
+            # Let workers re-check everything that was waiting on the old
+            # limit.
+            for task in self._parked.pop(key, []):
+                heapq.heappush(self._queue, task)
+            self._cond.notify_all()
 
-        self.runlater(runner)
+    def submit(self, func: Callable[..., T], *args, **kwargs) -> TaskFuture:
+        """
+        Run `func(*args, **kwargs)` in a thread with default priority. Blocks
+        while the queue is full.
+        """
 
-    def _thread_starter(self, func, args, kwargs):
-        present_stack = stack()
+        return self.submit_task(func, args=args, kwargs=kwargs)
 
-        prom = self.thread_pool.apply_async(
-            _future_target_wrapper,
-            args=(present_stack, func) + args,
-            kwds=kwargs
+    def submit_task(
+        self,
+        func: Callable[..., T],
+        args: Sequence[Any] = (),
+        kwargs: Optional[Dict[str, Any]] = None,
+        priority: TaskPriority = TaskPriority.DEFAULT,
+        key: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> TaskFuture:
+        """
+        Run `func(*args, **kwargs)` in a thread once tasks of higher `priority`
+        have started and fewer than the limit of tasks with the same `key` are
+        running. Blocks for up to `timeout` seconds (forever if None) while the
+        queue is full.
+        """
+
+        task = _Task(
+            priority=priority,
+            seq=next(self._seq),
+            func=func,
+            args=tuple(args),
+            kwargs=kwargs or {},
+            key=key,
+            stack=_submission_stack(),
+            context=contextvars.copy_context()
         )
-        return prom
+        task.future = TaskFuture(self, task)
+
+        with self._cond:
+            if self._queued >= self.max_queued:
+                if self._in_worker():
+                    # Blocking here could leave no thread to drain the queue.
+                    self._claim(task)
+                    run_inline = True
+                else:
+                    if not self._cond.wait_for(
+                            lambda: self._queued < self.max_queued,
+                            timeout=timeout):
+                        raise Full(
+                            f"Executor queue is full ({self.max_queued} tasks)."
+                        )
+                    run_inline = False
+            else:
+                run_inline = False
 
-    def runlater(self, func: Callable, *args, **kwargs) -> None:
-        prom = self._thread_starter(func, args, kwargs)
-        self.promises.put(prom)
+            if not run_inline:
+                heapq.heappush(self._queue, task)
+                self._queued += 1
+
+                # Idle threads only stop counting as idle once they wake up,
+                # so start threads while queued tasks outnumber them.
+                waiting = len(self._queue) > self._idle
+                if waiting and len(self._threads) < self.max_workers:
+                    self._start_thread()
 
-    def promise(self, func: Callable[..., T], *args, **kwargs) -> AsyncResult:
-        prom = self._thread_starter(func, args, kwargs)
-        self.promises.put(prom)
+                self._cond.notify_all()
 
-        return prom
+        if run_inline:
+            self._run(task)
+
+        return task.future
 
     def finish(self, timeout: Optional[float] = None) -> int:
-        logger.debug(f"Finishing {self.promises.qsize()} task(s).")
+        """
+        Wait for all queued and running tasks to complete. Returns the number
+        of tasks still outstanding after `timeout` seconds.
+        """
+
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._queued + self._running == 0, timeout=timeout
+            )
+            return self._queued + self._running
 
-        timeouts = []
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Current task counts: queued, running, completed and failed, plus the
+        number of threads and running tasks per key.
+        """
+
+        with self._cond:
+            return dict(
+                queued=self._queued,
+                running=self._running,
+                completed=self._completed,
+                failed=self._failed,
+                threads=len(self._threads),
+                running_by_key={
+                    k: v for k, v in self._running_by_key.items() if v > 0
+                }
+            )
 
-        while not self.promises.empty():
-            prom = self.promises.get()
+    def _in_worker(self) -> bool:
+        return getattr(self._local, "worker", False)
+
+    def _start_thread(self) -> None:
+        thread = threading.Thread(
+            target=self._worker,
+            name=f"Executor-{len(self._threads)}",
+            daemon=True
+        )
+        self._threads.append(thread)
+        thread.start()
+
+    def _claim(self, task: _Task) -> None:
+        # Call with self._cond held.
+        task.claimed = True
+        self._running += 1
+        if task.key is not None:
+            self._running_by_key[task.key] += 1
+
+    def _unpark(self, key: Optional[str]) -> None:
+        # Call with self._cond held. Requeue tasks waiting on `key`.
+        parked = self._parked.get(key)
+        while parked:
+            limit = self._limits.get(key)
+            if limit is not None and self._running_by_key[key] >= limit:
+                break
+
+            task = parked.popleft()
+            if not task.claimed:
+                heapq.heappush(self._queue, task)
+                self._cond.notify_all()
+                break
+
+    def _worker(self) -> None:
+        self._local.worker = True
+
+        while True:
+            with self._cond:
+                self._idle += 1
+                self._cond.wait_for(lambda: len(self._queue) > 0)
+                self._idle -= 1
+
+                task = heapq.heappop(self._queue)
+                if task.claimed:
+                    # Already run inline by a thread waiting on it.
+                    continue
+
+                limit = self._limits.get(task.key)
+                if limit is not None and self._running_by_key[task.key
+                                                             ] >= limit:
+                    self._parked[task.key].append(task)
+                    continue
+
+                self._queued -= 1
+                self._claim(task)
+                self._cond.notify_all()
+
+            self._run(task)
+
+    def _run_inline_if_waiting(self, task: _Task) -> None:
+        if task.claimed or not self._in_worker():
+            return
+
+        with self._cond:
+            if task.claimed:
+                return
+
+            # Still queued or parked; the copy there is skipped once claimed.
+            self._queued -= 1
+            self._claim(task)
+            self._cond.notify_all()
+
+        self._run(task)
+
+    def _run(self, task: _Task) -> None:
+        failed = False
+
+        if task.future.set_running_or_notify_cancel():
             try:
-                prom.get(timeout=timeout)
-            except TimeoutError:
-                timeouts.append(prom)
+                result = task.context.run(
+                    _future_target_wrapper, task.stack, task.queued_time,
+                    task.func, *task.args, **task.kwargs
+                )
+                task.future.set_result(result)
 
-        for prom in timeouts:
-            self.promises.put(prom)
+            except BaseException as e:
+                failed = True
+                task.future.set_exception(e)
 
-        if len(timeouts) == 0:
-            logger.debug("Done.")
-        else:
-            logger.debug("Some tasks timed out.")
+        with self._cond:
+            self._running -= 1
+            if failed:
+                self._failed += 1
+            else:
+                self._completed += 1
+
+            if task.key is not None:
+                self._running_by_key[task.key] -= 1
+                self._unpark(task.key)
+
+            self._cond.notify_all()
+
+        # Drop references held by the future.
+        task.args = task.kwargs = task.stack = task.context = None
+
+
+class TP(SingletonPerName):  # "thread processing"
+    """
+    Thread processing helpers. Tasks are run by the shared `Executor`; see
+    there for limits and priorities.
+    """
+
+    def __init__(self):
+        pass
+
+    def runrepeatedly(self, func: Callable, rpm: float = 6, *args, **kwargs):
+
+        def runner():
+            while True:
+                func(*args, **kwargs)
+                sleep(60 / rpm)
+
+        # Runs forever so gets its own thread instead of an executor one.
+        threading.Thread(target=runner, daemon=True).start()
+
+    def runlater(self, func: Callable, *args, **kwargs) -> None:
+        Executor().submit(func, *args, **kwargs)
+
+    def promise(self, func: Callable[..., T], *args, **kwargs) -> TaskFuture:
+        return Executor().submit(func, *args, **kwargs)
+
+    def finish(self, timeout: Optional[float] = None) -> int:
+        logger.debug(f"Finishing {Executor().metrics()} task(s).")
 
-        return len(timeouts)
+        return Executor().finish(timeout=timeout)
 
-    def _status(self) -> List[str]:
+    def _status(self) -> pd.DataFrame:
         rows = []
 
-        for p in self.thread_pool._pool:
+        for p in Executor()._threads:
             rows.append([p.is_alive(), str(p)])
 
         return pd.DataFrame(rows, columns=["alive", "thread"])
@@ -1250,7 +1926,7 @@ def get_all_local_in_call_stack(
     function is recognized but does not have `key` in its locals.
 
     This method works across threads as long as they are started using the TP
-    class above.
+    class above while `CAPTURE_THREAD_STACKS` is set.
     """
 
     logger.debug(f"Looking for local '{key}' in the stack.")
@@ -1274,8 +1950,8 @@ def get_all_local_in_call_stack(
             )
             locs = f.f_locals
             assert "pre_start_stack" in locs, "Pre thread start stack expected but not found."
-            for fi in locs['pre_start_stack']:
-                q.put(fi.frame)
+            for pf in locs['pre_start_stack']:
+                q.put(pf)
             continue
 
         if func(f.f_code):
@@ -1302,7 +1978,7 @@ def get_first_local_in_call_stack(
     locals.
 
     This method works across threads as long as they are started using the TP
-    class above.
+    class above while `CAPTURE_THREAD_STACKS` is set.
     """
 
     try:
@@ -1,6 +1,207 @@
+import argparse
+import signal
+import threading
+
 from trulens_eval import Tru
+from trulens_eval.schema import DEFAULT_LEASE_SECONDS
 
 
 def main():
     tru = Tru()
     tru.run_dashboard()
+
+
+def worker():
+    """
+    Evaluate deferred feedback functions. Any number of workers, on any number
+    of hosts, can be pointed at the same database.
+    """
+
+    from trulens_eval.feedback.cache import FeedbackCache
+    from trulens_eval.utils.worker import run_worker
+
+    parser = argparse.ArgumentParser(
+        prog="trulens-eval-worker", description=worker.__doc__
+    )
+    parser.add_argument(
+        "--database-url",
+        default=None,
+        help="SQLAlchemy database URL. Defaults to 'sqlite:///default.sqlite'."
+    )
+    parser.add_argument(
+        "--worker-id",
+        default=None,
+        help="Name of this worker in logs. Defaults to host name and pid."
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Number of feedback functions to evaluate at once."
+    )
+    parser.add_argument(
+        "--limit",
+        action="append",
+        default=[],
+        metavar="ENDPOINT=N",
+        help="Evaluate at most N feedback functions calling the named endpoint "
+        "(e.g. openai) at once. Can be given more than once."
+    )
+    parser.add_argument(
+        "--cache",
+        default=None,
+        metavar="FILE",
+        help="Reuse feedback function results cached in this SQLite file."
+    )
+    parser.add_argument(
+        "--cache-ttl-seconds",
+        type=float,
+        default=None,
+        help="How long cached results are reused for. Forever by default."
+    )
+    parser.add_argument(
+        "--lease-seconds",
+        type=float,
+        default=DEFAULT_LEASE_SECONDS,
+        help=
+        "How long claimed work stays with a worker that stopped heartbeating."
+    )
+    parser.add_argument(
+        "--poll-seconds",
+        type=float,
+        default=10.0,
+        help="How long to wait before looking for new work when there is none."
+    )
+    args = parser.parse_args()
+
+    executor_limits = dict()
+    for limit in args.limit:
+        endpoint, _, n = limit.partition("=")
+        if not n.isdigit():
+            parser.error(f"Expected --limit ENDPOINT=N, got {limit}.")
+        executor_limits[endpoint] = int(n)
+
+    feedback_cache = None
+    if args.cache is not None:
+        feedback_cache = FeedbackCache(
+            filename=args.cache, ttl_seconds=args.cache_ttl_seconds
+        )
+
+    stop_event = threading.Event()
+
+    def stop(signum, frame):
+        stop_event.set()
+
+    # Finish claimed work before exiting on Ctrl-C or `kill`.
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    run_worker(
+        database_url=args.database_url,
+        stop_event=stop_event,
+        executor_limits=executor_limits,
+        feedback_cache=feedback_cache,
+        worker_id=args.worker_id,
+        concurrency=args.concurrency,
+        lease_seconds=args.lease_seconds,
+        poll_seconds=args.poll_seconds
+    )
+
+
+def export():
+    """
+    Export records and feedback results to Parquet or Arrow files, continuing
+    after the previous export to the same directory.
+    """
+
+    from trulens_eval.database.export import export_records_and_feedback
+    from trulens_eval.database.export import ExportFormat
+    from trulens_eval.database.sqlalchemy_db import SqlAlchemyDB
+
+    parser = argparse.ArgumentParser(
+        prog="trulens-eval-export", description=export.__doc__
+    )
+    parser.add_argument("directory", help="Directory to export to.")
+    parser.add_argument(
+        "--database-url",
+        default="sqlite:///default.sqlite",
+        help="SQLAlchemy database URL. Defaults to 'sqlite:///default.sqlite'."
+    )
+    parser.add_argument(
+        "--app-ids",
+        nargs="+",
+        default=None,
+        help="Apps to export records of. Defaults to all."
+    )
+    parser.add_argument(
+        "--format",
+        choices=[f.value for f in ExportFormat],
+        default=ExportFormat.PARQUET.value,
+        help="File format."
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=1000,
+        help="Number of rows to read from the database at a time."
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Export everything rather than only what is new since the "
+        "previous export."
+    )
+    parser.add_argument(
+        "--overlap-seconds",
+        type=float,
+        default=300.0,
+        help="How far before the previous export to look for rows written "
+        "late or replaced since."
+    )
+    args = parser.parse_args()
+
+    watermark = export_records_and_feedback(
+        SqlAlchemyDB.from_db_url(args.database_url),
+        args.directory,
+        app_ids=args.app_ids,
+        format=args.format,
+        chunk_size=args.chunk_size,
+        incremental=not args.full,
+        overlap_seconds=args.overlap_seconds
+    )
+
+    print(
+        f"Exported up to "
+        f"{watermark.json(include={'records', 'feedbacks', 'parts'})} "
+        f"to {args.directory}."
+    )
+
+
+def rollups():
+    """
+    Rebuild the per app and per feedback function rollups that summaries of
+    apps are read from, for example after inserting with rollups disabled.
+    """
+
+    from trulens_eval.database.sqlalchemy_db import SqlAlchemyDB
+
+    parser = argparse.ArgumentParser(
+        prog="trulens-eval-rollups", description=rollups.__doc__
+    )
+    parser.add_argument(
+        "--database-url",
+        default="sqlite:///default.sqlite",
+        help="SQLAlchemy database URL. Defaults to 'sqlite:///default.sqlite'."
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=1000,
+        help="Number of feedback results to read from the database at a time."
+    )
+    args = parser.parse_args()
+
+    db = SqlAlchemyDB.from_db_url(args.database_url)
+    db.rebuild_rollups(chunk_size=args.chunk_size)
+
+    print(f"Rebuilt rollups of {db.engine.url}.")
@@ -0,0 +1,547 @@
+"""
+# In-process metrics
+
+Counters and histograms of what apps, endpoints, rate limiters and the database
+are doing, along with gauges read when scraped, exported in the Prometheus
+(OpenMetrics) text format by `start_metrics_server` at `/metrics`:
+
+```python
+from trulens_eval.utils import metrics
+
+server = metrics.start_metrics_server(port=9464)
+# curl http://127.0.0.1:9464/metrics
+```
+
+or with the feedback results of a database, `Tru().start_metrics_server()`.
+
+Metrics are disabled by default, in which case instrumented code only checks
+`ENABLED`. Enable them with `enable` (done by `start_metrics_server`) or the
+TRULENS_METRICS env. var. Updates take no locks: each thread updates cells of
+its own which are only summed when scraped.
+"""
+
+import bisect
+import functools
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+import logging
+import math
+import os
+import threading
+import time
+from typing import (
+    Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
+)
+import weakref
+
+from trulens_eval.util import Executor
+from trulens_eval.util import SingletonPerName
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Whether instrumented code updates metrics.
+ENABLED = os.environ.get("TRULENS_METRICS", "").lower() in ["1", "true"]
+
+# Content type of the text exposition format.
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds (seconds) of histogram buckets, excluding +Inf.
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+# Values of labels and the value of a sample with those labels.
+Samples = Iterable[Tuple[Tuple[str, ...], float]]
+
+
+def enable() -> None:
+    global ENABLED
+    ENABLED = True
+
+
+def disable() -> None:
+    global ENABLED
+    ENABLED = False
+
+
+class _CellOwner():
+    """
+    Holder of the cell of a thread, dropped along with the other thread-local
+    values of the thread once it finishes.
+    """
+
+    __slots__ = ("cell", "__weakref__")
+
+    def __init__(self, cell):
+        self.cell = cell
+
+
+class _PerThread():
+    """
+    Cells of a metric (with some label values), one for each running thread
+    that updated it. Threads only update their own cell. The cells of finished
+    threads are merged into `base` so that they do not accumulate.
+    """
+
+    def __init__(
+        self, new_cell: Callable[[], T], merge: Callable[[T, T], None]
+    ):
+        self.new_cell = new_cell
+        self.merge = merge
+
+        # Totals of finished threads.
+        self.base: T = new_cell()
+
+        # Cells of running threads by their id.
+        self.cells: Dict[int, T] = dict()
+
+        # Taken when cells come and go, not when they are updated.
+        self.lock = threading.Lock()
+
+        self.local = threading.local()
+
+    def cell(self) -> T:
+        try:
+            return self.local.owner.cell
+        except AttributeError:
+            owner = _CellOwner(self.new_cell())
+            with self.lock:
+                self.cells[id(owner.cell)] = owner.cell
+            self.local.owner = owner
+            weakref.finalize(owner, self._retire, owner.cell)
+            return owner.cell
+
+    def _retire(self, cell: T) -> None:
+        with self.lock:
+            self.merge(self.base, cell)
+            del self.cells[id(cell)]
+
+    def values(self) -> List[T]:
+        """
+        Cells whose sum is the value of the metric.
+        """
+
+        with self.lock:
+            return [self.base] + list(self.cells.values())
+
+
+class Metric():
+    """
+    A metric with the given label names. Updates are made to the children
+    produced by `labels`.
+    """
+
+    TYPE: str = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        registry: Optional['Registry'] = None
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], _PerThread] = dict()
+
+        (registry or REGISTRY).register(self)
+
+    def _new_cell(self):
+        raise NotImplementedError()
+
+    def _merge_cells(self, base, cell) -> None:
+        """
+        Add the values of `cell` to `base`.
+        """
+        raise NotImplementedError()
+
+    def _child(self, values: Tuple[str, ...]) -> _PerThread:
+        child = self._children.get(values)
+        if child is None:
+            # Threads creating the same child at once end up with the same one.
+            child = self._children.setdefault(
+                values, _PerThread(self._new_cell, self._merge_cells)
+            )
+        return child
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        """
+        Name, labels and value of each sample of this metric.
+        """
+
+        raise NotImplementedError()
+
+    def _label_dict(self, values: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, values))
+
+
+class Counter(Metric):
+    """
+    Monotonically increasing total.
+    """
+
+    TYPE = "counter"
+
+    class Child():
+        __slots__ = ("per_thread",)
+
+        def __init__(self, per_thread: _PerThread):
+            self.per_thread = per_thread
+
+        def inc(self, amount: float = 1.0) -> None:
+            self.per_thread.cell()[0] += amount
+
+    def _new_cell(self) -> List[float]:
+        return [0.0]
+
+    def _merge_cells(self, base: List[float], cell: List[float]) -> None:
+        base[0] += cell[0]
+
+    def labels(self, *values: str) -> 'Counter.Child':
+        return Counter.Child(self._child(tuple(map(str, values))))
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        for values, child in list(self._children.items()):
+            total = sum(cell[0] for cell in child.values())
+            yield self.name, self._label_dict(values), total
+
+
+class _HistogramCell():
+    __slots__ = ("counts", "sum")
+
+    def __init__(self, n_buckets: int):
+        self.counts = [0] * n_buckets
+        self.sum = 0.0
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values over buckets with the given upper bounds,
+    along with their sum and count.
+    """
+
+    TYPE = "histogram"
+
+    class Child():
+        __slots__ = ("per_thread", "buckets")
+
+        def __init__(self, per_thread: _PerThread, buckets: Sequence[float]):
+            self.per_thread = per_thread
+            self.buckets = buckets
+
+        def observe(self, value: float) -> None:
+            cell = self.per_thread.cell()
+            cell.counts[bisect.bisect_left(self.buckets, value)] += 1
+            cell.sum += value
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        registry: Optional['Registry'] = None
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(
+            name=name, help=help, labelnames=labelnames, registry=registry
+        )
+
+    def _new_cell(self) -> _HistogramCell:
+        # Last bucket is +Inf.
+        return _HistogramCell(len(self.buckets) + 1)
+
+    def _merge_cells(self, base: _HistogramCell, cell: _HistogramCell) -> None:
+        base.counts = [c + n for c, n in zip(base.counts, cell.counts)]
+        base.sum += cell.sum
+
+    def labels(self, *values: str) -> 'Histogram.Child':
+        return Histogram.Child(
+            self._child(tuple(map(str, values))), self.buckets
+        )
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        for values, child in list(self._children.items()):
+            counts = [0] * (len(self.buckets) + 1)
+            total = 0.0
+            for cell in child.values():
+                counts = [c + n for c, n in zip(counts, cell.counts)]
+                total += cell.sum
+
+            labels = self._label_dict(values)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield self.name + "_bucket", dict(
+                    labels, le=_format_value(bound)
+                ), cumulative
+            yield self.name + "_sum", labels, total
+            yield self.name + "_count", labels, cumulative
+
+
+class Gauge(Metric):
+    """
+    Values read by `collect` when the metric is scraped, as pairs of label
+    values and value, so nothing is updated on the hot path. Values that only
+    go up can be exported as counters with `type="counter"`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], Samples],
+        labelnames: Sequence[str] = (),
+        type: str = "gauge",
+        registry: Optional['Registry'] = None
+    ):
+        self.collect = collect
+        self.TYPE = type
+        super().__init__(
+            name=name, help=help, labelnames=labelnames, registry=registry
+        )
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        for values, value in self.collect():
+            yield self.name, self._label_dict(tuple(map(str, values))), value
+
+
+class Registry():
+    """
+    Metrics to export together.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = dict()
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> None:
+        with self._lock:
+            self._metrics[metric.name] = metric
+
+    def unregister(self, name: str) -> None:
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def exposition(self) -> str:
+        """
+        All metrics in the Prometheus text format.
+        """
+
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                logger.warning(f"Could not collect {metric.name}: {e}")
+                continue
+
+            lines.append(f"# HELP {metric.name} {_escape(metric.help)}")
+            lines.append(f"# TYPE {metric.name} {metric.TYPE}")
+            for name, labels, value in samples:
+                if len(labels) > 0:
+                    name += "{" + ",".join(
+                        f'{k}="{_escape(v)}"' for k, v in labels.items()
+                    ) + "}"
+                lines.append(f"{name} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+REGISTRY = Registry()
+
+
+def timed(histogram: Histogram, *labels: str):
+    """
+    Decorator observing the duration of each call to the decorated function in
+    `histogram` with the given label values, if enabled.
+    """
+
+    def decorator(func):
+        child = histogram.labels(*labels)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    # Set by `start_metrics_server`.
+    registry: Registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        body = self.registry.exposition().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def start_metrics_server(
+    port: int = 9464,
+    host: str = "127.0.0.1",
+    registry: Optional[Registry] = None
+) -> ThreadingHTTPServer:
+    """
+    Enable metrics and serve those of `registry` (otherwise `REGISTRY`) at
+    `http://host:port/metrics` from a daemon thread. Stop with `shutdown` of
+    the returned server. A `port` of 0 picks a free one, available as
+    `server.server_address[1]`.
+    """
+
+    handler = type("_Handler", (_Handler,), dict(registry=registry or REGISTRY))
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+
+    threading.Thread(
+        target=server.serve_forever, name="trulens-metrics", daemon=True
+    ).start()
+
+    enable()
+
+    logger.info(
+        f"Serving metrics at http://{host}:{server.server_address[1]}/metrics ."
+    )
+
+    return server
+
+
+# Metrics updated on the hot path.
+
+RECORDS = Counter(
+    "trulens_records_total", "Records produced by apps.", ["app_id", "status"]
+)
+
+CALL_LATENCY = Histogram(
+    "trulens_call_latency_seconds",
+    "Latency of recorded calls of instrumented methods.", ["method"]
+)
+
+RATE_LIMIT_WAIT = Histogram(
+    "trulens_rate_limit_wait_seconds",
+    "Time spent waiting for rate limiter budgets.", ["limiter"]
+)
+
+DB_WRITE_LATENCY = Histogram(
+    "trulens_db_write_seconds", "Latency of database writes.", ["operation"]
+)
+
+# Metrics read when scraped.
+
+
+def _endpoint_costs(field: str) -> Callable[[], Samples]:
+
+    def collect():
+        # Endpoints import this module.
+        from trulens_eval.feedback.provider.endpoint.base import Endpoint
+
+        for instance in list(SingletonPerName.instances.values()):
+            if isinstance(instance, Endpoint):
+                yield (instance.name,
+                      ), getattr(instance.global_callback.cost, field)
+
+    return collect
+
+
+ENDPOINT_REQUESTS = Gauge(
+    "trulens_endpoint_requests_total",
+    "Requests made to endpoints, outside of cost tracking only while enabled.",
+    _endpoint_costs("n_requests"), ["endpoint"],
+    type="counter"
+)
+
+ENDPOINT_TOKENS = Gauge(
+    "trulens_endpoint_tokens_total",
+    "Tokens used by endpoint requests, counted as requests are.",
+    _endpoint_costs("n_tokens"), ["endpoint"],
+    type="counter"
+)
+
+ENDPOINT_COST = Gauge(
+    "trulens_endpoint_cost_usd_total",
+    "Cost in USD of endpoint requests, counted as requests are.",
+    _endpoint_costs("cost"), ["endpoint"],
+    type="counter"
+)
+
+
+def _executor_metrics(*keys: str) -> Callable[[], Samples]:
+
+    def collect():
+        metrics = Executor().metrics()
+        if len(keys) == 1:
+            return [((), metrics[keys[0]])]
+        return [((key,), metrics[key]) for key in keys]
+
+    return collect
+
+
+def _executor_utilization() -> Samples:
+    executor = Executor()
+    return [((), executor.metrics()["running"] / executor.max_workers)]
+
+
+EXECUTOR_TASKS = Gauge(
+    "trulens_executor_tasks", "Tasks queued and running in the executor.",
+    _executor_metrics("queued", "running"), ["state"]
+)
+
+EXECUTOR_FINISHED = Gauge(
+    "trulens_executor_tasks_finished_total",
+    "Tasks finished by the executor.",
+    _executor_metrics("completed", "failed"), ["state"],
+    type="counter"
+)
+
+EXECUTOR_THREADS = Gauge(
+    "trulens_executor_threads", "Threads started by the executor.",
+    _executor_metrics("threads")
+)
+
+EXECUTOR_UTILIZATION = Gauge(
+    "trulens_executor_utilization",
+    "Fraction of the executor's maximum number of threads running tasks.",
+    _executor_utilization
+)
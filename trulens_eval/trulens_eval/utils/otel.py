@@ -0,0 +1,225 @@
+"""
+# OpenTelemetry spans of records
+
+`SpanSink` turns each record produced by an app into a tree of OpenTelemetry
+spans, one for the record and one for each of its calls of instrumented
+methods, and hands them to span processors that export them in batches, e.g. to
+an OTLP collector:
+
+```python
+from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+from trulens_eval.utils.otel import SpanSink
+
+sink = SpanSink(exporter=OTLPSpanExporter())
+tru_app = TruChain(chain, span_sink=sink)
+```
+
+Spans are named by the path of the method called in records, like
+`*.__record__.app.retriever.get_relevant_documents`, and carry the arguments,
+returns and errors of calls as attributes truncated to `max_attribute_length`
+characters. The record span carries its cost. Spans are emitted alongside
+writing records to the database, or instead of it with `feedback_mode`
+`FeedbackMode.NONE` and no `tru`.
+
+Spans are made once a record is complete as its calls only then have their
+callers and timing, using the recorded start and end times of calls.
+"""
+
+from datetime import datetime
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from trulens_eval.schema import Record
+from trulens_eval.schema import RecordAppCall
+from trulens_eval.schema import Select
+from trulens_eval.util import GetAttribute
+from trulens_eval.util import json_default
+from trulens_eval.util import JSONPath
+from trulens_eval.util import OptionalImports
+from trulens_eval.util import REQUIREMENT_OTEL
+
+with OptionalImports(message=REQUIREMENT_OTEL):
+    from opentelemetry import trace
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.trace import Status
+    from opentelemetry.trace import StatusCode
+
+logger = logging.getLogger(__name__)
+
+# Name of the tracer of spans made from records.
+TRACER_NAME = "trulens_eval"
+
+# Prefix of the names of attributes of spans.
+ATTRIBUTE_PREFIX = "trulens."
+
+
+def span_name(call: RecordAppCall) -> str:
+    """
+    Name of the span of `call`: the path of its method in records.
+    """
+
+    path = Select.Record + call.top().path
+    return str(
+        JSONPath(
+            path=path.path + (GetAttribute(attribute=call.method().name),)
+        )
+    )
+
+
+def _nanos(time: datetime) -> int:
+    return round(time.timestamp() * 1e6) * 1000
+
+
+class SpanSink():
+    """
+    Exports records as OpenTelemetry spans with the tracers of
+    `tracer_provider`, or if not given, of a new provider exporting to
+    `exporter` in batches.
+    """
+
+    def __init__(
+        self,
+        exporter: Optional[Any] = None,
+        tracer_provider: Optional[Any] = None,
+        max_attribute_length: int = 1024
+    ):
+        if tracer_provider is None:
+            if exporter is None:
+                raise ValueError(
+                    "Either `exporter` or `tracer_provider` is required."
+                )
+
+            tracer_provider = TracerProvider()
+            tracer_provider.add_span_processor(BatchSpanProcessor(exporter))
+
+        self.tracer_provider = tracer_provider
+        self.tracer = tracer_provider.get_tracer(TRACER_NAME)
+        self.max_attribute_length = max_attribute_length
+
+    def _truncate(self, value: Any) -> str:
+        if not isinstance(value, str):
+            value = json.dumps(value, default=json_default)
+
+        if len(value) > self.max_attribute_length:
+            value = value[:self.max_attribute_length] + "..."
+
+        return value
+
+    def _attributes(self, **values: Any) -> Dict[str, Any]:
+        attributes = dict()
+
+        for key, value in values.items():
+            if value is None:
+                continue
+
+            if not isinstance(value, (bool, int, float)):
+                value = self._truncate(value)
+
+            attributes[ATTRIBUTE_PREFIX + key] = value
+
+        return attributes
+
+    def _end(self, span, error: Optional[str], end_time: datetime) -> None:
+        if error is not None:
+            span.set_status(Status(StatusCode.ERROR, error))
+
+        span.end(end_time=_nanos(end_time))
+
+    def export_record(self, record: Record) -> None:
+        """
+        Emit the spans of `record`, to be exported by the span processors of
+        the tracer provider.
+        """
+
+        perf = record.perf
+        cost = record.cost
+
+        attributes = self._attributes(
+            record_id=record.record_id,
+            app_id=record.app_id,
+            main_input=record.main_input,
+            main_output=record.main_output,
+            tags=record.tags
+        )
+        if cost is not None:
+            attributes.update(
+                {
+                    ATTRIBUTE_PREFIX + "cost." + field: value
+                    for field, value in cost.dict().items()
+                }
+            )
+
+        root = self.tracer.start_span(
+            record.app_id,
+            attributes=attributes,
+            start_time=_nanos(perf.start_time) if perf is not None else None
+        )
+        error = record.main_error if record.main_error not in [
+            None, "None"
+        ] else None
+
+        # Calls and their spans by the stack of the calls, to find the caller of
+        # each call: the call one frame up whose interval contains that of the
+        # call.
+        spans: Dict[Tuple, List[Tuple[RecordAppCall, Any]]] = dict()
+
+        calls = [
+            call for call in record.calls
+            if call.perf is not None and len(call.stack) > 0
+        ]
+        # Callers start before and are shallower than their callees.
+        calls.sort(key=lambda call: (call.perf.start_time, len(call.stack)))
+
+        for call in calls:
+            stack = tuple(
+                (str(frame.path), frame.method.name) for frame in call.stack
+            )
+
+            parent = root
+            for caller, span in reversed(spans.get(stack[:-1], [])):
+                if caller.perf.start_time <= call.perf.start_time and \
+                        call.perf.end_time <= caller.perf.end_time:
+                    parent = span
+                    break
+
+            span = self.tracer.start_span(
+                span_name(call),
+                context=trace.set_span_in_context(parent),
+                attributes=self._attributes(
+                    args=call.args,
+                    rets=call.rets,
+                    error=call.error,
+                    pid=call.pid,
+                    tid=call.tid,
+                    queue_wait=call.perf.queue_wait.total_seconds()
+                    if call.perf.queue_wait is not None else None,
+                    self_time=call.perf.self_time.total_seconds()
+                ),
+                start_time=_nanos(call.perf.start_time)
+            )
+            spans.setdefault(stack, []).append((call, span))
+
+        # End calls in the order they ended so that callees end before their
+        # callers.
+        ended = sorted(
+            (item for items in spans.values() for item in items),
+            key=lambda item: item[0].perf.end_time
+        )
+        for call, span in ended:
+            self._end(span, call.error, call.perf.end_time)
+
+        self._end(
+            root, error, perf.end_time if perf is not None else datetime.now()
+        )
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        """
+        Export spans not yet exported by the span processors.
+        """
+
+        return self.tracer_provider.force_flush(timeout_millis)
+
+    def shutdown(self) -> None:
+        self.tracer_provider.shutdown()
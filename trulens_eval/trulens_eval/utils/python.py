@@ -3,8 +3,10 @@ Utilities related to core python functionalities.
 """
 
 import asyncio
-import inspect
-from typing import Callable, Sequence, TypeVar
+from bisect import bisect_left
+from collections import defaultdict
+import sys
+from typing import Callable, List, Sequence, TypeVar
 
 T = TypeVar("T")
 Thunk = Callable[[], T]
@@ -16,7 +18,29 @@ def caller_frame(offset=0) -> 'frame':
     https://docs.python.org/3/reference/datamodel.html#frame-objects .
     """
 
-    return inspect.stack()[offset + 1].frame
+    return sys._getframe(offset + 1)
+
+
+def stack_frames(offset: int = 0) -> List['frame']:
+    """
+    Get the frames of the caller's (of this function) stack, from the caller
+    outwards, skipping the `offset` innermost ones. Same as the frames of
+    `inspect.stack()[offset + 1:]` but without looking up the source of each
+    frame.
+    """
+
+    ret = []
+
+    try:
+        frame = sys._getframe(offset + 1)
+    except ValueError:  # offset deeper than the stack
+        return ret
+
+    while frame is not None:
+        ret.append(frame)
+        frame = frame.f_back
+
+    return ret
 
 
 STACK = "__tru_stack"
@@ -30,7 +54,7 @@ def task_factory_with_stack(loop, coro, *args, **kwargs) -> Sequence['frame']:
     parent_task = asyncio.current_task(loop=loop)
     task = asyncio.tasks.Task(coro=coro, loop=loop, *args, **kwargs)
 
-    stack = [fi.frame for fi in inspect.stack()[2:]]
+    stack = stack_frames(offset=2)
 
     if parent_task is not None:
         stack = merge_stacks(stack, parent_task.get_stack()[::-1])
@@ -61,7 +85,7 @@ def get_task_stack(task: asyncio.Task) -> Sequence['frame']:
     if hasattr(task, STACK):
         return getattr(task, STACK)
     else:
-        # get_stack order is reverse of inspect.stack:
+        # get_stack order is reverse of stack_frames:
         return task.get_stack()[::-1]
 
 
@@ -72,21 +96,25 @@ def merge_stacks(s1: Sequence['frame'],
     order.
     """
 
-    ret = []
+    # Positions of each frame in `s2` to find them without scanning `s2`.
+    positions = defaultdict(list)
+    for i, f in enumerate(s2):
+        positions[id(f)].append(i)
 
-    while len(s1) > 1:
-        f = s1[0]
-        s1 = s1[1:]
+    ret = []
+    start = 0  # frames of `s2` before this one were merged already
 
+    for f in s1[:-1]:
         ret.append(f)
-        try:
-            s2i = s2.index(f)
-            for _ in range(s2i):
-                ret.append(s2[0])
-                s2 = s2[1:]
 
-        except:
-            pass
+        s2i = positions.get(id(f))
+        if s2i is None:
+            continue
+
+        found = bisect_left(s2i, start)
+        if found < len(s2i):
+            ret.extend(s2[start:s2i[found]])
+            start = s2i[found]
 
     return ret
 
@@ -97,7 +125,7 @@ def stack_with_tasks() -> Sequence['frame']:
     across Tasks.
     """
 
-    ret = [fi.frame for fi in inspect.stack()[1:]]  # skip stack_with_task_stack
+    ret = stack_frames(offset=1)  # skip stack_with_tasks
 
     try:
         task_stack = get_task_stack(asyncio.current_task())
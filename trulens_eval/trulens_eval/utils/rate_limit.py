@@ -0,0 +1,268 @@
+"""
+Token-bucket rate limiting of API requests.
+
+A `RateLimiter` keeps one bucket per budget, e.g. requests per minute and
+tokens per minute. Each bucket holds up to `burst_seconds` worth of its budget
+and refills continuously. Taking from a bucket never blocks the bucket itself:
+the amount is deducted right away, possibly into debt, and the caller is told
+how long to wait for the debt to be repaid. Callers are thus served in the
+order they asked without polling, and usage only known after a request (such
+as the tokens of a completion) can be charged afterwards with `consume`.
+
+Bucket levels live either in memory, shared by everything in the process using
+the same limiter, or in a SQLite file so that several processes (e.g.
+evaluation workers sharing one API key) draw from the same budgets.
+"""
+
+import asyncio
+from contextlib import contextmanager
+import functools
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+from trulens_eval.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# Default number of seconds worth of budget that can be used at once.
+DEFAULT_BURST_SECONDS = 5.0
+
+# Bucket level and the time it was computed at.
+BucketState = Tuple[float, float]
+
+
+class _MemoryStore():
+    """
+    Bucket states of the limiters of this process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.states: Dict[str, BucketState] = dict()
+
+    @contextmanager
+    def transaction(self) -> Iterator[Dict[str, BucketState]]:
+        with self.lock:
+            yield self.states
+
+
+class _SQLiteStore():
+    """
+    Bucket states in a SQLite file shared by several processes. Transactions
+    take the database write lock for the duration of one update.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+                "name TEXT PRIMARY KEY, level REAL NOT NULL, ts REAL NOT NULL)"
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=60.0)
+
+    @contextmanager
+    def transaction(self) -> Iterator[Dict[str, BucketState]]:
+        conn = self._connect()
+        conn.isolation_level = None
+
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+
+            states = {
+                name: (level, ts) for name, level, ts in
+                conn.execute("SELECT name, level, ts FROM rate_limit_buckets")
+            }
+            yield states
+
+            conn.executemany(
+                "INSERT OR REPLACE INTO rate_limit_buckets VALUES (?, ?, ?)",
+                [(name, level, ts) for name, (level, ts) in states.items()]
+            )
+            conn.execute("COMMIT")
+
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        finally:
+            conn.close()
+
+
+class RateLimiter():
+    """
+    Requests-per-minute and tokens-per-minute budgets of an API.
+
+    Args:
+
+    - name: str -- name of the budgets. Limiters with the same name and `path`
+      share budgets.
+
+    - rpm: Optional[float] -- requests per minute, unlimited if None.
+
+    - tpm: Optional[float] -- tokens per minute, unlimited if None.
+
+    - burst_seconds: float -- how many seconds worth of each budget can be
+      used at once after being idle.
+
+    - path: Optional[str] -- SQLite file to keep the budgets in so they are
+      shared across processes. If None, budgets are shared within this
+      process only.
+    """
+
+    # Memory store shared by limiters without a path.
+    _memory_store = _MemoryStore()
+
+    def __init__(
+        self,
+        name: str,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        burst_seconds: float = DEFAULT_BURST_SECONDS,
+        path: Optional[str] = None
+    ):
+        assert burst_seconds > 0, "Burst must be positive."
+
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self.burst_seconds = burst_seconds
+        self.path = path
+
+        if path is None:
+            self.store = RateLimiter._memory_store
+            # Only compared within this process.
+            self.clock = time.monotonic
+        else:
+            self.store = _SQLiteStore(path)
+            # Compared across processes.
+            self.clock = time.time
+
+    def _budgets(self, requests: float,
+                 tokens: float) -> Dict[str, Tuple[float, float]]:
+        """
+        Amounts to take from each limited bucket along with the bucket's
+        budget per minute.
+        """
+
+        budgets = dict()
+
+        if self.rpm is not None:
+            budgets[f"{self.name}/requests"] = (requests, self.rpm)
+        if self.tpm is not None:
+            budgets[f"{self.name}/tokens"] = (tokens, self.tpm)
+
+        return budgets
+
+    def reserve(self, requests: float = 1, tokens: float = 0) -> float:
+        """
+        Take `requests` and `tokens` from the budgets, returning how many
+        seconds to wait before using them.
+        """
+
+        budgets = self._budgets(requests, tokens)
+
+        if len(budgets) == 0:
+            return 0.0
+
+        wait = 0.0
+
+        with self.store.transaction() as states:
+            now = self.clock()
+
+            for key, (amount, per_minute) in budgets.items():
+                rate = per_minute / 60.0
+                capacity = max(rate * self.burst_seconds, 1.0)
+
+                level, ts = states.get(key, (capacity, now))
+                level = min(capacity, level + (now - ts) * rate - amount)
+                states[key] = (level, now)
+
+                if level < 0:
+                    wait = max(wait, -level / rate)
+
+        return wait
+
+    def consume(self, requests: float = 0, tokens: float = 0) -> None:
+        """
+        Charge usage to the budgets without waiting, e.g. tokens of a response
+        beyond what was reserved for its request. Negative amounts give back
+        reserved but unused budget.
+        """
+
+        if requests == 0 and tokens == 0:
+            return
+
+        self.reserve(requests=requests, tokens=tokens)
+
+    def aconsume(self, requests: float = 0, tokens: float = 0) -> None:
+        """
+        Charge usage as `consume` does from a thread of the running event
+        loop's executor, without waiting for it.
+        """
+
+        asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self.consume, requests, tokens)
+        )
+
+    def acquire(self, requests: float = 1, tokens: float = 0) -> None:
+        """
+        Block until `requests` and `tokens` are available.
+        """
+
+        wait = self.reserve(requests=requests, tokens=tokens)
+
+        if metrics.ENABLED:
+            metrics.RATE_LIMIT_WAIT.labels(self.name).observe(wait)
+
+        if wait > 0:
+            logger.debug(f"{self.name} rate limited, waiting {wait:.2f}s.")
+            time.sleep(wait)
+
+    async def aacquire(self, requests: float = 1, tokens: float = 0) -> None:
+        """
+        Wait without blocking the event loop until `requests` and `tokens` are
+        available. Budgets are taken in the executor of the loop as the store
+        lock, or the write lock of a shared SQLite file, can be held by other
+        threads or processes.
+        """
+
+        reservation = asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self.reserve, requests, tokens)
+        )
+
+        try:
+            # Shielded so that a cancelled caller can still give back what the
+            # reservation took once it is done.
+            wait = await asyncio.shield(reservation)
+
+        except asyncio.CancelledError:
+
+            def give_back(reservation: asyncio.Future) -> None:
+                if reservation.exception() is None:
+                    self.aconsume(requests=-requests, tokens=-tokens)
+
+            reservation.add_done_callback(give_back)
+            raise
+
+        if metrics.ENABLED:
+            metrics.RATE_LIMIT_WAIT.labels(self.name).observe(wait)
+
+        if wait > 0:
+            logger.debug(f"{self.name} rate limited, waiting {wait:.2f}s.")
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # Give back what we will not use.
+                self.aconsume(requests=-requests, tokens=-tokens)
+                raise
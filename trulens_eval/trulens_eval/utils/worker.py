@@ -0,0 +1,223 @@
+"""
+Deferred feedback evaluation workers.
+
+Any number of workers, in any number of processes or hosts, can share a
+database. Each worker claims a bounded batch of pending feedback results with
+`DB.claim_pending_feedback`, keeps their lease alive with
+`DB.heartbeat_feedback` while evaluating them and stops claiming new work once
+asked to stop, finishing what it already claimed before exiting. Results are
+only written while the worker still holds their lease, so work taken over by
+another worker after a missed heartbeat is not recorded twice.
+"""
+
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import wait
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Dict, Optional
+import uuid
+
+from trulens_eval.schema import DEFAULT_LEASE_SECONDS
+from trulens_eval.schema import FeedbackResultID
+from trulens_eval.utils.text import UNICODE_CHECK
+from trulens_eval.utils.text import UNICODE_STOP
+from trulens_eval.utils.text import UNICODE_YIELD
+
+logger = logging.getLogger(__name__)
+
+
+class EvaluatorWorker():
+    """
+    Evaluates deferred feedback functions of the database of `tru` until
+    `stop_event` is set.
+
+    Args:
+
+    - tru: Tru -- provides the database to take work from.
+
+    - stop_event: Event-like -- set to ask the worker to shut down. Anything
+      with `is_set` and `wait` works, e.g. `threading.Event` or
+      `multiprocessing.Event`.
+
+    - worker_id: Optional[str] -- name of this worker in logs. Defaults to
+      host name and process id.
+
+    - concurrency: int -- number of feedback functions claimed at once.
+      They are evaluated in the shared `trulens_eval.util.Executor` along
+      with feedback evaluated on the app path, so its thread count and
+      per-endpoint limits (see `Tru.set_executor_limit`) apply as well.
+
+    - lease_seconds: float -- how long claimed work stays with this worker
+      without a heartbeat before others may take it over.
+
+    - retry_failed_seconds: float -- how long to wait before retrying failed
+      feedback functions.
+
+    - poll_seconds: float -- how long to wait before looking for new work when
+      none was found.
+    """
+
+    def __init__(
+        self,
+        tru: 'Tru',
+        stop_event: Optional[threading.Event] = None,
+        worker_id: Optional[str] = None,
+        concurrency: int = 8,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        retry_failed_seconds: float = 300.0,
+        poll_seconds: float = 10.0
+    ):
+        assert concurrency > 0, "Worker concurrency must be positive."
+
+        self.tru = tru
+        self.stop_event = stop_event or threading.Event()
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.retry_failed_seconds = retry_failed_seconds
+        self.poll_seconds = poll_seconds
+
+        # Identifies the leases of this worker in the database.
+        self.lease_token = uuid.uuid4().hex
+
+        # Renew leases well before they run out.
+        self.heartbeat_seconds = lease_seconds / 3
+
+        self._in_flight: Dict[FeedbackResultID, Future] = dict()
+        self._last_heartbeat = time.monotonic()
+
+    def stop(self) -> None:
+        """
+        Ask the worker to stop after finishing the work it already claimed.
+        """
+
+        self.stop_event.set()
+
+    def run(self) -> None:
+        """
+        Claim and evaluate deferred feedback until stopped.
+        """
+
+        from trulens_eval.feedback import Feedback
+
+        print(f"{UNICODE_YIELD} Worker {self.worker_id} started.")
+
+        while not self.stop_event.is_set():
+            self._reap()
+            self._heartbeat()
+
+            free = self.concurrency - len(self._in_flight)
+            claimed = 0
+
+            if free > 0:
+                rows = self.tru.db.claim_pending_feedback(
+                    limit=free,
+                    lease_seconds=self.lease_seconds,
+                    retry_failed_seconds=self.retry_failed_seconds,
+                    worker_id=self.worker_id,
+                    lease_token=self.lease_token
+                )
+                claimed = len(rows)
+
+                for _, row in rows.iterrows():
+                    future = Feedback._submit_deferred_row(self.tru, row)
+                    self._in_flight[row.feedback_result_id] = future
+
+            if free > 0 and claimed == free:
+                # There may be more work right away.
+                continue
+
+            if len(self._in_flight) < self.concurrency:
+                # Nothing (more) to claim for now.
+                timeout = self.poll_seconds
+                if len(self._in_flight) > 0:
+                    timeout = min(timeout, self.heartbeat_seconds)
+                self.stop_event.wait(timeout)
+
+            else:
+                wait(
+                    self._in_flight.values(),
+                    timeout=self.heartbeat_seconds,
+                    return_when=FIRST_COMPLETED
+                )
+
+        # Cooperative shutdown: keep the leases of claimed work alive until it
+        # is done.
+        print(
+            f"{UNICODE_STOP} Worker {self.worker_id} stopping after "
+            f"{len(self._in_flight)} feedback function(s) in progress."
+        )
+        while len(self._in_flight) > 0:
+            wait(self._in_flight.values(), timeout=self.heartbeat_seconds)
+            self._reap()
+            self._heartbeat()
+
+        self.tru.db.flush()
+
+        print(f"{UNICODE_CHECK} Worker {self.worker_id} stopped.")
+
+    def _reap(self) -> None:
+        for feedback_result_id, future in list(self._in_flight.items()):
+            if not future.done():
+                continue
+
+            del self._in_flight[feedback_result_id]
+
+            # Feedback.run_and_log records failures in the database; anything
+            # raised here is a problem with the worker itself.
+            if future.exception() is not None:
+                logger.error(
+                    f"Worker {self.worker_id} failed to evaluate feedback "
+                    f"{feedback_result_id}: {future.exception()}"
+                )
+
+    def _heartbeat(self) -> None:
+        if len(self._in_flight) == 0:
+            return
+
+        if time.monotonic() - self._last_heartbeat < self.heartbeat_seconds:
+            return
+
+        self._last_heartbeat = time.monotonic()
+
+        ids = list(self._in_flight.keys())
+        renewed = self.tru.db.heartbeat_feedback(ids, self.lease_token)
+
+        if renewed < len(ids):
+            # Either finished just now or the lease already ran out and the
+            # result was claimed again elsewhere.
+            logger.debug(
+                f"Worker {self.worker_id} renewed {renewed} of {len(ids)} leases."
+            )
+
+
+def run_worker(
+    database_url: Optional[str] = None,
+    stop_event: Optional[threading.Event] = None,
+    executor_limits: Optional[Dict[str, int]] = None,
+    feedback_cache: Optional['FeedbackCache'] = None,
+    **kwargs
+) -> None:
+    """
+    Run an `EvaluatorWorker` on the database at `database_url` until
+    `stop_event` is set, evaluating at most `executor_limits[name]` feedback
+    functions calling the endpoint `name` at once and reusing results from
+    `feedback_cache` if given. Used as the target of
+    processes started by `Tru.start_evaluator(fork=True)` and by the
+    `trulens-eval-worker` command. Other `kwargs` are passed on to
+    `EvaluatorWorker`.
+    """
+
+    from trulens_eval.tru import Tru
+
+    tru = Tru(
+        database_url=database_url,
+        executor_limits=executor_limits,
+        feedback_cache=feedback_cache
+    )
+
+    EvaluatorWorker(tru=tru, stop_event=stop_event, **kwargs).run()